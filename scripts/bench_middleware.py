@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-request middleware overhead, stacked vs single-pass
+
+Compares the previous main.py layout (two @app.middleware("http") layers, i.e.
+BaseHTTPMiddleware, for performance monitoring and rate limiting + logging)
+with RequestPipelineMiddleware doing the same work in one pure ASGI pass.
+
+Requests are driven straight through the ASGI app (no sockets). The rate
+limiter is a stub that always allows, so the numbers measure middleware
+overhead only, not Redis. Overhead is reported relative to the bare app.
+
+Usage:
+    python scripts/bench_middleware.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.middleware.request_pipeline import RequestPipelineMiddleware
+from src.observability.metrics_collector import get_route_label, record_request_metric
+
+class AllowAllLimiter:
+    async def check_rate_limit(self, request, user_id=None):
+        return True, {"allowed": True, "limit_type": "none"}
+
+limiter = AllowAllLimiter()
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/session/{session_id}")
+    async def get_session(session_id: str):
+        return {"session_id": session_id, "status": "scheduled"}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(20):
+                yield f"data: {index}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+def build_stacked_app() -> FastAPI:
+    """The previous layout: two BaseHTTPMiddleware layers"""
+    app = build_app()
+
+    @app.middleware("http")
+    async def performance_monitoring_middleware(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        duration_ms = (time.time() - start_time) * 1000
+        await record_request_metric(f"{request.method} {get_route_label(request.scope)}", duration_ms, response.status_code)
+        response.headers["X-Response-Time"] = f"{duration_ms:.2f}ms"
+        response.headers["X-Cache-Status"] = getattr(request.state, 'cache_status', 'miss')
+        return response
+
+    @app.middleware("http")
+    async def rate_limit_and_log_middleware(request: Request, call_next):
+        start_time = time.time()
+        user_id = request.headers.get("X-User-ID") or request.query_params.get("user_id")
+        allowed, rate_info = await limiter.check_rate_limit(request, user_id=user_id)
+        if not allowed:
+            return JSONResponse(status_code=429, content={"error": "Rate limit exceeded"})
+        response = await call_next(request)
+        logging.getLogger("bench").info(f"{request.method} {request.url.path} - {response.status_code} - {time.time() - start_time:.3f}s")
+        return response
+
+    return app
+
+def build_pipeline_app():
+    return RequestPipelineMiddleware(build_app(), limiter=limiter)
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    body_bytes = 0
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        # Deliver the (empty) body once, then block like a server until disconnect
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal body_bytes
+        if message["type"] == "http.response.body":
+            body_bytes += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return body_bytes
+
+async def measure(app, path: str, requests: int) -> float:
+    for _ in range(200):
+        await call(app, path)
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await call(app, path)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    apps = {"bare": build_app(), "stacked": build_stacked_app(), "pipeline": build_pipeline_app()}
+
+    for label, path in (("JSON", "/api/session/abc123"), ("stream", "/stream")):
+        medians = {name: await measure(app, path, args.requests) for name, app in apps.items()}
+        print(f"=== {label} {path} ({args.requests} requests, median us/request) ===")
+        for name in ("stacked", "pipeline"):
+            print(f"{name:9s} {medians[name]:8.1f}  overhead {medians[name] - medians['bare']:7.1f}")
+        print(f"{'bare':9s} {medians['bare']:8.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
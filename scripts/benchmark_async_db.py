@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for blocking vs non-blocking Supabase query execution
+
+Simulates N concurrent requests, each running a few PostgREST queries, and
+reports requests/second when .execute() runs directly on the event loop
+(before) versus through src.db.async_client.execute_async (after).
+
+By default queries are simulated with a fixed network latency so the script
+runs anywhere. Pass --live to issue a real user_profiles query per call instead.
+
+Usage:
+    python scripts/benchmark_async_db.py
+    python scripts/benchmark_async_db.py --requests 200 --queries 3 --latency-ms 40
+    python scripts/benchmark_async_db.py --live
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db.async_client import execute_async
+
+class SimulatedQuery:
+    """Stand-in for a PostgREST builder whose execute() blocks on network I/O"""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+
+    def execute(self):
+        time.sleep(self.latency_seconds)
+        return {"data": []}
+
+def build_query_factory(args):
+    if args.live:
+        from src.database import SupabaseFactory
+        client = SupabaseFactory.get_service_client()
+        return lambda: client.table('user_profiles').select('id').limit(1)
+    return lambda: SimulatedQuery(args.latency_ms / 1000)
+
+async def blocking_request(make_query, queries: int):
+    for _ in range(queries):
+        make_query().execute()
+
+async def non_blocking_request(make_query, queries: int):
+    for _ in range(queries):
+        await execute_async(make_query())
+
+async def run(label: str, handler, make_query, args) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(make_query, args.queries) for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    rps = args.requests / elapsed
+    print(f"{label:<28} {elapsed:8.2f}s  {rps:10.1f} req/s")
+    return rps
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Concurrent requests to simulate")
+    parser.add_argument("--queries", type=int, default=3, help="Queries per request")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Simulated query latency")
+    parser.add_argument("--live", action="store_true", help="Query Supabase instead of simulating latency")
+    args = parser.parse_args()
+
+    make_query = build_query_factory(args)
+    mode = "live Supabase" if args.live else f"simulated {args.latency_ms:.0f}ms latency"
+    print(f"=== {args.requests} concurrent requests x {args.queries} queries ({mode}) ===")
+
+    before = await run("blocking .execute()", blocking_request, make_query, args)
+    after = await run("execute_async()", non_blocking_request, make_query, args)
+
+    print(f"\nSpeedup: {after / before:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
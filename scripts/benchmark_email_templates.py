@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Render throughput benchmark for email templates
+
+Compares, per template, renders/second for:
+  - per-call formatting: rebuild the template table and str.format it on every
+    send (what EmailService._format_email_content used to do)
+  - CompiledTemplate.render: template compiled once at import
+  - CompiledTemplate.render_many: one bulk call with the fields that are the
+    same for every recipient bound once
+
+Usage:
+    python scripts/benchmark_email_templates.py
+    python scripts/benchmark_email_templates.py --renders 50000
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.email_service import COMPILED_TEMPLATES, EMAIL_TEMPLATE_SOURCES, EmailTemplate
+from src.email_templates import SESSION_SCHEDULED_HTML
+
+SHARED = {
+    "wingman_name": "Jordan",
+    "partner_name": "Jordan",
+    "challenge_title": "Start three conversations this week",
+    "challenge_type": "social",
+    "duration_days": 30,
+    "match_url": "https://wingmanmatch.com/matches/123",
+    "preferences_url": "https://wingmanmatch.com/preferences",
+    "start_date": "2026-10-20",
+    "challenge_dashboard_url": "https://wingmanmatch.com/dashboard",
+    "venue_name": "Blue Bottle Coffee",
+    "scheduled_time": "October 20, 2026 at 07:00 PM",
+}
+
+def contexts(count: int):
+    return [{"recipient_name": f"User {i}", "user_name": f"User {i}"} for i in range(count)]
+
+def report(label: str, renders: int, elapsed: float) -> float:
+    rate = renders / elapsed
+    print(f"  {label:<28} {rate:12,.0f} renders/s")
+    return rate
+
+def bench_text_template(name: str, renders: int):
+    print(f"{name}:")
+    per_recipient = contexts(renders)
+    recipients = [{**SHARED, **context} for context in per_recipient]
+
+    started = time.perf_counter()
+    for context in recipients:
+        source = copy.deepcopy(EMAIL_TEMPLATE_SOURCES)[name]
+        source["subject"].format(**context)
+        source["template"].format(**context)
+    before = report("per-call formatting", renders, time.perf_counter() - started)
+
+    compiled = COMPILED_TEMPLATES[name]
+    started = time.perf_counter()
+    for context in recipients:
+        compiled["subject"].render(context)
+        compiled["template"].render(context)
+    single = report("compiled render", renders, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    compiled["subject"].render_many(per_recipient, shared=SHARED)
+    compiled["template"].render_many(per_recipient, shared=SHARED)
+    bulk = report("compiled render_many", renders, time.perf_counter() - started)
+
+    print(f"  speedup: {single / before:.1f}x single, {bulk / before:.1f}x bulk\n")
+
+def bench_html_template(renders: int):
+    print("session_scheduled (HTML, escaped):")
+    per_recipient = contexts(renders)
+    recipients = [{**SHARED, **context} for context in per_recipient]
+
+    started = time.perf_counter()
+    for context in recipients:
+        SESSION_SCHEDULED_HTML.render(context)
+    report("compiled render", renders, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    SESSION_SCHEDULED_HTML.render_many(per_recipient, shared=SHARED)
+    report("compiled render_many", renders, time.perf_counter() - started)
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20000, help="Renders per template and mode")
+    args = parser.parse_args()
+
+    print(f"=== {args.renders:,} renders per template ===\n")
+    for template in (EmailTemplate.MATCH_INVITATION, EmailTemplate.MATCH_ACCEPTED):
+        bench_text_template(template.value, args.renders)
+    bench_html_template(args.renders)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Burst load test for the chat send rate limit (TokenBucket)
+
+Fires a burst of concurrent requests for one user and reports per-call latency
+and how many were admitted. With the chat limit (capacity 1, refill 2/s) a burst
+that finishes in T seconds may admit at most 1 + 2*T requests; anything above
+that is over-admission.
+
+Two modes:
+    bucket  - call TokenBucket.consume directly against REDIS_URL (default)
+    http    - POST /api/chat/send on a running server (needs DEVELOPMENT_MODE
+              test auth; a 429 counts as rejected, anything else as admitted)
+
+Usage:
+    python scripts/load_test_rate_limit.py --requests 200
+    python scripts/load_test_rate_limit.py --mode http --base-url http://localhost:8000 \\
+        --user-id <uuid> --match-id <uuid>
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+CHAT_CAPACITY = 1
+CHAT_REFILL_RATE = 2.0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def timed(call):
+    started = time.perf_counter()
+    admitted = await call()
+    return admitted, (time.perf_counter() - started) * 1000
+
+async def run_bucket_burst(args):
+    from src.rate_limiting import TokenBucket
+    from src.redis_session import RedisSession
+
+    if not await RedisSession.get_client():
+        raise SystemExit("REDIS_URL is not reachable - bucket mode needs a live Redis")
+
+    bucket = TokenBucket(capacity=CHAT_CAPACITY, refill_rate=CHAT_REFILL_RATE, key_prefix="load_test_chat")
+    identifier = f"burst-{uuid.uuid4()}"
+
+    async def call():
+        result = await bucket.consume(identifier, 1)
+        if result.get("redis_fallback") or result.get("error"):
+            raise SystemExit(f"Rate limiter did not use Redis: {result}")
+        return result["allowed"]
+
+    return await asyncio.gather(*(timed(call) for _ in range(args.requests)))
+
+async def run_http_burst(args):
+    import httpx
+
+    headers = {"X-Test-User-ID": args.user_id}
+    payload = {"match_id": args.match_id, "message": "load test message"}
+    limits = httpx.Limits(max_connections=args.requests)
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def call():
+            response = await client.post("/api/chat/send", json=payload)
+            return response.status_code != 429
+
+        return await asyncio.gather(*(timed(call) for _ in range(args.requests)))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["bucket", "http"], default="bucket")
+    parser.add_argument("--requests", type=int, default=100, help="Concurrent requests in the burst")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--user-id", help="Test user (http mode)")
+    parser.add_argument("--match-id", help="Match the user belongs to (http mode)")
+    args = parser.parse_args()
+
+    if args.mode == "http" and not (args.user_id and args.match_id):
+        parser.error("--user-id and --match-id are required in http mode")
+
+    started = time.perf_counter()
+    results = await (run_bucket_burst(args) if args.mode == "bucket" else run_http_burst(args))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency in results]
+    admitted = sum(1 for allowed, _ in results if allowed)
+    max_allowed = CHAT_CAPACITY + int(elapsed * CHAT_REFILL_RATE)
+
+    print(f"=== {args.requests} concurrent requests ({args.mode} mode) in {elapsed:.2f}s ===")
+    print(f"latency ms   p50={statistics.median(latencies):.2f}  p95={percentile(latencies, 95):.2f}  "
+          f"p99={percentile(latencies, 99):.2f}  max={max(latencies):.2f}")
+    print(f"admitted     {admitted} (limit for this window: {max_allowed})")
+    print("over-admission: NONE" if admitted <= max_allowed else f"over-admission: {admitted - max_allowed} EXTRA")
+
+    if admitted > max_allowed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Reconcile materialized reputation counters with session history
+
+Recomputes completed sessions and no-shows for every user from
+wingman_sessions and compares them with the trigger-maintained
+user_reputation counters. Drifted counters are repaired unless --dry-run
+is given. Exits with status 1 when drift was found, so a scheduler
+(e.g. Heroku Scheduler, daily) can alert on it.
+
+Usage:
+    python scripts/reconcile_reputation.py
+    python scripts/reconcile_reputation.py --dry-run
+    python scripts/reconcile_reputation.py --user-id <uuid> --user-id <uuid>
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.reputation_service import reputation_service
+
+async def run(args) -> int:
+    result = await reputation_service.reconcile_counters(user_ids=args.user_id, repair=not args.dry_run)
+
+    for entry in result["drift"]:
+        stored, actual = entry["stored"], entry["actual"]
+        print(f"{entry['user_id']}: stored {stored['completed_sessions']}/{stored['no_shows']}"
+              f" -> actual {actual['completed_sessions']}/{actual['no_shows']} (completed/no-shows)")
+
+    action = "repaired" if result["repaired"] else "found"
+    print(f"Drift {action} for {result['drifted']} users")
+    return 1 if result["drifted"] else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without repairing it")
+    parser.add_argument("--user-id", action="append", help="Only check this user (repeatable)")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
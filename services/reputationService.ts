@@ -62,6 +62,68 @@ class ReputationService {
     }
   }
 
+  /**
+   * Fetch reputation for many users with one request (e.g. a candidate list)
+   * Results populate the per-user cache, so badges rendered afterwards hit it
+   */
+  async getUserReputations(userIds: string[], useCache: boolean = true): Promise<Record<string, ReputationResponse>> {
+    const uniqueIds = Array.from(new Set(userIds));
+    const results: Record<string, ReputationResponse> = {};
+    const missing = useCache ? uniqueIds.filter(id => !this.isCacheValid(id)) : uniqueIds;
+
+    uniqueIds.forEach(id => {
+      if (!missing.includes(id)) {
+        results[id] = this.cache[id].data;
+      }
+    });
+
+    if (missing.length === 0) {
+      return results;
+    }
+
+    try {
+      const response = await fetch(`${this.API_BASE}/batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Test-User-ID': 'test-user-123', // For development
+        },
+        body: JSON.stringify({ user_ids: missing, use_cache: useCache }),
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new ReputationError(
+          errorData.detail || `Failed to fetch reputations: ${response.status}`,
+          response.status,
+          errorData.code
+        );
+      }
+
+      const data: { reputations: Record<string, ReputationResponse> } = await response.json();
+
+      Object.entries(data.reputations || {}).forEach(([userId, reputation]) => {
+        if (!this.isValidReputationResponse(reputation)) {
+          throw new ReputationError('Invalid reputation data received from server');
+        }
+        if (useCache) {
+          this.cacheReputation(userId, reputation);
+        }
+        results[userId] = reputation;
+      });
+
+      return results;
+    } catch (error) {
+      if (error instanceof ReputationError) {
+        throw error;
+      }
+
+      throw new ReputationError(
+        error instanceof Error ? error.message : 'Failed to fetch reputation data'
+      );
+    }
+  }
+
   /**
    * Get cached reputation data if available and valid
    */
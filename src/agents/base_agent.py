@@ -14,9 +14,11 @@ import json
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import AsyncGenerator, Dict, List, Any, Optional, Tuple
 from supabase import Client
 
+from src.llm_client import create_message, stream_message_text
+
 try:
     from src.simple_memory import WingmanMemory
 except ImportError:
@@ -25,6 +27,8 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+CLAUDE_FALLBACK_RESPONSE = "I apologize, but I'm having trouble processing your request right now. Please try again."
+
 class BaseAgent(ABC):
     """Base class for all Claude agents with common functionality"""
     
@@ -150,27 +154,24 @@ class BaseAgent(ABC):
         except Exception as e:
             logger.error(f"Error updating session context: {e}")
     
-    async def call_claude_with_router(self, messages: List[Dict[str, str]], system_prompt: str = "") -> str:
-        """Make a call to Claude via direct API call with fallback protection"""
+    async def call_claude_with_router(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        model: Optional[str] = None,
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> str:
+        """
+        Make a call to Claude with fallback protection
+        
+        Uses the shared pooled AsyncAnthropic client, so the event loop keeps
+        serving other requests while the model responds. Transient API errors
+        are retried under the "anthropic" retry policy and circuit breaker.
+        """
         try:
-            import anthropic
-            from src.config import Config
-            
-            # Create Anthropic client
-            client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY)
-            
-            # Prepare messages with system prompt
-            formatted_messages = []
-            if messages:
-                formatted_messages = [{"role": msg["role"], "content": msg["content"]} for msg in messages]
-            
-            # Call Claude API directly
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
-                temperature=0.7,
-                system=system_prompt if system_prompt else "You are a helpful assistant.",
-                messages=formatted_messages
+            response = await create_message(
+                **self._claude_request(messages, system_prompt, model, max_tokens, temperature)
             )
             
             # Extract text from response
@@ -181,7 +182,42 @@ class BaseAgent(ABC):
             
         except Exception as e:
             logger.error(f"Error calling Claude via LLM Router: {e}")
-            return "I apologize, but I'm having trouble processing your request right now. Please try again."
+            return CLAUDE_FALLBACK_RESPONSE
+    
+    async def stream_claude_with_router(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        model: Optional[str] = None,
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> AsyncGenerator[str, None]:
+        """Stream a Claude response as text chunks (same fallback as call_claude_with_router)"""
+        try:
+            async for chunk in stream_message_text(
+                **self._claude_request(messages, system_prompt, model, max_tokens, temperature)
+            ):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming Claude via LLM Router: {e}")
+            yield CLAUDE_FALLBACK_RESPONSE
+    
+    @staticmethod
+    def _claude_request(
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        """Build messages.create arguments for an agent turn"""
+        return {
+            "model": model or "claude-3-5-sonnet-20241022",
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "system": system_prompt if system_prompt else "You are a helpful assistant.",
+            "messages": [{"role": msg["role"], "content": msg["content"]} for msg in messages or []]
+        }
     
     async def store_conversation(self, thread_id: str, user_message: str, ai_response: str):
         """Store conversation in memory system"""
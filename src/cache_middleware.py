@@ -2,8 +2,10 @@
 """
 Cache Middleware for WingmanMatch Performance Optimization
 
-Provides FastAPI middleware for intelligent caching with Redis integration,
-ETag support, and automatic cache invalidation for hot data access.
+Provides response caching with Redis integration, ETag support, and automatic
+cache invalidation for hot data access. ResponseCache holds the caching logic
+and runs as a pure ASGI layer, either through CacheMiddleware or inside the
+single-pass request pipeline (src.middleware.request_pipeline).
 
 Features:
 - Automatic response caching for cacheable endpoints
@@ -11,35 +13,40 @@ Features:
 - Cache-Control headers for browser optimization
 - User-specific cache isolation
 - Configurable TTL per endpoint type
-- Cache invalidation on data mutations
+- Cache invalidation on data mutations through a tag index (no keyspace scans)
+- Single-flight fills, stale-while-revalidate and probabilistic early refresh
 """
 
+import asyncio
 import hashlib
 import json
 import logging
+import math
+import random
+import time
 from typing import Dict, List, Optional, Any, Callable, Set
 from datetime import datetime, timedelta
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from src.redis_client import redis_service
 from src.config import Config
 
 logger = logging.getLogger(__name__)
 
-class CacheMiddleware(BaseHTTPMiddleware):
+# Invalidation generation counters only need to outlive a fill
+GENERATION_TTL_SECONDS = 3600
+
+class ResponseCache:
     """
-    Intelligent caching middleware for WingmanMatch API endpoints.
+    Intelligent response caching for WingmanMatch API endpoints.
     
     Provides automatic caching with Redis backend, ETag support for static content,
     and user-scoped cache isolation for security and performance.
     """
     
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        
+    def __init__(self):
         # Cacheable endpoints configuration
         self.cacheable_endpoints = {
             # Challenge data - relatively static
@@ -104,40 +111,210 @@ class CacheMiddleware(BaseHTTPMiddleware):
         self.cache_invalidating_endpoints = set()
         for config in self.cacheable_endpoints.values():
             self.cache_invalidating_endpoints.update(config.get("invalidate_on", []))
+        
+        # Serve expired entries while one background request refreshes them
+        self.stale_while_revalidate = Config.CACHE_STALE_WHILE_REVALIDATE
+        # Tag indexes must outlive the longest-lived entry registered under them
+        self.tag_ttl = max(
+            config["ttl"] + config.get("stale_ttl", config["ttl"])
+            for config in self.cacheable_endpoints.values()
+        )
+        # XFetch beta: > 1 refreshes earlier, 0 only refreshes on expiry
+        self.early_expiration_beta = Config.CACHE_EARLY_EXPIRATION_BETA
+        self.coalesce_timeout = 10.0
+        
+        # One fill per cache key per worker; other requests wait for its result
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "coalesced": 0, "misses": 0, "refreshes": 0}
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send) -> None:
         """
-        Main middleware dispatch method.
+        Serve an HTTP request through the cache.
+        
+        GET requests to cacheable endpoints are answered from Redis when
+        possible. Expired entries (or ones picked for early refresh) are still
+        served when stale-while-revalidate is on, while one background request
+        refreshes them. On a miss, one request per key runs the app and the
+        others wait for its response. Other methods run the app and then
+        invalidate affected caches. Everything else passes straight through.
         
-        Handles caching logic for incoming requests and outgoing responses.
+        Args:
+            app: Downstream ASGI app
+            scope: ASGI scope of an HTTP request
+            receive: ASGI receive callable
+            send: ASGI send callable
         """
+        request = Request(scope, receive)
+        
         # Skip caching for non-GET requests by default
         if request.method != "GET":
-            response = await call_next(request)
+            await app(scope, receive, send)
             
             # Check if this endpoint invalidates any caches
             await self._handle_cache_invalidation(request)
-            
-            return response
+            return
         
         # Check if this endpoint is cacheable
         cache_config = self._get_cache_config(request)
         if not cache_config:
-            return await call_next(request)
+            await app(scope, receive, send)
+            return
+        
+        # User-scoped endpoints are only cached per user; without one, don't cache at all
+        cache_key = self._generate_cache_key(request, cache_config)
+        if cache_key is None:
+            await app(scope, receive, send)
+            return
         
         # Try to serve from cache
-        cached_response = await self._get_cached_response(request, cache_config)
-        if cached_response:
-            return cached_response
+        cached_data = await self._get_cached_data(cache_key)
+        if cached_data:
+            if not self._needs_refresh(cached_data):
+                self.stats["hits"] += 1
+                await self._send_cached(request, cached_data, cache_key, cache_config, "hit", send)
+                return
+            
+            if self.stale_while_revalidate:
+                self._start_refresh(app, scope, cache_key, cache_config)
+                self.stats["stale_hits"] += 1
+                await self._send_cached(request, cached_data, cache_key, cache_config, "stale", send)
+                return
+        
+        # Another request is already filling this key - wait for its response
+        inflight = self._inflight.get(cache_key)
+        if inflight:
+            try:
+                filled = await asyncio.wait_for(asyncio.shield(inflight), timeout=self.coalesce_timeout)
+            except asyncio.TimeoutError:
+                filled = None
+            
+            if filled:
+                self.stats["coalesced"] += 1
+                await self._send_cached(request, filled, cache_key, cache_config, "coalesced", send)
+                return
+            
+            # The fill failed or timed out - answer this request directly
+            await app(scope, receive, send)
+            return
+        
+        self.stats["misses"] += 1
+        fill = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = fill
+        try:
+            await self._fill(app, scope, receive, send, request, cache_key, cache_config, fill)
+        finally:
+            if not fill.done():
+                fill.set_result(None)
+            self._inflight.pop(cache_key, None)
+    
+    async def _fill(self, app: ASGIApp, scope: Scope, receive: Receive, send: Optional[Send],
+                    request: Request, cache_key: str, cache_config: Dict[str, Any],
+                    fill: asyncio.Future) -> None:
+        """
+        Run the app, store a successful response and hand it to waiting requests.
+        
+        The response is held until it is complete so it can be stored before
+        being sent. A send of None runs the fill without a client (background refresh).
+        Invalidation generations of the entry's tags are read first, so a response
+        computed before a mutation invalidated the key is not stored afterwards.
+        """
+        tags = self._cache_tags(request, cache_config)
+        generations = await self._tag_generations(tags)
+        start_time = time.perf_counter()
+        start_message: Optional[Message] = None
+        body_parts: List[bytes] = []
+        
+        async def buffer_response(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                if send:
+                    await send(message)
+                return
+            
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            
+            response_body = b"".join(body_parts)
+            if start_message["status"] == 200:
+                cached_data = await self._cache_response(
+                    request, cache_key, MutableHeaders(scope=start_message), response_body,
+                    cache_config, time.perf_counter() - start_time, tags, generations
+                )
+                if not fill.done():
+                    fill.set_result(cached_data)
+            if send:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": response_body})
+        
+        await app(scope, receive, buffer_response)
+    
+    def _start_refresh(self, app: ASGIApp, scope: Scope, cache_key: str,
+                       cache_config: Dict[str, Any]) -> None:
+        """Refresh a cache entry in the background unless a fill is already running"""
+        if cache_key in self._inflight:
+            return
+        
+        fill = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = fill
+        self.stats["refreshes"] += 1
+        
+        task = asyncio.create_task(self._refresh(app, dict(scope, state={}), cache_key, cache_config, fill))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+    
+    async def _refresh(self, app: ASGIApp, scope: Scope, cache_key: str,
+                       cache_config: Dict[str, Any], fill: asyncio.Future) -> None:
+        """Re-run a cached GET request without a client and store the result"""
+        request_sent = False
+        
+        async def receive() -> Message:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # No client to disconnect - wait until the response is complete
+            await asyncio.Event().wait()
+        
+        try:
+            request = Request(scope, receive)
+            await self._fill(app, scope, receive, None, request, cache_key, cache_config, fill)
+        except Exception as e:
+            logger.error(f"Error refreshing cache entry {cache_key}: {e}")
+        finally:
+            if not fill.done():
+                fill.set_result(None)
+            self._inflight.pop(cache_key, None)
+    
+    def _needs_refresh(self, cached_data: Dict[str, Any]) -> bool:
+        """
+        Decide whether a cached entry should be refreshed now.
+        
+        Uses probabilistic early expiration (XFetch): the chance of refreshing
+        rises as the entry nears expiry, and sooner for entries that were slow
+        to compute, so refreshes of a hot key spread out instead of all
+        landing on the expiry instant.
         
-        # Not in cache - process request
-        response = await call_next(request)
+        Args:
+            cached_data: Stored cache entry
+            
+        Returns:
+            True if the entry is expired or picked for early refresh
+        """
+        expires_at = cached_data.get("expires_at")
+        if expires_at is None:
+            return False
         
-        # Cache the response if successful
-        if response.status_code == 200:
-            await self._cache_response(request, response, cache_config)
+        early_by = 0.0
+        if self.early_expiration_beta > 0:
+            compute_time = cached_data.get("compute_time", 0.0)
+            early_by = -compute_time * self.early_expiration_beta * math.log(1.0 - random.random())
         
-        return response
+        return time.time() + early_by >= expires_at
     
     def _get_cache_config(self, request: Request) -> Optional[Dict[str, Any]]:
         """
@@ -191,91 +368,102 @@ class CacheMiddleware(BaseHTTPMiddleware):
         
         return path == pattern
     
-    async def _get_cached_response(self, request: Request, 
-                                  cache_config: Dict[str, Any]) -> Optional[Response]:
+    async def _get_cached_data(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
-        Attempt to retrieve cached response for the request.
+        Look up a stored response.
         
         Args:
-            request: FastAPI request object
-            cache_config: Cache configuration
+            cache_key: Cache key of the request
             
         Returns:
-            Cached response or None if not found
+            Stored cache entry or None if not found
         """
         try:
-            cache_key = self._generate_cache_key(request, cache_config)
-            
             # Check Redis cache
-            if not await redis_service.health_check():
+            if not redis_service.is_available():
                 return None
             
             cached_data = await redis_service.get_cache(cache_key)
-            if not cached_data:
-                return None
-            
-            # Handle ETag validation if enabled
-            if cache_config.get("etag_enabled", False):
-                etag = cached_data.get("etag")
-                if etag and request.headers.get("If-None-Match") == etag:
-                    # Client has current version
-                    return Response(status_code=304)
-            
-            # Reconstruct response
-            response_data = cached_data.get("response_data")
-            headers = cached_data.get("headers", {})
-            
-            if response_data:
-                response = JSONResponse(content=response_data)
-                
-                # Add cache headers
-                response.headers.update(headers)
-                response.headers["X-Cache"] = "HIT"
-                response.headers["X-Cache-Key"] = cache_key
-                
-                logger.debug(f"Cache HIT for {request.url.path}: {cache_key}")
-                return response
+            if cached_data and cached_data.get("body"):
+                return cached_data
         
         except Exception as e:
             logger.error(f"Error retrieving cached response: {e}")
         
         return None
     
-    async def _cache_response(self, request: Request, response: Response, 
-                             cache_config: Dict[str, Any]) -> None:
+    async def _send_cached(self, request: Request, cached_data: Dict[str, Any], cache_key: str,
+                           cache_config: Dict[str, Any], cache_status: str, send: Send) -> None:
         """
-        Cache the response data.
+        Send a stored response.
         
         Args:
             request: FastAPI request object
-            response: Response to cache
+            cached_data: Stored cache entry
+            cache_key: Cache key of the request
             cache_config: Cache configuration
+            cache_status: hit, stale or coalesced
+            send: ASGI send callable
         """
-        try:
-            cache_key = self._generate_cache_key(request, cache_config)
+        request.state.cache_status = cache_status
+        
+        # Handle ETag validation if enabled
+        etag = cached_data.get("etag") if cache_config.get("etag_enabled", False) else None
+        if etag and request.headers.get("If-None-Match") == etag:
+            # Client has current version
+            response = Response(status_code=304)
+        else:
+            # Reconstruct response
+            response = Response(content=cached_data["body"], media_type="application/json")
             
-            # Only cache JSON responses
-            if not response.headers.get("content-type", "").startswith("application/json"):
-                return
+            # Add cache headers
+            response.headers.update(cached_data.get("headers", {}))
+            response.headers["X-Cache"] = "STALE" if cache_status == "stale" else "HIT"
+            response.headers["X-Cache-Key"] = cache_key
+        
+        logger.debug(f"Cache {cache_status.upper()} for {request.url.path}: {cache_key}")
+        await response(request.scope, request.receive, send)
+    
+    async def _cache_response(self, request: Request, cache_key: str, headers: MutableHeaders,
+                             response_body: bytes, cache_config: Dict[str, Any],
+                             compute_time: float, tags: List[str],
+                             generations: List[int]) -> Optional[Dict[str, Any]]:
+        """
+        Cache the response data and add cache headers to the outgoing response.
+        
+        Args:
+            request: FastAPI request object
+            cache_key: Cache key of the request
+            headers: Mutable headers of the response about to be sent
+            response_body: Complete response body
+            cache_config: Cache configuration
+            compute_time: Seconds the app took to produce the response
+            tags: Invalidation tags of the entry
+            generations: Invalidation generations of the tags when the app was started
             
-            # Read response body
-            if hasattr(response, 'body'):
-                response_body = response.body
-            else:
-                # For streaming responses, we can't easily cache
-                return
+        Returns:
+            Stored cache entry or None if the response is not cacheable or was
+            invalidated while it was computed
+        """
+        try:
+            # Only cache JSON responses
+            if not headers.get("content-type", "").startswith("application/json"):
+                return None
             
-            # Parse JSON response
             try:
-                response_data = json.loads(response_body.decode())
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                return
+                body_text = response_body.decode()
+            except UnicodeDecodeError:
+                return None
+            
+            ttl = cache_config["ttl"]
             
             # Prepare cache data
             cache_data = {
-                "response_data": response_data,
-                "headers": dict(response.headers),
+                "body": body_text,
+                "headers": self._storable_headers(headers),
                 "cached_at": datetime.now().isoformat(),
+                "expires_at": time.time() + ttl,
+                "compute_time": compute_time,
                 "cache_key": cache_key
             }
             
@@ -283,23 +471,70 @@ class CacheMiddleware(BaseHTTPMiddleware):
             if cache_config.get("etag_enabled", False):
                 etag = self._generate_etag(response_body)
                 cache_data["etag"] = etag
-                response.headers["ETag"] = etag
+                headers["ETag"] = etag
             
             # Add cache control headers
-            ttl = cache_config["ttl"]
-            response.headers["Cache-Control"] = f"public, max-age={ttl}"
-            response.headers["X-Cache"] = "MISS"
-            response.headers["X-Cache-TTL"] = str(ttl)
+            headers["Cache-Control"] = f"public, max-age={ttl}"
+            headers["X-Cache"] = "MISS"
+            headers["X-Cache-TTL"] = str(ttl)
+            
+            # Keep entries past expiry so they can be served stale while refreshing
+            redis_ttl = ttl
+            if self.stale_while_revalidate:
+                redis_ttl += cache_config.get("stale_ttl", ttl)
+            
+            # A mutation invalidated this key while the response was computed
+            if await self._tag_generations(tags) != generations:
+                logger.debug(f"Not caching {cache_key}: invalidated while it was computed")
+                return None
             
-            # Store in cache
-            await redis_service.set_cache(cache_key, cache_data, ttl)
+            # Store in cache, registered under its type and user tags for invalidation
+            await redis_service.set_cache(
+                cache_key, cache_data, redis_ttl, tags=tags, tag_ttl=self.tag_ttl
+            )
+            
+            # An invalidation between the check and the write may have missed this entry
+            if await self._tag_generations(tags) != generations:
+                await redis_service.delete_cache(cache_key)
+                return None
             
             logger.debug(f"Cached response for {request.url.path}: {cache_key} (TTL: {ttl}s)")
+            return cache_data
         
         except Exception as e:
             logger.error(f"Error caching response: {e}")
+            return None
     
-    def _generate_cache_key(self, request: Request, cache_config: Dict[str, Any]) -> str:
+    @staticmethod
+    def _storable_headers(headers: MutableHeaders) -> Dict[str, str]:
+        """
+        Response headers to store with a cache entry.
+        
+        CORS headers describe the Origin of the request that filled the entry,
+        so they (and Origin in Vary) are left out; CORSMiddleware adds them for
+        each request that is served from the cache.
+        """
+        stored = {}
+        for name, value in headers.items():
+            if name in ("content-length", "content-type") or name.startswith("access-control-"):
+                continue
+            if name == "vary":
+                value = ", ".join(
+                    part.strip() for part in value.split(",")
+                    if part.strip() and part.strip().lower() != "origin"
+                )
+                if not value:
+                    continue
+            stored[name] = value
+        return stored
+    
+    async def _tag_generations(self, tags: List[str]) -> List[int]:
+        """Current invalidation generation of each tag"""
+        return list(await asyncio.gather(*(
+            redis_service.get_counter(generation_key(tag)) for tag in tags
+        )))
+    
+    def _generate_cache_key(self, request: Request, cache_config: Dict[str, Any]) -> Optional[str]:
         """
         Generate a unique cache key for the request.
         
@@ -308,7 +543,8 @@ class CacheMiddleware(BaseHTTPMiddleware):
             cache_config: Cache configuration
             
         Returns:
-            Unique cache key string
+            Unique cache key string, or None for a user-scoped endpoint when
+            the request has no user id (the response must not be shared)
         """
         key_parts = ["wingman", "api"]
         
@@ -318,8 +554,9 @@ class CacheMiddleware(BaseHTTPMiddleware):
         # Add user ID if user-scoped
         if cache_config.get("user_scoped", False):
             user_id = self._extract_user_id(request)
-            if user_id:
-                key_parts.append(f"user:{user_id}")
+            if not user_id:
+                return None
+            key_parts.append(f"user:{user_id}")
         
         # Add path
         path = request.url.path.strip("/").replace("/", ":")
@@ -335,6 +572,24 @@ class CacheMiddleware(BaseHTTPMiddleware):
         
         return ":".join(key_parts)
     
+    def _cache_tags(self, request: Request, cache_config: Dict[str, Any]) -> List[str]:
+        """
+        Get the invalidation tags for a cached response.
+        
+        Args:
+            request: FastAPI request object
+            cache_config: Cache configuration
+            
+        Returns:
+            Cache type tag, plus the user tag for user-scoped entries
+        """
+        tags = [cache_type_tag(cache_config["cache_type"])]
+        if cache_config.get("user_scoped", False):
+            user_id = self._extract_user_id(request)
+            if user_id:
+                tags.append(user_tag(user_id))
+        return tags
+    
     def _extract_user_id(self, request: Request) -> Optional[str]:
         """
         Extract user ID from request for user-scoped caching.
@@ -355,18 +610,14 @@ class CacheMiddleware(BaseHTTPMiddleware):
         if 'user_id' in request.query_params:
             return request.query_params['user_id']
         
-        # 3. Authorization header (JWT token)
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            # Would need JWT parsing here in a real implementation
-            # For now, just use a placeholder
-            return "jwt_user"
-        
-        # 4. Custom user header
+        # 3. Custom user header
         user_id = request.headers.get("X-User-ID")
         if user_id:
             return user_id
         
+        # Bearer tokens are not decoded here, so they don't identify a user:
+        # a shared placeholder would serve one user's cached data to another
+        
         return None
     
     def _generate_etag(self, content: bytes) -> str:
@@ -404,33 +655,42 @@ class CacheMiddleware(BaseHTTPMiddleware):
         """
         try:
             user_id = self._extract_user_id(request)
-            patterns_to_invalidate = []
             
             # Find all cache configs that should be invalidated
             for path, config in self.cacheable_endpoints.items():
                 if endpoint_key in config.get("invalidate_on", []):
+                    cache_type = config["cache_type"]
                     if config.get("user_scoped", False) and user_id:
-                        # User-specific invalidation
-                        pattern = f"wingman:*:user:{user_id}:*"
-                        patterns_to_invalidate.append(pattern)
+                        # User-specific invalidation of this cache type
+                        await invalidate_user_cache(user_id, [cache_type])
                     else:
                         # Global invalidation for this cache type
-                        cache_type = config["cache_type"]
-                        pattern = f"wingman:*:{cache_type}:*"
-                        patterns_to_invalidate.append(pattern)
-            
-            # Execute invalidations
-            for pattern in patterns_to_invalidate:
-                if await redis_service.health_check():
-                    # Delete keys matching pattern
-                    keys = await redis_service._client.keys(pattern)
-                    if keys:
-                        await redis_service._client.delete(*keys)
-                        logger.info(f"Invalidated {len(keys)} cache entries for pattern: {pattern}")
+                        await invalidate_cache_type(cache_type)
         
         except Exception as e:
             logger.error(f"Error invalidating caches: {e}")
 
+class CacheMiddleware:
+    """
+    Pure ASGI caching middleware for WingmanMatch API endpoints.
+    
+    Runs requests through a ResponseCache without re-wrapping them the way
+    BaseHTTPMiddleware does, so streaming responses pass through untouched.
+    """
+    
+    def __init__(self, app: ASGIApp, cache: Optional[ResponseCache] = None):
+        self.app = app
+        self.cache = cache or response_cache
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await self.cache.run(self.app, scope, receive, send)
+
+# Global response cache instance
+response_cache = ResponseCache()
+
 # Cache decorator for manual cache control
 def cache_response(cache_type: str, ttl: int = 3600, user_scoped: bool = True):
     """
@@ -454,6 +714,21 @@ def cache_response(cache_type: str, ttl: int = 3600, user_scoped: bool = True):
 
 # Utility functions for cache management
 
+def cache_type_tag(cache_type: str) -> str:
+    """Invalidation tag for every cached response of a cache type"""
+    return f"api:type:{cache_type}"
+
+def user_tag(user_id: str) -> str:
+    """Invalidation tag for every user-scoped cached response of a user"""
+    return f"api:user:{user_id}"
+
+def generation_key(tag: str) -> str:
+    """Counter bumped on every invalidation of a tag; fills compare it before storing"""
+    return f"cachegen:{tag}"
+
+async def _bump_generation(tag: str) -> None:
+    await redis_service.increment_counter(generation_key(tag), expiry_seconds=GENERATION_TTL_SECONDS)
+
 async def invalidate_user_cache(user_id: str, cache_types: Optional[List[str]] = None) -> int:
     """
     Invalidate all cached data for a specific user.
@@ -466,26 +741,18 @@ async def invalidate_user_cache(user_id: str, cache_types: Optional[List[str]] =
         Number of cache entries invalidated
     """
     try:
-        if not await redis_service.health_check():
-            return 0
-        
+        # Bumped before deleting, so fills in flight don't store their results
+        await _bump_generation(user_tag(user_id))
         if cache_types:
             total_invalidated = 0
             for cache_type in cache_types:
+                # Only this type's entries under the user's tag
                 pattern = f"wingman:*:{cache_type}:user:{user_id}:*"
-                keys = await redis_service._client.keys(pattern)
-                if keys:
-                    await redis_service._client.delete(*keys)
-                    total_invalidated += len(keys)
+                total_invalidated += await redis_service.invalidate_tag(user_tag(user_id), match=pattern)
             return total_invalidated
         else:
             # Invalidate all user caches
-            pattern = f"wingman:*:user:{user_id}:*"
-            keys = await redis_service._client.keys(pattern)
-            if keys:
-                await redis_service._client.delete(*keys)
-                return len(keys)
-            return 0
+            return await redis_service.invalidate_tag(user_tag(user_id))
     
     except Exception as e:
         logger.error(f"Error invalidating user cache: {e}")
@@ -502,16 +769,11 @@ async def invalidate_cache_type(cache_type: str) -> int:
         Number of cache entries invalidated
     """
     try:
-        if not await redis_service.health_check():
-            return 0
-        
-        pattern = f"wingman:*:{cache_type}:*"
-        keys = await redis_service._client.keys(pattern)
-        if keys:
-            await redis_service._client.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} entries for cache type: {cache_type}")
-            return len(keys)
-        return 0
+        # Bumped before deleting, so fills in flight don't store their results
+        await _bump_generation(cache_type_tag(cache_type))
+        invalidated = await redis_service.invalidate_tag(cache_type_tag(cache_type))
+        logger.info(f"Invalidated {invalidated} entries for cache type: {cache_type}")
+        return invalidated
     
     except Exception as e:
         logger.error(f"Error invalidating cache type: {e}")
@@ -528,7 +790,13 @@ async def get_cache_stats() -> Dict[str, Any]:
     
     return {
         "redis_status": redis_stats,
-        "cacheable_endpoints": len(CacheMiddleware(None).cacheable_endpoints),
-        "cache_invalidating_endpoints": len(CacheMiddleware(None).cache_invalidating_endpoints),
+        "cacheable_endpoints": len(response_cache.cacheable_endpoints),
+        "cache_invalidating_endpoints": len(response_cache.cache_invalidating_endpoints),
+        "response_cache": {
+            **response_cache.stats,
+            "fills_in_flight": len(response_cache._inflight),
+            "stale_while_revalidate": response_cache.stale_while_revalidate,
+            "early_expiration_beta": response_cache.early_expiration_beta
+        },
         "middleware_active": True
     }
\ No newline at end of file
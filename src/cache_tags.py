@@ -0,0 +1,160 @@
+"""
+Cache tag index for WingmanMatch
+Registers cached keys under tags so invalidation never scans the keyspace
+"""
+
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Iterable, List, Optional
+
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+TAG_KEY_PREFIX = "cacheidx"
+# Tag sets written before tag indexes became sorted sets; they are no longer
+# written to and expire within the tag TTL, after which this can be removed
+LEGACY_TAG_KEY_PREFIX = "cachetag"
+INVALIDATION_BATCH_SIZE = 500
+# Deleted cache keys are announced here so workers drop in-process copies
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+def tag_key(tag: str) -> str:
+    """Redis key of the sorted set indexing every cache key registered under a tag"""
+    return f"{TAG_KEY_PREFIX}:{tag}"
+
+def legacy_tag_key(tag: str) -> str:
+    """Redis key of the pre-sorted-set tag index"""
+    return f"{LEGACY_TAG_KEY_PREFIX}:{tag}"
+
+def add_to_tags(pipe: Any, key: str, tags: Iterable[str], expiry_seconds: int,
+                tag_ttl: Optional[int] = None) -> None:
+    """
+    Queue commands registering a cache key under its tags.
+
+    Each tag index is a sorted set scored by its entries' expiry times, and
+    every write also drops members that have already expired, so a tag that is
+    written continuously holds only its live entries. The index's own TTL is
+    pushed out to tag_ttl on every write, so callers pass a TTL at least as long
+    as any entry stored under the tag; it then expires on its own once idle.
+
+    Args:
+        pipe: Redis pipeline the cache write is part of
+        key: Cache key being written
+        tags: Tags to register the key under
+        expiry_seconds: Expiry of the cache entry
+        tag_ttl: Tag index expiry in seconds (defaults to expiry_seconds)
+    """
+    add_keys_to_tags(pipe, [key], tags, expiry_seconds, tag_ttl)
+
+def add_keys_to_tags(pipe: Any, keys: Iterable[str], tags: Iterable[str], expiry_seconds: int,
+                     tag_ttl: Optional[int] = None) -> None:
+    """
+    Queue commands registering several cache keys with the same expiry under their tags.
+
+    Costs one ZADD, one prune and one EXPIRE per tag however many keys there are.
+    See add_to_tags for the arguments.
+    """
+    now = time.time()
+    members = {key: now + expiry_seconds for key in keys}
+    if not members:
+        return
+    for tag in tags:
+        index = tag_key(tag)
+        pipe.zadd(index, members)
+        pipe.zremrangebyscore(index, "-inf", now)
+        pipe.expire(index, max(tag_ttl or expiry_seconds, expiry_seconds))
+
+def invalidation_message(keys: Iterable[Any], origin: Optional[str] = None) -> str:
+    """
+    Build an INVALIDATION_CHANNEL message.
+
+    Args:
+        keys: Cache keys that changed or were deleted (str or bytes)
+        origin: Id of the publishing worker, which has already updated its own copy
+
+    Returns:
+        JSON message body
+    """
+    return json.dumps({
+        "origin": origin,
+        "keys": [key.decode() if isinstance(key, bytes) else key for key in keys]
+    })
+
+async def invalidate_tag(client: Any, tag: str, match: Optional[str] = None,
+                         batch_size: int = INVALIDATION_BATCH_SIZE,
+                         on_delete: Optional[Callable[[List[str]], None]] = None) -> int:
+    """
+    Delete every cache key registered under a tag.
+
+    Cost is proportional to the entries under the tag, not the keyspace.
+    Members are read with ZSCAN and removed with UNLINK in batches, so Redis
+    is never blocked. Without a match, the tag index is first renamed away
+    atomically, so keys written during the invalidation register in a fresh
+    index instead of being lost.
+
+    Args:
+        client: Redis client (redis.asyncio)
+        tag: Tag to invalidate
+        match: Optional glob; only matching members are deleted and
+            unregistered, the rest of the tag is kept
+        batch_size: Keys per ZSCAN/UNLINK round trip
+        on_delete: Called with each batch of deleted keys (e.g. to drop local copies)
+
+    Returns:
+        Number of cache entries deleted
+    """
+    deleted = await _invalidate_index(client, tag_key(tag), True, match, batch_size, on_delete)
+    deleted += await _invalidate_index(client, legacy_tag_key(tag), False, match, batch_size, on_delete)
+
+    logger.info(f"Invalidated {deleted} cache entries for tag: {tag}")
+    return deleted
+
+async def _invalidate_index(client: Any, source: str, sorted_index: bool, match: Optional[str],
+                            batch_size: int, on_delete: Optional[Callable[[List[str]], None]]) -> int:
+    """Delete the cache keys in one tag index (sorted set, or legacy set)"""
+    if match is None:
+        purge_key = f"{source}:purge:{uuid.uuid4().hex}"
+        try:
+            await client.rename(source, purge_key)
+        except ResponseError:
+            # No such tag - nothing cached under it
+            return 0
+        source = purge_key
+
+    if sorted_index:
+        members = client.zscan_iter(source, match=match, count=batch_size)
+    else:
+        members = client.sscan_iter(source, match=match, count=batch_size)
+
+    deleted = 0
+    batch = []
+    async for member in members:
+        batch.append(member[0] if sorted_index else member)
+        if len(batch) >= batch_size:
+            deleted += await _unlink_batch(client, source, batch, sorted_index, match is not None, on_delete)
+            batch = []
+    if batch:
+        deleted += await _unlink_batch(client, source, batch, sorted_index, match is not None, on_delete)
+
+    if match is None:
+        await client.unlink(source)
+    return deleted
+
+async def _unlink_batch(client: Any, source: str, keys: list, sorted_index: bool, unregister: bool,
+                        on_delete: Optional[Callable[[List[str]], None]]) -> int:
+    """Delete a batch of cache keys, dropping them from the tag index when it is kept"""
+    pipe = client.pipeline(transaction=False)
+    pipe.unlink(*keys)
+    if unregister:
+        if sorted_index:
+            pipe.zrem(source, *keys)
+        else:
+            pipe.srem(source, *keys)
+    pipe.publish(INVALIDATION_CHANNEL, invalidation_message(keys))
+    results = await pipe.execute()
+    if on_delete:
+        on_delete([key.decode() if isinstance(key, bytes) else key for key in keys])
+    return results[0]
@@ -7,23 +7,28 @@ Integrates with WingmanMatch infrastructure for memory persistence and tool call
 """
 
 import os
+import inspect
 import logging
-from typing import Dict, Any, AsyncGenerator, Optional, List
+from typing import Dict, Any, AsyncGenerator, Awaitable, Optional, List, Union
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 import json
 import asyncio
+import time
 
 # Direct Anthropic SDK - no abstractions needed
 from anthropic import AsyncAnthropic
+from src.llm_client import create_message, get_anthropic_client as get_shared_anthropic_client
 
 # WingmanMatch imports
 from src.simple_memory import WingmanMemory
-from src.prompts import main_prompt, get_personalized_prompt, get_archetype_temperature
+from src.prompts import main_prompt, get_system_prompt_blocks, get_archetype_temperature
 from src.config import Config
 from src.database import get_db_service
-from src.retry_utils import with_anthropic_retry
-from src.safety_filters import create_safety_filter, SafetySeverity
+from src.db.async_client import execute_async
+from src.retry_policies import execute_with_retry
+from src.safety_filters import SafetyFilters, StreamingResponseFilter
+from src.observability.metrics_collector import metrics_collector, record_prompt_cache_metric
 from src.context_formatter import format_context_for_prompt_caching
 import src.tools as wingman_tools
 
@@ -37,27 +42,72 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Singleton Anthropic client
-_anthropic_client = None
-
 # Global safety filter instance
 _safety_filter = None
 
-def get_safety_filter():
+# Sent instead of (the rest of) a coach response that fails the safety check
+RESPONSE_BLOCKED_MESSAGE = "Let me rephrase that - I want to keep our focus on authentic, respectful confidence building. What would you like to work on next?"
+
+def get_safety_filter() -> SafetyFilters:
     """Get or create the safety filter instance (singleton pattern)"""
     global _safety_filter
     if _safety_filter is None:
-        _safety_filter = create_safety_filter()
+        _safety_filter = SafetyFilters()
         logger.info("Safety filter initialized for WingmanMatch")
     return _safety_filter
 
+def check_user_input(user_input: str, user_id: str) -> Optional[str]:
+    """
+    Safety filter user input
+    
+    Returns:
+        Guidance message to send instead of coaching if the input is blocked,
+        otherwise None
+    """
+    if not Config.ENABLE_SAFETY_FILTERS:
+        return None
+    
+    safety_result = get_safety_filter().check_message_safety(user_input, user_id)
+    if safety_result.is_safe:
+        return None
+    
+    logger.warning(f"User input blocked for safety: {safety_result.blocked_content}")
+    return safety_result.safety_message or "I need to make sure our conversation stays focused on respectful dating confidence building."
+
+class CoachingStreamTimings:
+    """
+    Per-stage timings for a streamed coaching turn
+    
+    Each stage is recorded in milliseconds since the request was parsed, so the
+    gaps show where time-to-first-byte goes.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+    
+    def mark(self, stage: str) -> None:
+        """Record a stage the first time it is reached"""
+        if stage not in self.stages:
+            self.stages[stage] = round((time.perf_counter() - self.started) * 1000, 1)
+    
+    async def export(self) -> None:
+        """Record each stage in the metrics collector"""
+        for stage, elapsed_ms in self.stages.items():
+            await metrics_collector.record_metric(
+                metric_type="coaching_stream",
+                name=stage,
+                value=elapsed_ms,
+                unit="ms"
+            )
+
+def prefetch_user_context(user_id: str, thread_id: str) -> "asyncio.Task[Dict[str, Any]]":
+    """Start loading coaching context in the background as soon as a request is parsed"""
+    return asyncio.create_task(get_user_context(user_id, thread_id))
+
 async def get_anthropic_client() -> AsyncAnthropic:
-    """Get or create the Anthropic client instance (singleton pattern)"""
-    global _anthropic_client
-    if _anthropic_client is None:
-        _anthropic_client = AsyncAnthropic(api_key=Config.ANTHROPIC_API_KEY)
-        logger.info("Anthropic client initialized for WingmanMatch")
-    return _anthropic_client
+    """Get the process-wide pooled Anthropic client shared with the agents"""
+    return get_shared_anthropic_client()
 
 def get_wingman_model() -> str:
     """Get appropriate Claude model for WingmanMatch coaching"""
@@ -70,38 +120,44 @@ def get_wingman_model() -> str:
         # Premium model for best coaching quality
         return Config.CHAT_MODEL
 
+# Process-level approach challenge catalog (same 30-minute TTL as /api/challenges)
+CHALLENGE_CATALOG_TTL_SECONDS = 1800
+_challenge_catalog: Optional[List[Dict[str, Any]]] = None
+_challenge_catalog_loaded_at: float = 0.0
+
+async def get_challenge_catalog() -> List[Dict[str, Any]]:
+    """Get the approach challenge catalog, reloading it at most once per TTL"""
+    global _challenge_catalog, _challenge_catalog_loaded_at
+    if _challenge_catalog is None or time.monotonic() - _challenge_catalog_loaded_at > CHALLENGE_CATALOG_TTL_SECONDS:
+        try:
+            result = await execute_async(get_db_service().table('approach_challenges').select('*').order('difficulty'))
+            _challenge_catalog = result.data or []
+            _challenge_catalog_loaded_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error loading challenge catalog: {e}")
+            return _challenge_catalog or []
+    return _challenge_catalog
+
+def invalidate_challenge_catalog() -> None:
+    """Drop the cached challenge catalog so the next chat turn reloads it"""
+    global _challenge_catalog
+    _challenge_catalog = None
+
 async def get_user_context(user_id: str, thread_id: str) -> Dict[str, Any]:
-    """Get comprehensive user context for dating confidence coaching"""
+    """
+    Get comprehensive user context for dating confidence coaching
+    
+    Memory hooks and the user profile are loaded concurrently in one pass; the
+    challenge catalog comes from the process-level cache.
+    """
     try:
         memory = WingmanMemory(get_db_service(), user_id)
-        context = await memory.get_coaching_context(thread_id)
-        
-        # Add WingmanMatch-specific context
-        db = get_db_service()
-        
-        # Get user profile
-        user_result = db.table('user_profiles').select('*').eq('id', user_id).execute()
-        user_profile = user_result.data[0] if user_result.data else None
-        
-        # Get assessment results  
-        assessment_result = db.table('confidence_assessments').select('*').eq('user_id', user_id).order('created_at', desc=True).limit(1).execute()
-        assessment_data = assessment_result.data[0] if assessment_result.data else None
-        
-        # Get recent attempts
-        attempts_result = db.table('approach_attempts').select('*').eq('user_id', user_id).order('created_at', desc=True).limit(10).execute()
-        attempts_data = attempts_result.data or []
-        
-        # Get challenges
-        challenges_result = db.table('approach_challenges').select('*').order('difficulty').execute()
-        challenges_data = challenges_result.data or []
-        
-        context.update({
-            'user_profile': user_profile,
-            'assessment_results': assessment_data,
-            'recent_attempts': attempts_data,
-            'available_challenges': challenges_data,
-        })
+        context, challenges_data = await asyncio.gather(
+            memory.get_coaching_context(thread_id, include_profile=True),
+            get_challenge_catalog()
+        )
         
+        context['available_challenges'] = challenges_data
         return context
         
     except Exception as e:
@@ -115,6 +171,12 @@ async def get_user_context(user_id: str, thread_id: str) -> Dict[str, Any]:
             'available_challenges': [],
         }
 
+async def get_conversation_context(user_id: str, thread_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Get the most recent messages of a thread (used for model routing)"""
+    memory = WingmanMemory(get_db_service(), user_id)
+    history = await memory.get_conversation_history(thread_id, limit=limit)
+    return history[-limit:]
+
 def format_coaching_context(context: Dict[str, Any], archetype: Optional[int] = None) -> str:
     """
     Format context for dating confidence coaching prompt injection
@@ -188,12 +250,12 @@ def _format_coaching_context_legacy(context: Dict[str, Any]) -> str:
     
     return "\\n".join(context_parts) if context_parts else "New coaching session - no previous context"
 
-@with_anthropic_retry()
 async def interact_with_coach(
     user_input: str,
     user_id: str,
     thread_id: str,
-    context: Optional[Dict[str, Any]] = None
+    context: Optional[Dict[str, Any]] = None,
+    model_override: Optional[str] = None
 ) -> str:
     """
     Get coaching response from Connell Barrett (non-streaming)
@@ -203,6 +265,7 @@ async def interact_with_coach(
         user_id: User identifier 
         thread_id: Conversation thread identifier
         context: Optional pre-loaded context
+        model_override: Model chosen by the router (defaults to get_wingman_model)
         
     Returns:
         Connell's coaching response
@@ -211,21 +274,10 @@ async def interact_with_coach(
         logger.info(f"Processing coaching request for user {user_id}")
         
         # Step 1: Safety filter user input
-        if Config.ENABLE_SAFETY_FILTERS:
-            safety_filter = get_safety_filter()
-            safety_result = safety_filter.filter_user_input(user_input)
-            
-            if not safety_result.is_safe:
-                logger.warning(f"User input blocked for safety: {safety_result.violations}")
-                return safety_result.guidance_message or "I need to make sure our conversation stays focused on respectful dating confidence building."
-            
-            # Use filtered content and add guidance if needed
-            filtered_input = safety_result.filtered_content
-            if safety_result.guidance_message and safety_result.severity != SafetySeverity.LOW:
-                # Prepend guidance for medium/high severity issues
-                filtered_input = f"{safety_result.guidance_message}\n\nNow, regarding your original question: {filtered_input}"
-        else:
-            filtered_input = user_input
+        blocked_message = check_user_input(user_input, user_id)
+        if blocked_message:
+            return blocked_message
+        filtered_input = user_input
         
         # Step 2: Get context if not provided
         if context is None:
@@ -239,13 +291,12 @@ async def interact_with_coach(
         # Step 4: Format context for prompt injection
         formatted_context = format_coaching_context(context, archetype)
         
-        # Step 5: Get personalized prompt and temperature
-        personalized_prompt = get_personalized_prompt(main_prompt, archetype, formatted_context)
+        # Step 5: Get personalized prompt (cacheable persona/archetype blocks) and temperature
+        system_blocks = get_system_prompt_blocks(
+            main_prompt, archetype, formatted_context, enable_caching=Config.ENABLE_PROMPT_CACHING
+        )
         temperature = get_archetype_temperature()
         
-        # Step 6: Get Anthropic client
-        anthropic_client = await get_anthropic_client()
-        
         # Step 7: Build conversation messages
         messages = []
         
@@ -265,17 +316,19 @@ async def interact_with_coach(
         logger.info(f"Sending {len(messages)} messages to Claude for coaching")
         
         # Step 8: Get model for current request
-        model = get_wingman_model()
+        model = model_override or get_wingman_model()
         
-        # Step 9: Make request to Claude
-        response = await anthropic_client.messages.create(
+        # Step 9: Make request to Claude (retried with circuit breaker; the shared
+        # client has SDK retries off, and failures below end in the fallback reply)
+        response = await create_message(
             model=model,
             max_tokens=2048,
             temperature=temperature,  # Use archetype-specific temperature
             top_p=0.9,               # Balanced nucleus sampling  
-            system=personalized_prompt,
+            system=system_blocks,
             messages=messages
         )
+        await record_prompt_cache_metric("coach_chat", getattr(response, 'usage', None))
         
         # Step 10: Extract response content
         assistant_response = ""
@@ -284,17 +337,13 @@ async def interact_with_coach(
                 assistant_response += block.text
         
         # Step 11: Safety filter coach response
+        final_response = assistant_response
         if Config.ENABLE_SAFETY_FILTERS:
-            safety_filter = get_safety_filter()
-            response_safety_result = safety_filter.filter_coach_response(assistant_response)
+            response_safety_result = get_safety_filter().check_response_safety(assistant_response)
             
             if not response_safety_result.is_safe:
-                logger.warning(f"Coach response failed safety check: {response_safety_result.violations}")
-                final_response = response_safety_result.filtered_content
-            else:
-                final_response = response_safety_result.filtered_content
-        else:
-            final_response = assistant_response
+                logger.warning(f"Coach response failed safety check: {response_safety_result.blocked_content}")
+                final_response = RESPONSE_BLOCKED_MESSAGE
         
         logger.info(f"Coaching response completed: {len(final_response)} characters")
         return final_response
@@ -303,130 +352,132 @@ async def interact_with_coach(
         logger.error(f"Error in interact_with_coach: {str(e)}", exc_info=True)
         return "I'm having some technical difficulties right now. Let me regroup and we'll continue our coaching session in just a moment."
 
-@with_anthropic_retry()
 async def interact_with_coach_stream(
     user_input: str,
     user_id: str, 
     thread_id: str,
-    context: Optional[Dict[str, Any]] = None
+    context: Optional[Union[Dict[str, Any], Awaitable[Dict[str, Any]]]] = None,
+    timings: Optional[CoachingStreamTimings] = None
 ) -> AsyncGenerator[str, None]:
     """
     Get streaming coaching response from Connell Barrett
     
+    The turn is pipelined: context loading starts first (or was already started
+    by the caller via prefetch_user_context), the input safety check runs while
+    it is in flight, and the response is safety filtered incrementally as it
+    streams rather than buffered until the end.
+    
+    Not wrapped in with_anthropic_retry (an async generator cannot be retried
+    once it has yielded); opening the stream is retried instead.
+    
     Args:
         user_input: User's message/question
         user_id: User identifier
         thread_id: Conversation thread identifier  
-        context: Optional pre-loaded context
+        context: Optional pre-loaded context, or an awaitable resolving to it
+        timings: Optional stage timer started when the request was parsed
         
     Yields:
         Streaming response chunks from Connell
     """
+    timings = timings or CoachingStreamTimings()
+    context_task = None
+    if context is None:
+        context_task = prefetch_user_context(user_id, thread_id)
+    elif inspect.isawaitable(context):
+        context_task = context
+    
     try:
         logger.info(f"Processing streaming coaching request for user {user_id}")
         
-        # Step 1: Safety filter user input
-        if Config.ENABLE_SAFETY_FILTERS:
-            safety_filter = get_safety_filter()
-            safety_result = safety_filter.filter_user_input(user_input)
-            
-            if not safety_result.is_safe:
-                logger.warning(f"User input blocked for safety in streaming: {safety_result.violations}")
-                yield safety_result.guidance_message or "I need to make sure our conversation stays focused on respectful dating confidence building."
-                return
-            
-            # Use filtered content and add guidance if needed
-            filtered_input = safety_result.filtered_content
-            if safety_result.guidance_message and safety_result.severity != SafetySeverity.LOW:
-                # Stream guidance first for medium/high severity issues
-                yield safety_result.guidance_message
-                yield "\n\nNow, regarding your original question: "
-        else:
-            filtered_input = user_input
+        # Step 1: Safety filter user input while context loads
+        blocked_message = check_user_input(user_input, user_id)
+        timings.mark("input_safety")
+        if blocked_message:
+            yield blocked_message
+            return
         
-        # Step 2: Get context if not provided
-        if context is None:
-            context = await get_user_context(user_id, thread_id)
+        # Step 2: Wait for the prefetched context
+        if context_task is not None:
+            context = await context_task
+        timings.mark("context_ready")
         
         # Step 3: Get user's dating archetype if available
         archetype = None
         if context.get('assessment_results'):
             archetype = context['assessment_results'].get('archetype')
         
-        # Step 4: Format context for prompt injection
+        # Step 4: Format context and personalize the prompt
         formatted_context = format_coaching_context(context, archetype)
-        
-        # Step 5: Get personalized prompt and temperature
-        personalized_prompt = get_personalized_prompt(main_prompt, archetype, formatted_context)
+        system_blocks = get_system_prompt_blocks(
+            main_prompt, archetype, formatted_context, enable_caching=Config.ENABLE_PROMPT_CACHING
+        )
         temperature = get_archetype_temperature()
         
-        # Step 6: Get Anthropic client
-        anthropic_client = await get_anthropic_client()
-        
-        # Step 7: Build conversation messages  
-        messages = []
-        
-        # Add conversation history
-        for msg in context.get('conversation_history', [])[-10:]:  # Last 10 messages
-            messages.append({
-                "role": msg.get('role'),
-                "content": msg.get('content')
-            })
-        
-        # Add current user input (filtered)
-        messages.append({
-            "role": "user", 
-            "content": filtered_input
-        })
+        # Step 5: Build conversation messages
+        messages = [
+            {"role": msg.get('role'), "content": msg.get('content')}
+            for msg in context.get('conversation_history', [])[-10:]  # Last 10 messages
+        ]
+        messages.append({"role": "user", "content": user_input})
+        timings.mark("prompt_ready")
         
         logger.info(f"Sending {len(messages)} messages to Claude for streaming coaching")
         
-        # Step 8: Get model for current request
-        model = get_wingman_model()
-        
-        # Step 9: Make streaming request to Claude
-        stream = await anthropic_client.messages.create(
-            model=model,
-            max_tokens=2048,
-            temperature=temperature,  # Use archetype-specific temperature
-            top_p=0.9,               # Balanced nucleus sampling
-            system=personalized_prompt,
-            messages=messages,
-            stream=True
+        # Step 6: Open the stream (retried until the first event arrives)
+        anthropic_client = await get_anthropic_client()
+        stream = await execute_with_retry(
+            lambda: anthropic_client.messages.create(
+                model=get_wingman_model(),
+                max_tokens=2048,
+                temperature=temperature,  # Use archetype-specific temperature
+                top_p=0.9,               # Balanced nucleus sampling
+                system=system_blocks,
+                messages=messages,
+                stream=True
+            ),
+            service="anthropic"
         )
+        timings.mark("stream_open")
         
-        # Step 10: Stream the response with optional safety filtering
-        if Config.ENABLE_SAFETY_FILTERS:
-            # Collect full response for safety checking
-            full_response = ""
-            response_chunks = []
-            
-            async for event in stream:
-                if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
-                    chunk = event.delta.text
-                    full_response += chunk
-                    response_chunks.append(chunk)
-            
-            # Safety check the complete response
-            safety_filter = get_safety_filter()
-            response_safety_result = safety_filter.filter_coach_response(full_response)
+        # Step 7: Relay chunks, safety filtering them as they arrive
+        output_filter = StreamingResponseFilter(get_safety_filter()) if Config.ENABLE_SAFETY_FILTERS else None
+        
+        async for event in stream:
+            if getattr(event, 'type', None) == 'message_start':
+                await record_prompt_cache_metric("coach_chat_stream", getattr(getattr(event, 'message', None), 'usage', None))
+            if not (hasattr(event, 'delta') and hasattr(event.delta, 'text')):
+                continue
+            timings.mark("first_token")
             
-            if not response_safety_result.is_safe:
-                logger.warning(f"Streaming coach response failed safety check: {response_safety_result.violations}")
-                yield response_safety_result.filtered_content
+            chunk = output_filter.feed(event.delta.text) if output_filter else event.delta.text
+            if output_filter and output_filter.blocked:
+                break
+            if chunk:
+                timings.mark("first_chunk")
+                yield chunk
+        
+        if output_filter:
+            if output_filter.blocked:
+                logger.warning(f"Streaming coach response failed safety check: {output_filter.result.blocked_content}")
+                yield RESPONSE_BLOCKED_MESSAGE
             else:
-                # Stream the safe response chunks
-                for chunk in response_chunks:
-                    yield chunk
-        else:
-            # Stream directly without safety checking
-            async for event in stream:
-                if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
-                    yield event.delta.text
+                tail = output_filter.flush()
+                if tail:
+                    timings.mark("first_chunk")
+                    yield tail
+        
+        timings.mark("complete")
+        if Config.ENABLE_DETAILED_LOGGING:
+            logger.info(f"Streaming coaching timings for user {user_id}: {timings.stages}")
+        await timings.export()
                 
     except Exception as e:
         logger.error(f"Error in interact_with_coach_stream: {str(e)}", exc_info=True)
         yield "I'm experiencing some technical difficulties. Let me regroup and we'll continue our coaching conversation in just a moment."
+    finally:
+        if isinstance(context_task, asyncio.Task) and not context_task.done():
+            context_task.cancel()
 
 async def store_coaching_conversation(
     user_id: str,
@@ -536,5 +587,8 @@ __all__ = [
     'store_coaching_conversation',
     'call_wingman_tool',
     'health_check',
-    'get_user_context'
+    'get_user_context',
+    'get_conversation_context',
+    'prefetch_user_context',
+    'CoachingStreamTimings'
 ]
\ No newline at end of file
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+WingmanMatch Coaching Context Cache
+
+Per-user cache of the coaching context sections (assessment, attempts, triggers,
+notes, goals, sessions, profile) and per-thread conversation history.
+
+Section reads go through a short-lived in-process L1 and then Redis. The memory
+hooks write through: each write updates or drops only the section it touches,
+and new conversation messages are appended to the cached history instead of
+re-reading the thread.
+
+Sections are stored as fields of one Redis hash per user, next to a version
+that every hook write bumps. Writes are applied atomically by a Lua script, so
+concurrent hooks never overwrite each other, and a context load only stores
+what it read from the database when no write happened since it read the cache.
+
+Thread history is a Redis list with its own version counter. Appends push onto
+the list atomically (only if it is cached) and bump the version, and a load only
+stores its database snapshot when no append happened since it read the cache.
+History is always read from Redis, so every worker sees every append.
+
+While Redis is unavailable, entries are kept in redis_service's in-process
+fallback instead.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.redis_client import redis_service
+
+logger = logging.getLogger(__name__)
+
+VERSION_FIELD = "_version"
+
+# KEYS[1]: sections hash
+# ARGV: expected version ('' = unconditional), '1' to bump the version, TTL,
+# number of sections to drop (-1 = all), the dropped sections, then
+# section/JSON value pairs to set. Returns the new version, or -1 when the
+# expected version no longer matches.
+APPLY_SECTIONS_SCRIPT = """
+local version = tonumber(redis.call('HGET', KEYS[1], '_version') or '0')
+if ARGV[1] ~= '' and tonumber(ARGV[1]) ~= version then
+    return -1
+end
+local drops = tonumber(ARGV[4])
+if drops < 0 then
+    redis.call('DEL', KEYS[1])
+elseif drops > 0 then
+    redis.call('HDEL', KEYS[1], unpack(ARGV, 5, 4 + drops))
+end
+for i = 5 + math.max(drops, 0), #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if ARGV[2] == '1' then
+    version = version + 1
+end
+redis.call('HSET', KEYS[1], '_version', version)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return version
+"""
+
+# KEYS[1]: history list, KEYS[2]: history version
+# ARGV: message JSON, history limit, TTL. Returns 1 if the message was appended.
+APPEND_HISTORY_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+-- A load that ran after the message was stored may already include it
+for _, cached in ipairs(redis.call('LRANGE', KEYS[1], -tonumber(ARGV[2]), -1)) do
+    if cached == ARGV[1] then
+        return 0
+    end
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# KEYS[1]: history list, KEYS[2]: history version
+# ARGV: expected version, TTL, then the message JSON values. Returns 1 if stored.
+STORE_HISTORY_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+if #ARGV > 2 then
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class CachedSections(dict):
+    """Cached sections plus the entry version they were read at (None if the read failed)"""
+
+    def __init__(self, sections: Optional[Dict[str, Any]] = None, version: Optional[int] = 0):
+        super().__init__(sections or {})
+        self.version = version
+
+class CoachingContextCache:
+    """Two-level (in-process + Redis) cache for coaching context"""
+
+    KEY_PREFIX = "coaching_context"
+    TTL_SECONDS = 3600
+    # Kept short so writes made by another worker become visible quickly
+    L1_TTL_SECONDS = 10
+    L1_MAX_ENTRIES = 1000
+    HISTORY_LIMIT = 20
+    # Optimistic retries for prepend_to_section before the section is dropped instead
+    WRITE_ATTEMPTS = 3
+
+    # Newest-first sections and the number of rows the context keeps for each
+    SECTION_LIMITS = {
+        'session_history': 5,
+        'recent_attempts': 10,
+        'coaching_notes': 5
+    }
+
+    def __init__(self):
+        self._l1: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _sections_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:sections"
+
+    def _local_sections_key(self, user_id: str) -> str:
+        # Separate key so the fallback copy can never collide with the Redis hash
+        return f"{self.KEY_PREFIX}:{user_id}:sections:local"
+
+    def _history_key(self, user_id: str, thread_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:thread:{thread_id}"
+
+    def _history_version_key(self, user_id: str, thread_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:thread:{thread_id}:version"
+
+    def _local_history_key(self, user_id: str, thread_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:thread:{thread_id}:local"
+
+    def _l1_get(self, key: str) -> Optional[Any]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._l1.pop(key, None)
+            return None
+        self._l1.move_to_end(key)
+        return value
+
+    def _l1_set(self, key: str, value: Any) -> None:
+        self._l1[key] = (time.monotonic() + self.L1_TTL_SECONDS, value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.L1_MAX_ENTRIES:
+            self._l1.popitem(last=False)
+
+    async def _fetch_sections(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """Read a user's sections and entry version from Redis (or the fallback), bypassing L1"""
+        client = redis_service.get_client()
+        if client is not None:
+            try:
+                raw = await client.hgetall(self._sections_key(user_id))
+            except Exception as e:
+                redis_service.report_error(e)
+                raise
+            fields = {_decode(name): _decode(value) for name, value in raw.items()}
+            version = int(fields.pop(VERSION_FIELD, 0))
+            return {name: json.loads(value) for name, value in fields.items()}, version
+
+        entry = await redis_service.get_cache(self._local_sections_key(user_id)) or {}
+        return entry.get('sections', {}), entry.get('version', 0)
+
+    async def _apply(self, user_id: str, values: Optional[Dict[str, Any]] = None,
+                     drop: Iterable[str] = (), drop_all: bool = False,
+                     expected_version: Optional[int] = None, bump: bool = True) -> bool:
+        """
+        Atomically drop and set sections of a user's entry
+
+        Args:
+            values: Sections to set
+            drop: Sections to remove
+            drop_all: Remove every section first
+            expected_version: Only apply if the entry is still at this version
+            bump: Bump the entry version so in-flight loads don't store over this write
+
+        Returns:
+            bool: False if expected_version no longer matched
+        """
+        values = values or {}
+        drop = list(drop)
+        self._l1.pop(self._sections_key(user_id), None)
+
+        args: List[Any] = [
+            '' if expected_version is None else expected_version, int(bump), self.TTL_SECONDS,
+            -1 if drop_all else len(drop), *drop
+        ]
+        for name, value in values.items():
+            args.extend([name, json.dumps(value, default=str)])
+        reply = await redis_service.run_script(APPLY_SECTIONS_SCRIPT, [self._sections_key(user_id)], args)
+        if reply is not None:
+            return int(reply) >= 0
+
+        # Redis unavailable: nothing can run between this read and write in-process
+        sections, version = await self._fetch_sections(user_id)
+        if expected_version is not None and expected_version != version:
+            return False
+        if drop_all:
+            sections = {}
+        for name in drop:
+            sections.pop(name, None)
+        sections.update(values)
+        await redis_service.set_cache(
+            self._local_sections_key(user_id),
+            {'sections': sections, 'version': version + int(bump)},
+            expiry_seconds=self.TTL_SECONDS
+        )
+        return True
+
+    async def get_sections(self, user_id: str) -> CachedSections:
+        """
+        Get the cached context sections for a user
+
+        Returns:
+            Cached sections (empty if nothing is cached) with the entry version to
+            pass to set_sections. Sections that were invalidated are absent and
+            must be reloaded by the caller.
+        """
+        key = self._sections_key(user_id)
+        try:
+            snapshot = self._l1_get(key)
+            if snapshot is None:
+                snapshot = await self._fetch_sections(user_id)
+                self._l1_set(key, snapshot)
+            sections, version = snapshot
+            return CachedSections(sections, version)
+        except Exception as e:
+            logger.error(f"Error reading coaching context cache for user {user_id}: {e}")
+            return CachedSections(version=None)
+
+    async def set_sections(self, user_id: str, sections: Dict[str, Any], version: Optional[int]) -> None:
+        """
+        Store freshly loaded sections in the user's cache entry
+
+        Args:
+            version: Entry version from the get_sections call that preceded the
+                load. Nothing is stored if a write happened since then, so a
+                slow load never overwrites newer data.
+        """
+        if version is None:
+            return
+        try:
+            if not await self._apply(user_id, sections, expected_version=version, bump=False):
+                logger.debug(f"Coaching context for user {user_id} changed during load; not caching it")
+        except Exception as e:
+            logger.error(f"Error writing coaching context cache for user {user_id}: {e}")
+
+    async def update_section(self, user_id: str, section: str, value: Any) -> None:
+        """Replace a single section with its new value (write-through)"""
+        try:
+            await self._apply(user_id, {section: value})
+        except Exception as e:
+            logger.error(f"Error updating cached {section} for user {user_id}: {e}")
+
+    async def prepend_to_section(self, user_id: str, section: str, record: Dict[str, Any]) -> None:
+        """
+        Add a new record to the front of a newest-first section
+
+        The section is trimmed to the same length the database query returns.
+        Sections that are not cached are left to the next load.
+        """
+        try:
+            for _ in range(self.WRITE_ATTEMPTS):
+                cached, version = await self._fetch_sections(user_id)
+                if section not in cached:
+                    # Still bump the version so a load already in flight isn't stored
+                    await self._apply(user_id)
+                    return
+                limit = self.SECTION_LIMITS.get(section)
+                updated = ([record] + list(cached[section] or []))[:limit]
+                if await self._apply(user_id, {section: updated}, expected_version=version):
+                    return
+            # Lost every race; drop the section so the next read reloads it
+            await self._apply(user_id, drop=[section])
+        except Exception as e:
+            logger.error(f"Error updating cached {section} for user {user_id}: {e}")
+
+    async def invalidate_section(self, user_id: str, section: str) -> None:
+        """Drop one section so only it is reloaded on the next read"""
+        try:
+            await self._apply(user_id, drop=[section])
+        except Exception as e:
+            logger.error(f"Error invalidating cached {section} for user {user_id}: {e}")
+
+    async def get_history(self, user_id: str, thread_id: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[int]]:
+        """
+        Get cached conversation history for a thread
+
+        Returns:
+            Tuple of (history or None on a miss, history version to pass to
+            set_history; None if the read failed)
+        """
+        try:
+            client = redis_service.get_client()
+            if client is None:
+                entry = await redis_service.get_cache(self._local_history_key(user_id, thread_id)) or {}
+                return entry.get('messages'), entry.get('version', 0)
+
+            try:
+                pipe = client.pipeline(transaction=True)
+                pipe.get(self._history_version_key(user_id, thread_id))
+                pipe.lrange(self._history_key(user_id, thread_id), 0, -1)
+                version, messages = await pipe.execute()
+            except Exception as e:
+                redis_service.report_error(e)
+                raise
+            history = [json.loads(message) for message in messages] if messages else None
+            return history, int(version or 0)
+        except Exception as e:
+            logger.error(f"Error reading cached history for thread {thread_id}: {e}")
+            return None, None
+
+    async def set_history(self, user_id: str, thread_id: str, history: List[Dict[str, Any]],
+                          version: Optional[int]) -> None:
+        """
+        Cache the conversation history loaded for a thread
+
+        Args:
+            version: History version from the get_history call that preceded the
+                load. Nothing is stored if a message was appended since then, so
+                a slow load never drops a newer message. Empty histories are not
+                cached (Redis lists cannot be empty); the thread is reloaded.
+        """
+        if version is None or not history:
+            return
+        history = history[-self.HISTORY_LIMIT:]
+        try:
+            reply = await redis_service.run_script(
+                STORE_HISTORY_SCRIPT,
+                [self._history_key(user_id, thread_id), self._history_version_key(user_id, thread_id)],
+                [version, self.TTL_SECONDS, *(json.dumps(message, default=str) for message in history)]
+            )
+            if reply is not None:
+                return
+
+            # Redis unavailable: nothing can run between this read and write in-process
+            key = self._local_history_key(user_id, thread_id)
+            entry = await redis_service.get_cache(key) or {}
+            if entry.get('version', 0) == version:
+                await redis_service.set_cache(key, {'messages': history, 'version': version},
+                                              expiry_seconds=self.TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Error caching history for thread {thread_id}: {e}")
+
+    async def append_message(self, user_id: str, thread_id: str, message: Dict[str, Any]) -> None:
+        """
+        Append a stored message to the cached thread history
+
+        Only applies to threads that are already cached, so the history never
+        starts from a partial view of the thread. The history version is bumped
+        either way, so a load already in flight doesn't store a snapshot
+        without this message.
+        """
+        try:
+            reply = await redis_service.run_script(
+                APPEND_HISTORY_SCRIPT,
+                [self._history_key(user_id, thread_id), self._history_version_key(user_id, thread_id)],
+                [json.dumps(message, default=str), self.HISTORY_LIMIT, self.TTL_SECONDS]
+            )
+            if reply is not None:
+                return
+
+            key = self._local_history_key(user_id, thread_id)
+            entry = await redis_service.get_cache(key) or {}
+            messages = entry.get('messages')
+            if messages is not None and message not in messages[-self.HISTORY_LIMIT:]:
+                messages = (messages + [message])[-self.HISTORY_LIMIT:]
+            await redis_service.set_cache(key, {'messages': messages, 'version': entry.get('version', 0) + 1},
+                                          expiry_seconds=self.TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Error appending cached history for thread {thread_id}: {e}")
+
+    async def invalidate_user(self, user_id: str) -> None:
+        """Drop all cached sections for a user (thread histories stay valid)"""
+        try:
+            await self._apply(user_id, drop_all=True)
+        except Exception as e:
+            logger.error(f"Error invalidating coaching context cache for user {user_id}: {e}")
+
+    def clear_local(self) -> None:
+        """Clear the in-process section L1 (Redis entries are left alone)"""
+        self._l1.clear()
+
+# Global coaching context cache instance
+coaching_context_cache = CoachingContextCache()
@@ -13,6 +13,9 @@ class ConfigurationError(Exception):
 class Config:
     # API Configurations
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY")
+    # Shared Anthropic HTTP connection pool
+    ANTHROPIC_MAX_CONNECTIONS: int = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "50"))
+    ANTHROPIC_TIMEOUT_SECONDS: float = float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "120"))
     
     # Model selection for WingmanMatch operations
     # Chat model for wingman conversations (premium for quality)
@@ -42,6 +45,10 @@ class Config:
     
     # Email Configuration for match notifications
     RESEND_API_KEY: str = os.getenv("RESEND_API_KEY")
+    # Outbound email queue drained by the background dispatcher
+    EMAIL_OUTBOX_BATCH_SIZE: int = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+    EMAIL_OUTBOX_CONCURRENCY: int = int(os.getenv("EMAIL_OUTBOX_CONCURRENCY", "5"))
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
     
     # WingmanMatch Feature Flags
     ENABLE_MATCHING: bool = os.getenv("ENABLE_MATCHING", "true").lower() in ("true", "1", "yes")
@@ -50,6 +57,18 @@ class Config:
     ENABLE_CHALLENGES_CATALOG: bool = os.getenv("ENABLE_CHALLENGES_CATALOG", "true").lower() in ("true", "1", "yes")
     ENABLE_DETAILED_LOGGING: bool = os.getenv("ENABLE_DETAILED_LOGGING", "false").lower() in ("true", "1", "yes")
     ENABLE_RATE_LIMITING: bool = os.getenv("ENABLE_RATE_LIMITING", "true").lower() in ("true", "1", "yes")
+    RATE_LIMIT_ALGORITHM: str = os.getenv("RATE_LIMIT_ALGORITHM", "gcra")  # gcra, sliding_log
+    RATE_LIMIT_GLOBAL_LEASE_FRACTION: float = float(os.getenv("RATE_LIMIT_GLOBAL_LEASE_FRACTION", "0.01"))  # 0 disables leasing
+    RATE_LIMIT_GLOBAL_LEASE_TTL_SECONDS: float = float(os.getenv("RATE_LIMIT_GLOBAL_LEASE_TTL_SECONDS", "30"))
+    REDIS_L1_ENABLED: bool = os.getenv("REDIS_L1_ENABLED", "true").lower() in ("true", "1", "yes")
+    REDIS_L1_MAX_ENTRIES: int = int(os.getenv("REDIS_L1_MAX_ENTRIES", "2000"))
+    REDIS_L1_TTL_SECONDS: float = float(os.getenv("REDIS_L1_TTL_SECONDS", "60"))  # safety net behind pub/sub invalidation
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "1.0"))
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", "3"))  # consecutive errors before failover
+    REDIS_BREAKER_PROBE_INTERVAL_SECONDS: float = float(os.getenv("REDIS_BREAKER_PROBE_INTERVAL_SECONDS", "0.5"))
+    REDIS_BREAKER_MAX_PROBE_INTERVAL_SECONDS: float = float(os.getenv("REDIS_BREAKER_MAX_PROBE_INTERVAL_SECONDS", "30"))
+    CACHE_STALE_WHILE_REVALIDATE: bool = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "true").lower() in ("true", "1", "yes")
+    CACHE_EARLY_EXPIRATION_BETA: float = float(os.getenv("CACHE_EARLY_EXPIRATION_BETA", "1.0"))  # 0 disables early refresh
     ENABLE_TEST_AUTH: bool = os.getenv("ENABLE_TEST_AUTH", "true").lower() in ("true", "1", "yes") and os.getenv("DEVELOPMENT_MODE", "false").lower() in ("true", "1", "yes")
     
     # A/B Testing Flags for Coaching Persona
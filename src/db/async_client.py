@@ -0,0 +1,51 @@
+"""
+Non-blocking Supabase query execution for async endpoints
+supabase-py's PostgREST builders only expose a blocking .execute(); running it
+directly inside an async handler stalls every other request on the worker.
+These helpers run the network round trip on a bounded I/O thread pool instead.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Lazily create the shared executor sized to the database pool setting"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=Config.DATABASE_POOL_SIZE,
+            thread_name_prefix="supabase-io"
+        )
+    return _executor
+
+async def execute_async(query) -> Any:
+    """
+    Execute a supabase-py query builder without blocking the event loop
+
+    Args:
+        query: Any builder with a blocking .execute() (table/select/insert/rpc chains)
+
+    Returns:
+        The builder's APIResponse
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), query.execute)
+
+async def gather_queries(*queries) -> List[Any]:
+    """Execute several independent query builders concurrently"""
+    return list(await asyncio.gather(*(execute_async(query) for query in queries)))
+
+def shutdown_executor() -> None:
+    """Release I/O threads on application shutdown"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
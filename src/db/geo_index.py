@@ -0,0 +1,271 @@
+"""
+In-process geospatial index for WingmanMatch buddy candidate search
+Buckets user locations into a fixed lat/lng cell grid so radius and k-nearest
+queries only touch the cells around the searcher instead of every location row
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.db.async_client import execute_async
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.05
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in miles between two coordinates"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+@dataclass
+class IndexedLocation:
+    """User location plus the profile fields needed to build a BuddyCandidate"""
+    user_id: str
+    lat: float
+    lng: float
+    city: Optional[str] = None
+    experience_level: Optional[str] = None
+    confidence_archetype: Optional[str] = None
+
+    @property
+    def is_matchable(self) -> bool:
+        """Only users with a complete profile are offered as candidates"""
+        return bool(self.experience_level and self.confidence_archetype)
+
+class GeoCellIndex:
+    """
+    Fixed-size lat/lng cell grid (geohash-style bucketing)
+
+    Radius queries scan only the cells overlapping the search bounding box and
+    apply an exact haversine filter; k-nearest queries widen the radius until
+    enough points are found.
+    """
+
+    def __init__(self, cell_size_degrees: float = 0.5):
+        self.cell_size = cell_size_degrees
+        self._lng_cells = int(math.ceil(360.0 / cell_size_degrees))
+        self._cells: Dict[Tuple[int, int], Dict[str, IndexedLocation]] = {}
+        self._locations: Dict[str, IndexedLocation] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._locations
+
+    def get(self, user_id: str) -> Optional[IndexedLocation]:
+        """Return the indexed location for a user, if any"""
+        return self._locations.get(user_id)
+
+    def locations(self) -> List[IndexedLocation]:
+        """Snapshot of every indexed location"""
+        with self._lock:
+            return list(self._locations.values())
+
+    def _cell_for(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = int(math.floor((lat + 90.0) / self.cell_size))
+        col = int(math.floor((lng + 180.0) / self.cell_size)) % self._lng_cells
+        return row, col
+
+    def upsert(self, location: IndexedLocation) -> None:
+        """Insert or move a user's location"""
+        with self._lock:
+            self.remove(location.user_id)
+            cell = self._cell_for(location.lat, location.lng)
+            self._cells.setdefault(cell, {})[location.user_id] = location
+            self._locations[location.user_id] = location
+
+    def remove(self, user_id: str) -> None:
+        """Drop a user from the index (no-op if absent)"""
+        with self._lock:
+            existing = self._locations.pop(user_id, None)
+            if existing is None:
+                return
+            cell = self._cell_for(existing.lat, existing.lng)
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(user_id, None)
+                if not bucket:
+                    del self._cells[cell]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells.clear()
+            self._locations.clear()
+
+    def _cells_within(self, lat: float, lng: float, radius_miles: float) -> Set[Tuple[int, int]]:
+        """Cells overlapping the bounding box of a search circle"""
+        lat_delta = radius_miles / MILES_PER_DEGREE_LAT
+        min_lat = max(-90.0, lat - lat_delta)
+        max_lat = min(90.0, lat + lat_delta)
+        min_row = self._cell_for(min_lat, lng)[0]
+        max_row = self._cell_for(max_lat, lng)[0]
+
+        # Longitude degrees shrink towards the poles; fall back to every column
+        # when the box reaches a pole or wraps the whole globe
+        widest_lat = max(abs(min_lat), abs(max_lat))
+        cos_lat = math.cos(math.radians(widest_lat))
+        if widest_lat >= 89.9 or cos_lat * MILES_PER_DEGREE_LAT * 180.0 <= radius_miles:
+            columns = range(self._lng_cells)
+        else:
+            lng_delta = radius_miles / (MILES_PER_DEGREE_LAT * cos_lat)
+            first_col = int(math.floor((lng - lng_delta + 180.0) / self.cell_size))
+            last_col = int(math.floor((lng + lng_delta + 180.0) / self.cell_size))
+            columns = [col % self._lng_cells for col in range(first_col, last_col + 1)]
+
+        return {(row, col) for row in range(min_row, max_row + 1) for col in columns}
+
+    def query_radius(
+        self,
+        lat: float,
+        lng: float,
+        radius_miles: float,
+        exclude_user_id: Optional[str] = None
+    ) -> List[Tuple[IndexedLocation, float]]:
+        """
+        Find indexed locations within radius, nearest first
+
+        Returns:
+            List of (location, distance_miles) tuples sorted by distance
+        """
+        results = []
+        with self._lock:
+            for cell in self._cells_within(lat, lng, radius_miles):
+                for location in self._cells.get(cell, {}).values():
+                    if location.user_id == exclude_user_id:
+                        continue
+                    distance = haversine_miles(lat, lng, location.lat, location.lng)
+                    if distance <= radius_miles:
+                        results.append((location, distance))
+
+        results.sort(key=lambda item: (item[1], item[0].user_id))
+        return results
+
+    def query_nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        exclude_user_id: Optional[str] = None,
+        max_radius_miles: float = math.pi * EARTH_RADIUS_MILES
+    ) -> List[Tuple[IndexedLocation, float]]:
+        """
+        Find the k nearest indexed locations, optionally capped by distance
+
+        Returns:
+            Up to k (location, distance_miles) tuples sorted by distance
+        """
+        if k <= 0:
+            return []
+
+        radius = min(self.cell_size * MILES_PER_DEGREE_LAT, max_radius_miles)
+        while True:
+            results = self.query_radius(lat, lng, radius, exclude_user_id)
+            if len(results) >= k or radius >= max_radius_miles:
+                return results[:k]
+            radius = min(radius * 2, max_radius_miles)
+
+class CandidateLocationIndex(GeoCellIndex):
+    """
+    Process-wide candidate index backed by user_locations + user_profiles
+
+    Loaded lazily from Supabase and kept current by location upserts from the
+    profile completion endpoint. A periodic reload picks up writes made by other
+    workers and profile changes that do not go through this process.
+    """
+
+    REFRESH_SECONDS = 300
+
+    def __init__(self, cell_size_degrees: float = 0.5):
+        super().__init__(cell_size_degrees)
+        self._loaded_at: Optional[float] = None
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or (time.monotonic() - self._loaded_at) > self.REFRESH_SECONDS
+
+    async def ensure_loaded(self, client) -> None:
+        """
+        Load (or reload) every located user if the index is empty or stale
+
+        Concurrent callers share one reload; the query runs off the event loop
+        and the current contents keep serving until the new rows are swapped in.
+        """
+        if not self.is_stale:
+            return
+
+        async with self._load_lock:
+            if not self.is_stale:
+                return
+
+            result = await execute_async(client.table('user_locations')\
+                .select('user_id, lat, lng, city, user_profiles!inner(experience_level, confidence_archetype)'))
+
+            rows = result.data or []
+            with self._lock:
+                self.clear()
+                for row in rows:
+                    profile = row.get('user_profiles') or {}
+                    self.update_location(
+                        user_id=row['user_id'],
+                        lat=row.get('lat'),
+                        lng=row.get('lng'),
+                        city=row.get('city'),
+                        experience_level=profile.get('experience_level'),
+                        confidence_archetype=profile.get('confidence_archetype')
+                    )
+                self._loaded_at = time.monotonic()
+
+            logger.info(f"Candidate location index loaded with {len(self)} located users")
+
+    def update_location(
+        self,
+        user_id: str,
+        lat: Optional[float],
+        lng: Optional[float],
+        city: Optional[str] = None,
+        experience_level: Optional[str] = None,
+        confidence_archetype: Optional[str] = None
+    ) -> None:
+        """
+        Apply a user_locations write to the index
+
+        Missing or placeholder (0,0) coordinates - city-only privacy mode - remove
+        the user, since they cannot be matched by distance. Profile fields not
+        supplied are carried over from the existing entry.
+        """
+        if lat is None or lng is None or (float(lat) == 0.0 and float(lng) == 0.0):
+            self.remove(user_id)
+            return
+
+        with self._lock:
+            existing = self.get(user_id)
+            self.upsert(IndexedLocation(
+                user_id=user_id,
+                lat=float(lat),
+                lng=float(lng),
+                city=city if city is not None else (existing.city if existing else None),
+                experience_level=experience_level or (existing.experience_level if existing else None),
+                confidence_archetype=confidence_archetype or (existing.confidence_archetype if existing else None)
+            ))
+
+    def invalidate(self) -> None:
+        """Force a full reload on the next query"""
+        self._loaded_at = None
+
+# Global index instance
+candidate_index = CandidateLocationIndex()
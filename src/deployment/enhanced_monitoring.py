@@ -14,7 +14,7 @@ import traceback
 from contextlib import asynccontextmanager
 
 from src.config import Config
-from src.observability.metrics_collector import metrics_collector, record_request_metric
+from src.observability.metrics_collector import metrics_collector, record_request_metric, get_route_label
 from src.observability.alert_system import alert_system, AlertSeverity
 from src.deployment.production_config import production_config
 
@@ -135,7 +135,7 @@ class EnhancedMonitoring:
                 
                 # Record metrics using existing system
                 await record_request_metric(
-                    endpoint=request.url.path,
+                    endpoint=get_route_label(request.scope),
                     duration_ms=duration_ms,
                     status_code=response.status_code
                 )
@@ -0,0 +1,311 @@
+"""
+Durable outbound email queue for WingmanMatch
+
+Request handlers enqueue Resend payloads onto a Redis stream and return at once.
+A background dispatcher reads the stream in batches through a consumer group,
+sends each batch concurrently on a small thread pool (resend.Emails.send is a
+blocking HTTP call) and acknowledges messages once Resend has accepted them.
+Messages claimed by a worker that died mid-batch are reclaimed by the others.
+Failed sends are requeued with a "not_before" time (exponential backoff), and
+messages refused by an open circuit breaker wait before they are tried again.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import resend
+from redis.exceptions import ResponseError
+
+from src.config import Config
+from src.redis_client import redis_service
+from src.retry_policies import CircuitBreakerError, with_email_retry
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_STREAM = "email:outbox"
+DEAD_LETTER_STREAM = "email:outbox:dead"
+CONSUMER_GROUP = "email-dispatchers"
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class EmailOutbox:
+    """
+    Redis stream backed email outbox with a batching background dispatcher.
+
+    While Redis is unavailable, messages are held in a local queue and sent
+    by the dispatcher from there; those are not durable across restarts.
+    """
+
+    def __init__(self):
+        self.batch_size = Config.EMAIL_OUTBOX_BATCH_SIZE
+        self.max_concurrent = Config.EMAIL_OUTBOX_CONCURRENCY
+        self.max_attempts = Config.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.poll_interval_seconds = 0.5
+        self.stream_maxlen = 100000
+        # Messages unacknowledged this long were claimed by a dead worker (or hit an open circuit)
+        self.claim_idle_ms = 60000
+        self.claim_interval_seconds = 30
+        # Retry delay doubles per failed attempt; refused (open-circuit) local sends wait a fixed time
+        self.retry_backoff_seconds = 30
+        self.max_retry_backoff_seconds = 900
+        self.circuit_wait_seconds = 30
+
+        self._consumer = f"dispatcher-{uuid.uuid4().hex[:12]}"
+        self._group_ready = False
+        self._last_claim = 0.0
+        self._local: Deque[Dict[str, str]] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "sent": 0, "retried": 0, "dead_lettered": 0}
+
+    async def enqueue(self, payload: Dict[str, Any]) -> bool:
+        """
+        Queue an email for delivery.
+
+        Args:
+            payload: resend.Emails.send parameters (from, to, subject, html/text, ...)
+
+        Returns:
+            bool: True once the email is queued
+        """
+        message = {"payload": json.dumps(payload, default=str), "attempts": "0"}
+        self.stats["enqueued"] += 1
+
+        client = redis_service.get_client()
+        if client is not None:
+            try:
+                await client.xadd(OUTBOX_STREAM, message, maxlen=self.stream_maxlen, approximate=True)
+                return True
+            except Exception as e:
+                redis_service.report_error(e)
+                logger.warning(f"Email outbox unavailable, queueing locally: {str(e)}")
+
+        self._local.append(message)
+        return True
+
+    # Dispatcher
+
+    def start_dispatcher(self):
+        """Start the background dispatcher (call from a running event loop)"""
+        if self._dispatch_task is None or self._dispatch_task.done():
+            self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop_dispatcher(self):
+        """Stop the background dispatcher; unacknowledged messages stay in the stream"""
+        if self._dispatch_task:
+            self._dispatch_task.cancel()
+            try:
+                await self._dispatch_task
+            except asyncio.CancelledError:
+                pass
+            self._dispatch_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _dispatch_loop(self):
+        """Dispatch batches back to back, polling while nothing could be sent"""
+        while True:
+            try:
+                processed = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Email dispatcher error: {str(e)}")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval_seconds)
+
+    async def dispatch_once(self) -> int:
+        """
+        Send one batch from the local queue and one from the stream.
+
+        Messages that are not yet due or were refused by an open circuit
+        breaker are not counted, so the dispatcher sleeps instead of spinning.
+
+        Returns:
+            Number of messages a send was attempted for
+        """
+        processed = await self._dispatch_local()
+
+        client = redis_service.get_client()
+        if client is None:
+            return processed
+
+        try:
+            entries = await self._read_batch(client)
+            if entries:
+                processed += await self._process_batch(client, entries)
+            return processed
+        except Exception as e:
+            redis_service.report_error(e)
+            raise
+
+    async def _read_batch(self, client: Any) -> List[Tuple[str, Dict[str, str]]]:
+        """Read a batch for this consumer, reclaiming stale messages from other consumers first"""
+        if not self._group_ready:
+            try:
+                await client.xgroup_create(OUTBOX_STREAM, CONSUMER_GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self._group_ready = True
+
+        raw: List[Tuple[Any, Dict[Any, Any]]] = []
+        if time.monotonic() - self._last_claim >= self.claim_interval_seconds:
+            self._last_claim = time.monotonic()
+            claimed = await client.xautoclaim(OUTBOX_STREAM, CONSUMER_GROUP, self._consumer,
+                                              min_idle_time=self.claim_idle_ms, count=self.batch_size)
+            raw.extend(claimed[1])
+
+        if len(raw) < self.batch_size:
+            reply = await client.xreadgroup(CONSUMER_GROUP, self._consumer, {OUTBOX_STREAM: ">"},
+                                            count=self.batch_size - len(raw))
+            for _, stream_entries in reply or []:
+                raw.extend(stream_entries)
+
+        return [
+            (_decode(entry_id), {_decode(k): _decode(v) for k, v in fields.items()})
+            for entry_id, fields in raw if fields
+        ]
+
+    async def _process_batch(self, client: Any, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        """
+        Send the due messages of a batch concurrently, then acknowledge and requeue
+        them in one round trip.
+
+        Messages not yet due, and sends refused by an open circuit breaker, are left
+        pending and reclaimed once claim_idle_ms has passed.
+
+        Returns:
+            Number of messages a send was attempted for
+        """
+        now = time.time()
+        due = [(entry_id, fields) for entry_id, fields in entries if self._is_due(fields, now)]
+        if not due:
+            return 0
+        results = await self._send_all([fields for _, fields in due])
+
+        pipe = client.pipeline(transaction=False)
+        acked = []
+        for (entry_id, fields), result in zip(due, results):
+            if isinstance(result, CircuitBreakerError):
+                continue
+            acked.append(entry_id)
+            if isinstance(result, Exception):
+                self._queue_failure(pipe, fields, result)
+        if acked:
+            pipe.xack(OUTBOX_STREAM, CONSUMER_GROUP, *acked)
+            pipe.xdel(OUTBOX_STREAM, *acked)
+            await pipe.execute()
+        return len(acked)
+
+    @staticmethod
+    def _is_due(message: Dict[str, str], now: float) -> bool:
+        return float(message.get("not_before", 0)) <= now
+
+    def _retry_at(self, attempts: int) -> str:
+        """Epoch time before which a message that failed `attempts` times is not retried"""
+        delay = min(self.retry_backoff_seconds * 2 ** (attempts - 1), self.max_retry_backoff_seconds)
+        return str(time.time() + delay)
+
+    def _queue_failure(self, pipe: Any, fields: Dict[str, str], error: Exception):
+        attempts = int(fields.get("attempts", 0)) + 1
+        message = {"payload": fields["payload"], "attempts": str(attempts), "error": str(error)[:500]}
+        if attempts >= self.max_attempts:
+            pipe.xadd(DEAD_LETTER_STREAM, message, maxlen=self.stream_maxlen, approximate=True)
+            self.stats["dead_lettered"] += 1
+            logger.error(f"Email dead-lettered after {attempts} attempts: {str(error)}")
+        else:
+            message["not_before"] = self._retry_at(attempts)
+            pipe.xadd(OUTBOX_STREAM, message, maxlen=self.stream_maxlen, approximate=True)
+            self.stats["retried"] += 1
+
+    async def _dispatch_local(self) -> int:
+        """
+        Send a batch of due messages queued while Redis was unavailable.
+
+        Returns:
+            Number of messages a send was attempted for
+        """
+        now = time.time()
+        batch: List[Dict[str, str]] = []
+        waiting: List[Dict[str, str]] = []
+        for _ in range(len(self._local)):
+            if len(batch) >= self.batch_size:
+                break
+            message = self._local.popleft()
+            (batch if self._is_due(message, now) else waiting).append(message)
+        self._local.extend(waiting)
+        if not batch:
+            return 0
+
+        refused = 0
+        results = await self._send_all(batch)
+        for message, result in zip(batch, results):
+            if isinstance(result, CircuitBreakerError):
+                refused += 1
+                self._local.append({**message, "not_before": str(time.time() + self.circuit_wait_seconds)})
+            elif isinstance(result, Exception):
+                attempts = int(message["attempts"]) + 1
+                if attempts >= self.max_attempts:
+                    self.stats["dead_lettered"] += 1
+                    logger.error(f"Dropping locally queued email after {attempts} attempts: {str(result)}")
+                else:
+                    self.stats["retried"] += 1
+                    self._local.append({**message, "attempts": str(attempts),
+                                        "not_before": self._retry_at(attempts)})
+        return len(batch) - refused
+
+    async def _send_all(self, messages: List[Dict[str, str]]) -> List[Any]:
+        """Send messages concurrently; returns the Resend response or the exception for each"""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def send(message):
+            async with semaphore:
+                return await self._deliver(json.loads(message["payload"]))
+
+        results = await asyncio.gather(*(send(message) for message in messages), return_exceptions=True)
+        self.stats["sent"] += sum(1 for result in results if not isinstance(result, Exception))
+        return results
+
+    @with_email_retry()
+    async def _deliver(self, payload: Dict[str, Any]) -> Any:
+        """Send one email on the I/O thread pool so the event loop is never blocked"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                thread_name_prefix="email-io")
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self._executor, resend.Emails.send, payload)
+        logger.info(f"Email sent to {payload.get('to')}: {response}")
+        return response
+
+    async def get_status(self) -> Dict[str, Any]:
+        """Get outbox queue depth and delivery counters"""
+        status = {
+            **self.stats,
+            "dispatcher_running": self._dispatch_task is not None and not self._dispatch_task.done(),
+            "local_queue_size": len(self._local),
+            "stream_length": None,
+            "dead_letter_length": None
+        }
+
+        client = redis_service.get_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.xlen(OUTBOX_STREAM)
+                pipe.xlen(DEAD_LETTER_STREAM)
+                status["stream_length"], status["dead_letter_length"] = await pipe.execute()
+            except Exception as e:
+                logger.error(f"Error reading email outbox status: {str(e)}")
+
+        return status
+
+# Global email outbox instance
+email_outbox = EmailOutbox()
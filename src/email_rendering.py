@@ -0,0 +1,125 @@
+"""
+Precompiled email template rendering for WingmanMatch
+
+Templates use str.format placeholders ({recipient_name}, {score:.0f}). Each
+template is parsed once into a positional format string, so a render is a
+single C-level str.format call with no re-parsing or template rebuilding.
+Fields shared by every recipient of a bulk send can be bound once with
+partial(), which bakes their rendered values into the static text.
+"""
+
+import html
+from string import Formatter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+_formatter = Formatter()
+
+def _escape_braces(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+class CompiledTemplate:
+    """
+    A template parsed once and rendered many times.
+
+    Args:
+        source: Template text with str.format placeholders
+        escape_html: HTML-escape substituted values (for HTML bodies)
+    """
+
+    def __init__(self, source: str, escape_html: bool = False):
+        self.source = source
+        self.escape_html = escape_html
+
+        # (static text, field name, conversion, format spec) in template order
+        self._parts: List[Tuple[str, Optional[str], Optional[str], str]] = [
+            (literal, field, conversion, spec or "")
+            for literal, field, spec, conversion in _formatter.parse(source)
+        ]
+        self.fields = frozenset(field for _, field, _, _ in self._parts if field is not None)
+
+        # Each distinct field gets one positional slot, so repeated fields are fetched once
+        self._slots: List[str] = []
+        format_string = []
+        for literal, field, conversion, spec in self._parts:
+            format_string.append(_escape_braces(literal))
+            if field is None:
+                continue
+            if field not in self._slots:
+                self._slots.append(field)
+            slot = str(self._slots.index(field))
+            format_string.append("{" + slot + (f"!{conversion}" if conversion else "")
+                                 + (f":{spec}" if spec else "") + "}")
+        self._format_string = "".join(format_string)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        """
+        Render the template.
+
+        Raises:
+            KeyError: If the context is missing a template field
+        """
+        if self.escape_html:
+            return self._format_string.format(*[self._escape(context[name]) for name in self._slots])
+        return self._format_string.format(*[context[name] for name in self._slots])
+
+    def render_many(self, contexts: Iterable[Mapping[str, Any]],
+                    shared: Optional[Mapping[str, Any]] = None) -> List[str]:
+        """
+        Render the template once per recipient context.
+
+        Args:
+            contexts: Per-recipient fields
+            shared: Fields common to every recipient, rendered only once
+
+        Returns:
+            Rendered text per context, in order
+        """
+        template = self.partial(shared) if shared else self
+        return [template.render(context) for context in contexts]
+
+    def partial(self, context: Mapping[str, Any]) -> "CompiledTemplate":
+        """
+        Bind some fields now, returning a template over the remaining ones.
+
+        Bound values are rendered into the static text, so later renders only
+        substitute the fields that vary.
+        """
+        source = []
+        for literal, field, conversion, spec in self._parts:
+            source.append(_escape_braces(literal))
+            if field is None:
+                continue
+            if field in context:
+                value = _formatter.convert_field(context[field], conversion) if conversion else context[field]
+                source.append(_escape_braces(format(self._escape(value), spec)))
+            else:
+                source.append("{" + field + (f"!{conversion}" if conversion else "")
+                              + (f":{spec}" if spec else "") + "}")
+
+        return CompiledTemplate("".join(source), escape_html=self.escape_html)
+
+    def _escape(self, value: Any) -> Any:
+        if self.escape_html and isinstance(value, str):
+            return html.escape(value)
+        return value
+
+def compile_templates(sources: Dict[str, Dict[str, str]],
+                      html_keys: Iterable[str] = ()) -> Dict[str, Dict[str, CompiledTemplate]]:
+    """
+    Compile a {name: {part: source}} template table.
+
+    Args:
+        sources: Template sources, e.g. {"match_invitation": {"subject": ..., "template": ...}}
+        html_keys: Parts rendered into HTML, whose values are escaped
+
+    Returns:
+        The same table with each source replaced by its CompiledTemplate
+    """
+    html_keys = set(html_keys)
+    return {
+        name: {
+            part: CompiledTemplate(source, escape_html=part in html_keys)
+            for part, source in parts.items()
+        }
+        for name, parts in sources.items()
+    }
@@ -13,10 +13,10 @@ from typing import Any, Dict, List, Optional, Union
 from enum import Enum
 
 import resend
-from resend.exceptions import ResendError
 
 from src.config import Config
-from src.retry_policies import with_email_retry, execute_with_retry
+from src.email_outbox import email_outbox
+from src.email_rendering import compile_templates
 
 logger = logging.getLogger(__name__)
 
@@ -42,41 +42,10 @@ class EmailServiceError(Exception):
     """Custom exception for email service errors"""
     pass
 
-class EmailService:
-    """
-    Email service for WingmanMatch using Resend API.
-    
-    Provides template-based email sending with retry logic, fallback mechanisms,
-    and comprehensive error handling.
-    """
-    
-    def __init__(self):
-        self._is_available = False
-        self._fallback_mode = False
-        self._pending_emails: List[Dict[str, Any]] = []
-        self._initialize_service()
-    
-    def _initialize_service(self):
-        """Initialize Resend email service"""
-        if not Config.RESEND_API_KEY:
-            logger.warning("Resend API key not configured, email service in fallback mode")
-            self._fallback_mode = True
-            return
-        
-        try:
-            resend.api_key = Config.RESEND_API_KEY
-            self._is_available = True
-            logger.info("Email service initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize email service: {str(e)}")
-            self._fallback_mode = True
-    
-    def _get_email_templates(self) -> Dict[str, Dict[str, str]]:
-        """Get email template definitions"""
-        return {
-            EmailTemplate.MATCH_INVITATION.value: {
-                "subject": "🎯 You have a new WingmanMatch invitation!",
-                "template": """
+EMAIL_TEMPLATE_SOURCES: Dict[str, Dict[str, str]] = {
+    EmailTemplate.MATCH_INVITATION.value: {
+        "subject": "🎯 You have a new WingmanMatch invitation!",
+        "template": """
 Hello {recipient_name},
 
 Great news! We've found you a potential wingman match for your challenge: "{challenge_title}".
@@ -102,12 +71,12 @@ The WingmanMatch Team
 
 ---
 If you no longer wish to receive match invitations, you can update your preferences here: {preferences_url}
-                """.strip()
-            },
-            
-            EmailTemplate.MATCH_ACCEPTED.value: {
-                "subject": "🎉 Your WingmanMatch has been accepted!",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.MATCH_ACCEPTED.value: {
+        "subject": "🎉 Your WingmanMatch has been accepted!",
+        "template": """
 Hello {recipient_name},
 
 Fantastic news! {partner_name} has accepted your wingman match invitation.
@@ -130,12 +99,12 @@ We're excited to see what you'll achieve together!
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.MATCH_DECLINED.value: {
-                "subject": "WingmanMatch update - Let's find you another match",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.MATCH_DECLINED.value: {
+        "subject": "WingmanMatch update - Let's find you another match",
+        "template": """
 Hello {recipient_name},
 
 Thanks for considering the recent wingman match opportunity. While {partner_name} wasn't the right fit this time, we're committed to finding you the perfect wingman partner.
@@ -156,12 +125,12 @@ Don't give up - the right wingman match is out there!
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.SESSION_REMINDER.value: {
-                "subject": "⏰ WingmanMatch session reminder - {session_time}",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.SESSION_REMINDER.value: {
+        "subject": "⏰ WingmanMatch session reminder - {session_time}",
+        "template": """
 Hello {recipient_name},
 
 This is a friendly reminder about your upcoming wingman session.
@@ -184,12 +153,12 @@ Looking forward to another productive session!
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.CHALLENGE_REMINDER.value: {
-                "subject": "🚀 Challenge progress check-in - How are you doing?",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.CHALLENGE_REMINDER.value: {
+        "subject": "🚀 Challenge progress check-in - How are you doing?",
+        "template": """
 Hello {recipient_name},
 
 Hope your challenge is going well! It's been {days_since_start} days since you started "{challenge_title}" with {partner_name}.
@@ -211,12 +180,12 @@ You've got this! Keep pushing forward.
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.WELCOME_ONBOARDING.value: {
-                "subject": "🎯 Welcome to WingmanMatch - Let's find your perfect wingman!",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.WELCOME_ONBOARDING.value: {
+        "subject": "🎯 Welcome to WingmanMatch - Let's find your perfect wingman!",
+        "template": """
 Hello {recipient_name},
 
 Welcome to WingmanMatch! We're excited to help you achieve your goals with the perfect wingman partner.
@@ -240,12 +209,12 @@ Let's make your goals a reality!
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.MATCH_COMPLETION.value: {
-                "subject": "🏆 Congratulations! You've completed your WingmanMatch challenge",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.MATCH_COMPLETION.value: {
+        "subject": "🏆 Congratulations! You've completed your WingmanMatch challenge",
+        "template": """
 Hello {recipient_name},
 
 Congratulations! You and {partner_name} have successfully completed your "{challenge_title}" challenge!
@@ -274,12 +243,12 @@ We're proud of what you've accomplished together!
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            },
-            
-            EmailTemplate.SYSTEM_NOTIFICATION.value: {
-                "subject": "WingmanMatch System Notification",
-                "template": """
+        """.strip()
+    },
+    
+    EmailTemplate.SYSTEM_NOTIFICATION.value: {
+        "subject": "WingmanMatch System Notification",
+        "template": """
 Hello {recipient_name},
 
 {notification_message}
@@ -288,21 +257,56 @@ Hello {recipient_name},
 
 Best regards,
 The WingmanMatch Team
-                """.strip()
-            }
-        }
+        """.strip()
+    }
+}
+
+# Compiled once at import; rendering never re-parses or rebuilds the templates
+COMPILED_TEMPLATES = compile_templates(EMAIL_TEMPLATE_SOURCES)
+
+class EmailService:
+    """
+    Email service for WingmanMatch using Resend API.
+    
+    Provides template-based email sending with retry logic, fallback mechanisms,
+    and comprehensive error handling.
+    """
+    
+    def __init__(self):
+        self._is_available = False
+        self._fallback_mode = False
+        self._pending_emails: List[Dict[str, Any]] = []
+        self._initialize_service()
+    
+    def _initialize_service(self):
+        """Initialize Resend email service"""
+        if not Config.RESEND_API_KEY:
+            logger.warning("Resend API key not configured, email service in fallback mode")
+            self._fallback_mode = True
+            return
+        
+        try:
+            resend.api_key = Config.RESEND_API_KEY
+            self._is_available = True
+            logger.info("Email service initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize email service: {str(e)}")
+            self._fallback_mode = True
+    
+    def _get_email_templates(self) -> Dict[str, Dict[str, str]]:
+        """Get email template definitions"""
+        return EMAIL_TEMPLATE_SOURCES
     
     def _format_email_content(self, template: EmailTemplate, variables: Dict[str, Any]) -> Dict[str, str]:
         """Format email content with provided variables"""
-        templates = self._get_email_templates()
-        template_data = templates.get(template.value)
+        template_data = COMPILED_TEMPLATES.get(template.value)
         
         if not template_data:
             raise EmailServiceError(f"Template not found: {template.value}")
         
         try:
-            subject = template_data["subject"].format(**variables)
-            content = template_data["template"].format(**variables)
+            subject = template_data["subject"].render(variables)
+            content = template_data["template"].render(variables)
             
             return {
                 "subject": subject,
@@ -311,7 +315,6 @@ The WingmanMatch Team
         except KeyError as e:
             raise EmailServiceError(f"Missing template variable: {e}")
     
-    @with_email_retry()
     async def send_email(
         self,
         to_email: str,
@@ -326,6 +329,9 @@ The WingmanMatch Team
         """
         Send an email using the specified template.
         
+        The email is queued on the outbox and delivered (with retries) by its
+        background dispatcher, so this returns without waiting on Resend.
+        
         Args:
             to_email: Recipient email address
             template: Email template to use
@@ -337,7 +343,7 @@ The WingmanMatch Team
             tags: Email tags for tracking
             
         Returns:
-            bool: True if email sent successfully, False otherwise
+            bool: True if the email was queued, False otherwise
         """
         if self._fallback_mode:
             return await self._handle_fallback_email(
@@ -358,21 +364,15 @@ The WingmanMatch Team
                 "tags": tags or [template.value, priority.value]
             }
             
-            # Send email via Resend
-            response = resend.Emails.send(email_data)
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Email queued: {template.value} to {to_email}")
+            return True
             
-            if response and hasattr(response, 'id'):
-                logger.info(f"Email sent successfully: {response.id} to {to_email}")
-                return True
-            else:
-                logger.error(f"Failed to send email to {to_email}: No response ID")
-                return False
-                
-        except ResendError as e:
-            logger.error(f"Resend API error sending email to {to_email}: {str(e)}")
-            raise
+        except EmailServiceError as e:
+            logger.error(f"Error formatting email to {to_email}: {str(e)}")
+            return False
         except Exception as e:
-            logger.error(f"Unexpected error sending email to {to_email}: {str(e)}")
+            logger.error(f"Unexpected error queueing email to {to_email}: {str(e)}")
             raise
     
     async def _handle_fallback_email(
@@ -594,6 +594,77 @@ The WingmanMatch Team
         logger.info(f"Bulk email send completed: {results['successful']}/{results['total']} successful")
         return results
     
+    async def send_bulk_template(
+        self,
+        template: EmailTemplate,
+        recipients: List[Dict[str, Any]],
+        shared_variables: Optional[Dict[str, Any]] = None,
+        priority: EmailPriority = EmailPriority.NORMAL,
+        from_email: str = "noreply@wingmanmatch.com",
+        from_name: str = "WingmanMatch",
+        tags: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Render one template for many recipients and queue the results.
+        
+        Variables shared by every recipient are rendered once; only the
+        per-recipient variables are substituted for each email.
+        
+        Args:
+            template: Email template to use
+            recipients: Dicts with "to_email" and that recipient's "variables"
+            shared_variables: Variables common to every recipient
+            priority: Email priority level
+            from_email: Sender email address
+            from_name: Sender name
+            tags: Email tags for tracking
+            
+        Returns:
+            Dict with success/failure statistics
+        """
+        results = {"total": len(recipients), "successful": 0, "failed": 0, "errors": []}
+        
+        template_data = COMPILED_TEMPLATES.get(template.value)
+        if not template_data:
+            raise EmailServiceError(f"Template not found: {template.value}")
+        
+        try:
+            contexts = [recipient["variables"] for recipient in recipients]
+            subjects = template_data["subject"].render_many(contexts, shared=shared_variables)
+            contents = template_data["template"].render_many(contexts, shared=shared_variables)
+        except KeyError as e:
+            raise EmailServiceError(f"Missing template variable: {e}")
+        
+        for recipient, subject, content in zip(recipients, subjects, contents):
+            to_email = recipient["to_email"]
+            try:
+                if self._fallback_mode:
+                    self._pending_emails.append({
+                        "to_email": to_email,
+                        "template": template.value,
+                        "subject": subject,
+                        "content": content,
+                        "priority": priority.value,
+                        "timestamp": datetime.now().isoformat(),
+                        "sent": False
+                    })
+                else:
+                    await email_outbox.enqueue({
+                        "from": f"{from_name} <{from_email}>",
+                        "to": [to_email],
+                        "subject": subject,
+                        "text": content,
+                        "reply_to": "support@wingmanmatch.com",
+                        "tags": tags or [template.value, priority.value]
+                    })
+                results["successful"] += 1
+            except Exception as e:
+                results["failed"] += 1
+                results["errors"].append(f"Error queueing email to {to_email}: {str(e)}")
+        
+        logger.info(f"Bulk template email queued: {results['successful']}/{results['total']} {template.value}")
+        return results
+    
     def get_pending_emails(self) -> List[Dict[str, Any]]:
         """Get list of pending emails (fallback mode only)"""
         return self._pending_emails.copy()
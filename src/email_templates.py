@@ -1,118 +1,21 @@
 """
 Email service for WingmanMatch using Resend
-Provides templated transactional emails for match notifications
+Provides templated transactional emails for match notifications; emails are
+queued on the outbox and delivered by its background dispatcher
 """
 
 import logging
 from typing import Dict, Any, Optional
 import resend
 from src.config import Config
+from src.email_outbox import email_outbox
+from src.email_rendering import CompiledTemplate
 
 logger = logging.getLogger(__name__)
 
-class EmailService:
-    """Resend email service for WingmanMatch match notifications"""
-    
-    def __init__(self):
-        if Config.RESEND_API_KEY:
-            resend.api_key = Config.RESEND_API_KEY
-            self.enabled = True
-            logger.info("Resend email service initialized")
-        else:
-            self.enabled = False
-            logger.warning("RESEND_API_KEY not configured - email features disabled")
-    
-    async def send_match_invitation(self, to_email: str, inviter_name: str, venue_suggestion: str) -> bool:
-        """Send match invitation email"""
-        if not self.enabled:
-            logger.warning("Email service disabled - match invitation not sent")
-            return False
-        
-        try:
-            email_data = {
-                "from": "WingmanMatch <matches@wingmanmatch.com>",
-                "to": [to_email],
-                "subject": f"🎯 New Wingman Match with {inviter_name}",
-                "html": self._get_match_invitation_template(inviter_name, venue_suggestion)
-            }
-            
-            response = resend.Emails.send(email_data)
-            logger.info(f"Match invitation sent to {to_email}: {response}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send match invitation to {to_email}: {e}")
-            return False
-    
-    async def send_match_acceptance(self, to_email: str, accepter_name: str, venue_name: str, scheduled_time: str) -> bool:
-        """Send match acceptance notification"""
-        if not self.enabled:
-            logger.warning("Email service disabled - match acceptance not sent")
-            return False
-        
-        try:
-            email_data = {
-                "from": "WingmanMatch <matches@wingmanmatch.com>",
-                "to": [to_email],
-                "subject": f"🎉 {accepter_name} accepted your wingman match!",
-                "html": self._get_match_acceptance_template(accepter_name, venue_name, scheduled_time)
-            }
-            
-            response = resend.Emails.send(email_data)
-            logger.info(f"Match acceptance sent to {to_email}: {response}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send match acceptance to {to_email}: {e}")
-            return False
-    
-    async def send_match_decline(self, to_email: str, decliner_name: str) -> bool:
-        """Send match decline notification"""
-        if not self.enabled:
-            logger.warning("Email service disabled - match decline not sent")
-            return False
-        
-        try:
-            email_data = {
-                "from": "WingmanMatch <matches@wingmanmatch.com>",
-                "to": [to_email],
-                "subject": "Match update from WingmanMatch",
-                "html": self._get_match_decline_template(decliner_name)
-            }
-            
-            response = resend.Emails.send(email_data)
-            logger.info(f"Match decline sent to {to_email}: {response}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send match decline to {to_email}: {e}")
-            return False
-    
-    async def send_session_reminder(self, to_email: str, partner_name: str, venue_name: str, scheduled_time: str) -> bool:
-        """Send session reminder email"""
-        if not self.enabled:
-            logger.warning("Email service disabled - session reminder not sent")
-            return False
-        
-        try:
-            email_data = {
-                "from": "WingmanMatch <matches@wingmanmatch.com>",
-                "to": [to_email],
-                "subject": f"⏰ Wingman session with {partner_name} tomorrow",
-                "html": self._get_session_reminder_template(partner_name, venue_name, scheduled_time)
-            }
-            
-            response = resend.Emails.send(email_data)
-            logger.info(f"Session reminder sent to {to_email}: {response}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send session reminder to {to_email}: {e}")
-            return False
-    
-    def _get_match_invitation_template(self, inviter_name: str, venue_suggestion: str) -> str:
-        """HTML template for match invitation"""
-        return f"""
+# HTML bodies, compiled once at import; substituted values are HTML-escaped
+
+MATCH_INVITATION_HTML = CompiledTemplate("""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; border-radius: 10px; color: white; text-align: center;">
@@ -152,11 +55,9 @@ class EmailService:
             </div>
         </body>
         </html>
-        """
-    
-    def _get_match_acceptance_template(self, accepter_name: str, venue_name: str, scheduled_time: str) -> str:
-        """HTML template for match acceptance"""
-        return f"""
+        """, escape_html=True)
+
+MATCH_ACCEPTANCE_HTML = CompiledTemplate("""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); padding: 30px; border-radius: 10px; color: white; text-align: center;">
@@ -188,11 +89,9 @@ class EmailService:
             </div>
         </body>
         </html>
-        """
-    
-    def _get_match_decline_template(self, decliner_name: str) -> str:
-        """HTML template for match decline"""
-        return f"""
+        """, escape_html=True)
+
+MATCH_DECLINE_HTML = CompiledTemplate("""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: #f5f5f5; padding: 30px; border-radius: 10px; text-align: center;">
@@ -212,11 +111,9 @@ class EmailService:
             </div>
         </body>
         </html>
-        """
-    
-    def _get_session_reminder_template(self, partner_name: str, venue_name: str, scheduled_time: str) -> str:
-        """HTML template for session reminder"""
-        return f"""
+        """, escape_html=True)
+
+SESSION_REMINDER_HTML = CompiledTemplate("""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: linear-gradient(135deg, #ff9a56 0%, #ff6a00 100%); padding: 30px; border-radius: 10px; color: white; text-align: center;">
@@ -242,33 +139,9 @@ class EmailService:
             </div>
         </body>
         </html>
-        """
-    
-    async def send_session_scheduled(self, to_email: str, user_name: str, venue_name: str, scheduled_time: str) -> bool:
-        """Send session scheduled confirmation email"""
-        if not self.enabled:
-            logger.warning("Email service disabled - session scheduled notification not sent")
-            return False
-        
-        try:
-            email_data = {
-                "from": "WingmanMatch <sessions@wingmanmatch.com>",
-                "to": [to_email],
-                "subject": f"🎯 Wingman Session Scheduled at {venue_name}",
-                "html": self._get_session_scheduled_template(user_name, venue_name, scheduled_time)
-            }
-            
-            response = resend.Emails.send(email_data)
-            logger.info(f"Session scheduled notification sent to {to_email}: {response}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send session scheduled notification to {to_email}: {e}")
-            return False
-    
-    def _get_session_scheduled_template(self, user_name: str, venue_name: str, scheduled_time: str) -> str:
-        """HTML template for session scheduled notification"""
-        return f"""
+        """, escape_html=True)
+
+SESSION_SCHEDULED_HTML = CompiledTemplate("""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; border-radius: 10px; color: white; text-align: center;">
@@ -311,7 +184,149 @@ class EmailService:
             </div>
         </body>
         </html>
-        """
+        """, escape_html=True)
+
+class EmailService:
+    """Resend email service for WingmanMatch match notifications"""
+    
+    def __init__(self):
+        if Config.RESEND_API_KEY:
+            resend.api_key = Config.RESEND_API_KEY
+            self.enabled = True
+            logger.info("Resend email service initialized")
+        else:
+            self.enabled = False
+            logger.warning("RESEND_API_KEY not configured - email features disabled")
+    
+    async def send_match_invitation(self, to_email: str, inviter_name: str, venue_suggestion: str) -> bool:
+        """Send match invitation email"""
+        if not self.enabled:
+            logger.warning("Email service disabled - match invitation not sent")
+            return False
+        
+        try:
+            email_data = {
+                "from": "WingmanMatch <matches@wingmanmatch.com>",
+                "to": [to_email],
+                "subject": f"🎯 New Wingman Match with {inviter_name}",
+                "html": self._get_match_invitation_template(inviter_name, venue_suggestion)
+            }
+            
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Match invitation queued for {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue match invitation to {to_email}: {e}")
+            return False
+    
+    async def send_match_acceptance(self, to_email: str, accepter_name: str, venue_name: str, scheduled_time: str) -> bool:
+        """Send match acceptance notification"""
+        if not self.enabled:
+            logger.warning("Email service disabled - match acceptance not sent")
+            return False
+        
+        try:
+            email_data = {
+                "from": "WingmanMatch <matches@wingmanmatch.com>",
+                "to": [to_email],
+                "subject": f"🎉 {accepter_name} accepted your wingman match!",
+                "html": self._get_match_acceptance_template(accepter_name, venue_name, scheduled_time)
+            }
+            
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Match acceptance queued for {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue match acceptance to {to_email}: {e}")
+            return False
+    
+    async def send_match_decline(self, to_email: str, decliner_name: str) -> bool:
+        """Send match decline notification"""
+        if not self.enabled:
+            logger.warning("Email service disabled - match decline not sent")
+            return False
+        
+        try:
+            email_data = {
+                "from": "WingmanMatch <matches@wingmanmatch.com>",
+                "to": [to_email],
+                "subject": "Match update from WingmanMatch",
+                "html": self._get_match_decline_template(decliner_name)
+            }
+            
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Match decline queued for {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue match decline to {to_email}: {e}")
+            return False
+    
+    async def send_session_reminder(self, to_email: str, partner_name: str, venue_name: str, scheduled_time: str) -> bool:
+        """Send session reminder email"""
+        if not self.enabled:
+            logger.warning("Email service disabled - session reminder not sent")
+            return False
+        
+        try:
+            email_data = {
+                "from": "WingmanMatch <matches@wingmanmatch.com>",
+                "to": [to_email],
+                "subject": f"⏰ Wingman session with {partner_name} tomorrow",
+                "html": self._get_session_reminder_template(partner_name, venue_name, scheduled_time)
+            }
+            
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Session reminder queued for {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue session reminder to {to_email}: {e}")
+            return False
+    
+    def _get_match_invitation_template(self, inviter_name: str, venue_suggestion: str) -> str:
+        """HTML template for match invitation"""
+        return MATCH_INVITATION_HTML.render({"inviter_name": inviter_name, "venue_suggestion": venue_suggestion})
+    
+    def _get_match_acceptance_template(self, accepter_name: str, venue_name: str, scheduled_time: str) -> str:
+        """HTML template for match acceptance"""
+        return MATCH_ACCEPTANCE_HTML.render({"accepter_name": accepter_name, "venue_name": venue_name, "scheduled_time": scheduled_time})
+    
+    def _get_match_decline_template(self, decliner_name: str) -> str:
+        """HTML template for match decline"""
+        return MATCH_DECLINE_HTML.render({"decliner_name": decliner_name})
+    
+    def _get_session_reminder_template(self, partner_name: str, venue_name: str, scheduled_time: str) -> str:
+        """HTML template for session reminder"""
+        return SESSION_REMINDER_HTML.render({"partner_name": partner_name, "venue_name": venue_name, "scheduled_time": scheduled_time})
+    
+    async def send_session_scheduled(self, to_email: str, user_name: str, venue_name: str, scheduled_time: str) -> bool:
+        """Send session scheduled confirmation email"""
+        if not self.enabled:
+            logger.warning("Email service disabled - session scheduled notification not sent")
+            return False
+        
+        try:
+            email_data = {
+                "from": "WingmanMatch <sessions@wingmanmatch.com>",
+                "to": [to_email],
+                "subject": f"🎯 Wingman Session Scheduled at {venue_name}",
+                "html": self._get_session_scheduled_template(user_name, venue_name, scheduled_time)
+            }
+            
+            await email_outbox.enqueue(email_data)
+            logger.info(f"Session scheduled notification queued for {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue session scheduled notification to {to_email}: {e}")
+            return False
+    
+    def _get_session_scheduled_template(self, user_name: str, venue_name: str, scheduled_time: str) -> str:
+        """HTML template for session scheduled notification"""
+        return SESSION_SCHEDULED_HTML.render({"user_name": user_name, "venue_name": venue_name, "scheduled_time": scheduled_time})
 
 # Global email service instance
 email_service = EmailService()
\ No newline at end of file
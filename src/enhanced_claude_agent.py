@@ -25,7 +25,7 @@ from anthropic import AsyncAnthropic
 
 # Import existing app modules (keeping all app logic)
 from src.simple_memory import SimpleMemory
-from src.prompts import main_prompt
+from src.prompts import main_prompt, cached_text_block
 from src.config import Config
 from src.context_formatter import format_static_context_for_caching, get_cache_control_header
 
@@ -33,6 +33,7 @@ from src.context_formatter import format_static_context_for_caching, get_cache_c
 from src.model_router import model_router, get_optimal_model, ModelRoutingDecision
 from src.memory_compressor import memory_compressor, compress_messages, CompressionStrategy
 from src.redis_client import redis_service
+from src.observability.metrics_collector import record_prompt_cache_metric
 
 # Set up logging first
 logging.basicConfig(
@@ -196,7 +197,7 @@ async def get_cached_response(cache_key: str) -> Optional[str]:
         Cached response or None if not found
     """
     try:
-        if await redis_service.health_check():
+        if redis_service.is_available():
             cached_data = await redis_service.get_cache(cache_key)
             if cached_data and isinstance(cached_data, dict):
                 response = cached_data.get("response")
@@ -218,7 +219,7 @@ async def cache_response(cache_key: str, response: str, ttl: int = 300) -> None:
         ttl: Time to live in seconds
     """
     try:
-        if await redis_service.health_check():
+        if redis_service.is_available():
             cache_data = {
                 "response": response,
                 "cached_at": datetime.now().isoformat(),
@@ -345,6 +346,9 @@ async def interact_with_agent_optimized(
             user_id, user_timezone, memory
         )
         
+        # Persona/archetype prompt is static per archetype - mark it for prompt caching
+        system_blocks = [cached_text_block(system_prompt, Config.ENABLE_PROMPT_CACHING)]
+        
         # Get model configuration from routing decision
         model_config = model_router.get_model_config(routing_decision.tier)
         
@@ -359,7 +363,7 @@ async def interact_with_agent_optimized(
                 max_tokens=max_tokens,
                 temperature=temperature,
                 extra_headers=cache_headers,  # Include cache headers
-                system=system_prompt,  # Use personalized system prompt
+                system=system_blocks,  # Use personalized system prompt
                 messages=chat_messages
             )
             
@@ -379,6 +383,7 @@ async def interact_with_agent_optimized(
                 if hasattr(response.usage, 'cache_creation_input_tokens'):
                     logger.info(f"Cache usage: creation={response.usage.cache_creation_input_tokens}, "
                               f"read={response.usage.cache_read_input_tokens}")
+                await record_prompt_cache_metric("agent_optimized", response.usage)
             
             # Cache the response for future identical requests
             await cache_response(cache_key, assistant_response, ttl=300)  # 5 minutes
@@ -396,7 +401,7 @@ async def interact_with_agent_optimized(
                     model="claude-3-5-sonnet-20241022",
                     max_tokens=4000,
                     temperature=base_temperature,
-                    system=system_prompt,
+                    system=system_blocks,
                     messages=chat_messages
                 )
                 
@@ -498,6 +503,9 @@ async def interact_with_agent_stream_optimized(
             user_id, user_timezone, memory
         )
         
+        # Persona/archetype prompt is static per archetype - mark it for prompt caching
+        system_blocks = [cached_text_block(system_prompt, Config.ENABLE_PROMPT_CACHING)]
+        
         # Get model configuration from routing decision
         model_config = model_router.get_model_config(routing_decision.tier)
         
@@ -512,13 +520,15 @@ async def interact_with_agent_stream_optimized(
                 max_tokens=max_tokens,
                 temperature=temperature,
                 extra_headers=cache_headers,  # Include cache headers
-                system=system_prompt,  # Use personalized system prompt
+                system=system_blocks,  # Use personalized system prompt
                 messages=chat_messages,
                 stream=True
             )
             
             # Stream the response
             async for event in stream:
+                if getattr(event, 'type', None) == 'message_start':
+                    await record_prompt_cache_metric("agent_stream_optimized", getattr(getattr(event, 'message', None), 'usage', None))
                 if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
                     yield event.delta.text
                     
@@ -533,7 +543,7 @@ async def interact_with_agent_stream_optimized(
                         model="claude-3-5-sonnet-20241022",
                         max_tokens=4000,
                         temperature=base_temperature,
-                        system=system_prompt,
+                        system=system_blocks,
                         messages=chat_messages,
                         stream=True
                     )
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Shared Anthropic client for WingmanMatch
+
+One pooled AsyncAnthropic client per process, used by the coach and the agents
+so every Claude call reuses warm HTTP connections instead of opening a new
+client per request. Retries and circuit breaking come from the "anthropic"
+policy in src.retry_policies, so the SDK's own retries are turned off to avoid
+multiplying attempts.
+"""
+
+import logging
+from typing import Any, AsyncGenerator, Optional
+
+import httpx
+from anthropic import AsyncAnthropic
+
+from src.config import Config
+from src.retry_policies import execute_with_retry
+
+logger = logging.getLogger(__name__)
+
+_anthropic_client: Optional[AsyncAnthropic] = None
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """Get or create the shared Anthropic client (singleton pattern)"""
+    global _anthropic_client
+    if _anthropic_client is None:
+        _anthropic_client = AsyncAnthropic(
+            api_key=Config.ANTHROPIC_API_KEY,
+            max_retries=0,
+            timeout=Config.ANTHROPIC_TIMEOUT_SECONDS,
+            http_client=httpx.AsyncClient(
+                timeout=Config.ANTHROPIC_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=Config.ANTHROPIC_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.ANTHROPIC_MAX_CONNECTIONS
+                )
+            )
+        )
+        logger.info(f"Anthropic client initialized (pool size {Config.ANTHROPIC_MAX_CONNECTIONS})")
+    return _anthropic_client
+
+async def create_message(**kwargs) -> Any:
+    """
+    Call messages.create on the shared client with retry and circuit breaker
+
+    Args:
+        **kwargs: Arguments for messages.create (model, messages, system, ...)
+
+    Returns:
+        Anthropic Message response
+    """
+    client = get_anthropic_client()
+    return await execute_with_retry(lambda: client.messages.create(**kwargs), service="anthropic")
+
+async def stream_message_text(**kwargs) -> AsyncGenerator[str, None]:
+    """
+    Stream response text from the shared client
+
+    Opening the stream is retried; once text has been yielded a failure is
+    raised to the caller rather than replayed.
+
+    Args:
+        **kwargs: Arguments for messages.create (model, messages, system, ...)
+
+    Yields:
+        Text deltas as they arrive
+    """
+    stream = await create_message(stream=True, **kwargs)
+    async for event in stream:
+        if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
+            yield event.delta.text
+
+async def close_anthropic_client() -> None:
+    """Close the shared client's connection pool (application shutdown)"""
+    global _anthropic_client
+    if _anthropic_client is not None:
+        await _anthropic_client.close()
+        _anthropic_client = None
+        logger.info("Anthropic client closed")
@@ -17,7 +17,10 @@ import time
 # Performance Infrastructure Imports
 from src.redis_client import redis_service
 from src.observability.metrics_collector import metrics_collector, record_request_metric, record_database_metric, record_cache_metric
+from src.middleware.request_pipeline import RequestPipelineMiddleware
+from src.cache_middleware import response_cache, invalidate_cache_type
 from src.db.connection_pool import db_pool
+from src.db.async_client import execute_async, shutdown_executor
 from src.model_router import model_router, get_optimal_model
 
 @asynccontextmanager
@@ -50,6 +53,7 @@ async def lifespan(app: FastAPI):
         # 3. Initialize Metrics Collection
         if Config.ENABLE_PERFORMANCE_MONITORING:
             metrics_collector.enable_collection()
+            metrics_collector.start_flush_task()
             logger.info("Performance metrics collection enabled")
         else:
             logger.info("Performance monitoring disabled")
@@ -72,6 +76,10 @@ async def lifespan(app: FastAPI):
         # Initialize email service
         from src.email_templates import email_service
         logger.info(f"Email service enabled: {email_service.enabled}")
+        if email_service.enabled:
+            from src.email_outbox import email_outbox
+            email_outbox.start_dispatcher()
+            logger.info("Email outbox dispatcher started")
         
         # Log feature flags
         feature_flags = Config.get_feature_flags()
@@ -100,6 +108,10 @@ async def lifespan(app: FastAPI):
     try:
         logger.info("Shutting down performance infrastructure...")
         
+        # Stop sending queued emails; undelivered ones stay in the outbox stream
+        from src.email_outbox import email_outbox
+        await email_outbox.stop_dispatcher()
+        
         # Close Performance Infrastructure
         # 1. Close Redis service
         await redis_service.close()
@@ -110,8 +122,14 @@ async def lifespan(app: FastAPI):
             await db_pool.close()
             logger.info("Database connection pool closed")
         
-        # 3. Cleanup metrics
+        # Release Supabase I/O threads and the shared Anthropic connection pool
+        shutdown_executor()
+        from src.llm_client import close_anthropic_client
+        await close_anthropic_client()
+        
+        # 3. Flush pending aggregates and cleanup metrics
         if Config.ENABLE_PERFORMANCE_MONITORING:
+            await metrics_collector.stop_flush_task()
             await metrics_collector.cleanup_old_metrics(hours=24)
             logger.info("Metrics cleanup completed")
         
@@ -158,6 +176,11 @@ ALLOWED_ORIGINS = [
     "http://127.0.0.1:8000",         # Alternative localhost
 ]
 
+# Single-pass request pipeline: rate limiting, response cache, timing, metrics
+# and access logging. Added before CORS so CORS stays the outermost layer and
+# adds its headers to cached responses for each request's own Origin.
+app.add_middleware(RequestPipelineMiddleware, response_cache=response_cache)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -179,62 +202,6 @@ app.add_middleware(
     allow_origin_regex=r"https://[^.]+\.herokuapp\.com"  # Additional regex for Heroku domains
 )
 
-# Performance Monitoring Middleware
-@app.middleware("http")
-async def performance_monitoring_middleware(request: Request, call_next):
-    """
-    Performance monitoring middleware for tracking request metrics, caching, and optimization.
-    
-    Tracks:
-    - Request timing (P95 latency)
-    - Cache hit/miss rates  
-    - Database query performance
-    - API endpoint usage patterns
-    """
-    start_time = time.time()
-    endpoint = request.url.path
-    method = request.method
-    
-    try:
-        # Process request
-        response = await call_next(request)
-        
-        # Calculate metrics
-        duration_ms = (time.time() - start_time) * 1000
-        status_code = response.status_code
-        
-        # Record performance metrics if monitoring enabled
-        if Config.ENABLE_PERFORMANCE_MONITORING:
-            await record_request_metric(
-                endpoint=f"{method} {endpoint}",
-                duration_ms=duration_ms,
-                status_code=status_code
-            )
-        
-        # Add performance headers for debugging
-        response.headers["X-Response-Time"] = f"{duration_ms:.2f}ms"
-        response.headers["X-Cache-Status"] = getattr(request.state, 'cache_status', 'miss')
-        
-        # Log slow requests
-        if duration_ms > 2000:  # > 2 seconds
-            logger.warning(f"Slow request: {method} {endpoint} took {duration_ms:.2f}ms")
-        
-        return response
-        
-    except Exception as e:
-        # Record error metrics
-        duration_ms = (time.time() - start_time) * 1000
-        
-        if Config.ENABLE_PERFORMANCE_MONITORING:
-            await record_request_metric(
-                endpoint=f"{method} {endpoint}",
-                duration_ms=duration_ms,
-                status_code=500
-            )
-        
-        logger.error(f"Request error: {method} {endpoint} - {str(e)}")
-        raise
-
 # Pydantic models for API requests/responses
 class HealthResponse(BaseModel):
     status: str
@@ -621,9 +588,9 @@ async def get_cache_statistics():
             source="redis"
         )
         
-        # Calculate hit rates
-        hits = len([m for m in cache_metrics if m.tags.get("hit") == "True"])
-        total = len(cache_metrics)
+        # Calculate hit rates (each entry aggregates a minute of samples)
+        hits = sum(m.metadata["count"] for m in cache_metrics if m.tags.get("hit") == "True")
+        total = sum(m.metadata["count"] for m in cache_metrics)
         hit_rate = (hits / total * 100) if total > 0 else 0
         
         # Get Redis specific stats
@@ -706,11 +673,10 @@ async def start_confidence_assessment(request: ConfidenceAssessmentRequest, back
         if is_complete:
             try:
                 # Query the confidence_test_results table for final results
-                result_query = db_client.table('confidence_test_results')\
+                result_query = await execute_async(db_client.table('confidence_test_results')\
                     .select('*')\
                     .eq('user_id', request.user_id)\
-                    .limit(1)\
-                    .execute()
+                    .limit(1))
                 
                 if result_query.data:
                     result_data = result_query.data[0]
@@ -744,11 +710,10 @@ async def get_confidence_results(user_id: str):
         db_client = SupabaseFactory.get_service_client()
         
         # Query confidence_test_results table
-        result = db_client.table('confidence_test_results')\
+        result = await execute_async(db_client.table('confidence_test_results')\
             .select('*')\
             .eq('user_id', user_id)\
-            .limit(1)\
-            .execute()
+            .limit(1))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="No assessment results found for this user")
@@ -780,12 +745,11 @@ async def get_confidence_progress(user_id: str):
         db_client = SupabaseFactory.get_service_client()
         
         # Query confidence_test_progress table
-        result = db_client.table('confidence_test_progress')\
+        result = await execute_async(db_client.table('confidence_test_progress')\
             .select('*')\
             .eq('user_id', user_id)\
             .order('created_at', desc=True)\
-            .limit(1)\
-            .execute()
+            .limit(1))
         
         if not result.data:
             # Return default progress if no record exists
@@ -829,10 +793,9 @@ async def reset_confidence_assessment(user_id: str):
         db_client = SupabaseFactory.get_service_client()
         
         # Delete progress record
-        progress_result = db_client.table('confidence_test_progress')\
+        progress_result = await execute_async(db_client.table('confidence_test_progress')\
             .delete()\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
         
         # Optionally clear incomplete results (keep completed ones)
         # We'll only clear progress, not final results
@@ -927,10 +890,9 @@ async def complete_user_profile(request: ProfileCompleteRequest):
         if request.photo_url:
             profile_update_data["photo_url"] = request.photo_url
         
-        profile_result = db_client.table('user_profiles')\
+        profile_result = await execute_async(db_client.table('user_profiles')\
             .update(profile_update_data)\
-            .eq('id', request.user_id)\
-            .execute()
+            .eq('id', request.user_id))
         
         if not profile_result.data:
             raise HTTPException(
@@ -965,9 +927,8 @@ async def complete_user_profile(request: ProfileCompleteRequest):
                 )
         
         # Upsert location data (insert or update if exists)
-        location_result = db_client.table('user_locations')\
-            .upsert(location_data, on_conflict="user_id")\
-            .execute()
+        location_result = await execute_async(db_client.table('user_locations')\
+            .upsert(location_data, on_conflict="user_id"))
         
         if not location_result.data:
             raise HTTPException(
@@ -975,6 +936,21 @@ async def complete_user_profile(request: ProfileCompleteRequest):
                 detail="Failed to update user location data"
             )
         
+        # Keep the in-process candidate index current for buddy searches
+        from src.db.geo_index import candidate_index
+        updated_profile = profile_result.data[0]
+        candidate_index.update_location(
+            user_id=request.user_id,
+            lat=location_data.get("lat"),
+            lng=location_data.get("lng"),
+            city=location_data.get("city"),
+            experience_level=updated_profile.get("experience_level"),
+            confidence_archetype=updated_profile.get("confidence_archetype")
+        )
+        
+        from src.coaching_context_cache import coaching_context_cache
+        await coaching_context_cache.update_section(request.user_id, 'user_profile', updated_profile)
+
         logger.info(f"Profile completion successful for user {request.user_id}")
         
         return ProfileCompleteResponse(
@@ -1066,11 +1042,10 @@ async def test_login(request: TestAuthRequest):
         # Check if user profile exists in our database
         existing_profile = None
         try:
-            profile_query = admin_client.table('user_profiles')\
+            profile_query = await execute_async(admin_client.table('user_profiles')\
                 .select('id, email')\
                 .eq('id', user_id)\
-                .limit(1)\
-                .execute()
+                .limit(1))
             
             if profile_query.data:
                 existing_profile = profile_query.data[0]
@@ -1089,13 +1064,12 @@ async def test_login(request: TestAuthRequest):
                 await memory.ensure_user_profile(user_id)
                 
                 # Update the profile with test user information
-                profile_update = admin_client.table('user_profiles')\
+                profile_update = await execute_async(admin_client.table('user_profiles')\
                     .update({
                         "email": request.email,
                         "updated_at": datetime.now(timezone.utc).isoformat()
                     })\
-                    .eq('id', user_id)\
-                    .execute()
+                    .eq('id', user_id))
                 
                 logger.info(f"🧪 TEST AUTH: Successfully created test user profile {user_id}")
                 
@@ -1180,7 +1154,6 @@ async def send_email_endpoint(email_request: EmailRequest):
     """Send email using template"""
     try:
         from src.email_service import email_service, EmailTemplate, EmailPriority
-        from src.retry_policies import with_email_retry
         
         # Convert string template name to enum
         try:
@@ -1194,22 +1167,18 @@ async def send_email_endpoint(email_request: EmailRequest):
         except ValueError:
             priority = EmailPriority.NORMAL
         
-        # Send email with retry logic
-        @with_email_retry()
-        async def send_with_retry():
-            return await email_service.send_email(
-                email_request.to_email,
-                template,
-                email_request.variables,
-                priority
-            )
-        
-        success = await send_with_retry()
+        # Queue the email; the outbox dispatcher delivers it with retries
+        success = await email_service.send_email(
+            email_request.to_email,
+            template,
+            email_request.variables,
+            priority
+        )
         
         if success:
             return EmailResponse(
                 success=True,
-                message="Email sent successfully",
+                message="Email queued for delivery",
                 email_id=f"wingman_{int(time.time())}"
             )
         else:
@@ -1227,6 +1196,7 @@ async def get_email_service_status():
     """Get detailed email service status"""
     from src.email_service import email_service
     from src.email_templates import email_service as template_service
+    from src.email_outbox import email_outbox
     
     # Get status from both email services
     main_status = email_service.get_service_status()
@@ -1239,6 +1209,7 @@ async def get_email_service_status():
     enhanced_status = {
         **main_status,
         "template_service": template_status,
+        "outbox": await email_outbox.get_status(),
         "configuration": {
             "resend_api_key_set": bool(Config.RESEND_API_KEY),
             "development_mode": Config.DEVELOPMENT_MODE,
@@ -1407,55 +1378,6 @@ async def get_user_status(user_id: str):
         logger.error(f"Error fetching user status: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch user status")
 
-# Middleware for rate limiting and request logging
-@app.middleware("http")
-async def rate_limit_and_log_middleware(request: Request, call_next):
-    """Middleware for rate limiting and request logging"""
-    start_time = time.time()
-    
-    # Apply rate limiting to all requests
-    try:
-        from src.rate_limiter import rate_limiter
-        
-        # Extract user_id from request if available (from headers or query params)
-        user_id = request.headers.get("X-User-ID") or request.query_params.get("user_id")
-        
-        # Check rate limits
-        allowed, rate_info = await rate_limiter.check_rate_limit(request, user_id=user_id)
-        
-        if not allowed:
-            from fastapi.responses import JSONResponse
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "error": "Rate limit exceeded",
-                    "message": f"Too many requests for {rate_info.get('limit_type', 'unknown')} limit",
-                    "retry_after": rate_info.get("reset_time", 0) - int(time.time()),
-                    "limit_info": rate_info
-                },
-                headers={
-                    "X-RateLimit-Limit": str(rate_info.get("limit", "unknown")),
-                    "X-RateLimit-Remaining": str(rate_info.get("remaining", 0)),
-                    "X-RateLimit-Reset": str(rate_info.get("reset_time", 0)),
-                    "Retry-After": str(max(1, rate_info.get("reset_time", 0) - int(time.time())))
-                }
-            )
-    except Exception as e:
-        # If rate limiting fails, log error but don't block request
-        logger.error(f"Rate limiting error (allowing request): {str(e)}")
-    
-    # Request logging
-    if Config.ENABLE_DETAILED_LOGGING:
-        logger.debug(f"Request: {request.method} {request.url.path}")
-        logger.debug(f"Headers: {dict(request.headers)}")
-    
-    response = await call_next(request)
-    
-    process_time = time.time() - start_time
-    logger.info(f"{request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
-    
-    return response
-
 # Claude Agent (Connell Barrett) Coaching Endpoints
 
 class CoachingRequest(BaseModel):
@@ -1561,19 +1483,28 @@ async def coach_chat_stream(request: CoachingRequest):
         raise HTTPException(status_code=503, detail="AI coaching is currently disabled")
     
     try:
-        from src.claude_agent import interact_with_coach_stream, store_coaching_conversation
+        from src.claude_agent import (
+            interact_with_coach_stream, store_coaching_conversation,
+            prefetch_user_context, CoachingStreamTimings
+        )
         import uuid
         
         # Generate thread_id if not provided
         thread_id = request.thread_id or str(uuid.uuid4())
         
+        # Start loading context now rather than when the response body starts
+        timings = CoachingStreamTimings()
+        context_task = prefetch_user_context(request.user_id, thread_id)
+        
         async def generate_response():
             full_response = ""
             
             async for chunk in interact_with_coach_stream(
                 user_input=request.message,
                 user_id=request.user_id,
-                thread_id=thread_id
+                thread_id=thread_id,
+                context=context_task,
+                timings=timings
             ):
                 full_response += chunk
                 yield f"data: {json.dumps({'chunk': chunk, 'thread_id': thread_id})}\\n\\n"
@@ -1586,8 +1517,8 @@ async def coach_chat_stream(request: CoachingRequest):
                 coach_response=full_response
             )
             
-            # Send completion signal
-            yield f"data: {json.dumps({'done': True, 'thread_id': thread_id})}\\n\\n"
+            # Send completion signal with the per-stage timings (ms)
+            yield f"data: {json.dumps({'done': True, 'thread_id': thread_id, 'timings': timings.stages})}\\n\\n"
         
         return StreamingResponse(
             generate_response(),
@@ -1671,7 +1602,12 @@ async def get_coaching_challenges(
 
 @app.get("/api/challenges")
 async def get_challenges(difficulty: Optional[str] = None, request: Request = None):
-    """Get approach challenges with optional difficulty filter and Redis caching"""
+    """
+    Get approach challenges with optional difficulty filter
+    
+    Responses are cached by the response cache middleware (1 hour, keyed by
+    query string) and invalidated through /api/challenges/cache/invalidate.
+    """
     start_time = time.time()
     
     try:
@@ -1681,23 +1617,6 @@ async def get_challenges(difficulty: Optional[str] = None, request: Request = No
         if not Config.ENABLE_CHALLENGES_CATALOG:
             raise HTTPException(status_code=503, detail="Challenges catalog is currently disabled")
         
-        # Create cache key based on parameters
-        cache_key = f"challenges:all" if not difficulty else f"challenges:difficulty:{difficulty}"
-        
-        # Check Redis cache first (30-minute TTL for challenges)
-        cached_data = await get_cached_data(cache_key, ttl_seconds=1800)  # 30 minutes
-        if cached_data:
-            if request:
-                request.state.cache_status = 'hit'
-            await record_cache_metric("challenges_get", hit=True)
-            logger.debug(f"Cache hit for {cache_key}")
-            return cached_data
-        
-        if request:
-            request.state.cache_status = 'miss'
-        await record_cache_metric("challenges_get", hit=False)
-        logger.debug(f"Cache miss for {cache_key} - fetching from database")
-        
         # Fetch from database with performance monitoring
         db_start = time.time()
         db = SupabaseFactory.get_service_client()
@@ -1711,7 +1630,7 @@ async def get_challenges(difficulty: Optional[str] = None, request: Request = No
             query = query.eq('difficulty', difficulty)
         
         # Execute query
-        result = query.execute()
+        result = await execute_async(query)
         db_duration = (time.time() - db_start) * 1000
         
         # Record database performance
@@ -1738,11 +1657,6 @@ async def get_challenges(difficulty: Optional[str] = None, request: Request = No
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        # Cache the result in Redis (30-minute TTL)
-        cache_success = await set_cached_data(cache_key, response_data, ttl_seconds=1800)
-        if cache_success:
-            logger.debug(f"Cached challenges data for key: {cache_key}")
-        
         # Record total request performance
         total_duration = (time.time() - start_time) * 1000
         if Config.ENABLE_PERFORMANCE_MONITORING:
@@ -1761,8 +1675,11 @@ async def invalidate_challenges_cache_endpoint():
     """Manually invalidate challenges cache for admin use"""
     try:
         from src.redis_session import invalidate_challenges_cache
+        from src.claude_agent import invalidate_challenge_catalog
         
         success = await invalidate_challenges_cache()
+        invalidate_challenge_catalog()
+        await invalidate_cache_type("challenges")
         
         return {
             "success": success,
@@ -1830,6 +1747,14 @@ class BuddyMatchRequest(BaseModel):
     """Request model for finding buddy matches"""
     radius_miles: int = Field(default=20, ge=1, le=100, description="Search radius in miles")
 
+class ReputationResponse(BaseModel):
+    """Response model for user reputation data"""
+    score: int = Field(..., description="Reputation score (-5 to 20)", ge=-5, le=20)
+    completed_sessions: int = Field(..., description="Number of completed sessions", ge=0)
+    no_shows: int = Field(..., description="Number of no-show sessions", ge=0)
+    badge_color: str = Field(..., description="Badge color based on score", pattern="^(gold|green|red)$")
+    cache_timestamp: str = Field(..., description="ISO timestamp when data was cached")
+
 class BuddyCandidateResponse(BaseModel):
     """Response model for buddy candidate"""
     user_id: str
@@ -1837,6 +1762,7 @@ class BuddyCandidateResponse(BaseModel):
     distance_miles: float
     experience_level: str
     confidence_archetype: str
+    reputation: Optional[ReputationResponse] = None
 
 class BuddyMatchResponse(BaseModel):
     """Response model for buddy matching"""
@@ -1853,6 +1779,26 @@ class AutoMatchResponse(BaseModel):
     buddy_user_id: Optional[str] = None
     buddy_profile: Optional[Dict[str, Any]] = None
 
+class BatchMatchRequest(BaseModel):
+    """Request model for batch wingman matching"""
+    user_ids: Optional[List[str]] = Field(None, max_length=10000, description="Users to match")
+    city: Optional[str] = Field(None, min_length=1, description="Match every located user in this city")
+    radius_miles: int = Field(default=25, ge=1, le=100, description="Maximum distance between buddies")
+
+class BatchMatchPair(BaseModel):
+    """A wingman match created by batch matching"""
+    match_id: str
+    user1_id: str
+    user2_id: str
+
+class BatchMatchResponse(BaseModel):
+    """Response model for batch wingman matching"""
+    success: bool
+    message: str
+    matches: List[BatchMatchPair] = []
+    unmatched_user_ids: List[str] = []
+    stats: Dict[str, Any] = {}
+
 # Chat Models
 class ChatMessage(BaseModel):
     """Model for a single chat message"""
@@ -1987,13 +1933,14 @@ class SessionConfirmCompletionResponse(BaseModel):
     reputation_updated: bool = Field(..., description="Whether reputation counters were updated")
     session_status: str = Field(..., description="Updated session status")
 
-class ReputationResponse(BaseModel):
-    """Response model for user reputation data"""
-    score: int = Field(..., description="Reputation score (-5 to 20)", ge=-5, le=20)
-    completed_sessions: int = Field(..., description="Number of completed sessions", ge=0)
-    no_shows: int = Field(..., description="Number of no-show sessions", ge=0)
-    badge_color: str = Field(..., description="Badge color based on score", pattern="^(gold|green|red)$")
-    cache_timestamp: str = Field(..., description="ISO timestamp when data was cached")
+class ReputationBatchRequest(BaseModel):
+    """Request model for fetching reputation for many users"""
+    user_ids: List[str] = Field(..., min_length=1, max_length=200, description="UUIDs of the users")
+    use_cache: bool = Field(default=True, description="Whether to use Redis cache")
+
+class ReputationBatchResponse(BaseModel):
+    """Response model for batch reputation data"""
+    reputations: Dict[str, ReputationResponse] = Field(..., description="Reputation keyed by user ID")
 
 # Dating Goals Pydantic Models
 class DatingGoalsRequest(BaseModel):
@@ -2023,10 +1970,13 @@ class DatingGoalsDataResponse(BaseModel):
     updated_at: Optional[str] = Field(None, description="When goals were last updated (ISO format)")
 
 @app.get("/api/matches/candidates/{user_id}", response_model=BuddyMatchResponse)
-async def find_buddy_candidates(user_id: str, radius_miles: int = 20):
+async def find_buddy_candidates(user_id: str, radius_miles: int = 20, include_reputation: bool = False):
     """
     Find buddy candidates within specified radius of user's location
     Simple endpoint for finding potential wingman partners
+    
+    With include_reputation, each candidate carries its reputation badge data,
+    fetched for the whole list in one batch
     """
     try:
         from src.db.distance import find_candidates_within_radius
@@ -2050,6 +2000,19 @@ async def find_buddy_candidates(user_id: str, radius_miles: int = 20):
             for candidate in candidates
         ]
         
+        if include_reputation and candidate_responses:
+            try:
+                from src.services.reputation_service import reputation_service
+                
+                reputations = await reputation_service.get_reputations(
+                    [candidate.user_id for candidate in candidate_responses]
+                )
+                for candidate in candidate_responses:
+                    candidate.reputation = ReputationResponse(**reputations[candidate.user_id].to_dict())
+            except Exception as e:
+                # Badges are optional; still return the candidates
+                logger.warning(f"Could not attach reputation to candidates for user {user_id}: {str(e)}")
+        
         return BuddyMatchResponse(
             success=True,
             message=f"Found {len(candidates)} candidates within {radius_miles} miles",
@@ -2139,6 +2102,50 @@ async def create_auto_match(user_id: str, radius_miles: int = 25):
             buddy_profile=None
         )
 
+@app.post("/api/matches/batch", response_model=BatchMatchResponse)
+async def create_batch_matches(request: BatchMatchRequest):
+    """
+    Create wingman matches for many users in one pass
+    
+    Used for city launches instead of calling /api/matches/auto per user:
+    - Builds the compatibility graph once (radius, experience level, recency)
+    - Skips users that already hold a pending match
+    - Greedy closest-first pairing so two users never claim the same buddy
+    - Inserts all match records in one bulk write and reports throughput
+    """
+    try:
+        from src.services.wingman_matcher import WingmanMatcher
+        from src.database import SupabaseFactory
+        
+        if not request.user_ids and not request.city:
+            raise HTTPException(status_code=400, detail="Provide user_ids or city")
+        
+        client = SupabaseFactory.get_service_client()
+        matcher = WingmanMatcher(client)
+        
+        result = await matcher.create_batch_matches(
+            user_ids=request.user_ids,
+            city=request.city,
+            max_radius_miles=request.radius_miles
+        )
+        
+        return BatchMatchResponse(
+            success=result["success"],
+            message=result["message"],
+            matches=[BatchMatchPair(**match) for match in result["matches"]],
+            unmatched_user_ids=result["unmatched_user_ids"],
+            stats=result["stats"]
+        )
+        
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
+    except Exception as e:
+        logger.error(f"Error running batch matching: {str(e)}")
+        return BatchMatchResponse(
+            success=False,
+            message=f"Unable to run batch matching: {str(e)}"
+        )
+
 # User Reputation Endpoints
 @app.get("/api/user/reputation/{user_id}", response_model=ReputationResponse)
 async def get_user_reputation(user_id: str, use_cache: bool = True):
@@ -2182,6 +2189,36 @@ async def get_user_reputation(user_id: str, use_cache: bool = True):
         logger.error(f"Error fetching reputation for user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch user reputation: {str(e)}")
 
+@app.post("/api/user/reputation/batch", response_model=ReputationBatchResponse)
+async def get_user_reputations(request_body: ReputationBatchRequest):
+    """
+    Get reputation for many users in one request
+    
+    For lists such as buddy candidates or matches: cache hits are served with
+    one Redis MGET and all misses are read in one database query
+    
+    Returns:
+        ReputationBatchResponse with reputation keyed by user ID
+    """
+    try:
+        from src.services.reputation_service import reputation_service
+        
+        reputations = await reputation_service.get_reputations(request_body.user_ids, request_body.use_cache)
+        
+        return ReputationBatchResponse(
+            reputations={
+                user_id: ReputationResponse(**reputation_data.to_dict())
+                for user_id, reputation_data in reputations.items()
+            }
+        )
+        
+    except ValueError as e:
+        logger.warning(f"Invalid user_id in reputation batch: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"Invalid user ID format: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error fetching reputation for {len(request_body.user_ids)} users: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user reputations: {str(e)}")
+
 @app.post("/api/user/reputation/cache/invalidate/{user_id}")
 async def invalidate_user_reputation_cache(user_id: str):
     """
@@ -2222,6 +2259,27 @@ async def invalidate_all_reputation_cache():
         logger.error(f"Error invalidating all reputation cache: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to invalidate cache: {str(e)}")
 
+@app.post("/api/user/reputation/reconcile")
+async def reconcile_reputation_counters(repair: bool = True):
+    """
+    Recompute reputation from session history and compare with the stored counters
+    Admin endpoint for detecting (and by default repairing) counter drift
+    """
+    try:
+        from src.services.reputation_service import reputation_service
+        
+        result = await reputation_service.reconcile_counters(repair=repair)
+        
+        return {
+            "success": True,
+            "message": f"Reputation counters drifted for {result['drifted']} users",
+            **result
+        }
+        
+    except Exception as e:
+        logger.error(f"Error reconciling reputation counters: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to reconcile reputation: {str(e)}")
+
 # Chat Endpoints
 @app.get("/api/chat/messages/{match_id}", response_model=ChatMessagesResponse)
 async def get_chat_messages(match_id: str, request: Request, cursor: Optional[str] = None, limit: int = 50):
@@ -2241,7 +2299,7 @@ async def get_chat_messages(match_id: str, request: Request, cursor: Optional[st
         db_client = SupabaseFactory.get_service_client()
         
         # Verify user is participant in this match
-        match_check = db_client.table('wingman_matches').select('user1_id, user2_id').eq('id', match_id).execute()
+        match_check = await execute_async(db_client.table('wingman_matches').select('user1_id, user2_id').eq('id', match_id))
         if not match_check.data:
             raise HTTPException(status_code=404, detail="Match not found")
         
@@ -2260,7 +2318,7 @@ async def get_chat_messages(match_id: str, request: Request, cursor: Optional[st
         query = query.order('created_at', desc=True).limit(min(limit, 100))
         
         # Execute query
-        result = query.execute()
+        result = await execute_async(query)
         messages = result.data
         
         # Reverse to get chronological order
@@ -2329,7 +2387,7 @@ async def send_message(request: SendMessageRequest, http_request: Request):
         db_client = SupabaseFactory.get_service_client()
         
         # Verify user is participant in this match
-        match_check = db_client.table('wingman_matches').select('user1_id, user2_id').eq('id', request.match_id).execute()
+        match_check = await execute_async(db_client.table('wingman_matches').select('user1_id, user2_id').eq('id', request.match_id))
         if not match_check.data:
             raise HTTPException(status_code=404, detail="Match not found")
         
@@ -2348,7 +2406,7 @@ async def send_message(request: SendMessageRequest, http_request: Request):
             'message_text': sanitized_message
         }
         
-        result = db_client.table('chat_messages').insert(message_data).execute()
+        result = await execute_async(db_client.table('chat_messages').insert(message_data))
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to send message")
         
@@ -2363,7 +2421,7 @@ async def send_message(request: SendMessageRequest, http_request: Request):
         }
         
         # Upsert read timestamp
-        db_client.table('chat_read_timestamps').upsert(timestamp_data).execute()
+        await execute_async(db_client.table('chat_read_timestamps').upsert(timestamp_data))
         
         return SendMessageResponse(
             success=True,
@@ -2409,10 +2467,9 @@ async def respond_to_buddy_match(request: MatchResponseRequest):
         matcher = WingmanMatcher(db_client)
         
         # Validate user is participant in the match
-        match_check = db_client.table('wingman_matches')\
+        match_check = await execute_async(db_client.table('wingman_matches')\
             .select('user1_id, user2_id, status')\
-            .eq('id', request.match_id)\
-            .execute()
+            .eq('id', request.match_id))
         
         if not match_check.data:
             raise HTTPException(status_code=404, detail="Match not found")
@@ -2433,17 +2490,16 @@ async def respond_to_buddy_match(request: MatchResponseRequest):
         # Handle the response based on action
         if request.action == "accept":
             # Update match status to accepted
-            db_client.table('wingman_matches')\
+            await execute_async(db_client.table('wingman_matches')\
                 .update({"status": "accepted"})\
-                .eq('id', request.match_id)\
-                .execute()
+                .eq('id', request.match_id))
             
             # Send email notifications to both users
             if email_service:
                 try:
                     # Get user profiles for email
-                    user1_profile = db_client.table('user_profiles').select('email').eq('id', user1_id).execute()
-                    user2_profile = db_client.table('user_profiles').select('email').eq('id', user2_id).execute()
+                    user1_profile = await execute_async(db_client.table('user_profiles').select('email').eq('id', user1_id))
+                    user2_profile = await execute_async(db_client.table('user_profiles').select('email').eq('id', user2_id))
                     
                     if user1_profile.data and user2_profile.data:
                         user1_email = user1_profile.data[0]['email']
@@ -2467,10 +2523,9 @@ async def respond_to_buddy_match(request: MatchResponseRequest):
             
         else:  # decline
             # Update match status to declined
-            db_client.table('wingman_matches')\
+            await execute_async(db_client.table('wingman_matches')\
                 .update({"status": "declined"})\
-                .eq('id', request.match_id)\
-                .execute()
+                .eq('id', request.match_id))
             
             # Find next match for the user
             next_match_result = await matcher.create_automatic_match(request.user_id, radius_miles=25)
@@ -2527,10 +2582,9 @@ async def create_wingman_session(request: SessionCreateRequest):
         db_client = SupabaseFactory.get_service_client()
         
         # Validate match exists and status is accepted
-        match_check = db_client.table('wingman_matches')\
+        match_check = await execute_async(db_client.table('wingman_matches')\
             .select('id, user1_id, user2_id, status')\
-            .eq('id', request.match_id)\
-            .execute()
+            .eq('id', request.match_id))
         
         if not match_check.data:
             raise HTTPException(status_code=404, detail="Match not found")
@@ -2543,10 +2597,9 @@ async def create_wingman_session(request: SessionCreateRequest):
             )
         
         # Validate challenges exist
-        challenge_check = db_client.table('approach_challenges')\
+        challenge_check = await execute_async(db_client.table('approach_challenges')\
             .select('id')\
-            .in_('id', [str(request.user1_challenge_id), str(request.user2_challenge_id)])\
-            .execute()
+            .in_('id', [str(request.user1_challenge_id), str(request.user2_challenge_id)]))
         
         if len(challenge_check.data) != 2:
             raise HTTPException(
@@ -2555,11 +2608,10 @@ async def create_wingman_session(request: SessionCreateRequest):
             )
         
         # Check for existing active sessions for this match
-        existing_sessions = db_client.table('wingman_sessions')\
+        existing_sessions = await execute_async(db_client.table('wingman_sessions')\
             .select('id, status')\
             .eq('match_id', request.match_id)\
-            .in_('status', ['scheduled', 'in_progress'])\
-            .execute()
+            .in_('status', ['scheduled', 'in_progress']))
         
         if existing_sessions.data:
             raise HTTPException(
@@ -2584,9 +2636,8 @@ async def create_wingman_session(request: SessionCreateRequest):
             "status": "scheduled"
         }
         
-        session_result = db_client.table('wingman_sessions')\
-            .insert(session_data)\
-            .execute()
+        session_result = await execute_async(db_client.table('wingman_sessions')\
+            .insert(session_data))
         
         if not session_result.data:
             raise HTTPException(status_code=500, detail="Failed to create session")
@@ -2599,10 +2650,9 @@ async def create_wingman_session(request: SessionCreateRequest):
         
         try:
             # Get user profiles for email notifications
-            user_profiles = db_client.table('user_profiles')\
+            user_profiles = await execute_async(db_client.table('user_profiles')\
                 .select('id, email, first_name')\
-                .in_('id', [match_data['user1_id'], match_data['user2_id']])\
-                .execute()
+                .in_('id', [match_data['user1_id'], match_data['user2_id']]))
             
             if len(user_profiles.data) == 2:
                 # Create chat system message
@@ -2614,9 +2664,8 @@ async def create_wingman_session(request: SessionCreateRequest):
                 }
                 
                 # Insert system message into chat
-                db_client.table('chat_messages')\
-                    .insert(system_message)\
-                    .execute()
+                await execute_async(db_client.table('chat_messages')\
+                    .insert(system_message))
                 
                 # Send email notifications if service is available
                 if email_service and email_service.enabled:
@@ -2685,10 +2734,9 @@ async def get_session_data(session_id: str, request: Request):
         db_client = SupabaseFactory.get_service_client()
         
         # Fetch session with match data
-        session_query = db_client.table('wingman_sessions')\
+        session_query = await execute_async(db_client.table('wingman_sessions')\
             .select('*, wingman_matches!inner(user1_id, user2_id)')\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not session_query.data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -2705,19 +2753,17 @@ async def get_session_data(session_id: str, request: Request):
             )
         
         # Get participant profiles
-        profiles_query = db_client.table('user_profiles')\
+        profiles_query = await execute_async(db_client.table('user_profiles')\
             .select('id, first_name')\
-            .in_('id', participant_ids)\
-            .execute()
+            .in_('id', participant_ids))
         
         profiles_by_id = {profile['id']: profile for profile in profiles_query.data}
         
         # Get challenge data
         challenge_ids = [session_data['user1_challenge_id'], session_data['user2_challenge_id']]
-        challenges_query = db_client.table('approach_challenges')\
+        challenges_query = await execute_async(db_client.table('approach_challenges')\
             .select('id, title, description, points, difficulty')\
-            .in_('id', challenge_ids)\
-            .execute()
+            .in_('id', challenge_ids))
         
         challenges_by_id = {challenge['id']: challenge for challenge in challenges_query.data}
         
@@ -2816,10 +2862,9 @@ async def confirm_buddy_completion(session_id: str, request_body: SessionConfirm
         db_client = SupabaseFactory.get_service_client()
         
         # Fetch session with match data
-        session_query = db_client.table('wingman_sessions')\
+        session_query = await execute_async(db_client.table('wingman_sessions')\
             .select('*, wingman_matches!inner(user1_id, user2_id)')\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not session_query.data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -2876,10 +2921,9 @@ async def confirm_buddy_completion(session_id: str, request_body: SessionConfirm
             )
         
         # Update confirmation
-        confirmation_result = db_client.table('wingman_sessions')\
+        confirmation_result = await execute_async(db_client.table('wingman_sessions')\
             .update(update_data)\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not confirmation_result.data:
             raise HTTPException(status_code=500, detail="Failed to update confirmation")
@@ -2897,10 +2941,15 @@ async def confirm_buddy_completion(session_id: str, request_body: SessionConfirm
                 'completed_at': datetime.now(timezone.utc).isoformat()
             }
             
-            db_client.table('wingman_sessions')\
+            await execute_async(db_client.table('wingman_sessions')\
                 .update(completion_data)\
-                .eq('id', session_id)\
-                .execute()
+                .eq('id', session_id))
+            
+            # The wingman_sessions trigger updated both users' reputation counters
+            # with the status change; drop the cached copies so reads see them
+            from src.services.reputation_service import reputation_service
+            for participant_id in participant_ids:
+                await reputation_service.invalidate_user_cache(participant_id)
             
             session_status = 'completed'
             message = "Session marked as completed! Both participants have confirmed each other's challenges."
@@ -2953,10 +3002,9 @@ async def update_session_notes(session_id: str, request_body: SessionNotesReques
         db_client = SupabaseFactory.get_service_client()
         
         # Fetch session with match data
-        session_query = db_client.table('wingman_sessions')\
+        session_query = await execute_async(db_client.table('wingman_sessions')\
             .select('*, wingman_matches!inner(user1_id, user2_id)')\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not session_query.data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -2987,10 +3035,9 @@ async def update_session_notes(session_id: str, request_body: SessionNotesReques
             'notes': sanitized_notes
         }
         
-        update_result = db_client.table('wingman_sessions')\
+        update_result = await execute_async(db_client.table('wingman_sessions')\
             .update(update_data)\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not update_result.data:
             raise HTTPException(status_code=500, detail="Failed to update session notes")
@@ -3042,10 +3089,9 @@ async def confirm_session_completion(request_body: SessionConfirmCompletionReque
         db_client = SupabaseFactory.get_service_client()
         
         # Fetch session with match data
-        session_query = db_client.table('wingman_sessions')\
+        session_query = await execute_async(db_client.table('wingman_sessions')\
             .select('*, wingman_matches!inner(user1_id, user2_id)')\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not session_query.data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -3099,10 +3145,9 @@ async def confirm_session_completion(request_body: SessionConfirmCompletionReque
             )
         
         # Update confirmation flag
-        confirmation_result = db_client.table('wingman_sessions')\
+        confirmation_result = await execute_async(db_client.table('wingman_sessions')\
             .update(update_data)\
-            .eq('id', session_id)\
-            .execute()
+            .eq('id', session_id))
         
         if not confirmation_result.data:
             raise HTTPException(status_code=500, detail="Failed to update confirmation")
@@ -3124,20 +3169,24 @@ async def confirm_session_completion(request_body: SessionConfirmCompletionReque
                 'completed_at': datetime.now(timezone.utc).isoformat()
             }
             
-            db_client.table('wingman_sessions')\
+            await execute_async(db_client.table('wingman_sessions')\
                 .update(completion_data)\
-                .eq('id', session_id)\
-                .execute()
+                .eq('id', session_id))
+            
+            # The wingman_sessions trigger updated both users' reputation counters
+            # with the status change; drop the cached copies so reads see them
+            from src.services.reputation_service import reputation_service
+            for participant_id in participant_ids:
+                await reputation_service.invalidate_user_cache(participant_id)
             
             # Update reputation counters for both users in the match using SQL increment
             match_id = session_data['match_id']
             
             try:
                 # Get current reputation values and increment them
-                current_match_result = db_client.table('wingman_matches')\
+                current_match_result = await execute_async(db_client.table('wingman_matches')\
                     .select('user1_reputation, user2_reputation')\
-                    .eq('id', match_id)\
-                    .execute()
+                    .eq('id', match_id))
                 
                 if current_match_result.data:
                     current_match = current_match_result.data[0]
@@ -3145,13 +3194,12 @@ async def confirm_session_completion(request_body: SessionConfirmCompletionReque
                     new_user2_reputation = current_match['user2_reputation'] + 1
                     
                     # Update both reputation counters atomically
-                    update_reputation_result = db_client.table('wingman_matches')\
+                    update_reputation_result = await execute_async(db_client.table('wingman_matches')\
                         .update({
                             'user1_reputation': new_user1_reputation,
                             'user2_reputation': new_user2_reputation
                         })\
-                        .eq('id', match_id)\
-                        .execute()
+                        .eq('id', match_id))
                     
                     if update_reputation_result.data:
                         reputation_updated = True
@@ -3277,6 +3325,11 @@ async def process_dating_goals(request: DatingGoalsRequest):
         completion_percentage = progress.get('completion_percentage', 0.0)
         is_complete = progress.get('is_completed', False)
         
+        # Completing the flow writes dating_goals, so the coach reloads them
+        if is_complete:
+            from src.coaching_context_cache import coaching_context_cache
+            await coaching_context_cache.invalidate_section(request.user_id, 'dating_goals')
+        
         # Determine current topic number for frontend display
         topic_number = None
         if current_step >= 2 and current_step <= 5:
@@ -3319,10 +3372,9 @@ async def get_dating_goals(user_id: str):
             raise HTTPException(status_code=400, detail="Invalid user_id format")
         
         # Fetch dating goals from database
-        result = supabase.table('dating_goals')\
+        result = await execute_async(supabase.table('dating_goals')\
             .select('*')\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
         
         if not result.data:
             return DatingGoalsDataResponse(
@@ -3377,16 +3429,17 @@ async def reset_dating_goals(user_id: str):
             raise HTTPException(status_code=400, detail="Invalid user_id format")
         
         # Delete dating goals progress
-        supabase.table('dating_goals_progress')\
+        await execute_async(supabase.table('dating_goals_progress')\
             .delete()\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
         
         # Delete dating goals data
-        supabase.table('dating_goals')\
+        await execute_async(supabase.table('dating_goals')\
             .delete()\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
+        
+        from src.coaching_context_cache import coaching_context_cache
+        await coaching_context_cache.update_section(user_id, 'dating_goals', None)
         
         logger.info(f"Successfully reset dating goals for user {user_id}")
         
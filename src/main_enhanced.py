@@ -166,7 +166,7 @@ async def is_cache_valid(user_id: str) -> bool:
     """Check if cached data is still valid using Redis first, then fallback"""
     try:
         # Try Redis first
-        if await redis_service.health_check():
+        if redis_service.is_available():
             cached_data = await redis_service.get_cache(f"project_cache:{user_id}")
             if cached_data:
                 return True
@@ -184,7 +184,7 @@ async def get_cached_project_data(user_id: str) -> Optional[Dict]:
     """Get cached project data with Redis priority"""
     try:
         # Try Redis first
-        if await redis_service.health_check():
+        if redis_service.is_available():
             cached_data = await redis_service.get_cache(f"project_cache:{user_id}")
             if cached_data:
                 logger.debug(f"Redis cache HIT for project data: {user_id}")
@@ -205,7 +205,7 @@ async def cache_project_data(user_id: str, data: Dict):
     """Cache project data with Redis and memory fallback"""
     try:
         # Cache in Redis with TTL
-        if await redis_service.health_check():
+        if redis_service.is_available():
             await redis_service.set_cache(
                 f"project_cache:{user_id}", 
                 data, 
@@ -11,6 +11,8 @@ from fastapi import Request, Response
 from fastapi.responses import JSONResponse
 import json
 
+from src.observability.metrics_collector import get_route_label
+
 logger = logging.getLogger(__name__)
 
 class PerformanceMiddleware:
@@ -57,6 +59,7 @@ class PerformanceMiddleware:
                 
                 # Update request data
                 request_data.update({
+                    "route": get_route_label(scope),
                     "duration_ms": round(duration * 1000, 2),
                     "status_code": status_code,
                     "response_size": self._get_response_size(headers),
@@ -127,10 +130,10 @@ class PerformanceMiddleware:
             status = metric["status_code"]
             status_codes[status] = status_codes.get(status, 0) + 1
         
-        # Endpoint performance
+        # Endpoint performance, keyed by route template so the set stays bounded
         endpoints = {}
         for metric in recent_metrics:
-            path = metric["path"]
+            path = metric["route"]
             if path not in endpoints:
                 endpoints[path] = {
                     "count": 0,
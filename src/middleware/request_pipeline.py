@@ -0,0 +1,141 @@
+"""
+Request Pipeline Middleware for WingmanMatch
+Single-pass ASGI middleware for timing, rate limiting, response caching and access logging
+"""
+
+import logging
+import time
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.cache_middleware import ResponseCache
+from src.config import Config
+from src.observability.metrics_collector import get_route_label, record_request_metric
+from src.rate_limiter import RateLimiter, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+class RequestPipelineMiddleware:
+    """
+    Pure ASGI middleware that handles every cross-cutting request concern in one pass.
+
+    Replaces stacked @app.middleware("http") layers, each of which is a
+    BaseHTTPMiddleware that wraps the request and response again. Here the
+    ASGI send callable is wrapped once, and response bodies (including
+    streams) are passed straight through.
+
+    Order per request: rate limit check, cache lookup, app, timing headers,
+    request metric and access log.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        response_cache: Optional[ResponseCache] = None,
+        limiter: Optional[RateLimiter] = None
+    ):
+        self.app = app
+        self.response_cache = response_cache
+        self.rate_limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request = Request(scope, receive)
+
+        rejection = await self._check_rate_limit(request)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            self._log_request(request, rejection.status_code, start_time)
+            return
+
+        if Config.ENABLE_DETAILED_LOGGING:
+            logger.debug(f"Request: {request.method} {request.url.path}")
+            logger.debug(f"Headers: {dict(request.headers)}")
+
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Response-Time"] = f"{(time.perf_counter() - start_time) * 1000:.2f}ms"
+                headers["X-Cache-Status"] = scope.get("state", {}).get("cache_status", "miss")
+            await send(message)
+
+        try:
+            if self.response_cache:
+                await self.response_cache.run(self.app, scope, receive, send_with_timing)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            logger.error(f"Request error: {request.method} {request.url.path} - {str(e)}")
+            await self._record_request(scope, request, 500, start_time)
+            raise
+
+        await self._record_request(scope, request, status_code, start_time)
+        self._log_request(request, status_code, start_time)
+
+    async def _check_rate_limit(self, request: Request) -> Optional[JSONResponse]:
+        """
+        Check rate limits for the request.
+
+        Returns:
+            429 response if the request is over a limit, None otherwise
+        """
+        try:
+            # Extract user_id from request if available (from headers or query params)
+            user_id = request.headers.get("X-User-ID") or request.query_params.get("user_id")
+
+            allowed, rate_info = await self.rate_limiter.check_rate_limit(request, user_id=user_id)
+            if allowed:
+                return None
+
+            retry_after = rate_info.get("reset_time", 0) - int(time.time())
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "error": "Rate limit exceeded",
+                    "message": f"Too many requests for {rate_info.get('limit_type', 'unknown')} limit",
+                    "retry_after": retry_after,
+                    "limit_info": rate_info
+                },
+                headers={
+                    "X-RateLimit-Limit": str(rate_info.get("limit", "unknown")),
+                    "X-RateLimit-Remaining": str(rate_info.get("remaining", 0)),
+                    "X-RateLimit-Reset": str(rate_info.get("reset_time", 0)),
+                    "Retry-After": str(max(1, retry_after))
+                }
+            )
+        except Exception as e:
+            # If rate limiting fails, log error but don't block request
+            logger.error(f"Rate limiting error (allowing request): {str(e)}")
+            return None
+
+    async def _record_request(self, scope: Scope, request: Request, status_code: int, start_time: float) -> None:
+        """Record the request metric under its route template"""
+        duration_ms = (time.perf_counter() - start_time) * 1000
+
+        if Config.ENABLE_PERFORMANCE_MONITORING:
+            await record_request_metric(
+                endpoint=f"{request.method} {get_route_label(scope)}",
+                duration_ms=duration_ms,
+                status_code=status_code
+            )
+
+        # Log slow requests
+        if duration_ms > 2000:  # > 2 seconds
+            logger.warning(f"Slow request: {request.method} {request.url.path} took {duration_ms:.2f}ms")
+
+    def _log_request(self, request: Request, status_code: int, start_time: float) -> None:
+        """Write the access log line"""
+        process_time = time.perf_counter() - start_time
+        logger.info(f"{request.method} {request.url.path} - {status_code} - {process_time:.3f}s")
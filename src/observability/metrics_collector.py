@@ -1,19 +1,41 @@
 """
 Metrics Collection System for WingmanMatch
 Real-time performance metrics with percentile calculations and time-series storage
+
+Samples are aggregated in process (count, sum, min, max and a quantile sketch
+per metric series and minute) and flushed to Redis in one pipeline on a
+background interval, so recording a metric never touches the network.
+Percentiles come from merging sketches, so summaries cost O(buckets) and
+combine every worker's data.
 """
 
 import asyncio
 import logging
 import time
-from typing import Dict, Any, List, Optional
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 from dataclasses import dataclass, asdict
-import json
+from src.observability.quantile_sketch import QuantileSketch
 from src.redis_session import RedisSession
 
 logger = logging.getLogger(__name__)
 
+# Labels for requests that matched no route, and for names past the per-type cap
+UNMATCHED_ROUTE_LABEL = "<unmatched>"
+OVERFLOW_LABEL = "<other>"
+
+# Characters with meaning in stored series fields ("name|k=v,k=v|stat"), escaped as %XX
+_LABEL_ESCAPES = {"%": "%25", "|": "%7C", ",": "%2C", "=": "%3D"}
+
+def _escape_label(value: Any) -> str:
+    return "".join(_LABEL_ESCAPES.get(char, char) for char in str(value))
+
+def _unescape_label(value: str) -> str:
+    for char, escaped in reversed(list(_LABEL_ESCAPES.items())):
+        value = value.replace(escaped, char)
+    return value
+
 @dataclass
 class PerformanceMetric:
     """Performance metric data structure"""
@@ -25,14 +47,91 @@ class PerformanceMetric:
     tags: Dict[str, str]
     metadata: Optional[Dict[str, Any]] = None
 
+class MetricAggregate:
+    """Count, sum, min, max and quantile sketch of one metric series"""
+    
+    __slots__ = ("unit", "count", "total", "min", "max", "sketch")
+    
+    def __init__(self, unit: str):
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sketch = QuantileSketch()
+    
+    def add(self, value: float):
+        """Add one sample"""
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+    
+    def merge(self, other: "MetricAggregate"):
+        """Merge another aggregate of the same series into this one"""
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+    
+    def to_fields(self, prefix: str) -> Dict[str, float]:
+        """Hash fields (counters) for storing this aggregate in Redis"""
+        fields = {f"{prefix}|count": self.count, f"{prefix}|sum": self.total}
+        if self.sketch.zero_count:
+            fields[f"{prefix}|z"] = self.sketch.zero_count
+        for key, count in self.sketch.bins.items():
+            fields[f"{prefix}|k{key}"] = count
+        return fields
+    
+    @classmethod
+    def from_fields(cls, stats: Dict[str, str]) -> "MetricAggregate":
+        """Rebuild an aggregate from stored hash fields (min/max are sketch estimates)"""
+        aggregate = cls(stats.get("unit", "ms"))
+        aggregate.count = int(stats.get("count", 0))
+        aggregate.total = float(stats.get("sum", 0))
+        for stat, value in stats.items():
+            if stat == "z":
+                aggregate.sketch.add(0, int(value))
+            elif stat.startswith("k"):
+                aggregate.sketch.bins[int(stat[1:])] = int(value)
+                aggregate.sketch.count += int(value)
+        if aggregate.sketch.count:
+            aggregate.min = aggregate.sketch.quantile(0)
+            aggregate.max = aggregate.sketch.quantile(1)
+        return aggregate
+    
+    def percentiles(self, percentiles: List[int] = [50, 95, 99]) -> Dict[str, float]:
+        """Percentile estimates from the sketch"""
+        estimates = self.sketch.quantiles([p / 100.0 for p in percentiles])
+        return {f"p{p}": estimates[p / 100.0] for p in percentiles}
+
 class MetricsCollector:
     """Real-time metrics collection with percentile calculation"""
     
     def __init__(self):
-        self.metrics: List[PerformanceMetric] = []
         self.max_memory_metrics = 5000
+        self.metrics: Deque[PerformanceMetric] = deque(maxlen=self.max_memory_metrics)
         self.collection_enabled = True
-        self.redis_cache_ttl = 3600  # 1 hour
+        self.redis_cache_ttl = 86400  # 24 hours, the longest summary window
+        
+        # In-process aggregation flushed to Redis in batches
+        self.aggregation_bucket_seconds = 60
+        self.flush_interval_seconds = 10
+        self.max_pending_series = 5000
+        self._pending: Dict[Tuple[str, str, str, int], MetricAggregate] = {}
+        # Local per-minute aggregates, used for summaries when Redis is unavailable
+        self.local_history_seconds = 3600
+        self._recent: Dict[Tuple[str, str, str, int], MetricAggregate] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.dropped_samples = 0
+        
+        # Bounded label set: names beyond the cap are recorded under OVERFLOW_LABEL
+        self.max_names_per_type = 200
+        self._names: Dict[str, set] = {}
         
     async def record_metric(self, 
                           metric_type: str,
@@ -41,62 +140,159 @@ class MetricsCollector:
                           unit: str = "ms",
                           tags: Optional[Dict[str, str]] = None,
                           metadata: Optional[Dict[str, Any]] = None):
-        """Record a performance metric"""
+        """Record a performance metric (in memory only; Redis is written by flush)"""
         if not self.collection_enabled:
             return
         
+        tags = tags or {}
+        name = self._bounded_name(metric_type, name)
         metric = PerformanceMetric(
             timestamp=datetime.now(timezone.utc),
             metric_type=metric_type,
             name=name,
             value=value,
             unit=unit,
-            tags=tags or {},
+            tags=tags,
             metadata=metadata
         )
         
         self.metrics.append(metric)
         
-        # Store in Redis for persistence
-        await self._store_metric_in_redis(metric)
+        # Aggregate per series and time bucket
+        bucket_start = int(time.time()) // self.aggregation_bucket_seconds * self.aggregation_bucket_seconds
+        series_key = (metric_type, name, self._format_tags(tags), bucket_start)
+        
+        pending = self._pending.get(series_key)
+        if pending is None:
+            if len(self._pending) >= self.max_pending_series:
+                self.dropped_samples += 1
+                return
+            pending = self._pending[series_key] = MetricAggregate(unit)
+        pending.add(value)
         
-        # Clean up old metrics from memory
-        if len(self.metrics) > self.max_memory_metrics:
-            self.metrics = self.metrics[-self.max_memory_metrics:]
+        recent = self._recent.get(series_key)
+        if recent is None:
+            recent = self._recent[series_key] = MetricAggregate(unit)
+        recent.add(value)
+    
+    def _bounded_name(self, metric_type: str, name: str) -> str:
+        """Return name, or OVERFLOW_LABEL once metric_type has max_names_per_type names"""
+        names = self._names.setdefault(metric_type, set())
+        if name in names:
+            return name
+        if len(names) >= self.max_names_per_type:
+            return OVERFLOW_LABEL
+        names.add(name)
+        return name
     
-    async def _store_metric_in_redis(self, metric: PerformanceMetric):
-        """Store metric in Redis for persistence"""
+    @staticmethod
+    def _format_tags(tags: Dict[str, str]) -> str:
+        """Format tags as a stable key=value,... string (separators in keys and values are escaped)"""
+        return ",".join(f"{_escape_label(key)}={_escape_label(value)}" for key, value in sorted(tags.items()))
+    
+    @staticmethod
+    def _parse_tags(tag_string: str) -> Dict[str, str]:
+        """Parse a string produced by _format_tags"""
+        return {
+            _unescape_label(key): _unescape_label(value)
+            for key, value in (pair.split("=", 1) for pair in tag_string.split(",") if pair)
+        }
+    
+    async def flush(self) -> int:
+        """
+        Write pending aggregates to Redis in a single pipeline.
+        
+        Each time bucket is one hash per metric type, so Redis writes are bounded
+        by the number of series rather than the number of samples.
+        
+        Aggregates that could not be written are merged back into the pending
+        set and retried on the next flush.
+        
+        Returns:
+            Number of series written
+        """
+        self._prune_recent()
+        
+        if not self._pending:
+            return 0
+        
+        pending, self._pending = self._pending, {}
+        
         try:
             redis_client = await RedisSession.get_client()
             if not redis_client:
-                return
+                self._restore_pending(pending)
+                return 0
             
-            # Create metric key with timestamp for time-series storage
-            metric_key = f"metrics:{metric.metric_type}:{metric.name}:{int(metric.timestamp.timestamp())}"
+            pipe = redis_client.pipeline(transaction=False)
+            bucket_keys = set()
+            metric_types = set()
             
-            # Store metric data
-            metric_data = {
-                "timestamp": metric.timestamp.isoformat(),
-                "value": metric.value,
-                "unit": metric.unit,
-                "tags": metric.tags,
-                "metadata": metric.metadata
-            }
+            # Sketches merge by adding bin counts, so HINCRBY merges workers
+            for (metric_type, name, tag_string, bucket_start), aggregate in pending.items():
+                bucket_key = f"metrics_agg:{metric_type}:{bucket_start}"
+                series = f"{_escape_label(name)}|{tag_string}"
+                
+                pipe.hset(bucket_key, f"{series}|unit", aggregate.unit)
+                for field, value in aggregate.to_fields(series).items():
+                    if field.endswith("|sum"):
+                        pipe.hincrbyfloat(bucket_key, field, value)
+                    else:
+                        pipe.hincrby(bucket_key, field, value)
+                bucket_keys.add(bucket_key)
+                metric_types.add(metric_type)
             
-            await redis_client.setex(
-                metric_key,
-                self.redis_cache_ttl,
-                json.dumps(metric_data)
-            )
+            for bucket_key in bucket_keys:
+                pipe.expire(bucket_key, self.redis_cache_ttl)
+            pipe.sadd("metrics_agg:types", *metric_types)
+            pipe.expire("metrics_agg:types", self.redis_cache_ttl)
             
-            # Add to sorted set for time-based queries
-            await redis_client.zadd(
-                f"metrics_index:{metric.metric_type}:{metric.name}",
-                {metric_key: metric.timestamp.timestamp()}
-            )
+            await pipe.execute()
+            return len(pending)
             
         except Exception as e:
-            logger.error(f"Failed to store metric in Redis: {e}")
+            logger.error(f"Failed to flush metrics to Redis: {e}")
+            self._restore_pending(pending)
+            return 0
+    
+    def _restore_pending(self, pending: Dict[Tuple[str, str, str, int], MetricAggregate]):
+        """Merge unflushed aggregates back into _pending, dropping series beyond max_pending_series"""
+        for series_key, aggregate in pending.items():
+            current = self._pending.get(series_key)
+            if current is not None:
+                current.merge(aggregate)
+            elif len(self._pending) < self.max_pending_series:
+                self._pending[series_key] = aggregate
+            else:
+                self.dropped_samples += aggregate.count
+    
+    def _prune_recent(self):
+        """Drop local aggregates older than local_history_seconds"""
+        cutoff = int(time.time()) - self.local_history_seconds
+        for series_key in [key for key in self._recent if key[3] < cutoff]:
+            del self._recent[series_key]
+    
+    def start_flush_task(self):
+        """Start the background flush loop (call from a running event loop)"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop_flush_task(self):
+        """Stop the background flush loop and flush what is pending"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+    
+    async def _flush_loop(self):
+        """Flush aggregates every flush_interval_seconds"""
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
     
     async def get_metrics(self, 
                          metric_type: Optional[str] = None,
@@ -122,44 +318,77 @@ class MetricsCollector:
         
         return filtered_metrics
     
+    async def _read_redis_buckets(self,
+                                  metric_types: List[str],
+                                  hours: int) -> List[Tuple[str, int, str, str, MetricAggregate]]:
+        """
+        Read aggregated buckets for the given metric types in one pipeline.
+        
+        Returns:
+            List of (metric_type, bucket_start, name, tag_string, aggregate)
+        """
+        redis_client = await RedisSession.get_client()
+        if not redis_client:
+            return []
+        
+        bucket_seconds = self.aggregation_bucket_seconds
+        now = int(time.time())
+        first_bucket = (now - hours * 3600) // bucket_seconds * bucket_seconds
+        bucket_starts = list(range(first_bucket, now + 1, bucket_seconds))
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for metric_type in metric_types:
+            for bucket_start in bucket_starts:
+                pipe.hgetall(f"metrics_agg:{metric_type}:{bucket_start}")
+        buckets = iter(await pipe.execute())
+        
+        results = []
+        for metric_type in metric_types:
+            for bucket_start in bucket_starts:
+                series_stats: Dict[str, Dict[str, str]] = {}
+                for field, value in next(buckets).items():
+                    series, stat = field.rsplit("|", 1)
+                    series_stats.setdefault(series, {})[stat] = value
+                
+                for series, stats in series_stats.items():
+                    name, tag_string = series.split("|", 1)
+                    aggregate = MetricAggregate.from_fields(stats)
+                    if aggregate.count:
+                        results.append((metric_type, bucket_start, _unescape_label(name), tag_string, aggregate))
+        
+        return results
+    
     async def _get_metrics_from_redis(self, 
                                     metric_type: Optional[str],
                                     name: Optional[str],
                                     hours: int) -> List[PerformanceMetric]:
-        """Get metrics from Redis storage"""
+        """
+        Get aggregated metrics from Redis storage.
+        
+        Returns one metric per series and time bucket; value is the bucket mean
+        and metadata holds count, sum and percentiles.
+        """
         try:
-            redis_client = await RedisSession.get_client()
-            if not redis_client:
+            if not metric_type:
                 return []
             
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-            cutoff_timestamp = cutoff_time.timestamp()
-            
             metrics = []
-            
-            if metric_type and name:
-                # Get specific metric
-                index_key = f"metrics_index:{metric_type}:{name}"
-                metric_keys = await redis_client.zrangebyscore(
-                    index_key,
-                    cutoff_timestamp,
-                    "+inf"
-                )
-                
-                for key in metric_keys:
-                    metric_data = await redis_client.get(key)
-                    if metric_data:
-                        data = json.loads(metric_data)
-                        metric = PerformanceMetric(
-                            timestamp=datetime.fromisoformat(data["timestamp"]),
-                            metric_type=metric_type,
-                            name=name,
-                            value=data["value"],
-                            unit=data["unit"],
-                            tags=data["tags"],
-                            metadata=data["metadata"]
-                        )
-                        metrics.append(metric)
+            for _, bucket_start, series_name, tag_string, aggregate in await self._read_redis_buckets([metric_type], hours):
+                if name and series_name != name:
+                    continue
+                metrics.append(PerformanceMetric(
+                    timestamp=datetime.fromtimestamp(bucket_start, timezone.utc),
+                    metric_type=metric_type,
+                    name=series_name,
+                    value=aggregate.total / aggregate.count,
+                    unit=aggregate.unit,
+                    tags=self._parse_tags(tag_string),
+                    metadata={
+                        "count": aggregate.count,
+                        "sum": aggregate.total,
+                        "percentiles": aggregate.percentiles()
+                    }
+                ))
             
             return metrics
             
@@ -167,69 +396,77 @@ class MetricsCollector:
             logger.error(f"Failed to get metrics from Redis: {e}")
             return []
     
-    def calculate_percentiles(self, 
-                            values: List[float],
-                            percentiles: List[int] = [50, 95, 99]) -> Dict[str, float]:
-        """Calculate percentiles for a list of values"""
-        if not values:
-            return {f"p{p}": 0.0 for p in percentiles}
-        
-        sorted_values = sorted(values)
-        result = {}
-        
-        for p in percentiles:
-            index = int(len(sorted_values) * (p / 100.0))
-            if index >= len(sorted_values):
-                index = len(sorted_values) - 1
-            result[f"p{p}"] = sorted_values[index]
-        
-        return result
+    async def get_aggregates(self, hours: int = 1) -> Tuple[Dict[str, Dict[str, MetricAggregate]], str]:
+        """
+        Get merged aggregates per metric type and name for a time window.
+        
+        Uses every worker's flushed buckets from Redis plus this worker's
+        unflushed samples; falls back to this worker's local history without
+        Redis.
+        
+        Returns:
+            Tuple of ({metric_type: {name: aggregate}}, scope) where scope is
+            "cluster" or "local"
+        """
+        merged: Dict[str, Dict[str, MetricAggregate]] = {}
+        
+        def merge(metric_type: str, name: str, aggregate: MetricAggregate):
+            by_name = merged.setdefault(metric_type, {})
+            if name not in by_name:
+                by_name[name] = MetricAggregate(aggregate.unit)
+            by_name[name].merge(aggregate)
+        
+        try:
+            redis_client = await RedisSession.get_client()
+            if redis_client:
+                metric_types = sorted(await redis_client.smembers("metrics_agg:types"))
+                for metric_type, _, name, _, aggregate in await self._read_redis_buckets(metric_types, hours):
+                    merge(metric_type, name, aggregate)
+                for (metric_type, name, _, _), aggregate in self._pending.items():
+                    merge(metric_type, name, aggregate)
+                return merged, "cluster"
+        except Exception as e:
+            logger.error(f"Failed to read aggregated metrics from Redis: {e}")
+            merged = {}
+        
+        cutoff = int(time.time()) - hours * 3600
+        for (metric_type, name, _, bucket_start), aggregate in self._recent.items():
+            if bucket_start + self.aggregation_bucket_seconds > cutoff:
+                merge(metric_type, name, aggregate)
+        return merged, "local"
     
     async def get_performance_summary(self, hours: int = 1) -> Dict[str, Any]:
         """Get comprehensive performance summary"""
-        metrics = await self.get_metrics(hours=hours)
+        aggregates, scope = await self.get_aggregates(hours=hours)
         
         summary = {
             "time_window_hours": hours,
-            "total_metrics": len(metrics),
+            "scope": scope,
+            "total_metrics": 0,
             "metric_types": {},
             "performance_insights": {}
         }
         
-        # Group metrics by type
-        metrics_by_type = {}
-        for metric in metrics:
-            if metric.metric_type not in metrics_by_type:
-                metrics_by_type[metric.metric_type] = []
-            metrics_by_type[metric.metric_type].append(metric)
-        
         # Analyze each metric type
-        for metric_type, type_metrics in metrics_by_type.items():
+        for metric_type, by_name in aggregates.items():
             type_summary = {
-                "count": len(type_metrics),
+                "count": sum(aggregate.count for aggregate in by_name.values()),
                 "metrics": {}
             }
             
-            # Group by metric name
-            metrics_by_name = {}
-            for metric in type_metrics:
-                if metric.name not in metrics_by_name:
-                    metrics_by_name[metric.name] = []
-                metrics_by_name[metric.name].append(metric.value)
-            
-            # Calculate statistics for each metric
-            for name, values in metrics_by_name.items():
-                percentiles = self.calculate_percentiles(values)
+            # Statistics for each metric come straight from its aggregate
+            for name, aggregate in by_name.items():
                 type_summary["metrics"][name] = {
-                    "count": len(values),
-                    "min": min(values),
-                    "max": max(values),
-                    "avg": sum(values) / len(values),
-                    "percentiles": percentiles,
-                    "unit": type_metrics[0].unit
+                    "count": aggregate.count,
+                    "min": aggregate.min,
+                    "max": aggregate.max,
+                    "avg": aggregate.total / aggregate.count,
+                    "percentiles": aggregate.percentiles(),
+                    "unit": aggregate.unit
                 }
             
             summary["metric_types"][metric_type] = type_summary
+            summary["total_metrics"] += type_summary["count"]
         
         # Generate performance insights
         await self._generate_performance_insights(summary)
@@ -325,7 +562,8 @@ class MetricsCollector:
             cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
             cutoff_timestamp = cutoff_time.timestamp()
             
-            # Get all metric index keys
+            # Aggregated buckets expire on their own; this clears the
+            # per-sample index left by earlier versions
             index_keys = await redis_client.keys("metrics_index:*")
             
             for index_key in index_keys:
@@ -346,6 +584,22 @@ class MetricsCollector:
 metrics_collector = MetricsCollector()
 
 # Convenience functions
+def get_route_label(scope: Dict[str, Any]) -> str:
+    """
+    Metric label for a request: the matched route template, not the raw path.
+    
+    FastAPI stores the matched route in the ASGI scope, so this must be called
+    after the request has been routed (e.g. after call_next).
+    
+    Args:
+        scope: ASGI scope of the request
+        
+    Returns:
+        Route template such as "/api/session/{session_id}", or UNMATCHED_ROUTE_LABEL
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE_LABEL
+
 async def record_request_metric(endpoint: str, duration_ms: float, status_code: int):
     """Record request performance metric"""
     await metrics_collector.record_metric(
@@ -376,6 +630,23 @@ async def record_cache_metric(operation: str, hit: bool, duration_ms: float = 0)
         tags={"hit": str(hit)}
     )
 
+async def record_prompt_cache_metric(source: str, usage: Any):
+    """Record Anthropic prompt cache read/write token counts from a response usage block"""
+    if usage is None:
+        return
+    for name, field in (
+        ("prompt_cache_read_tokens", "cache_read_input_tokens"),
+        ("prompt_cache_write_tokens", "cache_creation_input_tokens"),
+        ("prompt_uncached_input_tokens", "input_tokens")
+    ):
+        await metrics_collector.record_metric(
+            metric_type="llm",
+            name=name,
+            value=getattr(usage, field, None) or 0,
+            unit="tokens",
+            tags={"source": source}
+        )
+
 async def get_performance_summary(hours: int = 1):
     """Get performance summary"""
     return await metrics_collector.get_performance_summary(hours)
@@ -0,0 +1,78 @@
+"""
+Quantile Sketch for WingmanMatch metrics
+Mergeable streaming percentiles with bounded relative error (DDSketch)
+"""
+
+import math
+from typing import Dict, Iterable
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmic bins, so every quantile is within
+    relative_accuracy of the true value, memory depends on the range of values
+    rather than the number of samples, and two sketches merge by adding their
+    bin counts. Non-positive values are counted in a zero bin.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def key(self, value: float) -> int:
+        """Bin index for a positive value"""
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def value(self, key: int) -> float:
+        """Representative value of a bin"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        """Add a value (count times)"""
+        if value > 0:
+            key = self.key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def merge(self, other: "QuantileSketch"):
+        """Merge another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile (0 <= q <= 1)"""
+        return self.quantiles([q])[q]
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, float]:
+        """Estimate several quantiles in one pass over the bins"""
+        qs = sorted(qs)
+        result = {q: 0.0 for q in qs}
+        if not self.count:
+            return result
+
+        keys = sorted(self.bins)
+        seen = self.zero_count
+        index = 0
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self.zero_count:
+                continue
+            while index < len(keys) and seen + self.bins[keys[index]] <= rank:
+                seen += self.bins[keys[index]]
+                index += 1
+            result[q] = self.value(keys[min(index, len(keys) - 1)])
+
+        return result
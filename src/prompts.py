@@ -1,3 +1,5 @@
+from typing import Any, Dict, List
+
 # Main prompt for Claude API with context injection
 main_prompt = """You are Connell Barrett, dating confidence coach and author of "Dating Sucks But You Don't." You exist at an incredible moment - when authentic confidence is becoming the antidote to toxic pickup culture.
 
@@ -322,6 +324,41 @@ CONTEXT INTEGRATION:
     return personalized_prompt
 
 
+def get_system_prompt_blocks(base_prompt: str, archetype: int = None, context: str = "",
+                             enable_caching: bool = True) -> List[Dict[str, Any]]:
+    """
+    Build the personalized prompt as Anthropic system blocks for prompt caching.
+    
+    Same content as get_personalized_prompt, split so the static persona and the
+    per-archetype style guidance sit in front of the per-user context with
+    cache_control breakpoints. Every user shares the persona cache entry and
+    every user of an archetype shares the archetype entry; only the context
+    block is billed as fresh input on each turn.
+    
+    Args:
+        base_prompt: The main system prompt
+        archetype: User's dating confidence archetype (1-6), None for default
+        context: User context to inject
+        enable_caching: Add cache_control breakpoints to the static blocks
+        
+    Returns:
+        List of system content blocks ready for Claude API
+    """
+    blocks = [cached_text_block(base_prompt, enable_caching)]
+    if archetype and archetype in ARCHETYPE_PROMPTS:
+        blocks.append(cached_text_block(ARCHETYPE_PROMPTS[archetype], enable_caching))
+    blocks.append({"type": "text", "text": f"CONTEXT INTEGRATION:\n{context}\n"})
+    return blocks
+
+
+def cached_text_block(text: str, enable_caching: bool = True) -> Dict[str, Any]:
+    """Text content block ending in a prompt cache breakpoint"""
+    block = {"type": "text", "text": text}
+    if enable_caching:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
 def get_archetype_temperature() -> float:
     """
     Get the consistent temperature setting for all archetypes.
@@ -1,13 +1,17 @@
 """
 Rate Limiter for WingmanMatch
 
-Provides comprehensive rate limiting using token bucket algorithm with Redis backend.
-Includes IP-based and user-based limiting, configurable limits per endpoint,
-and graceful degradation when Redis is unavailable.
+Provides comprehensive rate limiting with a Redis backend. All tiers that apply
+to a request (endpoint, user, IP, global) are evaluated in a single Lua script
+call using GCRA or a sliding-window log, so a request costs one Redis round
+trip. Includes IP-based and user-based limiting, configurable limits per
+endpoint, and graceful degradation to in-memory token buckets when Redis is
+unavailable.
 """
 
 import asyncio
 import logging
+import math
 import time
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple, Union
@@ -22,6 +26,143 @@ from src.redis_client import redis_service, get_redis
 
 logger = logging.getLogger(__name__)
 
+# Evaluates every tier in one call. A request is admitted only if all tiers
+# admit it, and state is written only then, so a request rejected by one tier
+# does not use up quota in the others.
+#   KEYS: one key per tier
+#   ARGV: algorithm ("gcra" or "sliding_log"), tokens, then limit,
+#         window_seconds and burst for each tier
+# Returns allowed, remaining, retry_after and reset_after for each tier.
+MULTI_TIER_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local algorithm = ARGV[1]
+local cost = tonumber(ARGV[2])
+
+local results = {}
+local writes = {}
+local all_allowed = true
+
+for i, key in ipairs(KEYS) do
+    local base = 3 + (i - 1) * 3
+    local limit = tonumber(ARGV[base])
+    local window = tonumber(ARGV[base + 1])
+    local burst = tonumber(ARGV[base + 2])
+    local allowed = 1
+    local remaining, retry_after, reset_after
+
+    if algorithm == 'gcra' then
+        local interval = window / limit
+        local tolerance = burst * interval
+        local tat = tonumber(redis.call('GET', key)) or now
+        if tat < now then
+            tat = now
+        end
+        local new_tat = tat + cost * interval
+
+        if new_tat - now > tolerance then
+            allowed = 0
+            retry_after = new_tat - now - tolerance
+            remaining = math.max(0, math.floor((tolerance - (tat - now)) / interval))
+            reset_after = tat - now
+        else
+            retry_after = 0
+            remaining = math.floor((tolerance - (new_tat - now)) / interval)
+            reset_after = new_tat - now
+            if cost > 0 then
+                writes[#writes + 1] = {'gcra', key, new_tat}
+            end
+        end
+    else
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        local count = redis.call('ZCARD', key)
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        reset_after = oldest[2] and (tonumber(oldest[2]) + window - now) or window
+
+        if count + cost > limit then
+            allowed = 0
+            local blocking = redis.call('ZRANGE', key, count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+            retry_after = blocking[2] and (tonumber(blocking[2]) + window - now) or window
+            remaining = math.max(0, limit - count)
+        else
+            retry_after = 0
+            remaining = limit - count - cost
+            if cost > 0 then
+                writes[#writes + 1] = {'log', key, count, window}
+            end
+        end
+    end
+
+    if allowed == 0 then
+        all_allowed = false
+    end
+    results[#results + 1] = allowed
+    results[#results + 1] = remaining
+    results[#results + 1] = tostring(retry_after)
+    results[#results + 1] = tostring(reset_after)
+end
+
+if all_allowed then
+    for _, write in ipairs(writes) do
+        if write[1] == 'gcra' then
+            redis.call('SET', write[2], string.format('%.6f', write[3]),
+                'PX', math.max(1, math.ceil((write[3] - now) * 1000)))
+        else
+            local member_prefix = string.format('%.6f', now)
+            for j = 1, cost do
+                redis.call('ZADD', write[2], now, member_prefix .. ':' .. (write[3] + j))
+            end
+            redis.call('EXPIRE', write[2], math.ceil(write[4]))
+        end
+    end
+end
+
+return results
+"""
+
+# Leases up to the requested number of global tokens from a GCRA budget and
+# returns how many were granted plus the wait until the next token frees up.
+#   KEYS: lease budget key
+#   ARGV: limit, window_seconds, burst, tokens wanted
+LEASE_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local wanted = tonumber(ARGV[4])
+
+local interval = window / limit
+local tolerance = burst * interval
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+
+local available = math.floor((tolerance - (tat - now)) / interval)
+local granted = math.max(0, math.min(wanted, available))
+if granted > 0 then
+    tat = tat + granted * interval
+    redis.call('SET', KEYS[1], string.format('%.6f', tat),
+        'PX', math.max(1, math.ceil((tat - now) * 1000)))
+end
+
+local retry_after = 0
+if granted < wanted then
+    retry_after = math.max(0, tat + interval - tolerance - now)
+end
+
+return {granted, tostring(retry_after)}
+"""
+
 class RateLimitType(Enum):
     """Types of rate limiting"""
     IP_BASED = "ip"
@@ -109,6 +250,137 @@ class TokenBucket:
             "last_refill": self.last_refill
         }
 
+class GlobalQuotaLease:
+    """
+    Worker-local lease on the global rate limit.
+    
+    Global tokens are taken from Redis in batches of lease_size and spent
+    locally, so most requests pass the global limit without a network call.
+    A refill is started in the background when the lease runs low; a request
+    only waits on Redis when the lease is empty. Leases older than lease_ttl
+    seconds are dropped so stale quota cannot be spent late.
+    
+    The aggregate limit holds to within workers x lease_size tokens: at most
+    that many can be admitted ahead of the shared budget, or sit unused in
+    idle workers.
+    """
+    
+    def __init__(
+        self,
+        config: RateLimitConfig,
+        lease_size: int,
+        lease_ttl: float,
+        key: str = "ratelimit:global:lease"
+    ):
+        self.config = config
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.key = key
+        self.low_watermark = lease_size // 4
+        
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.empty_until = 0.0
+        self._refill_task: Optional[asyncio.Task] = None
+    
+    async def acquire(self, tokens: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Take tokens from the local lease, leasing more from Redis if it is empty.
+        
+        Args:
+            tokens: Number of tokens to consume
+            
+        Returns:
+            Rate limit info, or None if Redis is unavailable
+        """
+        if time.monotonic() >= self.expires_at:
+            self.tokens = 0
+        
+        # Lease until there are enough tokens; once the shared budget is known
+        # to be exhausted, reject locally until a token frees up
+        while self.tokens < tokens and time.monotonic() >= self.empty_until:
+            granted = await self._refill()
+            if granted is None:
+                return None
+            if not granted:
+                break
+        
+        allowed = self.tokens >= tokens
+        if allowed:
+            self.tokens -= tokens
+            if self.tokens <= self.low_watermark:
+                self._start_refill()
+        
+        retry_after = 0.0 if allowed else max(0.0, self.empty_until - time.monotonic())
+        return {
+            "allowed": allowed,
+            "limit": self.config.requests,
+            "remaining": self.tokens,
+            "retry_after": retry_after,
+            "reset_time": math.ceil(time.time() + retry_after),
+            "window_seconds": self.config.window_seconds,
+            "leased": True
+        }
+    
+    def release(self, tokens: int = 1) -> None:
+        """Return unused tokens to the local lease"""
+        self.tokens += tokens
+    
+    def _start_refill(self) -> asyncio.Task:
+        """Start a background refill unless one is already in flight"""
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._lease())
+        return self._refill_task
+    
+    async def _refill(self) -> Optional[int]:
+        """Wait for a refill, starting one if needed"""
+        return await asyncio.shield(self._start_refill())
+    
+    async def _lease(self) -> Optional[int]:
+        """
+        Lease a batch of tokens from the shared global budget.
+        
+        Returns:
+            Number of tokens granted, or None if Redis is unavailable
+        """
+        try:
+            async with get_redis() as redis_client:
+                reply = await redis_client.run_script(
+                    LEASE_SCRIPT,
+                    keys=[self.key],
+                    args=[
+                        self.config.requests,
+                        self.config.window_seconds,
+                        self.config.burst_allowance,
+                        self.lease_size
+                    ]
+                )
+        except Exception as e:
+            logger.error(f"Error leasing global rate limit tokens: {str(e)}")
+            return None
+        
+        if reply is None:
+            return None
+        
+        granted, retry_after = int(reply[0]), float(reply[1])
+        if time.monotonic() >= self.expires_at:
+            self.tokens = 0
+        self.tokens += granted
+        if granted:
+            self.expires_at = time.monotonic() + self.lease_ttl
+        else:
+            self.empty_until = time.monotonic() + retry_after
+        return granted
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Get current lease status"""
+        return {
+            "tokens": self.tokens,
+            "lease_size": self.lease_size,
+            "expires_in": max(0.0, self.expires_at - time.monotonic()),
+            "refill_in_flight": bool(self._refill_task and not self._refill_task.done())
+        }
+
 class RateLimiter:
     """
     Comprehensive rate limiter with Redis backend and in-memory fallback.
@@ -120,10 +392,27 @@ class RateLimiter:
     - Global rate limiting
     """
     
+    ALGORITHMS = ("gcra", "sliding_log")
+    
     def __init__(self):
         self.default_config = self._get_default_rate_limits()
         self.endpoint_configs = self._get_endpoint_rate_limits()
         
+        self.algorithm = Config.RATE_LIMIT_ALGORITHM
+        if self.algorithm not in self.ALGORITHMS:
+            logger.warning(f"Unknown rate limit algorithm '{self.algorithm}', using gcra")
+            self.algorithm = "gcra"
+        
+        # Global tier is spent from a local lease unless leasing is disabled
+        self.global_lease: Optional[GlobalQuotaLease] = None
+        if Config.RATE_LIMIT_GLOBAL_LEASE_FRACTION > 0:
+            global_config = self.default_config[RateLimitType.GLOBAL]
+            self.global_lease = GlobalQuotaLease(
+                global_config,
+                lease_size=max(1, int(global_config.requests * Config.RATE_LIMIT_GLOBAL_LEASE_FRACTION)),
+                lease_ttl=Config.RATE_LIMIT_GLOBAL_LEASE_TTL_SECONDS
+            )
+        
         # In-memory fallback storage
         self._memory_buckets: Dict[str, TokenBucket] = {}
         self._memory_counters: Dict[str, Dict[str, Any]] = defaultdict(dict)
@@ -219,67 +508,131 @@ class RateLimiter:
         self,
         limit_type: RateLimitType,
         identifier: str,
-        endpoint: Optional[str] = None,
-        window_start: Optional[int] = None
+        endpoint: Optional[str] = None
     ) -> str:
         """Generate Redis key for rate limiting"""
-        timestamp = window_start or int(time.time())
-        
         if limit_type == RateLimitType.IP_BASED:
-            return f"ratelimit:ip:{identifier}:{timestamp}"
+            return f"ratelimit:ip:{identifier}"
         elif limit_type == RateLimitType.USER_BASED:
-            return f"ratelimit:user:{identifier}:{timestamp}"
+            return f"ratelimit:user:{identifier}"
         elif limit_type == RateLimitType.ENDPOINT_BASED and endpoint:
-            return f"ratelimit:endpoint:{endpoint}:{identifier}:{timestamp}"
+            return f"ratelimit:endpoint:{endpoint}:{identifier}"
         elif limit_type == RateLimitType.GLOBAL:
-            return f"ratelimit:global:{timestamp}"
+            return "ratelimit:global"
         else:
-            return f"ratelimit:unknown:{identifier}:{timestamp}"
+            return f"ratelimit:unknown:{identifier}"
     
-    def _get_window_start(self, window_seconds: int) -> int:
-        """Get the start of the current time window"""
-        return int(time.time()) // window_seconds * window_seconds
+    def _get_request_tiers(
+        self,
+        client_ip: str,
+        endpoint_path: str,
+        user_id: Optional[str] = None
+    ) -> List[Tuple[str, str, RateLimitConfig, Dict[str, Any]]]:
+        """
+        Get the rate limit tiers that apply to a request, in check order.
+        
+        Returns:
+            List of (limit_type, key, config, details) tuples
+        """
+        tiers = []
+        
+        if endpoint_path in self.endpoint_configs:
+            tiers.append((
+                "endpoint",
+                self._get_rate_limit_key(RateLimitType.ENDPOINT_BASED, client_ip, endpoint_path),
+                self.endpoint_configs[endpoint_path],
+                {"endpoint": endpoint_path}
+            ))
+        
+        if user_id:
+            tiers.append((
+                "user",
+                self._get_rate_limit_key(RateLimitType.USER_BASED, user_id),
+                self.default_config[RateLimitType.USER_BASED],
+                {"user_id": user_id}
+            ))
+        
+        tiers.append((
+            "ip",
+            self._get_rate_limit_key(RateLimitType.IP_BASED, client_ip),
+            self.default_config[RateLimitType.IP_BASED],
+            {"client_ip": client_ip}
+        ))
+        if not self.global_lease:
+            tiers.append((
+                "global",
+                self._get_rate_limit_key(RateLimitType.GLOBAL, "global"),
+                self.default_config[RateLimitType.GLOBAL],
+                {}
+            ))
+        
+        return tiers
     
-    async def _check_redis_rate_limit(
+    async def _check_tiers(
         self,
-        key: str,
-        config: RateLimitConfig,
+        tiers: List[Tuple[str, str, RateLimitConfig, Dict[str, Any]]],
         tokens_requested: int = 1
-    ) -> Tuple[bool, Dict[str, Any]]:
-        """Check rate limit using Redis backend"""
+    ) -> List[Dict[str, Any]]:
+        """
+        Check rate limit tiers in a single Redis round trip.
+        
+        Args:
+            tiers: Tiers from _get_request_tiers
+            tokens_requested: Number of tokens to consume (0 to only inspect)
+            
+        Returns:
+            Rate limit info for each tier, in tier order
+        """
+        args: List[Any] = [self.algorithm, tokens_requested]
+        for _, _, config, _ in tiers:
+            args.extend([config.requests, config.window_seconds, config.burst_allowance])
+        
         try:
             async with get_redis() as redis_client:
-                if not redis_client.is_available():
-                    return await self._check_memory_rate_limit(key, config, tokens_requested)
-                
-                # Use Redis for sliding window rate limiting
-                window_start = self._get_window_start(config.window_seconds)
-                rate_key = f"{key}:{window_start}"
-                
-                # Get current count and increment
-                current_count = await redis_client.increment_counter(
-                    rate_key, 
-                    config.window_seconds
+                reply = await redis_client.run_script(
+                    MULTI_TIER_SCRIPT,
+                    keys=[key for _, key, _, _ in tiers],
+                    args=args
                 )
-                
-                allowed = current_count <= config.requests
-                
-                # Calculate reset time
-                reset_time = window_start + config.window_seconds
-                remaining = max(0, config.requests - current_count)
-                
-                return allowed, {
-                    "allowed": allowed,
-                    "count": current_count,
-                    "limit": config.requests,
-                    "remaining": remaining,
-                    "reset_time": reset_time,
-                    "window_seconds": config.window_seconds
-                }
-                
         except Exception as e:
             logger.error(f"Error checking Redis rate limit: {str(e)}")
-            return await self._check_memory_rate_limit(key, config, tokens_requested)
+            reply = None
+        
+        if reply is None:
+            return await self._check_memory_tiers(tiers, tokens_requested)
+        
+        now = time.time()
+        results = []
+        for index, (_, _, config, _) in enumerate(tiers):
+            allowed, remaining, retry_after, reset_after = reply[index * 4:index * 4 + 4]
+            allowed = bool(int(allowed))
+            retry_after = float(retry_after)
+            
+            results.append({
+                "allowed": allowed,
+                "limit": config.requests,
+                "remaining": int(remaining),
+                "retry_after": retry_after,
+                "reset_time": math.ceil(now + (float(reset_after) if allowed else retry_after)),
+                "window_seconds": config.window_seconds,
+                "algorithm": self.algorithm
+            })
+        
+        return results
+    
+    async def _check_memory_tiers(
+        self,
+        tiers: List[Tuple[str, str, RateLimitConfig, Dict[str, Any]]],
+        tokens_requested: int = 1
+    ) -> List[Dict[str, Any]]:
+        """Check rate limit tiers in order using in-memory buckets, stopping at the first rejection"""
+        results = []
+        for _, key, config, _ in tiers:
+            allowed, info = await self._check_memory_rate_limit(key, config, tokens_requested)
+            results.append(info)
+            if not allowed:
+                break
+        return results
     
     async def _check_memory_rate_limit(
         self,
@@ -337,47 +690,34 @@ class RateLimiter:
         client_ip = self._get_client_ip(request)
         endpoint_path = endpoint or request.url.path
         
-        # Check endpoint-specific rate limit
-        if endpoint_path in self.endpoint_configs:
-            config = self.endpoint_configs[endpoint_path]
-            key = self._get_rate_limit_key(
-                RateLimitType.ENDPOINT_BASED,
-                client_ip,
-                endpoint_path
-            )
-            
-            allowed, info = await self._check_redis_rate_limit(key, config, tokens_requested)
-            if not allowed:
-                return False, {**info, "limit_type": "endpoint", "endpoint": endpoint_path}
-        
-        # Check user-based rate limit (if authenticated)
-        if user_id:
-            config = self.default_config[RateLimitType.USER_BASED]
-            key = self._get_rate_limit_key(RateLimitType.USER_BASED, user_id)
-            
-            allowed, info = await self._check_redis_rate_limit(key, config, tokens_requested)
-            if not allowed:
-                return False, {**info, "limit_type": "user", "user_id": user_id}
-        
-        # Check IP-based rate limit
-        config = self.default_config[RateLimitType.IP_BASED]
-        key = self._get_rate_limit_key(RateLimitType.IP_BASED, client_ip)
+        tiers = self._get_request_tiers(client_ip, endpoint_path, user_id)
         
-        allowed, info = await self._check_redis_rate_limit(key, config, tokens_requested)
-        if not allowed:
-            return False, {**info, "limit_type": "ip", "client_ip": client_ip}
+        global_info = None
+        if self.global_lease:
+            global_info = await self._check_global_lease(tokens_requested)
+            if not global_info.get("allowed", True):
+                return False, {**global_info, "limit_type": "global"}
         
-        # Check global rate limit
-        config = self.default_config[RateLimitType.GLOBAL]
-        key = self._get_rate_limit_key(RateLimitType.GLOBAL, "global")
+        results = await self._check_tiers(tiers, tokens_requested)
         
-        allowed, info = await self._check_redis_rate_limit(key, config, tokens_requested)
-        if not allowed:
-            return False, {**info, "limit_type": "global"}
+        for (limit_type, _, _, details), info in zip(tiers, results):
+            if not info.get("allowed", True):
+                if global_info and global_info.get("leased"):
+                    self.global_lease.release(tokens_requested)
+                return False, {**info, "limit_type": limit_type, **details}
         
         # All checks passed
         return True, {"allowed": True, "limit_type": "none"}
     
+    async def _check_global_lease(self, tokens_requested: int = 1) -> Dict[str, Any]:
+        """Check the global limit against the local lease, falling back to memory without Redis"""
+        info = await self.global_lease.acquire(tokens_requested)
+        if info is None:
+            config = self.default_config[RateLimitType.GLOBAL]
+            key = self._get_rate_limit_key(RateLimitType.GLOBAL, "global")
+            _, info = await self._check_memory_rate_limit(key, config, tokens_requested)
+        return info
+    
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP from request, considering proxies"""
         # Check for forwarded IP (from load balancers/proxies)
@@ -418,31 +758,16 @@ class RateLimiter:
             "limits": {}
         }
         
-        # Check each rate limit type
-        limit_checks = [
-            ("ip", RateLimitType.IP_BASED, client_ip),
-            ("global", RateLimitType.GLOBAL, "global")
-        ]
-        
-        if user_id:
-            limit_checks.append(("user", RateLimitType.USER_BASED, user_id))
-        
-        if endpoint_path in self.endpoint_configs:
-            limit_checks.append(("endpoint", RateLimitType.ENDPOINT_BASED, client_ip))
-        
-        for check_name, limit_type, identifier in limit_checks:
-            try:
-                config = (self.endpoint_configs.get(endpoint_path) 
-                         if limit_type == RateLimitType.ENDPOINT_BASED 
-                         else self.default_config[limit_type])
-                
-                key = self._get_rate_limit_key(limit_type, identifier, endpoint_path)
-                _, info = await self._check_redis_rate_limit(key, config, 0)  # Don't consume tokens
-                
-                status["limits"][check_name] = info
-                
-            except Exception as e:
-                status["limits"][check_name] = {"error": str(e)}
+        # Inspect every tier without consuming tokens
+        tiers = self._get_request_tiers(client_ip, endpoint_path, user_id)
+        try:
+            results = await self._check_tiers(tiers, 0)
+            for (limit_type, _, _, _), info in zip(tiers, results):
+                status["limits"][limit_type] = info
+            if self.global_lease:
+                status["limits"]["global"] = self.global_lease.get_status()
+        except Exception as e:
+            status["limits"] = {"error": str(e)}
         
         return status
     
@@ -453,6 +778,8 @@ class RateLimiter:
             "memory_counters_count": len(self._memory_counters),
             "endpoint_configs_count": len(self.endpoint_configs),
             "default_configs_count": len(self.default_config),
+            "algorithm": self.algorithm,
+            "global_lease": self.global_lease.get_status() if self.global_lease else None,
             "redis_available": redis_service.is_available()
         }
     
@@ -557,13 +884,15 @@ async def check_ip_rate_limit(ip_address: str) -> Tuple[bool, Dict[str, Any]]:
     """Check rate limit for specific IP address"""
     config = rate_limiter.default_config[RateLimitType.IP_BASED]
     key = rate_limiter._get_rate_limit_key(RateLimitType.IP_BASED, ip_address)
-    return await rate_limiter._check_redis_rate_limit(key, config)
+    info = (await rate_limiter._check_tiers([("ip", key, config, {})]))[0]
+    return info.get("allowed", True), info
 
 async def check_user_rate_limit(user_id: str) -> Tuple[bool, Dict[str, Any]]:
     """Check rate limit for specific user"""
     config = rate_limiter.default_config[RateLimitType.USER_BASED]
     key = rate_limiter._get_rate_limit_key(RateLimitType.USER_BASED, user_id)
-    return await rate_limiter._check_redis_rate_limit(key, config)
+    info = (await rate_limiter._check_tiers([("user", key, config, {})]))[0]
+    return info.get("allowed", True), info
 
 async def get_rate_limiter_health() -> Dict[str, Any]:
     """Get rate limiter health status"""
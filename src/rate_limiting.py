@@ -4,16 +4,52 @@ Provides public endpoint protection with Redis-backed persistence
 """
 
 import logging
-import time
 from typing import Dict, Any, Optional
 from src.redis_session import RedisSession
 from src.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Refill and consume in one server-side step so concurrent requests cannot both
+# pass on the same tokens. Uses Redis server time so worker clocks don't matter.
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_refill')
+local tokens = tonumber(state[1]) or capacity
+local last_refill = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - last_refill) * refill_rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    retry_after = (requested - tokens) / refill_rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last_refill', tostring(now),
+           'capacity', tostring(capacity), 'refill_rate', tostring(refill_rate))
+redis.call('EXPIRE', KEYS[1], ttl)
+
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
 class TokenBucket:
     """Token bucket rate limiter with Redis persistence"""
     
+    # Registered once; EVALSHA with automatic EVAL fallback on NOSCRIPT
+    _script = None
+    
     def __init__(self, capacity: int, refill_rate: float, key_prefix: str = "rate_limit"):
         self.capacity = capacity
         self.refill_rate = refill_rate  # tokens per second
@@ -22,6 +58,9 @@ class TokenBucket:
     async def consume(self, identifier: str, tokens: int = 1) -> Dict[str, Any]:
         """
         Attempt to consume tokens from bucket
+        
+        The check is a single atomic script call, so it costs one round trip and
+        never admits more than the bucket holds under concurrent requests.
         Returns dict with success status and current state
         """
         redis_client = await RedisSession.get_client()
@@ -38,52 +77,20 @@ class TokenBucket:
             }
         
         try:
-            current_time = time.time()
-            
-            # Get current bucket state
-            bucket_data = await redis_client.hgetall(bucket_key)
-            
-            if bucket_data:
-                # Parse existing bucket
-                last_refill = float(bucket_data.get("last_refill", current_time))
-                current_tokens = float(bucket_data.get("tokens", self.capacity))
-            else:
-                # Initialize new bucket
-                last_refill = current_time
-                current_tokens = self.capacity
-            
-            # Calculate tokens to add based on time elapsed
-            time_elapsed = current_time - last_refill
-            tokens_to_add = time_elapsed * self.refill_rate
-            current_tokens = min(self.capacity, current_tokens + tokens_to_add)
+            if TokenBucket._script is None:
+                TokenBucket._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
             
-            # Check if we can consume requested tokens
-            if current_tokens >= tokens:
-                # Consume tokens
-                current_tokens -= tokens
-                allowed = True
-                retry_after = None
-            else:
-                # Not enough tokens
-                allowed = False
-                tokens_needed = tokens - current_tokens
-                retry_after = tokens_needed / self.refill_rate
-            
-            # Update bucket state in Redis
-            bucket_state = {
-                "tokens": str(current_tokens),
-                "last_refill": str(current_time),
-                "capacity": str(self.capacity),
-                "refill_rate": str(self.refill_rate)
-            }
-            
-            await redis_client.hset(bucket_key, mapping=bucket_state)
-            await redis_client.expire(bucket_key, int(self.capacity / self.refill_rate) + 60)  # TTL with buffer
+            ttl = int(self.capacity / self.refill_rate) + 60  # TTL with buffer
+            allowed, current_tokens, retry_after = await TokenBucket._script(
+                keys=[bucket_key],
+                args=[self.capacity, self.refill_rate, tokens, ttl],
+                client=redis_client
+            )
             
             return {
-                "allowed": allowed,
-                "tokens_remaining": int(current_tokens),
-                "retry_after": retry_after,
+                "allowed": bool(int(allowed)),
+                "tokens_remaining": int(float(current_tokens)),
+                "retry_after": float(retry_after) if int(allowed) == 0 else None,
                 "redis_fallback": False
             }
             
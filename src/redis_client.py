@@ -7,16 +7,21 @@ comprehensive error handling.
 """
 
 import asyncio
+import fnmatch
 import json
 import logging
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 from contextlib import asynccontextmanager
 
 import redis.asyncio as redis
 from redis.asyncio import ConnectionPool, Redis
 from redis.exceptions import ConnectionError, TimeoutError, RedisError
 
+from src.cache_tags import INVALIDATION_CHANNEL, add_to_tags, invalidate_tag, invalidation_message
 from src.config import Config
 
 logger = logging.getLogger(__name__)
@@ -25,6 +30,108 @@ class RedisConnectionError(Exception):
     """Custom exception for Redis connection issues"""
     pass
 
+class LocalCache:
+    """
+    Bounded in-process LRU cache (L1) in front of Redis.
+    
+    Values are stored deserialized and shared between callers, so they must
+    be treated as read-only. Every invalidation bumps a version number; a
+    value read from Redis is only stored if no invalidation arrived while
+    the read was in flight, so a late read cannot resurrect a stale value.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None,
+            version: Optional[int] = None) -> None:
+        if version is not None and version != self.version:
+            return
+        ttl = min(self.ttl_seconds, ttl_seconds) if ttl_seconds else self.ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, keys: Iterable[str]) -> None:
+        self.version += 1
+        for key in keys:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+class RedisCircuitBreaker:
+    """
+    Circuit breaker around the Redis connection.
+    
+    States:
+    - CLOSED: Redis calls go through
+    - OPEN: Redis calls are skipped and the in-memory fallback is used
+    - HALF_OPEN: A background probe is checking whether Redis has recovered;
+      calls keep using the fallback until it succeeds
+    
+    State is read as a plain attribute, so checking it never awaits.
+    """
+    
+    def __init__(self, failure_threshold: int):
+        self.failure_threshold = failure_threshold
+        self.failure_count = 0
+        self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+        self.opened_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+    
+    def record_success(self) -> None:
+        """Record a successful Redis call"""
+        self.failure_count = 0
+    
+    def record_failure(self, error: Exception) -> bool:
+        """
+        Record a connection or timeout error.
+        
+        Returns:
+            bool: True if this failure opened the circuit
+        """
+        self.failure_count += 1
+        self.last_error = str(error)
+        if self.state == "CLOSED" and self.failure_count >= self.failure_threshold:
+            self.trip(error)
+            return True
+        return False
+    
+    def trip(self, error: Exception) -> None:
+        """Open the circuit immediately"""
+        self.state = "OPEN"
+        self.opened_at = datetime.now()
+        self.last_error = str(error)
+        logger.warning(f"Redis circuit opened after {self.failure_count} failures, "
+                       f"using in-memory fallback: {self.last_error}")
+    
+    def reset(self) -> None:
+        """Close the circuit after a successful probe"""
+        self.state = "CLOSED"
+        self.failure_count = 0
+        self.opened_at = None
+        logger.info("Redis circuit closed, Redis is reachable again")
+
 class RedisService:
     """
     Async Redis service with connection pooling, health checks, and graceful fallback.
@@ -36,13 +143,25 @@ class RedisService:
     def __init__(self):
         self._pool: Optional[ConnectionPool] = None
         self._client: Optional[Redis] = None
-        self._is_available = False
-        self._last_health_check = None
-        self._health_check_interval = timedelta(minutes=5)
+        
+        # Fails over to the in-memory fallback without waiting on a dead Redis
+        self._breaker = RedisCircuitBreaker(Config.REDIS_BREAKER_FAILURE_THRESHOLD)
+        self._probe_task: Optional[asyncio.Task] = None
+        
+        # Lua scripts registered on this client, keyed by source
+        self._scripts: Dict[str, Any] = {}
+        
+        # In-process L1 for get_cache; only used while the invalidation listener is subscribed
+        self._l1 = LocalCache(Config.REDIS_L1_MAX_ENTRIES, Config.REDIS_L1_TTL_SECONDS)
+        self._l1_active = False
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task: Optional[asyncio.Task] = None
+        self._cache_stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
         
         # Fallback in-memory storage when Redis is unavailable
         self._memory_cache: Dict[str, Any] = {}
         self._memory_timestamps: Dict[str, datetime] = {}
+        self._memory_tags: Dict[str, Set[str]] = {}
         
     async def initialize(self) -> bool:
         """
@@ -62,66 +181,158 @@ class RedisService:
                 password=Config.REDIS_PASSWORD,
                 max_connections=20,
                 retry_on_timeout=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
+                socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
                 health_check_interval=30
             )
             
             # Create Redis client
             self._client = Redis(connection_pool=self._pool)
             
+            if Config.REDIS_L1_ENABLED and self._listener_task is None:
+                self._listener_task = asyncio.create_task(self._listen_for_invalidations())
+            
             # Test connection
             await self._client.ping()
-            self._is_available = True
-            self._last_health_check = datetime.now()
+            self._breaker.record_success()
             
             logger.info("Redis client initialized successfully")
             return True
             
         except (ConnectionError, TimeoutError, RedisError) as e:
             logger.warning(f"Redis connection failed, using fallback mode: {str(e)}")
-            self._is_available = False
+            if self._client:
+                # Keep probing so the service recovers once Redis comes up
+                self._breaker.trip(e)
+                self._start_probe()
             return False
         except Exception as e:
             logger.error(f"Unexpected error initializing Redis: {str(e)}")
-            self._is_available = False
             return False
     
     async def health_check(self) -> bool:
         """
-        Perform health check on Redis connection.
+        Ping Redis and feed the result into the circuit breaker.
+        
+        Request-path code should use is_available() instead, which never
+        awaits. While the circuit is open this returns False without
+        pinging; the background probe decides when Redis is back.
         
         Returns:
             bool: True if Redis is healthy, False otherwise
         """
-        now = datetime.now()
-        
-        # Skip health check if recently performed
-        if (self._last_health_check and 
-            now - self._last_health_check < self._health_check_interval):
-            return self._is_available
-            
-        if not self._client:
+        if not self._redis_ready():
             return False
             
         try:
             await self._client.ping()
-            self._is_available = True
-            self._last_health_check = now
+            self._breaker.record_success()
             return True
-        except (ConnectionError, TimeoutError, RedisError):
-            logger.warning("Redis health check failed, switching to fallback mode")
-            self._is_available = False
-            self._last_health_check = now
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis health check failed: {str(e)}")
+            self._record_failure(e)
             return False
         except Exception as e:
             logger.error(f"Unexpected error during Redis health check: {str(e)}")
-            self._is_available = False
-            self._last_health_check = now
             return False
     
+    def _redis_ready(self) -> bool:
+        """Whether Redis calls should be attempted (no I/O)"""
+        return self._client is not None and self._breaker.state == "CLOSED"
+    
+    def _record_failure(self, error: Exception) -> None:
+        """Count a connection or timeout error, probing in the background once the circuit opens"""
+        if self._breaker.record_failure(error):
+            self._start_probe()
+    
+    def _start_probe(self) -> None:
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_until_recovered())
+    
+    async def _probe_until_recovered(self) -> None:
+        """Ping Redis with exponential backoff until it answers, then close the circuit"""
+        delay = Config.REDIS_BREAKER_PROBE_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            self._breaker.state = "HALF_OPEN"
+            try:
+                await self._client.ping()
+                self._breaker.reset()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._breaker.state = "OPEN"
+                self._breaker.last_error = str(e)
+                delay = min(delay * 2, Config.REDIS_BREAKER_MAX_PROBE_INTERVAL_SECONDS)
+    
+    async def _listen_for_invalidations(self) -> None:
+        """
+        Keep the L1 coherent with the other workers.
+        
+        Subscribes to INVALIDATION_CHANNEL and drops every announced key from
+        the L1. The L1 is only consulted while the subscription is live; when
+        it drops, the L1 is cleared and bypassed until it is re-established.
+        """
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._l1.clear()
+                self._l1_active = True
+                backoff = 1.0
+                logger.info("Redis L1 cache enabled, listening for invalidations")
+                
+                while True:
+                    # Poll with a timeout so an idle channel never trips the socket timeout
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._apply_invalidation(message["data"])
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis invalidation listener lost, bypassing L1 cache: {str(e)}")
+            finally:
+                self._l1_active = False
+                self._l1.clear()
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+            
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+    
+    def _apply_invalidation(self, data: Union[str, bytes]) -> None:
+        """Drop the keys of one INVALIDATION_CHANNEL message from the L1"""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+        if message.get("origin") == self._instance_id:
+            # Our own write; the L1 already holds the new value
+            return
+        self._l1.invalidate(message.get("keys", []))
+    
     async def close(self) -> None:
         """Close Redis connections and cleanup resources"""
+        for task in (self._listener_task, self._probe_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._listener_task = None
+        self._probe_task = None
+        self._l1_active = False
+        self._l1.clear()
+        
         if self._client:
             try:
                 await self._client.close()
@@ -137,6 +348,7 @@ class RedisService:
         # Clear in-memory cache
         self._memory_cache.clear()
         self._memory_timestamps.clear()
+        self._memory_tags.clear()
         
         logger.info("Redis client closed")
     
@@ -158,15 +370,19 @@ class RedisService:
         try:
             serialized_data = json.dumps(data, default=str)
             
-            if await self.health_check():
-                await self._client.setex(session_key, expiry_seconds, serialized_data)
-                logger.debug(f"Session stored in Redis: {session_key}")
-            else:
-                # Fallback to in-memory storage
-                self._memory_cache[session_key] = serialized_data
-                self._memory_timestamps[session_key] = datetime.now() + timedelta(seconds=expiry_seconds)
-                logger.debug(f"Session stored in memory fallback: {session_key}")
+            if self._redis_ready():
+                try:
+                    await self._client.setex(session_key, expiry_seconds, serialized_data)
+                    self._breaker.record_success()
+                    logger.debug(f"Session stored in Redis: {session_key}")
+                    return True
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
             
+            # Fallback to in-memory storage
+            self._memory_cache[session_key] = serialized_data
+            self._memory_timestamps[session_key] = datetime.now() + timedelta(seconds=expiry_seconds)
+            logger.debug(f"Session stored in memory fallback: {session_key}")
             return True
             
         except Exception as e:
@@ -184,20 +400,23 @@ class RedisService:
             Dict with session data or None if not found/expired
         """
         try:
-            if await self.health_check():
-                data = await self._client.get(session_key)
-                if data:
-                    return json.loads(data)
-            else:
-                # Check in-memory fallback
-                if session_key in self._memory_cache:
-                    # Check if expired
-                    if datetime.now() < self._memory_timestamps.get(session_key, datetime.now()):
-                        return json.loads(self._memory_cache[session_key])
-                    else:
-                        # Remove expired data
-                        self._memory_cache.pop(session_key, None)
-                        self._memory_timestamps.pop(session_key, None)
+            if self._redis_ready():
+                try:
+                    data = await self._client.get(session_key)
+                    self._breaker.record_success()
+                    return json.loads(data) if data else None
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # Check in-memory fallback
+            if session_key in self._memory_cache:
+                # Check if expired
+                if datetime.now() < self._memory_timestamps.get(session_key, datetime.now()):
+                    return json.loads(self._memory_cache[session_key])
+                else:
+                    # Remove expired data
+                    self._memory_cache.pop(session_key, None)
+                    self._memory_timestamps.pop(session_key, None)
             
             return None
             
@@ -216,12 +435,16 @@ class RedisService:
             bool: True if successful, False otherwise
         """
         try:
-            if await self.health_check():
-                await self._client.delete(session_key)
-            else:
-                # Remove from in-memory fallback
-                self._memory_cache.pop(session_key, None)
-                self._memory_timestamps.pop(session_key, None)
+            if self._redis_ready():
+                try:
+                    await self._client.delete(session_key)
+                    self._breaker.record_success()
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # Remove from in-memory fallback, which may hold writes made while Redis was down
+            self._memory_cache.pop(session_key, None)
+            self._memory_timestamps.pop(session_key, None)
             
             logger.debug(f"Session deleted: {session_key}")
             return True
@@ -244,37 +467,72 @@ class RedisService:
             int: Current counter value
         """
         try:
-            if await self.health_check():
-                # Use Redis INCR with expiry
-                pipe = self._client.pipeline()
-                pipe.incr(key)
-                pipe.expire(key, expiry_seconds)
-                results = await pipe.execute()
-                return results[0]
-            else:
-                # In-memory fallback
-                current_time = datetime.now()
-                
-                # Clean expired counters
-                expired_keys = [
-                    k for k, expiry in self._memory_timestamps.items()
-                    if current_time > expiry
-                ]
-                for k in expired_keys:
-                    self._memory_cache.pop(k, None)
-                    self._memory_timestamps.pop(k, None)
-                
-                # Increment counter
-                current_value = self._memory_cache.get(key, 0) + 1
-                self._memory_cache[key] = current_value
-                self._memory_timestamps[key] = current_time + timedelta(seconds=expiry_seconds)
-                
-                return current_value
+            if self._redis_ready():
+                try:
+                    # Use Redis INCR with expiry
+                    pipe = self._client.pipeline()
+                    pipe.incr(key)
+                    pipe.expire(key, expiry_seconds)
+                    results = await pipe.execute()
+                    self._breaker.record_success()
+                    return results[0]
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # In-memory fallback
+            current_time = datetime.now()
+            
+            # Clean expired counters
+            expired_keys = [
+                k for k, expiry in self._memory_timestamps.items()
+                if current_time > expiry
+            ]
+            for k in expired_keys:
+                self._memory_cache.pop(k, None)
+                self._memory_timestamps.pop(k, None)
+            
+            # Increment counter
+            current_value = self._memory_cache.get(key, 0) + 1
+            self._memory_cache[key] = current_value
+            self._memory_timestamps[key] = current_time + timedelta(seconds=expiry_seconds)
+            
+            return current_value
                 
         except Exception as e:
             logger.error(f"Error incrementing counter {key}: {str(e)}")
             return 1  # Safe fallback
     
+    async def run_script(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """
+        Run a Lua script atomically in one round trip.
+        
+        The script is registered once and then called by SHA (EVALSHA),
+        reloading automatically if Redis has flushed its script cache.
+        
+        Args:
+            script: Lua source
+            keys: KEYS passed to the script
+            args: ARGV passed to the script
+            
+        Returns:
+            Script result, or None if Redis is unavailable
+        """
+        if not self._redis_ready():
+            return None
+        
+        registered = self._scripts.get(script)
+        if registered is None:
+            registered = self._client.register_script(script)
+            self._scripts[script] = registered
+        
+        try:
+            result = await registered(keys=keys, args=args, client=self._client)
+        except (ConnectionError, TimeoutError) as e:
+            self._record_failure(e)
+            return None
+        self._breaker.record_success()
+        return result
+    
     async def get_counter(self, key: str) -> int:
         """
         Get current counter value.
@@ -286,20 +544,24 @@ class RedisService:
             int: Current counter value (0 if not found)
         """
         try:
-            if await self.health_check():
-                value = await self._client.get(key)
-                return int(value) if value else 0
-            else:
-                # Check in-memory fallback
-                if key in self._memory_cache:
-                    if datetime.now() < self._memory_timestamps.get(key, datetime.now()):
-                        return self._memory_cache[key]
-                    else:
-                        # Remove expired data
-                        self._memory_cache.pop(key, None)
-                        self._memory_timestamps.pop(key, None)
-                
-                return 0
+            if self._redis_ready():
+                try:
+                    value = await self._client.get(key)
+                    self._breaker.record_success()
+                    return int(value) if value else 0
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # Check in-memory fallback
+            if key in self._memory_cache:
+                if datetime.now() < self._memory_timestamps.get(key, datetime.now()):
+                    return self._memory_cache[key]
+                else:
+                    # Remove expired data
+                    self._memory_cache.pop(key, None)
+                    self._memory_timestamps.pop(key, None)
+            
+            return 0
                 
         except Exception as e:
             logger.error(f"Error getting counter {key}: {str(e)}")
@@ -307,7 +569,8 @@ class RedisService:
     
     # General Caching Methods
     
-    async def set_cache(self, key: str, value: Any, expiry_seconds: int = 3600) -> bool:
+    async def set_cache(self, key: str, value: Any, expiry_seconds: int = 3600,
+                        tags: Optional[List[str]] = None, tag_ttl: Optional[int] = None) -> bool:
         """
         Set cache value with expiry.
         
@@ -315,6 +578,8 @@ class RedisService:
             key: Cache key
             value: Value to cache
             expiry_seconds: Expiry time in seconds
+            tags: Tags to register the key under for invalidate_tag
+            tag_ttl: Tag index expiry; must cover the longest entry under the tags
             
         Returns:
             bool: True if successful, False otherwise
@@ -322,23 +587,51 @@ class RedisService:
         try:
             serialized_value = json.dumps(value, default=str)
             
-            if await self.health_check():
-                await self._client.setex(key, expiry_seconds, serialized_value)
-            else:
-                # In-memory fallback
-                self._memory_cache[key] = serialized_value
-                self._memory_timestamps[key] = datetime.now() + timedelta(seconds=expiry_seconds)
+            if self._redis_ready():
+                try:
+                    await self._set_in_redis(key, serialized_value, expiry_seconds, tags, tag_ttl)
+                    return True
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
             
+            # In-memory fallback
+            self._memory_cache[key] = serialized_value
+            self._memory_timestamps[key] = datetime.now() + timedelta(seconds=expiry_seconds)
+            for tag in tags or []:
+                self._memory_tags.setdefault(tag, set()).add(key)
             return True
             
         except Exception as e:
             logger.error(f"Error setting cache {key}: {str(e)}")
             return False
     
+    async def _set_in_redis(self, key: str, serialized_value: str, expiry_seconds: int,
+                            tags: Optional[List[str]], tag_ttl: Optional[int]) -> None:
+        if tags or self._l1_active:
+            # Write the entry, its tag registrations and the L1 invalidation in one round trip
+            pipe = self._client.pipeline(transaction=False)
+            pipe.setex(key, expiry_seconds, serialized_value)
+            if tags:
+                add_to_tags(pipe, key, tags, expiry_seconds, tag_ttl)
+            if self._l1_active:
+                pipe.publish(INVALIDATION_CHANNEL, invalidation_message([key], self._instance_id))
+            await pipe.execute()
+        else:
+            await self._client.setex(key, expiry_seconds, serialized_value)
+        self._breaker.record_success()
+        
+        if self._l1_active:
+            # Store a decoded copy so later changes to the caller's object don't leak in
+            self._l1.invalidate([key])
+            self._l1.set(key, json.loads(serialized_value), expiry_seconds)
+    
     async def get_cache(self, key: str) -> Optional[Any]:
         """
         Get cached value.
         
+        Values are served from the in-process L1 when possible. L1 values
+        are shared between callers and must not be mutated.
+        
         Args:
             key: Cache key
             
@@ -346,19 +639,20 @@ class RedisService:
             Cached value or None if not found/expired
         """
         try:
-            if await self.health_check():
-                data = await self._client.get(key)
-                if data:
-                    return json.loads(data)
-            else:
-                # Check in-memory fallback
-                if key in self._memory_cache:
-                    if datetime.now() < self._memory_timestamps.get(key, datetime.now()):
-                        return json.loads(self._memory_cache[key])
-                    else:
-                        # Remove expired data
-                        self._memory_cache.pop(key, None)
-                        self._memory_timestamps.pop(key, None)
+            if self._redis_ready():
+                try:
+                    return await self._get_from_redis(key)
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # Check in-memory fallback
+            if key in self._memory_cache:
+                if datetime.now() < self._memory_timestamps.get(key, datetime.now()):
+                    return json.loads(self._memory_cache[key])
+                else:
+                    # Remove expired data
+                    self._memory_cache.pop(key, None)
+                    self._memory_timestamps.pop(key, None)
             
             return None
             
@@ -366,6 +660,35 @@ class RedisService:
             logger.error(f"Error getting cache {key}: {str(e)}")
             return None
     
+    async def _get_from_redis(self, key: str) -> Optional[Any]:
+        if self._l1_active:
+            value = self._l1.get(key)
+            if value is not None:
+                self._cache_stats["l1_hits"] += 1
+                return value
+            
+            # Fetch the remaining TTL too, so the L1 copy never outlives the Redis entry
+            version = self._l1.version
+            pipe = self._client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            data, ttl_ms = await pipe.execute()
+            self._breaker.record_success()
+            if data:
+                self._cache_stats["l2_hits"] += 1
+                value = json.loads(data)
+                self._l1.set(key, value, ttl_ms / 1000 if ttl_ms > 0 else None, version)
+                return value
+        else:
+            data = await self._client.get(key)
+            self._breaker.record_success()
+            if data:
+                self._cache_stats["l2_hits"] += 1
+                return json.loads(data)
+        
+        self._cache_stats["misses"] += 1
+        return None
+    
     async def delete_cache(self, key: str) -> bool:
         """
         Delete cached value.
@@ -377,12 +700,23 @@ class RedisService:
             bool: True if successful, False otherwise
         """
         try:
-            if await self.health_check():
-                await self._client.delete(key)
-            else:
-                # Remove from in-memory fallback
-                self._memory_cache.pop(key, None)
-                self._memory_timestamps.pop(key, None)
+            if self._redis_ready():
+                try:
+                    if self._l1_active:
+                        pipe = self._client.pipeline(transaction=False)
+                        pipe.delete(key)
+                        pipe.publish(INVALIDATION_CHANNEL, invalidation_message([key], self._instance_id))
+                        await pipe.execute()
+                        self._l1.invalidate([key])
+                    else:
+                        await self._client.delete(key)
+                    self._breaker.record_success()
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # Remove from in-memory fallback, which may hold writes made while Redis was down
+            self._memory_cache.pop(key, None)
+            self._memory_timestamps.pop(key, None)
             
             return True
             
@@ -390,11 +724,88 @@ class RedisService:
             logger.error(f"Error deleting cache {key}: {str(e)}")
             return False
     
+    async def invalidate_tag(self, tag: str, match: Optional[str] = None) -> int:
+        """
+        Delete every cached key registered under a tag.
+        
+        Args:
+            tag: Tag passed to set_cache
+            match: Optional glob limiting which keys under the tag are deleted
+            
+        Returns:
+            Number of cache entries deleted
+        """
+        try:
+            deleted = 0
+            if self._redis_ready():
+                try:
+                    deleted = await invalidate_tag(self._client, tag, match=match,
+                                                   on_delete=self._l1.invalidate)
+                    self._breaker.record_success()
+                except (ConnectionError, TimeoutError) as e:
+                    self._record_failure(e)
+            
+            # In-memory fallback, which may hold entries written while Redis was down
+            tagged = self._memory_tags.get(tag, set())
+            keys = {key for key in tagged if match is None or fnmatch.fnmatchcase(key, match)}
+            tagged -= keys
+            if not tagged:
+                self._memory_tags.pop(tag, None)
+            
+            for key in keys:
+                self._memory_timestamps.pop(key, None)
+                if self._memory_cache.pop(key, None) is not None:
+                    deleted += 1
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"Error invalidating cache tag {tag}: {str(e)}")
+            return 0
+    
     # Utility Methods
     
     def is_available(self) -> bool:
-        """Check if Redis is currently available"""
-        return self._is_available
+        """Check if Redis calls are currently attempted (circuit closed); never awaits"""
+        return self._redis_ready()
+    
+    def get_client(self) -> Optional[Redis]:
+        """
+        Raw client for commands RedisService does not wrap (e.g. streams).
+        
+        Returns:
+            The client, or None while Redis is unavailable. Callers should pass
+            connection and timeout errors to report_error().
+        """
+        return self._client if self._redis_ready() else None
+    
+    def report_error(self, error: Exception) -> None:
+        """Count a connection or timeout error from a get_client() caller toward the circuit breaker"""
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            self._record_failure(error)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get get_cache hit ratios per tier.
+        
+        Returns:
+            Dict with L1 and L2 hit counts and ratios. The L1 ratio is over
+            all lookups, the L2 ratio over the lookups that reached Redis.
+        """
+        l1_hits = self._cache_stats["l1_hits"]
+        l2_hits = self._cache_stats["l2_hits"]
+        misses = self._cache_stats["misses"]
+        lookups = l1_hits + l2_hits + misses
+        l2_lookups = l2_hits + misses
+        
+        return {
+            "l1_enabled": self._l1_active,
+            "l1_size": len(self._l1),
+            "l1_hits": l1_hits,
+            "l2_hits": l2_hits,
+            "misses": misses,
+            "l1_hit_ratio": round(l1_hits / lookups, 4) if lookups else 0.0,
+            "l2_hit_ratio": round(l2_hits / l2_lookups, 4) if l2_lookups else 0.0
+        }
     
     async def get_stats(self) -> Dict[str, Any]:
         """
@@ -404,13 +815,17 @@ class RedisService:
             Dict with connection stats and cache information
         """
         stats = {
-            "redis_available": self._is_available,
-            "last_health_check": self._last_health_check.isoformat() if self._last_health_check else None,
+            "redis_available": self._redis_ready(),
+            "circuit_state": self._breaker.state,
+            "circuit_opened_at": self._breaker.opened_at.isoformat() if self._breaker.opened_at else None,
+            "consecutive_failures": self._breaker.failure_count,
+            "last_error": self._breaker.last_error,
             "fallback_cache_size": len(self._memory_cache),
-            "redis_url_configured": bool(Config.REDIS_URL)
+            "redis_url_configured": bool(Config.REDIS_URL),
+            "cache": self.get_cache_stats()
         }
         
-        if self._is_available and self._client:
+        if self._redis_ready():
             try:
                 info = await self._client.info()
                 stats.update({
@@ -5,9 +5,10 @@ Provides connection pool with health monitoring and graceful fallback
 
 import logging
 import json
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 import redis.asyncio as redis
 from redis.asyncio import ConnectionPool
+from src.cache_tags import add_keys_to_tags, add_to_tags, invalidate_tag
 from src.config import Config
 
 logger = logging.getLogger(__name__)
@@ -89,15 +90,22 @@ class RedisSession:
         return health
     
     @classmethod
-    async def set_session(cls, session_id: str, data: Dict[str, Any], ttl: int = 3600):
-        """Store session data with TTL (default 1 hour)"""
+    async def set_session(cls, session_id: str, data: Dict[str, Any], ttl: int = 3600,
+                          tags: Optional[List[str]] = None):
+        """Store session data with TTL (default 1 hour), optionally registered under invalidation tags"""
         if not cls._healthy or not cls._client:
             logger.warning("Redis unavailable - session not stored")
             return False
         
         try:
             json_data = json.dumps(data)
-            await cls._client.setex(f"session:{session_id}", ttl, json_data)
+            if tags:
+                pipe = cls._client.pipeline(transaction=False)
+                pipe.setex(f"session:{session_id}", ttl, json_data)
+                add_to_tags(pipe, f"session:{session_id}", tags, ttl)
+                await pipe.execute()
+            else:
+                await cls._client.setex(f"session:{session_id}", ttl, json_data)
             return True
         except Exception as e:
             logger.error(f"Failed to store session {session_id}: {e}")
@@ -119,6 +127,47 @@ class RedisSession:
             logger.error(f"Failed to retrieve session {session_id}: {e}")
             return None
     
+    @classmethod
+    async def get_sessions(cls, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Retrieve several sessions with one MGET; missing sessions map to None"""
+        if not session_ids:
+            return {}
+        if not cls._healthy or not cls._client:
+            logger.warning("Redis unavailable - sessions not retrieved")
+            return {session_id: None for session_id in session_ids}
+        
+        try:
+            values = await cls._client.mget([f"session:{session_id}" for session_id in session_ids])
+            return {
+                session_id: json.loads(json_data) if json_data else None
+                for session_id, json_data in zip(session_ids, values)
+            }
+        except Exception as e:
+            logger.error(f"Failed to retrieve {len(session_ids)} sessions: {e}")
+            return {session_id: None for session_id in session_ids}
+    
+    @classmethod
+    async def set_sessions(cls, sessions: Dict[str, Dict[str, Any]], ttl: int = 3600,
+                           tags: Optional[List[str]] = None) -> bool:
+        """Store several sessions with TTL in one pipelined round trip"""
+        if not sessions:
+            return True
+        if not cls._healthy or not cls._client:
+            logger.warning("Redis unavailable - sessions not stored")
+            return False
+        
+        try:
+            pipe = cls._client.pipeline(transaction=False)
+            for session_id, data in sessions.items():
+                pipe.setex(f"session:{session_id}", ttl, json.dumps(data))
+            if tags:
+                add_keys_to_tags(pipe, [f"session:{session_id}" for session_id in sessions], tags, ttl)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store {len(sessions)} sessions: {e}")
+            return False
+    
     @classmethod
     async def delete_session(cls, session_id: str) -> bool:
         """Delete session data"""
@@ -146,6 +195,19 @@ class RedisSession:
             logger.error(f"Failed to extend session {session_id}: {e}")
             return False
     
+    @classmethod
+    async def invalidate_tag(cls, tag: str) -> int:
+        """Delete every session key registered under a tag"""
+        if not cls._healthy or not cls._client:
+            logger.warning("Redis unavailable - cache not invalidated")
+            return 0
+        
+        try:
+            return await invalidate_tag(cls._client, tag)
+        except Exception as e:
+            logger.error(f"Failed to invalidate tag {tag}: {e}")
+            return 0
+    
     @classmethod
     async def cleanup(cls):
         """Clean up Redis connections"""
@@ -172,7 +234,7 @@ async def clear_user_session(user_id: str) -> bool:
 # Cache functions for challenges
 async def cache_challenges(cache_key: str, data: dict, ttl: int = 600) -> bool:
     """Cache challenges data with TTL (default 10 minutes)"""
-    return await RedisSession.set_session(cache_key, data, ttl)
+    return await RedisSession.set_session(cache_key, data, ttl, tags=["challenges"])
 
 async def get_cached_challenges(cache_key: str) -> Optional[dict]:
     """Retrieve cached challenges data"""
@@ -185,11 +247,8 @@ async def invalidate_challenges_cache(tag: str = "challenges") -> bool:
         return False
     
     try:
-        # For MVP, we'll use a simple pattern match to find keys
-        keys = await RedisSession._client.keys(f"challenges:*")
-        if keys:
-            await RedisSession._client.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} challenge cache keys")
+        invalidated = await invalidate_tag(RedisSession._client, tag)
+        logger.info(f"Invalidated {invalidated} challenge cache keys")
         return True
     except Exception as e:
         logger.error(f"Failed to invalidate challenges cache: {e}")
@@ -14,6 +14,8 @@ from functools import wraps
 import random
 import time
 
+import anthropic
+
 from src.config import Config
 
 logger = logging.getLogger(__name__)
@@ -136,7 +138,9 @@ class RetryManager:
             retryable_exceptions=[
                 ConnectionError,
                 TimeoutError,
-                # Add Anthropic-specific exceptions here
+                anthropic.APIConnectionError,  # includes APITimeoutError
+                anthropic.RateLimitError,
+                anthropic.InternalServerError,
             ],
             circuit_breaker=self._get_or_create_circuit_breaker("anthropic", 5, 120)
         )
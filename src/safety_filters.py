@@ -252,6 +252,77 @@ Real confidence comes from being comfortable being yourself - let's work on that
         
         return sanitized
 
+class StreamingResponseFilter:
+    """
+    Incremental safety check for streamed AI responses
+    
+    Each chunk is checked together with the text already released on the same
+    line, and the newest HOLDBACK_CHARS are held back, so any unsafe match up to
+    that length is caught before any part of it reaches the user.
+    """
+    
+    HOLDBACK_CHARS = 120
+    # Released text re-checked with each chunk (patterns are single-line)
+    CONTEXT_CHARS = 1000
+    
+    def __init__(self, filters: Optional[SafetyFilters] = None):
+        self.filters = filters or safety_filters
+        self.pending = ""
+        self.released_context = ""
+        self.result: Optional[SafetyCheckResult] = None
+    
+    @property
+    def blocked(self) -> bool:
+        return self.result is not None and not self.result.is_safe
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Add a streamed chunk
+        
+        Args:
+            chunk: Next piece of the AI response
+            
+        Returns:
+            Text that is safe to send now (may be empty)
+        """
+        if self.blocked:
+            return ""
+        
+        self.pending += chunk
+        if not self._check():
+            return ""
+        
+        if len(self.pending) <= self.HOLDBACK_CHARS:
+            return ""
+        
+        # Release up to a word boundary before the held-back tail
+        cut = len(self.pending) - self.HOLDBACK_CHARS
+        boundary = max(self.pending.rfind(' ', 0, cut), self.pending.rfind('\n', 0, cut))
+        if boundary > 0:
+            cut = boundary + 1
+        
+        released = self.pending[:cut]
+        self.pending = self.pending[cut:]
+        
+        context = self.released_context + released
+        line_start = context.rfind('\n')
+        if line_start >= 0:
+            context = context[line_start + 1:]
+        self.released_context = context[-self.CONTEXT_CHARS:]
+        
+        return released
+    
+    def flush(self) -> str:
+        """Release the held-back tail once the stream has ended"""
+        if self.blocked or not self._check():
+            return ""
+        released, self.pending = self.pending, ""
+        return released
+    
+    def _check(self) -> bool:
+        self.result = self.filters.check_response_safety(self.released_context + self.pending)
+        return self.result.is_safe
+
 # Global safety filter instance
 safety_filters = SafetyFilters()
 
@@ -4,13 +4,14 @@ Calculates user reputation scores based on session completion and no-shows
 """
 
 import logging
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from uuid import UUID
 
 from src.config import Config
 from src.database import SupabaseFactory
+from src.db.async_client import execute_async
 
 logger = logging.getLogger(__name__)
 
@@ -58,141 +59,128 @@ class ReputationCalculator:
         Returns:
             ReputationData with score, counts, and badge color
         """
-        try:
-            # Validate user_id format
-            UUID(user_id)
-        except ValueError:
-            raise ValueError(f"Invalid user_id format: {user_id}")
+        reputations = await self.calculate_reputations([user_id])
+        return reputations[user_id]
+    
+    async def calculate_reputations(self, user_ids: List[str]) -> Dict[str, ReputationData]:
+        """
+        Calculate reputation data for several users in one database call
         
-        # Query user session history
-        session_data = await self._get_user_session_history(user_id)
+        Args:
+            user_ids: UUID strings of the users
+            
+        Returns:
+            Dict mapping each user_id to its ReputationData
+        """
+        self._validate_user_ids(user_ids)
+        if not user_ids:
+            return {}
         
-        # Calculate metrics
-        completed_sessions = self._count_completed_sessions(session_data, user_id)
-        no_shows = self._count_no_shows(session_data, user_id)
+        session_counts = await self._get_session_counts(user_ids)
+        cache_timestamp = datetime.now(timezone.utc).isoformat()
         
-        # Calculate score with bounds
-        raw_score = completed_sessions - no_shows
-        score = max(self.MIN_SCORE, min(self.MAX_SCORE, raw_score))
+        return {
+            user_id: self._build_reputation(user_id, *session_counts.get(user_id, (0, 0)), cache_timestamp)
+            for user_id in user_ids
+        }
+    
+    async def load_reputations(self, user_ids: List[str]) -> Dict[str, ReputationData]:
+        """
+        Read the maintained user_reputation counters for several users
+        
+        The counters are kept current by a trigger on wingman_sessions
+        (migration 009), so this is a primary key lookup rather than a
+        recomputation. Users without a row have no scored sessions yet.
+        
+        Args:
+            user_ids: UUID strings of the users
+            
+        Returns:
+            Dict mapping each user_id to its ReputationData
+        """
+        self._validate_user_ids(user_ids)
+        if not user_ids:
+            return {}
         
-        # Determine badge color
-        badge_color = self._get_badge_color(score)
+        try:
+            result = await execute_async(self.supabase.table('user_reputation')\
+                .select('user_id, completed_sessions, no_shows, score, badge_color')\
+                .in_('user_id', list(dict.fromkeys(user_ids))))
+        except Exception as e:
+            logger.error(f"Database error reading reputation counters for {len(user_ids)} users: {e}")
+            raise Exception(f"Failed to fetch reputation counters: {str(e)}")
         
-        # Create timestamp
         cache_timestamp = datetime.now(timezone.utc).isoformat()
+        rows = {str(row['user_id']): row for row in result.data or []}
+        
+        reputations = {}
+        for user_id in user_ids:
+            row = rows.get(user_id)
+            if row is None:
+                reputations[user_id] = self._build_reputation(user_id, 0, 0, cache_timestamp)
+            else:
+                reputations[user_id] = ReputationData(
+                    user_id=user_id,
+                    score=row['score'],
+                    completed_sessions=row['completed_sessions'],
+                    no_shows=row['no_shows'],
+                    badge_color=row['badge_color'],
+                    cache_timestamp=cache_timestamp
+                )
+        return reputations
+    
+    def _validate_user_ids(self, user_ids: List[str]):
+        for user_id in user_ids:
+            try:
+                UUID(user_id)
+            except ValueError:
+                raise ValueError(f"Invalid user_id format: {user_id}")
+    
+    def _build_reputation(self, user_id: str, completed_sessions: int, no_shows: int,
+                          cache_timestamp: str) -> ReputationData:
+        """Derive the bounded score and badge from session counts"""
+        # Calculate score with bounds
+        raw_score = completed_sessions - no_shows
+        score = max(self.MIN_SCORE, min(self.MAX_SCORE, raw_score))
         
         return ReputationData(
             user_id=user_id,
             score=score,
             completed_sessions=completed_sessions,
             no_shows=no_shows,
-            badge_color=badge_color,
+            badge_color=self._get_badge_color(score),
             cache_timestamp=cache_timestamp
         )
     
-    async def _get_user_session_history(self, user_id: str) -> List[Dict[str, Any]]:
+    async def _get_session_counts(self, user_ids: List[str]) -> Dict[str, Tuple[int, int]]:
         """
-        Query wingman_sessions for user's session history
+        Aggregate completed sessions and no-shows for users in the database
+        
+        Uses the get_user_reputation_counts function (migration 008), which
+        counts in one query instead of returning every session row.
         
         Args:
-            user_id: UUID string of the user
+            user_ids: UUID strings of the users
             
         Returns:
-            List of session records where user was a participant
+            Dict mapping user_id to (completed_sessions, no_shows)
         """
         try:
-            # First get all match IDs where user is a participant
-            matches_result = self.supabase.table('wingman_matches')\
-                .select('id')\
-                .or_(f'user1_id.eq.{user_id},user2_id.eq.{user_id}')\
-                .execute()
-            
-            if not matches_result.data:
-                logger.debug(f"No matches found for user {user_id}")
-                return []
-            
-            # Extract match IDs
-            match_ids = [match['id'] for match in matches_result.data]
-            logger.debug(f"Found {len(match_ids)} matches for user {user_id}")
+            result = await execute_async(self.supabase.rpc(
+                'get_user_reputation_counts', {'p_user_ids': list(dict.fromkeys(user_ids))}
+            ))
             
-            # Query sessions for these matches
-            result = self.supabase.table('wingman_sessions')\
-                .select("""
-                    id,
-                    match_id,
-                    status,
-                    completed_at,
-                    user1_completed_confirmed_by_user2,
-                    user2_completed_confirmed_by_user1,
-                    created_at,
-                    wingman_matches!inner(
-                        user1_id,
-                        user2_id
-                    )
-                """)\
-                .in_('match_id', match_ids)\
-                .execute()
-            
-            if result.data:
-                logger.debug(f"Found {len(result.data)} sessions for user {user_id}")
-                return result.data
-            else:
-                logger.debug(f"No sessions found for user {user_id}")
-                return []
+            counts = {
+                str(row['user_id']): (row['completed_sessions'] or 0, row['no_shows'] or 0)
+                for row in result.data or []
+            }
+            logger.debug(f"Aggregated session counts for {len(counts)} users")
+            return counts
                 
         except Exception as e:
-            logger.error(f"Database error getting session history for user {user_id}: {e}")
+            logger.error(f"Database error getting session counts for {len(user_ids)} users: {e}")
             raise Exception(f"Failed to fetch session history: {str(e)}")
     
-    def _count_completed_sessions(self, sessions: List[Dict[str, Any]], user_id: str) -> int:
-        """
-        Count successfully completed sessions for the user
-        
-        A session is completed if:
-        - Status is 'completed'
-        - User's completion was confirmed by their buddy
-        """
-        completed_count = 0
-        
-        for session in sessions:
-            if session.get('status') != 'completed':
-                continue
-                
-            # Determine if this user's completion was confirmed
-            match = session.get('wingman_matches', {})
-            user1_id = match.get('user1_id')
-            user2_id = match.get('user2_id')
-            
-            # Check which user this is and if their completion was confirmed
-            if user_id == user1_id:
-                # User is user1, check if user2 confirmed their completion
-                if session.get('user1_completed_confirmed_by_user2'):
-                    completed_count += 1
-            elif user_id == user2_id:
-                # User is user2, check if user1 confirmed their completion
-                if session.get('user2_completed_confirmed_by_user1'):
-                    completed_count += 1
-        
-        logger.debug(f"User {user_id} has {completed_count} completed sessions")
-        return completed_count
-    
-    def _count_no_shows(self, sessions: List[Dict[str, Any]], user_id: str) -> int:
-        """
-        Count no-show sessions for the user
-        
-        A session is a no-show if:
-        - Status is 'no_show' or 'cancelled'
-        - The user was responsible for the no-show (simplified: count all for now)
-        """
-        no_show_count = 0
-        
-        for session in sessions:
-            if session.get('status') in ['no_show', 'cancelled']:
-                no_show_count += 1
-        
-        logger.debug(f"User {user_id} has {no_show_count} no-show sessions")
-        return no_show_count
-    
     def _get_badge_color(self, score: int) -> str:
         """
         Determine badge color based on reputation score
@@ -218,6 +206,7 @@ class ReputationService:
     
     CACHE_TTL = 300  # 5 minutes
     CACHE_KEY_PREFIX = "reputation:user"
+    CACHE_TAG = "reputation"
     
     def __init__(self):
         self.calculator = ReputationCalculator()
@@ -240,9 +229,10 @@ class ReputationService:
                 logger.debug(f"Cache hit for user reputation {user_id}")
                 return cached_data
         
-        # Calculate fresh reputation data
-        logger.debug(f"Calculating fresh reputation for user {user_id}")
-        reputation_data = await self.calculator.calculate_user_reputation(user_id)
+        # Read the maintained counters
+        logger.debug(f"Loading reputation counters for user {user_id}")
+        reputations = await self.calculator.load_reputations([user_id])
+        reputation_data = reputations[user_id]
         
         # Cache the result if caching is enabled
         if use_cache:
@@ -250,6 +240,82 @@ class ReputationService:
         
         return reputation_data
     
+    async def get_reputations(self, user_ids: List[str], use_cache: bool = True) -> Dict[str, ReputationData]:
+        """
+        Get reputation for many users at once
+        
+        Cache hits are fetched with one MGET; all misses are read together in
+        one database query and written back in one pipelined round trip.
+        
+        Args:
+            user_ids: UUID strings of the users
+            use_cache: Whether to use Redis cache (default True)
+            
+        Returns:
+            Dict mapping each user_id to its ReputationData, in request order
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        reputations: Dict[str, ReputationData] = {}
+        
+        if use_cache:
+            reputations.update(await self._get_cached_reputations(user_ids))
+        
+        misses = [user_id for user_id in user_ids if user_id not in reputations]
+        if misses:
+            logger.debug(f"Loading reputation counters for {len(misses)} of {len(user_ids)} users")
+            loaded = await self.calculator.load_reputations(misses)
+            reputations.update(loaded)
+            
+            if use_cache:
+                await self._cache_reputations(loaded)
+        
+        return {user_id: reputations[user_id] for user_id in user_ids}
+    
+    async def reconcile_counters(self, user_ids: Optional[List[str]] = None,
+                                 repair: bool = True) -> Dict[str, Any]:
+        """
+        Recompute reputation from session history and compare with the counters
+        
+        Drift means a session outcome changed without the trigger seeing it
+        (e.g. a match deleted with its sessions, or a manual data fix).
+        
+        Args:
+            user_ids: Users to check (default: every user with sessions or counters)
+            repair: Overwrite drifted counters with the recomputed values
+            
+        Returns:
+            Dict with the drifted users and their stored vs recomputed counts
+        """
+        if user_ids is not None:
+            self.calculator._validate_user_ids(user_ids)
+        
+        result = await execute_async(self.calculator.supabase.rpc(
+            'reconcile_user_reputation', {'p_user_ids': user_ids, 'p_repair': repair}
+        ))
+        
+        drift = [
+            {
+                'user_id': str(row['user_id']),
+                'stored': {'completed_sessions': row['stored_completed_sessions'], 'no_shows': row['stored_no_shows']},
+                'actual': {'completed_sessions': row['completed_sessions'], 'no_shows': row['no_shows']}
+            }
+            for row in result.data or []
+        ]
+        
+        if drift:
+            logger.warning(f"Reputation counters drifted for {len(drift)} users (repair={repair})")
+            if repair:
+                for entry in drift:
+                    await self.invalidate_user_cache(entry['user_id'])
+        else:
+            logger.info("Reputation counters match session history")
+        
+        return {
+            'drifted': len(drift),
+            'repaired': repair and bool(drift),
+            'drift': drift
+        }
+    
     async def _get_cached_reputation(self, user_id: str) -> Optional[ReputationData]:
         """Get reputation data from Redis cache"""
         try:
@@ -289,7 +355,7 @@ class ReputationService:
                 'cache_timestamp': reputation_data.cache_timestamp
             }
             
-            success = await RedisSession.set_session(cache_key, cache_data, self.CACHE_TTL)
+            success = await RedisSession.set_session(cache_key, cache_data, self.CACHE_TTL, tags=[self.CACHE_TAG])
             if success:
                 logger.debug(f"Cached reputation for user {user_id} with TTL {self.CACHE_TTL}s")
             
@@ -299,6 +365,39 @@ class ReputationService:
             logger.warning(f"Cache storage failed for user {user_id}: {e}")
             return False
     
+    async def _get_cached_reputations(self, user_ids: List[str]) -> Dict[str, ReputationData]:
+        """Get cached reputation data for several users with one MGET"""
+        try:
+            from src.redis_session import RedisSession
+            
+            cache_keys = {user_id: f"{self.CACHE_KEY_PREFIX}:{user_id}" for user_id in user_ids}
+            cached = await RedisSession.get_sessions(list(cache_keys.values()))
+            
+            return {
+                user_id: ReputationData(**cached[cache_key])
+                for user_id, cache_key in cache_keys.items()
+                if cached.get(cache_key)
+            }
+            
+        except Exception as e:
+            logger.warning(f"Batch cache retrieval failed for {len(user_ids)} users: {e}")
+            return {}
+    
+    async def _cache_reputations(self, reputations: Dict[str, ReputationData]) -> bool:
+        """Cache reputation data for several users in one round trip"""
+        try:
+            from src.redis_session import RedisSession
+            
+            return await RedisSession.set_sessions(
+                {f"{self.CACHE_KEY_PREFIX}:{user_id}": asdict(data) for user_id, data in reputations.items()},
+                self.CACHE_TTL,
+                tags=[self.CACHE_TAG]
+            )
+            
+        except Exception as e:
+            logger.warning(f"Batch cache storage failed for {len(reputations)} users: {e}")
+            return False
+    
     async def invalidate_user_cache(self, user_id: str) -> bool:
         """Invalidate cached reputation for a specific user"""
         try:
@@ -309,10 +408,10 @@ class ReputationService:
                 return False
             
             cache_key = f"{self.CACHE_KEY_PREFIX}:{user_id}"
-            result = await RedisSession._client.delete(cache_key)
+            result = await RedisSession.delete_session(cache_key)
             
             logger.info(f"Invalidated reputation cache for user {user_id}")
-            return result > 0
+            return result
             
         except Exception as e:
             logger.error(f"Cache invalidation failed for user {user_id}: {e}")
@@ -327,17 +426,10 @@ class ReputationService:
                 logger.warning("Redis unavailable - cache not invalidated")
                 return False
             
-            # Find all reputation cache keys
-            pattern = f"{self.CACHE_KEY_PREFIX}:*"
-            keys = await RedisSession._client.keys(pattern)
-            
-            if keys:
-                await RedisSession._client.delete(*keys)
-                logger.info(f"Invalidated {len(keys)} reputation cache entries")
-                return True
-            else:
-                logger.info("No reputation cache entries to invalidate")
-                return True
+            # Every cached reputation is registered under one tag
+            invalidated = await RedisSession.invalidate_tag(self.CACHE_TAG)
+            logger.info(f"Invalidated {invalidated} reputation cache entries")
+            return True
                 
         except Exception as e:
             logger.error(f"Bulk cache invalidation failed: {e}")
@@ -7,18 +7,22 @@ Implements the auto-matching algorithm for finding wingman buddies based on:
 - Experience level compatibility (same or ±1 level)
 - Recency filtering to avoid recent pairs
 - Throttling to ensure one active pending match per user
+- Batch mode that pairs a whole set of users or a city in one pass
 
 Follows established patterns from WingmanMemory and ConfidenceTestAgent for 
 auto-dependency creation and error handling.
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Set, Tuple
 from datetime import datetime, timezone, timedelta
 from supabase import Client
 
 from src.database import SupabaseFactory
+from src.db.async_client import execute_async
 from src.db.distance import find_candidates_within_radius, BuddyCandidate
+from src.db.geo_index import candidate_index, IndexedLocation
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +36,12 @@ class WingmanMatcher:
         'advanced': 3
     }
     
+    # Users paired within this many days are not matched again
+    RECENT_PAIRING_DAYS = 7
+    
+    # Max user IDs per PostgREST in.() filter to keep request URLs bounded
+    BATCH_QUERY_CHUNK_SIZE = 200
+    
     def __init__(self, supabase_client: Client):
         self.supabase = supabase_client
         
@@ -142,13 +152,13 @@ class WingmanMatcher:
                 return None
             
             # Filter out users who were recently paired (last 7 days)
-            recent_cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+            # Load all recent partners in one query and filter in memory
+            recent_cutoff = datetime.now(timezone.utc) - timedelta(days=self.RECENT_PAIRING_DAYS)
+            recent_partners = await self._get_recent_partners(user_id, recent_cutoff)
             filtered_candidates = []
             
             for candidate in compatible_candidates:
-                # Check if they were recently matched
-                recent_match = await self._check_recent_pairing(user_id, candidate.user_id, recent_cutoff)
-                if not recent_match:
+                if candidate.user_id not in recent_partners:
                     filtered_candidates.append(candidate)
                 else:
                     logger.info(f"Excluding candidate {candidate.user_id} - recently paired with {user_id}")
@@ -171,6 +181,225 @@ class WingmanMatcher:
             logger.error(f"Error finding best candidate for user {user_id}: {e}")
             return None
     
+    async def create_batch_matches(
+        self,
+        user_ids: Optional[List[str]] = None,
+        city: Optional[str] = None,
+        max_radius_miles: int = 25
+    ) -> Dict[str, Any]:
+        """
+        Pair many users at once with a single global matching pass
+        
+        Builds the compatibility graph once (distance, experience level, recency,
+        existing pending matches), picks a greedy closest-first matching so no user
+        is claimed twice, and inserts all wingman_matches rows in one bulk write.
+        
+        Args:
+            user_ids: Users to match (optional if city is given)
+            city: Match every located user in this city (case-insensitive)
+            max_radius_miles: Maximum distance between paired users
+            
+        Returns:
+            Dict with success status, created matches, unmatched users and throughput stats
+        """
+        started = time.perf_counter()
+        
+        try:
+            await candidate_index.ensure_loaded(self.supabase)
+            
+            # Resolve the user pool from the location index
+            if user_ids:
+                pool = [candidate_index.get(uid) for uid in dict.fromkeys(user_ids)]
+                pool = [location for location in pool if location and location.is_matchable]
+            elif city:
+                city_key = city.strip().lower()
+                pool = [
+                    location for location in candidate_index.locations()
+                    if location.is_matchable and (location.city or '').strip().lower() == city_key
+                ]
+            else:
+                raise ValueError("Either user_ids or city is required for batch matching")
+            
+            pool_ids = [location.user_id for location in pool]
+            
+            # Load pending matches and recent pairings for the whole pool up front
+            pending_users = await self._get_users_with_pending_match(pool_ids)
+            recent_cutoff = datetime.now(timezone.utc) - timedelta(days=self.RECENT_PAIRING_DAYS)
+            recent_pairs = await self._get_recent_pairs(pool_ids, recent_cutoff)
+            
+            eligible = [location for location in pool if location.user_id not in pending_users]
+            edges = self._build_compatibility_edges(eligible, recent_pairs, max_radius_miles)
+            pairs = self._select_pairs(edges)
+            
+            matches = await self.create_match_records(pairs)
+            
+            matched_users = {uid for pair in pairs for uid in pair}
+            elapsed = time.perf_counter() - started
+            
+            logger.info(f"Batch matching paired {len(matches)} couples from {len(pool)} users "
+                       f"({len(edges)} compatible edges) in {elapsed * 1000:.1f}ms")
+            
+            return {
+                "success": True,
+                "message": f"Created {len(matches)} wingman matches for {len(pool)} users",
+                "matches": [
+                    {"match_id": match['id'], "user1_id": match['user1_id'], "user2_id": match['user2_id']}
+                    for match in matches
+                ],
+                "unmatched_user_ids": [
+                    location.user_id for location in eligible if location.user_id not in matched_users
+                ],
+                "stats": {
+                    "users_considered": len(pool),
+                    "users_with_pending_match": len(pending_users),
+                    "compatible_edges": len(edges),
+                    "matches_created": len(matches),
+                    "elapsed_ms": round(elapsed * 1000, 1),
+                    "users_per_second": round(len(pool) / elapsed, 1) if elapsed > 0 else None
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error running batch matching: {e}")
+            return {
+                "success": False,
+                "message": f"Unable to run batch matching: {e}",
+                "matches": [],
+                "unmatched_user_ids": [],
+                "stats": {"elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+            }
+    
+    def _build_compatibility_edges(
+        self,
+        pool: List[IndexedLocation],
+        recent_pairs: Set[Tuple[str, str]],
+        max_radius_miles: float
+    ) -> List[Tuple[float, str, str]]:
+        """
+        Build compatible (distance, user1_id, user2_id) edges within the pool
+        
+        Uses the same rules as single-user matching: within radius, experience
+        level same or ±1, and not paired in the recency window. Edge user IDs use
+        the deterministic user1 < user2 ordering.
+        """
+        pool_by_id = {location.user_id: location for location in pool}
+        edges = []
+        
+        for location in pool:
+            level = self.EXPERIENCE_LEVELS.get(location.experience_level, 2)
+            nearby = candidate_index.query_radius(
+                location.lat, location.lng, max_radius_miles, exclude_user_id=location.user_id
+            )
+            for neighbor, distance in nearby:
+                # Each undirected edge is emitted once, from its lower user ID
+                if neighbor.user_id not in pool_by_id or neighbor.user_id < location.user_id:
+                    continue
+                
+                neighbor_level = self.EXPERIENCE_LEVELS.get(neighbor.experience_level, 2)
+                if abs(level - neighbor_level) > 1:
+                    continue
+                
+                pair = (location.user_id, neighbor.user_id)
+                if pair in recent_pairs:
+                    continue
+                
+                edges.append((distance, location.user_id, neighbor.user_id))
+        
+        return edges
+    
+    @staticmethod
+    def _select_pairs(edges: List[Tuple[float, str, str]]) -> List[Tuple[str, str]]:
+        """
+        Greedy closest-first matching over compatibility edges
+        
+        Each user is paired at most once; ties are broken by user IDs so the
+        result is deterministic for a given pool.
+        """
+        claimed = set()
+        pairs = []
+        
+        for _, user1_id, user2_id in sorted(edges):
+            if user1_id in claimed or user2_id in claimed:
+                continue
+            claimed.add(user1_id)
+            claimed.add(user2_id)
+            pairs.append((user1_id, user2_id))
+        
+        return pairs
+    
+    async def create_match_records(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Insert pending wingman match records for many pairs in one bulk write
+        
+        Args:
+            pairs: (user1_id, user2_id) tuples; ordering is normalized here
+            
+        Returns:
+            Created match records
+        """
+        if not pairs:
+            return []
+        
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for user1_id, user2_id in pairs:
+            if user1_id > user2_id:
+                user1_id, user2_id = user2_id, user1_id
+            rows.append({
+                'user1_id': user1_id,
+                'user2_id': user2_id,
+                'status': 'pending',
+                'user1_reputation': 0,
+                'user2_reputation': 0,
+                'created_at': created_at
+            })
+        
+        result = await execute_async(self.supabase.table('wingman_matches')\
+            .insert(rows))
+        
+        if not result.data:
+            raise Exception("Failed to create batch match records")
+        
+        logger.info(f"Bulk created {len(result.data)} wingman matches")
+        return result.data
+    
+    def _chunked(self, user_ids: List[str]) -> List[List[str]]:
+        size = self.BATCH_QUERY_CHUNK_SIZE
+        return [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+    
+    async def _get_users_with_pending_match(self, user_ids: List[str]) -> Set[str]:
+        """Users from the list that already hold a pending match (throttling)"""
+        pool = set(user_ids)
+        pending = set()
+        
+        for chunk in self._chunked(user_ids):
+            ids = ','.join(chunk)
+            result = await execute_async(self.supabase.table('wingman_matches')\
+                .select('user1_id, user2_id')\
+                .eq('status', 'pending')\
+                .or_(f'user1_id.in.({ids}),user2_id.in.({ids})'))
+            
+            for match in result.data or []:
+                pending.update(uid for uid in (match['user1_id'], match['user2_id']) if uid in pool)
+        
+        return pending
+    
+    async def _get_recent_pairs(self, user_ids: List[str], cutoff_date: datetime) -> Set[Tuple[str, str]]:
+        """Ordered (user1_id, user2_id) pairs created since the cutoff for any listed user"""
+        pairs = set()
+        
+        for chunk in self._chunked(user_ids):
+            ids = ','.join(chunk)
+            result = await execute_async(self.supabase.table('wingman_matches')\
+                .select('user1_id, user2_id')\
+                .or_(f'user1_id.in.({ids}),user2_id.in.({ids})')\
+                .gte('created_at', cutoff_date.isoformat()))
+            
+            for match in result.data or []:
+                pairs.add(tuple(sorted((match['user1_id'], match['user2_id']))))
+        
+        return pairs
+    
     async def create_match_record(self, user1_id: str, user2_id: str) -> Dict[str, Any]:
         """
         Create wingman match record with deterministic user ordering
@@ -188,12 +417,11 @@ class WingmanMatcher:
                 user1_id, user2_id = user2_id, user1_id
             
             # Check if match already exists (duplicate prevention)
-            existing = self.supabase.table('wingman_matches')\
+            existing = await execute_async(self.supabase.table('wingman_matches')\
                 .select('*')\
                 .eq('user1_id', user1_id)\
                 .eq('user2_id', user2_id)\
-                .eq('status', 'pending')\
-                .execute()
+                .eq('status', 'pending'))
             
             if existing.data:
                 logger.info(f"Match already exists between {user1_id} and {user2_id}")
@@ -209,9 +437,8 @@ class WingmanMatcher:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            result = self.supabase.table('wingman_matches')\
-                .insert(match_data)\
-                .execute()
+            result = await execute_async(self.supabase.table('wingman_matches')\
+                .insert(match_data))
             
             if not result.data:
                 raise Exception("Failed to create match record")
@@ -237,11 +464,10 @@ class WingmanMatcher:
         """
         try:
             # Check both user1_id and user2_id positions
-            result = self.supabase.table('wingman_matches')\
+            result = await execute_async(self.supabase.table('wingman_matches')\
                 .select('*')\
                 .eq('status', 'pending')\
-                .or_(f'user1_id.eq.{user_id},user2_id.eq.{user_id}')\
-                .execute()
+                .or_(f'user1_id.eq.{user_id},user2_id.eq.{user_id}'))
             
             if result.data:
                 match = result.data[0]
@@ -271,10 +497,9 @@ class WingmanMatcher:
         """
         try:
             # Check if user profile exists
-            result = self.supabase.table('user_profiles')\
+            result = await execute_async(self.supabase.table('user_profiles')\
                 .select('id')\
-                .eq('id', user_id)\
-                .execute()
+                .eq('id', user_id))
             
             if not result.data:
                 # Create minimal user profile with auto-dependency creation pattern
@@ -290,7 +515,7 @@ class WingmanMatcher:
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }
                 
-                self.supabase.table('user_profiles').insert(profile_data).execute()
+                await execute_async(self.supabase.table('user_profiles').insert(profile_data))
                 logger.info(f"Auto-created user profile for {user_id}")
         
         except Exception as e:
@@ -299,10 +524,9 @@ class WingmanMatcher:
     async def _get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user profile information"""
         try:
-            result = self.supabase.table('user_profiles')\
+            result = await execute_async(self.supabase.table('user_profiles')\
                 .select('id, first_name, experience_level, confidence_archetype')\
-                .eq('id', user_id)\
-                .execute()
+                .eq('id', user_id))
             
             if result.data:
                 return result.data[0]
@@ -314,32 +538,30 @@ class WingmanMatcher:
             logger.error(f"Error getting user profile for {user_id}: {e}")
             return None
     
-    async def _check_recent_pairing(self, user1_id: str, user2_id: str, cutoff_date: datetime) -> bool:
+    async def _get_recent_partners(self, user_id: str, cutoff_date: datetime) -> Set[str]:
         """
-        Check if two users were recently paired
+        Get every user paired with user_id since the cutoff in a single query
         
         Args:
-            user1_id: First user ID
-            user2_id: Second user ID  
+            user_id: User to look up
             cutoff_date: Date threshold for "recent"
             
         Returns:
-            True if recently paired, False otherwise
+            Set of partner user IDs (empty if the lookup fails)
         """
         try:
-            # Use deterministic ordering for consistent checks
-            if user1_id > user2_id:
-                user1_id, user2_id = user2_id, user1_id
-            
-            result = self.supabase.table('wingman_matches')\
-                .select('id, created_at')\
-                .eq('user1_id', user1_id)\
-                .eq('user2_id', user2_id)\
-                .gte('created_at', cutoff_date.isoformat())\
-                .execute()
+            # Matches store the pair in deterministic user1/user2 order, so the
+            # user can be on either side
+            result = await execute_async(self.supabase.table('wingman_matches')\
+                .select('user1_id, user2_id')\
+                .or_(f'user1_id.eq.{user_id},user2_id.eq.{user_id}')\
+                .gte('created_at', cutoff_date.isoformat()))
             
-            return len(result.data) > 0
+            return {
+                match['user2_id'] if match['user1_id'] == user_id else match['user1_id']
+                for match in result.data or []
+            }
             
         except Exception as e:
-            logger.error(f"Error checking recent pairing for {user1_id} and {user2_id}: {e}")
-            return False  # If we can't check, allow the pairing
\ No newline at end of file
+            logger.error(f"Error loading recent partners for {user_id}: {e}")
+            return set()  # If we can't check, allow the pairing
\ No newline at end of file
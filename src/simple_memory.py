@@ -17,6 +17,8 @@ from supabase import Client
 
 from src.config import Config
 from src.database import get_db_service
+from src.db.async_client import execute_async, gather_queries
+from src.coaching_context_cache import CoachingContextCache, coaching_context_cache
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +41,10 @@ class WingmanMemory:
             # Check last 10 minutes for duplicates
             recent_cutoff = datetime.now(timezone.utc) - timedelta(minutes=10)
             
-            result = self.supabase.table('conversations')\
+            result = await execute_async(self.supabase.table('conversations')\
                 .select('id, message_text, context')\
                 .eq('user_id', self.user_id)\
-                .gte('created_at', recent_cutoff.isoformat())\
-                .execute()
+                .gte('created_at', recent_cutoff.isoformat()))
             
             for record in result.data:
                 existing_content = record.get('message_text', '')
@@ -65,10 +66,9 @@ class WingmanMemory:
         """Ensure user profile exists to prevent foreign key constraint violations"""
         try:
             # Check if user profile exists
-            result = self.supabase.table('user_profiles')\
+            result = await execute_async(self.supabase.table('user_profiles')\
                 .select('id')\
-                .eq('id', user_id)\
-                .execute()
+                .eq('id', user_id))
             
             if not result.data:
                 # Create minimal user profile
@@ -83,7 +83,7 @@ class WingmanMemory:
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }
                 
-                self.supabase.table('user_profiles').insert(profile_data).execute()
+                await execute_async(self.supabase.table('user_profiles').insert(profile_data))
                 logger.info(f"Auto-created user profile for {user_id}")
             
         except Exception as e:
@@ -121,9 +121,15 @@ class WingmanMemory:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            result = self.supabase.table('conversations').insert(conversation_data).execute()
+            result = await execute_async(self.supabase.table('conversations').insert(conversation_data))
             logger.info(f"Stored message for thread {thread_id}, role: {role}")
             
+            # Extend the cached thread history instead of re-reading the thread
+            stored = result.data[0] if result.data else conversation_data
+            await coaching_context_cache.append_message(
+                self.user_id, thread_id, self._format_history_message(stored)
+            )
+            
             # Check if we need session summarization
             await self._check_session_buffer(thread_id)
             
@@ -135,11 +141,10 @@ class WingmanMemory:
         """Check if session needs summarization based on message count"""
         try:
             # Count messages in current thread
-            result = self.supabase.table('conversations')\
+            result = await execute_async(self.supabase.table('conversations')\
                 .select('id', count='exact')\
                 .eq('user_id', self.user_id)\
-                .eq('context->>thread_id', thread_id)\
-                .execute()
+                .eq('context->>thread_id', thread_id))
             
             message_count = result.count or 0
             
@@ -155,12 +160,11 @@ class WingmanMemory:
         """Create session summary for coaching continuity"""
         try:
             # Get messages from current thread
-            messages = self.supabase.table('conversations')\
+            messages = await execute_async(self.supabase.table('conversations')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .eq('context->>thread_id', thread_id)\
-                .order('created_at')\
-                .execute()
+                .order('created_at'))
             
             if not messages.data:
                 logger.warning(f"No messages found for session {thread_id}")
@@ -187,22 +191,26 @@ class WingmanMemory:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            self.supabase.table('coaching_sessions').insert(summary_data).execute()
+            result = await execute_async(self.supabase.table('coaching_sessions').insert(summary_data))
             logger.info(f"Created session summary for thread {thread_id}")
             
+            stored = result.data[0] if result.data else summary_data
+            await coaching_context_cache.prepend_to_section(
+                self.user_id, 'session_history', self._format_session_summary(stored)
+            )
+            
         except Exception as e:
             logger.error(f"Error summarizing session: {e}")
 
     async def get_conversation_history(self, thread_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get conversation history for current thread"""
         try:
-            result = self.supabase.table('conversations')\
+            result = await execute_async(self.supabase.table('conversations')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .eq('context->>thread_id', thread_id)\
                 .order('created_at')\
-                .limit(limit)\
-                .execute()
+                .limit(limit))
             
             messages = []
             for msg in result.data:
@@ -218,104 +226,150 @@ class WingmanMemory:
             logger.error(f"Error getting conversation history: {e}")
             return []
 
-    async def get_coaching_context(self, thread_id: str) -> Dict[str, Any]:
-        """Get comprehensive coaching context including memory hooks"""
+    async def get_coaching_context(self, thread_id: str, include_profile: bool = False) -> Dict[str, Any]:
+        """
+        Get comprehensive coaching context including memory hooks
+        
+        Sections are served from the coaching context cache; only sections that
+        are missing (first load, or invalidated by a write) are read from the
+        database, concurrently, and then written back to the cache.
+        
+        Args:
+            thread_id: Conversation thread to load history for
+            include_profile: Also load the user_profiles row as 'user_profile'
+        """
         try:
-            context = {
-                'conversation_history': [],
-                'session_history': [],
-                'assessment_results': None,
-                'recent_attempts': [],
-                'confidence_triggers': [],
-                'coaching_notes': [],
-                'dating_goals': None
+            context = self._empty_coaching_context(include_profile)
+            
+            cached_sections = await coaching_context_cache.get_sections(self.user_id)
+            cached_history, history_version = await coaching_context_cache.get_history(self.user_id, thread_id)
+            
+            section_queries = self._coaching_section_queries()
+            if include_profile:
+                section_queries['user_profile'] = self.supabase.table('user_profiles')\
+                    .select('*')\
+                    .eq('id', self.user_id)
+            missing = [name for name in section_queries if name not in cached_sections]
+            
+            queries = [section_queries[name] for name in missing]
+            if cached_history is None:
+                # Conversation history - newest 20 messages, returned oldest first
+                queries.append(
+                    self.supabase.table('conversations')\
+                        .select('*')\
+                        .eq('user_id', self.user_id)\
+                        .eq('context->>thread_id', thread_id)\
+                        .order('created_at', desc=True)\
+                        .limit(CoachingContextCache.HISTORY_LIMIT)
+                )
+            
+            results = await gather_queries(*queries) if queries else []
+            
+            loaded_sections = {
+                name: self._parse_coaching_section(name, result.data or [])
+                for name, result in zip(missing, results)
             }
+            if loaded_sections:
+                await coaching_context_cache.set_sections(self.user_id, loaded_sections, cached_sections.version)
             
-            # Get conversation history
-            context['conversation_history'] = await self.get_conversation_history(thread_id)
+            if cached_history is None:
+                cached_history = [
+                    self._format_history_message(msg)
+                    for msg in reversed(results[-1].data or [])
+                ]
+                await coaching_context_cache.set_history(self.user_id, thread_id, cached_history, history_version)
             
-            # Get session history (memory hook)
-            session_result = self.supabase.table('coaching_sessions')\
+            for name in section_queries:
+                context[name] = loaded_sections[name] if name in loaded_sections else cached_sections[name]
+            context['conversation_history'] = list(cached_history)
+            
+            return context
+            
+        except Exception as e:
+            logger.error(f"Error getting coaching context: {e}")
+            return self._empty_coaching_context(include_profile)
+
+    def _coaching_section_queries(self) -> Dict[str, Any]:
+        """Query builders for each cacheable coaching context section"""
+        return {
+            # Session history (memory hook)
+            'session_history': self.supabase.table('coaching_sessions')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .order('created_at', desc=True)\
-                .limit(5)\
-                .execute()
-            
-            context['session_history'] = [
-                {
-                    'session_id': s.get('session_id'),
-                    'summary': s.get('summary'),
-                    'date': s.get('created_at'),
-                    'message_count': s.get('message_count', 0)
-                }
-                for s in session_result.data
-            ]
-            
-            # Get assessment results (memory hook)
-            assessment_result = self.supabase.table('confidence_assessments')\
+                .limit(5),
+            # Assessment results (memory hook)
+            'assessment_results': self.supabase.table('confidence_assessments')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
-            
-            if assessment_result.data:
-                context['assessment_results'] = assessment_result.data[0]
-            
-            # Get recent attempts (memory hook)
-            attempts_result = self.supabase.table('approach_attempts')\
+                .limit(1),
+            # Recent attempts (memory hook)
+            'recent_attempts': self.supabase.table('approach_attempts')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .order('created_at', desc=True)\
-                .limit(10)\
-                .execute()
-            
-            context['recent_attempts'] = attempts_result.data or []
-            
-            # Get confidence triggers (memory hook)
-            triggers_result = self.supabase.table('confidence_triggers')\
+                .limit(10),
+            # Confidence triggers (memory hook)
+            'confidence_triggers': self.supabase.table('confidence_triggers')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
-                .eq('is_active', True)\
-                .execute()
-            
-            context['confidence_triggers'] = triggers_result.data or []
-            
-            # Get coaching notes (memory hook)
-            notes_result = self.supabase.table('coaching_notes')\
+                .eq('is_active', True),
+            # Coaching notes (memory hook)
+            'coaching_notes': self.supabase.table('coaching_notes')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .order('created_at', desc=True)\
-                .limit(5)\
-                .execute()
-            
-            context['coaching_notes'] = notes_result.data or []
-            
-            # Get dating goals (memory hook)
-            goals_result = self.supabase.table('dating_goals')\
+                .limit(5),
+            # Dating goals (memory hook)
+            'dating_goals': self.supabase.table('dating_goals')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
-            
-            if goals_result.data:
-                context['dating_goals'] = goals_result.data[0]
-            
-            return context
-            
-        except Exception as e:
-            logger.error(f"Error getting coaching context: {e}")
-            return {
-                'conversation_history': [],
-                'session_history': [],
-                'assessment_results': None,
-                'recent_attempts': [],
-                'confidence_triggers': [],
-                'coaching_notes': [],
-                'dating_goals': None
-            }
+                .limit(1)
+        }
+
+    @staticmethod
+    def _parse_coaching_section(name: str, rows: List[Dict[str, Any]]) -> Any:
+        """Convert raw rows for a context section into its context value"""
+        if name == 'session_history':
+            return [WingmanMemory._format_session_summary(s) for s in rows]
+        if name in ('assessment_results', 'dating_goals', 'user_profile'):
+            return rows[0] if rows else None
+        return rows
+
+    @staticmethod
+    def _format_session_summary(session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'session_id': session.get('session_id'),
+            'summary': session.get('summary'),
+            'date': session.get('created_at'),
+            'message_count': session.get('message_count', 0)
+        }
+
+    @staticmethod
+    def _format_history_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'role': msg.get('role'),
+            'content': msg.get('message_text'),
+            'timestamp': msg.get('created_at')
+        }
+
+    @staticmethod
+    def _empty_coaching_context(include_profile: bool = False) -> Dict[str, Any]:
+        """Context shape returned when nothing is stored yet (or loading fails)"""
+        context = {
+            'conversation_history': [],
+            'session_history': [],
+            'assessment_results': None,
+            'recent_attempts': [],
+            'confidence_triggers': [],
+            'coaching_notes': [],
+            'dating_goals': None
+        }
+        if include_profile:
+            context['user_profile'] = None
+        return context
 
     # Memory hook methods for dating confidence coaching
     
@@ -334,8 +388,12 @@ class WingmanMemory:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            self.supabase.table('confidence_assessments').insert(assessment_record).execute()
+            result = await execute_async(self.supabase.table('confidence_assessments').insert(assessment_record))
             logger.info(f"Stored assessment results for user {self.user_id}")
+            
+            await coaching_context_cache.update_section(
+                self.user_id, 'assessment_results', result.data[0] if result.data else assessment_record
+            )
             return True
             
         except Exception as e:
@@ -357,8 +415,12 @@ class WingmanMemory:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            self.supabase.table('approach_attempts').insert(attempt_record).execute()
+            result = await execute_async(self.supabase.table('approach_attempts').insert(attempt_record))
             logger.info(f"Recorded approach attempt for user {self.user_id}")
+            
+            await coaching_context_cache.prepend_to_section(
+                self.user_id, 'recent_attempts', result.data[0] if result.data else attempt_record
+            )
             return True
             
         except Exception as e:
@@ -371,12 +433,12 @@ class WingmanMemory:
             await self.ensure_user_profile(self.user_id)
             
             # Deactivate existing triggers
-            self.supabase.table('confidence_triggers')\
+            await execute_async(self.supabase.table('confidence_triggers')\
                 .update({'is_active': False})\
-                .eq('user_id', self.user_id)\
-                .execute()
+                .eq('user_id', self.user_id))
             
             # Insert new triggers
+            active_triggers = []
             for trigger in triggers:
                 trigger_record = {
                     'user_id': self.user_id,
@@ -387,7 +449,11 @@ class WingmanMemory:
                     'created_at': datetime.now(timezone.utc).isoformat()
                 }
                 
-                self.supabase.table('confidence_triggers').insert(trigger_record).execute()
+                result = await execute_async(self.supabase.table('confidence_triggers').insert(trigger_record))
+                active_triggers.append(result.data[0] if result.data else trigger_record)
+            
+            # The inserted rows are now the complete active set
+            await coaching_context_cache.update_section(self.user_id, 'confidence_triggers', active_triggers)
             
             logger.info(f"Updated confidence triggers for user {self.user_id}")
             return True
@@ -413,8 +479,12 @@ class WingmanMemory:
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            self.supabase.table('coaching_notes').insert(notes_record).execute()
+            result = await execute_async(self.supabase.table('coaching_notes').insert(notes_record))
             logger.info(f"Saved coaching notes for user {self.user_id}")
+            
+            await coaching_context_cache.prepend_to_section(
+                self.user_id, 'coaching_notes', result.data[0] if result.data else notes_record
+            )
             return True
             
         except Exception as e:
@@ -424,12 +494,11 @@ class WingmanMemory:
     async def get_user_archetype(self, user_id: str) -> Optional[int]:
         """Get user's dating confidence archetype"""
         try:
-            result = self.supabase.table('confidence_assessments')\
+            result = await execute_async(self.supabase.table('confidence_assessments')\
                 .select('archetype')\
                 .eq('user_id', user_id)\
                 .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
+                .limit(1))
             
             if result.data and result.data[0].get('archetype'):
                 archetype = result.data[0]['archetype']
@@ -454,7 +523,7 @@ class WingmanMemory:
         
         try:
             # Test database connection
-            result = self.supabase.table('user_profiles').select('id').limit(1).execute()
+            result = await execute_async(self.supabase.table('user_profiles').select('id').limit(1))
             health["database_connection"] = True
             
             # Test user profile access
@@ -12,7 +12,9 @@ from datetime import datetime, timezone, timedelta
 
 from src.config import Config
 from src.database import get_db_service
-from src.retry_utils import with_supabase_retry
+from src.db.async_client import execute_async
+from src.coaching_context_cache import coaching_context_cache
+from src.retry_policies import with_supabase_retry
 
 logger = logging.getLogger(__name__)
 
@@ -48,16 +50,15 @@ async def get_approach_challenges(
             query = query.eq('challenge_type', challenge_type)
         
         # Order by difficulty and limit results
-        result = query.order('difficulty').limit(limit).execute()
+        result = await execute_async(query.order('difficulty').limit(limit))
         
         challenges = result.data or []
         
         # Get user's completed challenges for context
-        completed_result = db.table('approach_attempts')\
+        completed_result = await execute_async(db.table('approach_attempts')\
             .select('challenge_id')\
             .eq('user_id', user_id)\
-            .eq('outcome', 'completed')\
-            .execute()
+            .eq('outcome', 'completed'))
         
         completed_ids = [attempt['challenge_id'] for attempt in completed_result.data]
         
@@ -132,13 +133,14 @@ async def record_attempt_outcome(
             'created_at': datetime.now(timezone.utc).isoformat()
         }
         
-        result = db.table('approach_attempts').insert(attempt_data).execute()
+        result = await execute_async(db.table('approach_attempts').insert(attempt_data))
         
         if result.data:
             attempt_id = result.data[0]['id']
             
             # Update user statistics
             await _update_user_stats(user_id, outcome, confidence_rating)
+            await coaching_context_cache.prepend_to_section(user_id, 'recent_attempts', result.data[0])
             
             logger.info(f"Recorded attempt {attempt_id} for user {user_id}")
             
@@ -182,14 +184,13 @@ async def get_session_history(
             .order('created_at', desc=True)\
             .limit(limit)
         
-        result = query.execute()
+        result = await execute_async(query)
         sessions = result.data or []
         
         # Get session statistics
-        total_sessions_result = db.table('coaching_sessions')\
+        total_sessions_result = await execute_async(db.table('coaching_sessions')\
             .select('id', count='exact')\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
         
         total_sessions = total_sessions_result.count or 0
         
@@ -211,11 +212,10 @@ async def get_session_history(
         
         # Get recent activity metrics
         recent_cutoff = datetime.now(timezone.utc) - timedelta(days=30)
-        recent_sessions_result = db.table('coaching_sessions')\
+        recent_sessions_result = await execute_async(db.table('coaching_sessions')\
             .select('id', count='exact')\
             .eq('user_id', user_id)\
-            .gte('created_at', recent_cutoff.isoformat())\
-            .execute()
+            .gte('created_at', recent_cutoff.isoformat()))
         
         recent_sessions = recent_sessions_result.count or 0
         
@@ -276,10 +276,11 @@ async def update_confidence_notes(
             'created_at': datetime.now(timezone.utc).isoformat()
         }
         
-        result = db.table('coaching_notes').insert(notes_data).execute()
+        result = await execute_async(db.table('coaching_notes').insert(notes_data))
         
         if result.data:
             note_id = result.data[0]['id']
+            await coaching_context_cache.prepend_to_section(user_id, 'coaching_notes', result.data[0])
             
             # Update confidence triggers if breakthroughs were identified
             if breakthroughs:
@@ -324,12 +325,11 @@ async def get_user_progress(
         start_date = datetime.now(timezone.utc) - timedelta(days=days)
         
         # Get attempts in timeframe
-        attempts_result = db.table('approach_attempts')\
+        attempts_result = await execute_async(db.table('approach_attempts')\
             .select('*')\
             .eq('user_id', user_id)\
             .gte('created_at', start_date.isoformat())\
-            .order('created_at')\
-            .execute()
+            .order('created_at'))
         
         attempts = attempts_result.data or []
         
@@ -342,11 +342,10 @@ async def get_user_progress(
         confidence_trend = [a['confidence_rating'] for a in attempts[-10:]]  # Last 10 attempts
         
         # Get session count
-        sessions_result = db.table('coaching_sessions')\
+        sessions_result = await execute_async(db.table('coaching_sessions')\
             .select('id', count='exact')\
             .eq('user_id', user_id)\
-            .gte('created_at', start_date.isoformat())\
-            .execute()
+            .gte('created_at', start_date.isoformat()))
         
         session_count = sessions_result.count or 0
         
@@ -384,10 +383,9 @@ async def _update_user_stats(user_id: str, outcome: str, confidence_rating: int)
         db = get_db_service()
         
         # Get current stats
-        stats_result = db.table('user_stats')\
+        stats_result = await execute_async(db.table('user_stats')\
             .select('*')\
-            .eq('user_id', user_id)\
-            .execute()
+            .eq('user_id', user_id))
         
         if stats_result.data:
             # Update existing stats
@@ -400,7 +398,7 @@ async def _update_user_stats(user_id: str, outcome: str, confidence_rating: int)
                 'updated_at': datetime.now(timezone.utc).isoformat()
             }
             
-            db.table('user_stats').update(updated_stats).eq('user_id', user_id).execute()
+            await execute_async(db.table('user_stats').update(updated_stats).eq('user_id', user_id))
         else:
             # Create new stats record
             new_stats = {
@@ -413,7 +411,7 @@ async def _update_user_stats(user_id: str, outcome: str, confidence_rating: int)
                 'updated_at': datetime.now(timezone.utc).isoformat()
             }
             
-            db.table('user_stats').insert(new_stats).execute()
+            await execute_async(db.table('user_stats').insert(new_stats))
         
         logger.info(f"Updated stats for user {user_id}")
         
@@ -428,21 +426,20 @@ async def _process_breakthroughs(user_id: str, breakthroughs: List[str]):
         # Mark related triggers as resolved
         for breakthrough in breakthroughs:
             # Simple keyword matching to identify related triggers
-            triggers_result = db.table('confidence_triggers')\
+            triggers_result = await execute_async(db.table('confidence_triggers')\
                 .select('*')\
                 .eq('user_id', user_id)\
-                .eq('is_active', True)\
-                .execute()
+                .eq('is_active', True))
             
             for trigger in triggers_result.data:
                 trigger_desc = trigger.get('description', '').lower()
                 if any(word in trigger_desc for word in breakthrough.lower().split()):
                     # Mark trigger as resolved
-                    db.table('confidence_triggers')\
+                    await execute_async(db.table('confidence_triggers')\
                         .update({'is_active': False, 'resolved_date': datetime.now(timezone.utc).isoformat()})\
-                        .eq('id', trigger['id'])\
-                        .execute()
+                        .eq('id', trigger['id']))
         
+        await coaching_context_cache.invalidate_section(user_id, 'confidence_triggers')
         logger.info(f"Processed breakthroughs for user {user_id}")
         
     except Exception as e:
@@ -0,0 +1,60 @@
+-- Migration: Aggregate reputation session counts in the database
+-- File: 008_add_reputation_aggregates.sql
+-- Dependencies: 001_add_wingman_tables.sql
+-- Description: Adds get_user_reputation_counts, which returns completed session and
+--              no-show counts for a list of users in one query instead of fetching
+--              every session row and counting in the application
+
+BEGIN;
+
+-- Sessions are looked up by match and counted by status
+CREATE INDEX IF NOT EXISTS "idx_wingman_sessions_match_id_status" ON "public"."wingman_sessions"("match_id", "status");
+
+-- Returns one row per requested user (zeros for users without sessions)
+-- A completed session counts for a user only when their buddy confirmed their completion;
+-- every no_show or cancelled session in the user's matches counts as a no-show
+CREATE OR REPLACE FUNCTION "public"."get_user_reputation_counts"(
+    "p_user_ids" UUID[]
+) RETURNS TABLE (
+    "user_id" UUID,
+    "completed_sessions" INTEGER,
+    "no_shows" INTEGER
+)
+LANGUAGE "sql"
+STABLE
+AS $$
+    WITH requested AS (
+        SELECT DISTINCT unnest(p_user_ids) AS user_id
+    ),
+    participations AS (
+        -- Split on participant column so each side uses its own index
+        SELECT m.id AS match_id, m.user1_id AS user_id, TRUE AS is_user1
+        FROM "public"."wingman_matches" m
+        WHERE m.user1_id = ANY(p_user_ids)
+        UNION ALL
+        SELECT m.id, m.user2_id, FALSE
+        FROM "public"."wingman_matches" m
+        WHERE m.user2_id = ANY(p_user_ids)
+          AND m.user2_id IS DISTINCT FROM m.user1_id
+    )
+    SELECT
+        r.user_id,
+        (COUNT(s.id) FILTER (
+            WHERE s.status = 'completed'
+              AND CASE WHEN p.is_user1
+                       THEN s.user1_completed_confirmed_by_user2
+                       ELSE s.user2_completed_confirmed_by_user1 END
+        ))::INTEGER AS completed_sessions,
+        (COUNT(s.id) FILTER (
+            WHERE s.status IN ('no_show', 'cancelled')
+        ))::INTEGER AS no_shows
+    FROM requested r
+    LEFT JOIN participations p ON p.user_id = r.user_id
+    LEFT JOIN "public"."wingman_sessions" s ON s.match_id = p.match_id
+    GROUP BY r.user_id;
+$$;
+
+-- Set function ownership
+ALTER FUNCTION "public"."get_user_reputation_counts"(UUID[]) OWNER TO "postgres";
+
+COMMIT;
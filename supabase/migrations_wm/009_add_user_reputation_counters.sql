@@ -0,0 +1,260 @@
+-- Migration: Materialized per-user reputation counters
+-- File: 009_add_user_reputation_counters.sql
+-- Dependencies: 001_add_wingman_tables.sql, 008_add_reputation_aggregates.sql
+-- Description: Adds user_reputation, kept up to date by a trigger on wingman_sessions so
+--              reputation reads are a single primary key lookup, plus
+--              reconcile_user_reputation to detect and repair drift from session history
+
+BEGIN;
+
+-- One row per user; score and badge follow the ReputationCalculator rules
+-- (score = completed - no-shows bounded to [-5, 20]; gold >= 10, green >= 0, red otherwise)
+CREATE TABLE IF NOT EXISTS "public"."user_reputation" (
+    "user_id" "uuid" NOT NULL,
+    "completed_sessions" INTEGER DEFAULT 0 NOT NULL,
+    "no_shows" INTEGER DEFAULT 0 NOT NULL,
+    "score" INTEGER GENERATED ALWAYS AS (
+        GREATEST(-5, LEAST(20, "completed_sessions" - "no_shows"))
+    ) STORED,
+    "badge_color" VARCHAR(10) GENERATED ALWAYS AS (
+        CASE
+            WHEN GREATEST(-5, LEAST(20, "completed_sessions" - "no_shows")) >= 10 THEN 'gold'
+            WHEN GREATEST(-5, LEAST(20, "completed_sessions" - "no_shows")) >= 0 THEN 'green'
+            ELSE 'red'
+        END
+    ) STORED,
+    "updated_at" TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT "user_reputation_pkey" PRIMARY KEY ("user_id"),
+    CONSTRAINT "user_reputation_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "public"."user_profiles"("id") ON DELETE CASCADE,
+    CONSTRAINT "user_reputation_counts_check" CHECK ("completed_sessions" >= 0 AND "no_shows" >= 0)
+);
+
+-- Trigger helpers live outside the PostgREST-exposed public schema, so clients
+-- cannot call them through /rpc to change another user's counters
+CREATE SCHEMA IF NOT EXISTS "private";
+REVOKE ALL ON SCHEMA "private" FROM PUBLIC, "anon", "authenticated";
+
+-- Add to a user's counters, creating their row on first use
+CREATE OR REPLACE FUNCTION "private"."apply_reputation_delta"(
+    "p_user_id" UUID,
+    "p_completed" INTEGER,
+    "p_no_shows" INTEGER
+) RETURNS VOID
+LANGUAGE "plpgsql"
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF p_user_id IS NULL OR (p_completed = 0 AND p_no_shows = 0) THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO "public"."user_reputation" AS r ("user_id", "completed_sessions", "no_shows", "updated_at")
+    VALUES (p_user_id, GREATEST(0, p_completed), GREATEST(0, p_no_shows), NOW())
+    ON CONFLICT ("user_id") DO UPDATE SET
+        "completed_sessions" = GREATEST(0, r."completed_sessions" + p_completed),
+        "no_shows" = GREATEST(0, r."no_shows" + p_no_shows),
+        "updated_at" = NOW();
+END;
+$$;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one session's contribution to both participants,
+-- using the same rules as get_user_reputation_counts
+CREATE OR REPLACE FUNCTION "private"."apply_session_reputation"(
+    "p_match_id" UUID,
+    "p_status" TEXT,
+    "p_user1_confirmed" BOOLEAN,
+    "p_user2_confirmed" BOOLEAN,
+    "p_sign" INTEGER
+) RETURNS VOID
+LANGUAGE "plpgsql"
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_user1 UUID;
+    v_user2 UUID;
+    v_no_show INTEGER;
+BEGIN
+    IF p_status NOT IN ('completed', 'no_show', 'cancelled') THEN
+        RETURN;
+    END IF;
+
+    SELECT m.user1_id, m.user2_id INTO v_user1, v_user2
+    FROM "public"."wingman_matches" m
+    WHERE m.id = p_match_id;
+
+    IF NOT FOUND THEN
+        -- Match already deleted (cascade); reconcile_user_reputation corrects the counters
+        RETURN;
+    END IF;
+
+    v_no_show := CASE WHEN p_status IN ('no_show', 'cancelled') THEN p_sign ELSE 0 END;
+
+    PERFORM "private"."apply_reputation_delta"(
+        v_user1,
+        CASE WHEN p_status = 'completed' AND COALESCE(p_user1_confirmed, FALSE) THEN p_sign ELSE 0 END,
+        v_no_show
+    );
+
+    IF v_user2 IS DISTINCT FROM v_user1 THEN
+        PERFORM "private"."apply_reputation_delta"(
+            v_user2,
+            CASE WHEN p_status = 'completed' AND COALESCE(p_user2_confirmed, FALSE) THEN p_sign ELSE 0 END,
+            v_no_show
+        );
+    END IF;
+END;
+$$;
+
+-- Keeps user_reputation in step with every session insert, outcome change and delete,
+-- inside the same transaction as the session write
+CREATE OR REPLACE FUNCTION "private"."sync_user_reputation"()
+RETURNS TRIGGER
+LANGUAGE "plpgsql"
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM "private"."apply_session_reputation"(
+            OLD.match_id, OLD.status,
+            OLD.user1_completed_confirmed_by_user2, OLD.user2_completed_confirmed_by_user1, -1
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM "private"."apply_session_reputation"(
+            NEW.match_id, NEW.status,
+            NEW.user1_completed_confirmed_by_user2, NEW.user2_completed_confirmed_by_user1, 1
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS "wingman_sessions_sync_reputation_insert" ON "public"."wingman_sessions";
+DROP TRIGGER IF EXISTS "wingman_sessions_sync_reputation_update" ON "public"."wingman_sessions";
+DROP TRIGGER IF EXISTS "wingman_sessions_sync_reputation_delete" ON "public"."wingman_sessions";
+
+CREATE TRIGGER "wingman_sessions_sync_reputation_insert"
+    AFTER INSERT ON "public"."wingman_sessions"
+    FOR EACH ROW EXECUTE FUNCTION "private"."sync_user_reputation"();
+
+-- Only outcome changes touch the counters; notes, venue and time edits skip the trigger
+CREATE TRIGGER "wingman_sessions_sync_reputation_update"
+    AFTER UPDATE OF "status", "match_id", "user1_completed_confirmed_by_user2", "user2_completed_confirmed_by_user1"
+    ON "public"."wingman_sessions"
+    FOR EACH ROW
+    WHEN (
+        OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.match_id IS DISTINCT FROM NEW.match_id
+        OR OLD.user1_completed_confirmed_by_user2 IS DISTINCT FROM NEW.user1_completed_confirmed_by_user2
+        OR OLD.user2_completed_confirmed_by_user1 IS DISTINCT FROM NEW.user2_completed_confirmed_by_user1
+    )
+    EXECUTE FUNCTION "private"."sync_user_reputation"();
+
+CREATE TRIGGER "wingman_sessions_sync_reputation_delete"
+    AFTER DELETE ON "public"."wingman_sessions"
+    FOR EACH ROW EXECUTE FUNCTION "private"."sync_user_reputation"();
+
+-- Compare stored counters with session history and, when p_repair, overwrite the drifted rows.
+-- p_user_ids NULL checks every user with a match or a counters row.
+-- Repairs lock user_reputation against concurrent trigger updates so none are lost.
+CREATE OR REPLACE FUNCTION "public"."reconcile_user_reputation"(
+    "p_user_ids" UUID[] DEFAULT NULL,
+    "p_repair" BOOLEAN DEFAULT TRUE
+) RETURNS TABLE (
+    "user_id" UUID,
+    "stored_completed_sessions" INTEGER,
+    "stored_no_shows" INTEGER,
+    "completed_sessions" INTEGER,
+    "no_shows" INTEGER
+)
+LANGUAGE "plpgsql"
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_user_ids UUID[];
+BEGIN
+    IF p_repair THEN
+        LOCK TABLE "public"."user_reputation" IN SHARE ROW EXCLUSIVE MODE;
+    END IF;
+
+    v_user_ids := COALESCE(p_user_ids, ARRAY(
+        SELECT m.user1_id FROM "public"."wingman_matches" m
+        UNION
+        SELECT m.user2_id FROM "public"."wingman_matches" m
+        UNION
+        SELECT r.user_id FROM "public"."user_reputation" r
+    ));
+
+    CREATE TEMP TABLE reputation_drift ON COMMIT DROP AS
+    SELECT
+        c.user_id,
+        COALESCE(r.completed_sessions, 0) AS stored_completed_sessions,
+        COALESCE(r.no_shows, 0) AS stored_no_shows,
+        c.completed_sessions,
+        c.no_shows
+    FROM "public"."get_user_reputation_counts"(v_user_ids) c
+    LEFT JOIN "public"."user_reputation" r ON r.user_id = c.user_id
+    WHERE COALESCE(r.completed_sessions, 0) <> c.completed_sessions
+       OR COALESCE(r.no_shows, 0) <> c.no_shows;
+
+    IF p_repair THEN
+        INSERT INTO "public"."user_reputation" AS r ("user_id", "completed_sessions", "no_shows", "updated_at")
+        SELECT d.user_id, d.completed_sessions, d.no_shows, NOW()
+        FROM reputation_drift d
+        -- Constraint name rather than column: user_id is also an output column here
+        ON CONFLICT ON CONSTRAINT "user_reputation_pkey" DO UPDATE SET
+            "completed_sessions" = EXCLUDED.completed_sessions,
+            "no_shows" = EXCLUDED.no_shows,
+            "updated_at" = NOW();
+    END IF;
+
+    RETURN QUERY
+    SELECT d.user_id, d.stored_completed_sessions, d.stored_no_shows, d.completed_sessions, d.no_shows
+    FROM reputation_drift d;
+
+    DROP TABLE reputation_drift;
+END;
+$$;
+
+-- Set function ownership
+ALTER FUNCTION "private"."apply_reputation_delta"(UUID, INTEGER, INTEGER) OWNER TO "postgres";
+ALTER FUNCTION "private"."apply_session_reputation"(UUID, TEXT, BOOLEAN, BOOLEAN, INTEGER) OWNER TO "postgres";
+ALTER FUNCTION "private"."sync_user_reputation"() OWNER TO "postgres";
+ALTER FUNCTION "public"."reconcile_user_reputation"(UUID[], BOOLEAN) OWNER TO "postgres";
+
+-- SECURITY DEFINER functions: EXECUTE is granted to PUBLIC by default, so revoke it.
+-- The helpers only run from the trigger; reconciliation is a server-side admin job.
+REVOKE EXECUTE ON FUNCTION "private"."apply_reputation_delta"(UUID, INTEGER, INTEGER) FROM PUBLIC, "anon", "authenticated";
+REVOKE EXECUTE ON FUNCTION "private"."apply_session_reputation"(UUID, TEXT, BOOLEAN, BOOLEAN, INTEGER) FROM PUBLIC, "anon", "authenticated";
+REVOKE EXECUTE ON FUNCTION "private"."sync_user_reputation"() FROM PUBLIC, "anon", "authenticated";
+REVOKE EXECUTE ON FUNCTION "public"."reconcile_user_reputation"(UUID[], BOOLEAN) FROM PUBLIC, "anon", "authenticated";
+GRANT EXECUTE ON FUNCTION "public"."reconcile_user_reputation"(UUID[], BOOLEAN) TO service_role;
+
+-- Backfill counters from existing session history
+INSERT INTO "public"."user_reputation" ("user_id", "completed_sessions", "no_shows")
+SELECT c.user_id, c.completed_sessions, c.no_shows
+FROM "public"."get_user_reputation_counts"(ARRAY(
+    SELECT user1_id FROM "public"."wingman_matches"
+    UNION
+    SELECT user2_id FROM "public"."wingman_matches"
+)) c
+WHERE c.completed_sessions > 0 OR c.no_shows > 0
+ON CONFLICT ("user_id") DO UPDATE SET
+    "completed_sessions" = EXCLUDED.completed_sessions,
+    "no_shows" = EXCLUDED.no_shows,
+    "updated_at" = NOW();
+
+-- Enable Row Level Security; reputation badges are shown to other users
+ALTER TABLE "public"."user_reputation" ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can view reputation" ON "public"."user_reputation"
+    FOR SELECT TO authenticated
+    USING (true);
+
+COMMIT;
@@ -28,6 +28,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 from services.wingman_matcher import WingmanMatcher
 from database import SupabaseFactory
 from db.distance import BuddyCandidate
+from src.db.geo_index import CandidateLocationIndex
 
 class TestWingmanMatcherInitialization:
     """Test WingmanMatcher service initialization and configuration"""
@@ -113,7 +114,7 @@ class TestExperienceLevelCompatibility:
         }
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=False), \
+             patch.object(matcher, '_get_recent_partners', return_value=set()), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=mock_candidates):
             
             result = await matcher.find_best_candidate(user_id, 25)
@@ -135,7 +136,7 @@ class TestExperienceLevelCompatibility:
         }
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=False), \
+             patch.object(matcher, '_get_recent_partners', return_value=set()), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=mock_candidates):
             
             result = await matcher.find_best_candidate(user_id, 25)
@@ -157,7 +158,7 @@ class TestExperienceLevelCompatibility:
         }
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=False), \
+             patch.object(matcher, '_get_recent_partners', return_value=set()), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=mock_candidates):
             
             result = await matcher.find_best_candidate(user_id, 25)
@@ -303,12 +304,9 @@ class TestRecencyFiltering:
             )
         ]
         
-        # Mock recent pairing check - first candidate was recent, second was not
-        async def mock_recent_check(user1, user2, cutoff):
-            return user2 == "recent-buddy"  # Only recent-buddy was recently paired
-        
+        # Mock recent partners - first candidate was recent, second was not
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', side_effect=mock_recent_check), \
+             patch.object(matcher, '_get_recent_partners', return_value={"recent-buddy"}), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=candidates):
             
             result = await matcher.find_best_candidate(user_id, 25)
@@ -346,7 +344,7 @@ class TestRecencyFiltering:
         ]
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=True), \
+             patch.object(matcher, '_get_recent_partners', return_value={"recent-buddy-1", "recent-buddy-2"}), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=candidates):
             
             result = await matcher.find_best_candidate(user_id, 25)
@@ -361,10 +359,10 @@ class TestRecencyFiltering:
         # Mock the recent pairing check to capture the cutoff date
         captured_cutoff = None
         
-        async def mock_recent_check(user1, user2, cutoff):
+        async def mock_recent_partners(user, cutoff):
             nonlocal captured_cutoff
             captured_cutoff = cutoff
-            return False
+            return set()
         
         user_profile = {
             'id': user_id,
@@ -384,7 +382,7 @@ class TestRecencyFiltering:
         ]
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', side_effect=mock_recent_check), \
+             patch.object(matcher, '_get_recent_partners', side_effect=mock_recent_partners), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=candidates):
             
             await matcher.find_best_candidate(user_id, 25)
@@ -396,6 +394,26 @@ class TestRecencyFiltering:
             time_diff = abs((captured_cutoff - expected_cutoff).total_seconds())
             assert time_diff < 60  # Within 1 minute tolerance
 
+    @pytest.mark.asyncio
+    async def test_recent_partners_loaded_in_single_query(self, matcher):
+        """Test recent partners are resolved from either side of the pair"""
+        user_id = "user-m"
+        cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+
+        query = matcher.supabase.table.return_value.select.return_value.or_.return_value.gte.return_value
+        query.execute.return_value.data = [
+            {'user1_id': 'user-a', 'user2_id': user_id},
+            {'user1_id': user_id, 'user2_id': 'user-z'}
+        ]
+
+        partners = await matcher._get_recent_partners(user_id, cutoff)
+
+        assert partners == {'user-a', 'user-z'}
+        matcher.supabase.table.assert_called_once_with('wingman_matches')
+        matcher.supabase.table.return_value.select.return_value.or_.return_value.gte.assert_called_once_with(
+            'created_at', cutoff.isoformat()
+        )
+
 class TestDeterministicSelection:
     """Test deterministic selection with fixed candidate pools"""
     
@@ -444,7 +462,7 @@ class TestDeterministicSelection:
         }
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=False), \
+             patch.object(matcher, '_get_recent_partners', return_value=set()), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=fixed_candidates):
             
             result = await matcher.find_best_candidate(user_id, 35)
@@ -483,7 +501,7 @@ class TestDeterministicSelection:
         ]
         
         with patch.object(matcher, '_get_user_profile', return_value=user_profile), \
-             patch.object(matcher, '_check_recent_pairing', return_value=False), \
+             patch.object(matcher, '_get_recent_partners', return_value=set()), \
              patch('services.wingman_matcher.find_candidates_within_radius', return_value=identical_candidates):
             
             # Run multiple times to ensure deterministic result
@@ -677,6 +695,71 @@ class TestMatchRecordOperations:
         assert result == existing_match
         matcher.supabase.table.return_value.insert.assert_not_called()
 
+class TestBatchMatching:
+    """Test batch matching builds one global pairing for a user pool"""
+    @pytest.fixture
+    def matcher(self):
+        mock_client = MagicMock()
+        return WingmanMatcher(mock_client)
+    
+    @pytest.fixture
+    def city_index(self):
+        index = CandidateLocationIndex()
+        index.update_location("user-a", 37.7749, -122.4194, "San Francisco", "beginner", "Naturalist")
+        index.update_location("user-b", 37.7800, -122.4100, "San Francisco", "beginner", "Analyzer")
+        index.update_location("user-c", 37.8044, -122.2712, "San Francisco", "intermediate", "Scholar")
+        index.update_location("user-d", 37.8100, -122.2700, "San Francisco", "advanced", "Sprinter")
+        index.update_location("user-e", 40.7128, -74.0060, "New York", "beginner", "Naturalist")
+        return index
+    
+    def test_select_pairs_closest_first_without_reuse(self):
+        """Test greedy pairing never assigns a user twice"""
+        edges = [
+            (5.0, "user-a", "user-c"),
+            (1.0, "user-a", "user-b"),
+            (2.0, "user-b", "user-c"),
+            (3.0, "user-c", "user-d")
+        ]
+        
+        pairs = WingmanMatcher._select_pairs(edges)
+        
+        assert pairs == [("user-a", "user-b"), ("user-c", "user-d")]
+    
+    @pytest.mark.asyncio
+    async def test_batch_matching_for_city(self, matcher, city_index):
+        """Test city batch respects pending, recency and experience rules"""
+        inserted = [
+            {'id': 'match-1', 'user1_id': 'user-b', 'user2_id': 'user-c'}
+        ]
+        matcher.supabase.table.return_value.insert.return_value.execute.return_value.data = inserted
+        
+        with patch('services.wingman_matcher.candidate_index', city_index), \
+             patch.object(city_index, 'ensure_loaded'), \
+             patch.object(matcher, '_get_users_with_pending_match', return_value={"user-d"}), \
+             patch.object(matcher, '_get_recent_pairs', return_value={("user-a", "user-b")}):
+            
+            result = await matcher.create_batch_matches(city="san francisco", max_radius_miles=25)
+        
+        assert result["success"] is True
+        assert result["stats"]["users_considered"] == 4
+        assert result["matches"] == [{"match_id": "match-1", "user1_id": "user-b", "user2_id": "user-c"}]
+        assert result["unmatched_user_ids"] == ["user-a"]
+        
+        # One bulk insert with deterministically ordered pairs
+        rows = matcher.supabase.table.return_value.insert.call_args[0][0]
+        assert [(row['user1_id'], row['user2_id']) for row in rows] == [("user-b", "user-c")]
+        assert all(row['status'] == 'pending' for row in rows)
+    
+    @pytest.mark.asyncio
+    async def test_batch_matching_requires_pool(self, matcher):
+        """Test batch matching without users or city fails cleanly"""
+        with patch('services.wingman_matcher.candidate_index'):
+            result = await matcher.create_batch_matches()
+        
+        assert result["success"] is False
+        assert result["matches"] == []
+        matcher.supabase.table.return_value.insert.assert_not_called()
+
 if __name__ == "__main__":
     # Run tests with pytest
     import pytest
@@ -23,13 +23,17 @@ class TestReputationCalculator:
         self.calculator = ReputationCalculator()
         self.calculator.supabase = Mock()
     
+    def mock_counts(self, rows):
+        """Mock the get_user_reputation_counts aggregate"""
+        self.calculator.supabase.rpc.return_value.execute.return_value.data = rows
+    
     @pytest.mark.asyncio
     async def test_calculate_user_reputation_new_user(self):
         """Test reputation calculation for new user with no sessions"""
         user_id = str(uuid4())
         
-        # Mock empty session history
-        self.calculator.supabase.table.return_value.select.return_value.or_.return_value.execute.return_value.data = []
+        # Aggregate returns zero counts for a user without sessions
+        self.mock_counts([{'user_id': user_id, 'completed_sessions': 0, 'no_shows': 0}])
         
         result = await self.calculator.calculate_user_reputation(user_id)
         
@@ -40,54 +44,22 @@ class TestReputationCalculator:
         assert result.no_shows == 0
         assert result.badge_color == "green"
         assert result.cache_timestamp is not None
+        self.calculator.supabase.rpc.assert_called_once_with(
+            'get_user_reputation_counts', {'p_user_ids': [user_id]}
+        )
     
     @pytest.mark.asyncio
     async def test_calculate_user_reputation_with_sessions(self):
         """Test reputation calculation with mixed session results"""
         user_id = str(uuid4())
         
-        # Mock session history with completed and no-show sessions
-        mock_sessions = [
-            # Completed session - user1 confirmed by user2
-            {
-                'id': str(uuid4()),
-                'status': 'completed',
-                'user1_completed_confirmed_by_user2': True,
-                'user2_completed_confirmed_by_user1': False,
-                'wingman_matches': {'user1_id': user_id, 'user2_id': str(uuid4())}
-            },
-            # Completed session - user2 confirmed by user1
-            {
-                'id': str(uuid4()),
-                'status': 'completed',
-                'user1_completed_confirmed_by_user2': False,
-                'user2_completed_confirmed_by_user1': True,
-                'wingman_matches': {'user1_id': str(uuid4()), 'user2_id': user_id}
-            },
-            # No-show session
-            {
-                'id': str(uuid4()),
-                'status': 'no_show',
-                'user1_completed_confirmed_by_user2': False,
-                'user2_completed_confirmed_by_user1': False,
-                'wingman_matches': {'user1_id': user_id, 'user2_id': str(uuid4())}
-            },
-            # Cancelled session
-            {
-                'id': str(uuid4()),
-                'status': 'cancelled',
-                'user1_completed_confirmed_by_user2': False,
-                'user2_completed_confirmed_by_user1': False,
-                'wingman_matches': {'user1_id': str(uuid4()), 'user2_id': user_id}
-            }
-        ]
-        
-        self.calculator.supabase.table.return_value.select.return_value.or_.return_value.execute.return_value.data = mock_sessions
+        # 2 confirmed completions, 1 no_show + 1 cancelled
+        self.mock_counts([{'user_id': user_id, 'completed_sessions': 2, 'no_shows': 2}])
         
         result = await self.calculator.calculate_user_reputation(user_id)
         
-        assert result.completed_sessions == 2  # 2 confirmed completions
-        assert result.no_shows == 2  # 1 no_show + 1 cancelled
+        assert result.completed_sessions == 2
+        assert result.no_shows == 2
         assert result.score == 0  # 2 - 2 = 0
         assert result.badge_color == "green"  # score >= 0
     
@@ -96,18 +68,8 @@ class TestReputationCalculator:
         """Test reputation score bounds enforcement"""
         user_id = str(uuid4())
         
-        # Test upper bound - many completed sessions
-        mock_sessions_high = []
-        for i in range(25):  # 25 completed sessions, 0 no-shows
-            mock_sessions_high.append({
-                'id': str(uuid4()),
-                'status': 'completed',
-                'user1_completed_confirmed_by_user2': True,
-                'user2_completed_confirmed_by_user1': False,
-                'wingman_matches': {'user1_id': user_id, 'user2_id': str(uuid4())}
-            })
-        
-        self.calculator.supabase.table.return_value.select.return_value.or_.return_value.execute.return_value.data = mock_sessions_high
+        # Test upper bound - 25 completed sessions, 0 no-shows
+        self.mock_counts([{'user_id': user_id, 'completed_sessions': 25, 'no_shows': 0}])
         
         result = await self.calculator.calculate_user_reputation(user_id)
         
@@ -121,18 +83,8 @@ class TestReputationCalculator:
         """Test reputation score lower bound enforcement"""
         user_id = str(uuid4())
         
-        # Test lower bound - many no-shows
-        mock_sessions_low = []
-        for i in range(10):  # 0 completed, 10 no-shows
-            mock_sessions_low.append({
-                'id': str(uuid4()),
-                'status': 'no_show',
-                'user1_completed_confirmed_by_user2': False,
-                'user2_completed_confirmed_by_user1': False,
-                'wingman_matches': {'user1_id': user_id, 'user2_id': str(uuid4())}
-            })
-        
-        self.calculator.supabase.table.return_value.select.return_value.or_.return_value.execute.return_value.data = mock_sessions_low
+        # Test lower bound - 0 completed, 10 no-shows
+        self.mock_counts([{'user_id': user_id, 'completed_sessions': 0, 'no_shows': 10}])
         
         result = await self.calculator.calculate_user_reputation(user_id)
         
@@ -141,6 +93,37 @@ class TestReputationCalculator:
         assert result.score == -5  # Capped at MIN_SCORE
         assert result.badge_color == "red"
     
+    @pytest.mark.asyncio
+    async def test_calculate_reputations_batch(self):
+        """Test batch calculation makes one database call and fills in users without rows"""
+        user_ids = [str(uuid4()) for _ in range(3)]
+        self.mock_counts([
+            {'user_id': user_ids[0], 'completed_sessions': 12, 'no_shows': 1},
+            {'user_id': user_ids[1], 'completed_sessions': 0, 'no_shows': 3}
+        ])
+        
+        results = await self.calculator.calculate_reputations(user_ids)
+        
+        assert self.calculator.supabase.rpc.call_count == 1
+        assert list(results) == user_ids
+        assert (results[user_ids[0]].score, results[user_ids[0]].badge_color) == (11, "gold")
+        assert (results[user_ids[1]].score, results[user_ids[1]].badge_color) == (-3, "red")
+        assert (results[user_ids[2]].score, results[user_ids[2]].completed_sessions) == (0, 0)
+    
+    @pytest.mark.asyncio
+    async def test_load_reputations_reads_counters(self):
+        """Test maintained counters are read in one query, with zeros for users without a row"""
+        user_ids = [str(uuid4()), str(uuid4())]
+        self.calculator.supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [
+            {'user_id': user_ids[0], 'completed_sessions': 11, 'no_shows': 0, 'score': 11, 'badge_color': 'gold'}
+        ]
+        
+        results = await self.calculator.load_reputations(user_ids)
+        
+        self.calculator.supabase.table.assert_called_once_with('user_reputation')
+        assert (results[user_ids[0]].score, results[user_ids[0]].badge_color) == (11, "gold")
+        assert (results[user_ids[1]].score, results[user_ids[1]].badge_color) == (0, "green")
+    
     def test_badge_color_logic(self):
         """Test badge color assignment logic"""
         # Test gold badge
@@ -168,7 +151,7 @@ class TestReputationCalculator:
         user_id = str(uuid4())
         
         # Mock database error
-        self.calculator.supabase.table.return_value.select.return_value.or_.return_value.execute.side_effect = Exception("DB Error")
+        self.calculator.supabase.rpc.return_value.execute.side_effect = Exception("DB Error")
         
         with pytest.raises(Exception, match="Failed to fetch session history"):
             await self.calculator.calculate_user_reputation(user_id)
@@ -186,7 +169,7 @@ class TestReputationService:
         """Test reputation fetching with cache miss"""
         user_id = str(uuid4())
         
-        # Mock cache miss and fresh calculation
+        # Mock cache miss and counter read
         with patch('src.services.reputation_service.ReputationService._get_cached_reputation', return_value=None):
             with patch('src.services.reputation_service.ReputationService._cache_reputation', return_value=True) as mock_cache:
                 
@@ -199,7 +182,7 @@ class TestReputationService:
                     cache_timestamp=datetime.now(timezone.utc).isoformat()
                 )
                 
-                self.service.calculator.calculate_user_reputation = AsyncMock(return_value=mock_reputation)
+                self.service.calculator.load_reputations = AsyncMock(return_value={user_id: mock_reputation})
                 
                 result = await self.service.get_user_reputation(user_id)
                 
@@ -224,8 +207,8 @@ class TestReputationService:
             result = await self.service.get_user_reputation(user_id)
             
             assert result == cached_reputation
-            # Calculator should not be called for cache hit
-            self.service.calculator.calculate_user_reputation.assert_not_called()
+            # Counters should not be read for cache hit
+            self.service.calculator.load_reputations.assert_not_called()
     
     @pytest.mark.asyncio
     async def test_get_user_reputation_no_cache(self):
@@ -241,13 +224,55 @@ class TestReputationService:
             cache_timestamp=datetime.now(timezone.utc).isoformat()
         )
         
-        self.service.calculator.calculate_user_reputation = AsyncMock(return_value=mock_reputation)
+        self.service.calculator.load_reputations = AsyncMock(return_value={user_id: mock_reputation})
         
         result = await self.service.get_user_reputation(user_id, use_cache=False)
         
         assert result == mock_reputation
         # Should not check cache when use_cache=False
-        self.service.calculator.calculate_user_reputation.assert_called_once_with(user_id)
+        self.service.calculator.load_reputations.assert_called_once_with([user_id])
+    
+    @pytest.mark.asyncio
+    async def test_get_reputations_batches_cache_and_database(self):
+        """Test batch fetch serves hits from one MGET and loads all misses in one query"""
+        hit_id, miss_ids = str(uuid4()), [str(uuid4()), str(uuid4())]
+        timestamp = datetime.now(timezone.utc).isoformat()
+        hit = ReputationData(hit_id, 12, 12, 0, "gold", timestamp)
+        loaded = {user_id: ReputationData(user_id, 1, 1, 0, "green", timestamp) for user_id in miss_ids}
+        self.service.calculator.load_reputations = AsyncMock(return_value=loaded)
+        
+        cached = {f"reputation:user:{hit_id}": vars(hit), **{f"reputation:user:{u}": None for u in miss_ids}}
+        with patch('src.redis_session.RedisSession.get_sessions', AsyncMock(return_value=cached)) as get_sessions, \
+             patch('src.redis_session.RedisSession.set_sessions', AsyncMock(return_value=True)) as set_sessions:
+            result = await self.service.get_reputations([miss_ids[0], hit_id, miss_ids[1], hit_id])
+        
+        assert list(result) == [miss_ids[0], hit_id, miss_ids[1]]
+        assert result[hit_id] == hit
+        get_sessions.assert_awaited_once()
+        self.service.calculator.load_reputations.assert_awaited_once_with([miss_ids[0], miss_ids[1]])
+        stored = set_sessions.await_args.args[0]
+        assert set(stored) == {f"reputation:user:{u}" for u in miss_ids}
+    
+    @pytest.mark.asyncio
+    async def test_reconcile_counters_reports_and_repairs_drift(self):
+        """Test reconciliation reports drifted users and drops their cached reputation"""
+        user_id = str(uuid4())
+        self.service.calculator.supabase.rpc.return_value.execute.return_value.data = [{
+            'user_id': user_id,
+            'stored_completed_sessions': 3, 'stored_no_shows': 0,
+            'completed_sessions': 4, 'no_shows': 1
+        }]
+        
+        with patch.object(self.service, 'invalidate_user_cache', AsyncMock(return_value=True)) as invalidate:
+            result = await self.service.reconcile_counters()
+        
+        self.service.calculator.supabase.rpc.assert_called_once_with(
+            'reconcile_user_reputation', {'p_user_ids': None, 'p_repair': True}
+        )
+        assert result['drifted'] == 1
+        assert result['repaired'] is True
+        assert result['drift'][0]['actual'] == {'completed_sessions': 4, 'no_shows': 1}
+        invalidate.assert_awaited_once_with(user_id)
 
 class TestReputationData:
     """Test reputation data model"""
@@ -306,19 +331,19 @@ class TestReputationIntegration:
                 badge_color="green",
                 cache_timestamp=datetime.now(timezone.utc).isoformat()
             )
-            service.calculator.calculate_user_reputation = AsyncMock(return_value=mock_reputation)
+            service.calculator.load_reputations = AsyncMock(return_value={user_id: mock_reputation})
             
-            # First call should miss cache and calculate
+            # First call should miss cache and read the counters
             result1 = await service.get_user_reputation(user_id)
             assert result1 == mock_reputation
             
             # Second call should hit cache
-            service.calculator.calculate_user_reputation.reset_mock()
+            service.calculator.load_reputations.reset_mock()
             result2 = await service.get_user_reputation(user_id)
             assert result2.score == mock_reputation.score
             
-            # Calculator should not be called on cache hit
-            service.calculator.calculate_user_reputation.assert_not_called()
+            # Counters should not be read on cache hit
+            service.calculator.load_reputations.assert_not_called()
             
             # Cleanup
             await service.invalidate_user_cache(user_id)
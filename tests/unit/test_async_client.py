@@ -0,0 +1,64 @@
+"""
+Tests for non-blocking Supabase query execution
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.db.async_client import execute_async, gather_queries
+
+class SlowQuery:
+    """Query builder stand-in whose execute() blocks like a network call"""
+
+    def __init__(self, result, delay: float = 0.05):
+        self.result = result
+        self.delay = delay
+        self.thread_name = None
+
+    def execute(self):
+        self.thread_name = threading.current_thread().name
+        time.sleep(self.delay)
+        return self.result
+
+class TestAsyncClient:
+    """Tests for execute_async and gather_queries"""
+
+    @pytest.mark.asyncio
+    async def test_execute_async_runs_off_event_loop(self):
+        """Test execute() runs on the I/O pool and returns its response"""
+        query = SlowQuery({"data": [1]})
+
+        result = await execute_async(query)
+
+        assert result == {"data": [1]}
+        assert query.thread_name.startswith("supabase-io")
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self):
+        """Test other coroutines progress while a query is in flight"""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        await asyncio.gather(execute_async(SlowQuery(None, delay=0.1)), ticker())
+
+        assert ticks == 5
+
+    @pytest.mark.asyncio
+    async def test_gather_queries_runs_concurrently(self):
+        """Test independent queries overlap instead of running back to back"""
+        queries = [SlowQuery(i, delay=0.1) for i in range(4)]
+
+        started = time.perf_counter()
+        results = await gather_queries(*queries)
+        elapsed = time.perf_counter() - started
+
+        assert results == [0, 1, 2, 3]
+        assert elapsed < 0.3
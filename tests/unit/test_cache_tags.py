@@ -0,0 +1,153 @@
+"""
+Tests for tag-indexed cache invalidation
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import time
+
+import pytest
+
+from redis.exceptions import ResponseError
+
+from src.cache_middleware import invalidate_cache_type, invalidate_user_cache
+from src.cache_tags import invalidate_tag, legacy_tag_key, tag_key
+from src.redis_client import RedisService
+from src.redis_session import RedisSession
+
+def tagged_client(members, legacy_members=()):
+    """Redis client mock whose tag index (and legacy tag set) hold the given members"""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=lambda: [len(pipe.unlink.call_args.args)])
+
+    async def zscan_iter(key, match=None, count=None):
+        for member in members:
+            yield member, time.time() + 60
+
+    async def sscan_iter(key, match=None, count=None):
+        for member in legacy_members:
+            yield member
+
+    client = MagicMock()
+    client.rename = AsyncMock()
+    client.unlink = AsyncMock()
+    client.keys = AsyncMock()
+    client.zscan_iter = MagicMock(side_effect=zscan_iter)
+    client.sscan_iter = MagicMock(side_effect=sscan_iter)
+    client.pipeline.return_value = pipe
+    return client, pipe
+
+class TestInvalidateTag:
+    """Tests for cache_tags.invalidate_tag"""
+
+    @pytest.mark.asyncio
+    async def test_deletes_members_in_batches_without_key_scans(self):
+        """Test invalidation walks only the tag index, unlinking in batches"""
+        members = [f"wingman:api:matches:{i}" for i in range(1200)]
+        client, pipe = tagged_client(members)
+
+        deleted = await invalidate_tag(client, "api:type:matches", batch_size=500)
+
+        assert deleted == 1200
+        client.keys.assert_not_called()
+        purge_key = client.rename.await_args_list[0].args[1]
+        assert client.rename.await_args_list[0].args[0] == tag_key("api:type:matches")
+        assert client.zscan_iter.call_args.args[0] == purge_key
+        assert [len(call.args) for call in pipe.unlink.call_args_list] == [500, 500, 200]
+        assert client.unlink.await_args_list[0].args == (purge_key,)
+
+    @pytest.mark.asyncio
+    async def test_match_keeps_tag_and_unregisters_deleted_keys(self):
+        """Test a filtered invalidation removes only matching members from the tag index"""
+        client, pipe = tagged_client(["wingman:api:matches:user:u1:a"])
+
+        deleted = await invalidate_tag(client, "api:user:u1", match="wingman:*:matches:user:u1:*")
+
+        assert deleted == 1
+        client.rename.assert_not_awaited()
+        assert client.zscan_iter.call_args.kwargs["match"] == "wingman:*:matches:user:u1:*"
+        pipe.zrem.assert_called_once_with(tag_key("api:user:u1"), "wingman:api:matches:user:u1:a")
+        client.unlink.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_missing_tag_deletes_nothing(self):
+        """Test a tag with no entries is a no-op"""
+        client, pipe = tagged_client([])
+        client.rename.side_effect = ResponseError("no such key")
+
+        assert await invalidate_tag(client, "api:type:location") == 0
+        client.zscan_iter.assert_not_called()
+        client.sscan_iter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_legacy_tag_set_is_drained(self):
+        """Test entries registered in a pre-sorted-set tag set are still invalidated"""
+        client, pipe = tagged_client(["wingman:api:a"], legacy_members=["wingman:api:b"])
+
+        assert await invalidate_tag(client, "api:type:matches") == 2
+        assert [call.args[0] for call in client.rename.await_args_list] == [
+            tag_key("api:type:matches"), legacy_tag_key("api:type:matches")
+        ]
+
+class TestTaggedCacheWrites:
+    """Tests for tagged RedisService cache writes and invalidation helpers"""
+
+    @pytest.mark.asyncio
+    async def test_tagged_write_is_one_pipeline(self):
+        """Test the entry and its expiry-scored tag registrations are written in one round trip"""
+        service = RedisService()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[])
+        service._client = MagicMock()
+        service._client.pipeline.return_value = pipe
+
+        await service.set_cache("wingman:api:location:user:u1:x", {"body": "{}"}, 3600,
+                                tags=["api:type:location", "api:user:u1"], tag_ttl=7200)
+
+        pipe.execute.assert_awaited_once()
+        assert pipe.setex.call_args.args[:2] == ("wingman:api:location:user:u1:x", 3600)
+        assert [call.args[0] for call in pipe.zadd.call_args_list] == [
+            tag_key("api:type:location"), tag_key("api:user:u1")
+        ]
+        (expires_at,) = pipe.zadd.call_args.args[1].values()
+        assert expires_at == pytest.approx(time.time() + 3600, abs=5)
+        # Expired members are pruned on every write, so hot tags stay bounded
+        assert [call.args[0] for call in pipe.zremrangebyscore.call_args_list] == [
+            tag_key("api:type:location"), tag_key("api:user:u1")
+        ]
+        assert {call.args[1] for call in pipe.expire.call_args_list} == {7200}
+
+    @pytest.mark.asyncio
+    async def test_memory_fallback_invalidates_by_tag(self):
+        """Test tagged entries in the in-memory fallback are invalidated too"""
+        service = RedisService()
+
+        with patch('src.cache_middleware.redis_service', service):
+            for cache_type in ("matches", "location"):
+                await service.set_cache(f"wingman:api:{cache_type}:user:u1:x", {"body": "{}"}, 600,
+                                        tags=[f"api:type:{cache_type}", "api:user:u1"])
+
+            assert await invalidate_user_cache("u1", ["matches"]) == 1
+            assert await service.get_cache("wingman:api:location:user:u1:x") == {"body": "{}"}
+            assert await invalidate_cache_type("location") == 1
+            # Only the invalidation generation counters remain
+            assert all(key.startswith("cachegen:") for key in service._memory_cache)
+
+    @pytest.mark.asyncio
+    async def test_batch_session_write_registers_tags_once(self):
+        """Test a batch of tagged sessions costs one ZADD, prune and EXPIRE per tag"""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[])
+        client = MagicMock()
+        client.pipeline.return_value = pipe
+        sessions = {f"reputation:u{i}": {"score": i} for i in range(200)}
+
+        with patch.object(RedisSession, '_client', client), patch.object(RedisSession, '_healthy', True):
+            assert await RedisSession.set_sessions(sessions, ttl=300, tags=["reputation"]) is True
+
+        assert pipe.setex.call_count == 200
+        (zadd,) = pipe.zadd.call_args_list
+        assert zadd.args[0] == tag_key("reputation")
+        assert set(zadd.args[1]) == {f"session:{session_id}" for session_id in sessions}
+        assert pipe.zremrangebyscore.call_count == 1
+        assert pipe.expire.call_count == 1
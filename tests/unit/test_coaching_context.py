@@ -0,0 +1,236 @@
+"""
+Tests for the concurrent coaching context loader and its cache
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.coaching_context_cache import coaching_context_cache
+from src.redis_client import redis_service
+from src.simple_memory import WingmanMemory
+
+class FakeQuery:
+    """Chainable PostgREST builder stand-in that records the table it reads"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.payload = None
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def insert(self, payload):
+        self.payload = payload
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        if self.payload is not None:
+            self.client.writes.append(self.table_name)
+            return SimpleNamespace(data=[dict(self.payload, id=f"{self.table_name}-new")])
+        self.client.reads.append(self.table_name)
+        return SimpleNamespace(data=self.client.rows.get(self.table_name, []))
+
+class FakeSupabase:
+    def __init__(self, rows, latency=0.0):
+        self.rows = rows
+        self.latency = latency
+        self.reads = []
+        self.writes = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+ROWS = {
+    'conversations': [{'role': 'user', 'message_text': 'hi', 'created_at': '2025-01-01'}],
+    'confidence_assessments': [{'archetype': 'Analyzer'}],
+    'approach_attempts': [{'outcome': 'completed'}],
+    'dating_goals': [{'goals': 'Be bolder'}],
+    'user_profiles': [{'id': 'user-1', 'first_name': 'Sam'}]
+}
+
+@pytest.fixture(autouse=True)
+def clear_context_cache():
+    """Start every test with an empty coaching context cache"""
+    coaching_context_cache.clear_local()
+    redis_service._memory_cache.clear()
+    redis_service._memory_timestamps.clear()
+    yield
+    coaching_context_cache.clear_local()
+
+class TestCoachingContextLoader:
+    """Tests for WingmanMemory.get_coaching_context"""
+
+    @pytest.mark.asyncio
+    async def test_context_queries_run_concurrently(self):
+        """Test all memory hooks load in roughly one query's latency"""
+        client = FakeSupabase(ROWS, latency=0.1)
+        memory = WingmanMemory(client, 'user-1')
+
+        started = time.perf_counter()
+        context = await memory.get_coaching_context('thread-1', include_profile=True)
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.4
+        assert len(client.reads) == 8
+        assert context['conversation_history'] == [{'role': 'user', 'content': 'hi', 'timestamp': '2025-01-01'}]
+        assert context['assessment_results'] == {'archetype': 'Analyzer'}
+        assert context['dating_goals'] == {'goals': 'Be bolder'}
+        assert context['user_profile'] == {'id': 'user-1', 'first_name': 'Sam'}
+
+    @pytest.mark.asyncio
+    async def test_context_without_profile_skips_profile_read(self):
+        """Test the profile is only read when requested"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        context = await memory.get_coaching_context('thread-1')
+
+        assert 'user_profiles' not in client.reads
+        assert 'user_profile' not in context
+        assert context['recent_attempts'] == ROWS['approach_attempts']
+
+    @pytest.mark.asyncio
+    async def test_context_falls_back_to_empty_on_error(self):
+        """Test a failed read returns the empty context shape"""
+        memory = WingmanMemory(None, 'user-1')
+
+        context = await memory.get_coaching_context('thread-1', include_profile=True)
+
+        assert context == WingmanMemory._empty_coaching_context(include_profile=True)
+
+class TestCoachingContextCache:
+    """Tests for cached coaching context and write-through memory hooks"""
+
+    @pytest.mark.asyncio
+    async def test_second_load_is_served_from_cache(self):
+        """Test a warm context needs no database reads"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        first = await memory.get_coaching_context('thread-1', include_profile=True)
+        client.reads.clear()
+        second = await memory.get_coaching_context('thread-1', include_profile=True)
+
+        assert client.reads == []
+        assert second == first
+
+    @pytest.mark.asyncio
+    async def test_cache_survives_losing_local_tier(self):
+        """Test the shared tier serves a worker with a cold in-process cache"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        await memory.get_coaching_context('thread-1')
+        coaching_context_cache.clear_local()
+        client.reads.clear()
+        context = await memory.get_coaching_context('thread-1')
+
+        assert client.reads == []
+        assert context['dating_goals'] == {'goals': 'Be bolder'}
+
+    @pytest.mark.asyncio
+    async def test_new_thread_only_loads_history(self):
+        """Test a new thread reuses cached sections and reads only its messages"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        await memory.get_coaching_context('thread-1')
+        client.reads.clear()
+        await memory.get_coaching_context('thread-2')
+
+        assert client.reads == ['conversations']
+
+    @pytest.mark.asyncio
+    async def test_add_message_appends_to_cached_history(self):
+        """Test stored messages extend the cached thread without re-reading it"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        await memory.get_coaching_context('thread-1')
+        await memory.add_message('thread-1', 'I did the approach', 'user')
+        client.reads.clear()
+        context = await memory.get_coaching_context('thread-1')
+
+        assert 'conversations' not in client.reads
+        assert [m['content'] for m in context['conversation_history']] == ['hi', 'I did the approach']
+
+    @pytest.mark.asyncio
+    async def test_memory_hooks_update_sections_in_place(self):
+        """Test hook writes are reflected without reloading the section"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        await memory.get_coaching_context('thread-1')
+        await memory.record_approach_attempt({'challenge_id': 'c1', 'outcome': 'partial'})
+        await memory.store_assessment_results({'archetype': 'Sprinter'})
+        await memory.update_confidence_triggers([{'type': 'social', 'description': 'Groups'}])
+        client.reads.clear()
+        context = await memory.get_coaching_context('thread-1')
+
+        assert client.reads == []
+        assert context['recent_attempts'][0]['outcome'] == 'partial'
+        assert context['recent_attempts'][1] == {'outcome': 'completed'}
+        assert context['assessment_results']['archetype'] == 'Sprinter'
+        assert [t['description'] for t in context['confidence_triggers']] == ['Groups']
+
+    @pytest.mark.asyncio
+    async def test_invalidated_section_is_reloaded_alone(self):
+        """Test invalidating one section reloads only that table"""
+        client = FakeSupabase(ROWS)
+        memory = WingmanMemory(client, 'user-1')
+
+        await memory.get_coaching_context('thread-1')
+        await coaching_context_cache.invalidate_section('user-1', 'dating_goals')
+        client.reads.clear()
+        await memory.get_coaching_context('thread-1')
+
+        assert client.reads == ['dating_goals']
+
+    @pytest.mark.asyncio
+    async def test_load_does_not_overwrite_newer_write(self):
+        """Test sections loaded before a hook write are not stored over it"""
+        snapshot = await coaching_context_cache.get_sections('user-1')
+        await coaching_context_cache.update_section('user-1', 'dating_goals', {'goals': 'New'})
+        await coaching_context_cache.set_sections(
+            'user-1', {'dating_goals': {'goals': 'Stale'}, 'recent_attempts': []}, snapshot.version
+        )
+
+        sections = await coaching_context_cache.get_sections('user-1')
+        assert sections == {'dating_goals': {'goals': 'New'}}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_prepends_are_all_kept(self):
+        """Test concurrent hook writes to one section don't lose each other's records"""
+        snapshot = await coaching_context_cache.get_sections('user-1')
+        await coaching_context_cache.set_sections('user-1', {'recent_attempts': []}, snapshot.version)
+
+        await asyncio.gather(*(
+            coaching_context_cache.prepend_to_section('user-1', 'recent_attempts', {'n': n}) for n in range(3)
+        ))
+
+        sections = await coaching_context_cache.get_sections('user-1')
+        assert sorted(r['n'] for r in sections['recent_attempts']) == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_history_load_does_not_drop_concurrent_append(self):
+        """Test a history snapshot loaded before an append is not stored over it"""
+        history, version = await coaching_context_cache.get_history('user-1', 'thread-1')
+        assert history is None
+
+        await coaching_context_cache.append_message('user-1', 'thread-1', {'role': 'user', 'content': 'new'})
+        await coaching_context_cache.set_history('user-1', 'thread-1', [{'role': 'user', 'content': 'old'}], version)
+
+        history, version = await coaching_context_cache.get_history('user-1', 'thread-1')
+        assert history is None
+        await coaching_context_cache.set_history(
+            'user-1', 'thread-1', [{'role': 'user', 'content': 'old'}, {'role': 'user', 'content': 'new'}], version
+        )
+        await coaching_context_cache.append_message('user-1', 'thread-1', {'role': 'user', 'content': 'new'})
+
+        history, _ = await coaching_context_cache.get_history('user-1', 'thread-1')
+        assert [m['content'] for m in history] == ['old', 'new']
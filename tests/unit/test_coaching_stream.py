@@ -0,0 +1,132 @@
+"""
+Tests for the pipelined streaming coaching turn
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import src.claude_agent as claude_agent
+from src.claude_agent import CoachingStreamTimings, interact_with_coach_stream, RESPONSE_BLOCKED_MESSAGE
+from src.safety_filters import StreamingResponseFilter
+
+def text_event(text):
+    return SimpleNamespace(delta=SimpleNamespace(text=text))
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        usage = SimpleNamespace(input_tokens=20, cache_read_input_tokens=3000, cache_creation_input_tokens=0)
+        yield SimpleNamespace(type='message_start', message=SimpleNamespace(usage=usage))
+        for chunk in self.chunks:
+            yield text_event(chunk)
+
+class FakeAnthropic:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requests = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeStream(self.chunks)
+
+EMPTY_CONTEXT = {
+    'conversation_history': [{'role': 'user', 'content': 'earlier'}],
+    'assessment_results': None
+}
+
+async def collect(generator):
+    return [chunk async for chunk in generator]
+
+class TestStreamingResponseFilter:
+    """Tests for incremental output safety filtering"""
+
+    def test_releases_text_before_holdback(self):
+        """Test safe text is released except the held-back tail"""
+        output_filter = StreamingResponseFilter()
+        text = "Confidence grows when you keep showing up. " * 10
+
+        released = output_filter.feed(text)
+
+        held_back = len(text) - len(released)
+        assert released.endswith(' ')
+        assert StreamingResponseFilter.HOLDBACK_CHARS <= held_back < StreamingResponseFilter.HOLDBACK_CHARS + 20
+        assert released + output_filter.flush() == text
+
+    def test_blocks_match_split_across_chunks(self):
+        """Test PII split over chunks never reaches the user"""
+        output_filter = StreamingResponseFilter()
+        chunks = ["Just text her at 555-", "123-4567 tonight and see how it goes."]
+
+        released = "".join(output_filter.feed(chunk) for chunk in chunks) + output_filter.flush()
+
+        assert output_filter.blocked
+        assert "555" not in released
+
+class TestCoachingStream:
+    """Tests for interact_with_coach_stream"""
+
+    @pytest.mark.asyncio
+    async def test_context_prefetch_overlaps_and_chunks_stream(self):
+        """Test context loads from an in-flight task and chunks are relayed"""
+        client = FakeAnthropic(["Let's ", "work on ", "your opener."])
+        started = asyncio.Event()
+
+        async def slow_context():
+            started.set()
+            await asyncio.sleep(0.05)
+            return EMPTY_CONTEXT
+
+        context_task = asyncio.create_task(slow_context())
+        timings = CoachingStreamTimings()
+
+        with patch.object(claude_agent, 'get_anthropic_client', return_value=client), \
+             patch.object(claude_agent.Config, 'ENABLE_SAFETY_FILTERS', True):
+            chunks = await collect(interact_with_coach_stream(
+                "How do I start a conversation?", "user-1", "thread-1",
+                context=context_task, timings=timings
+            ))
+
+        assert started.is_set()
+        assert "".join(chunks) == "Let's work on your opener."
+        assert client.requests[0]['messages'][0] == {'role': 'user', 'content': 'earlier'}
+        assert timings.stages['input_safety'] <= timings.stages['context_ready']
+        assert timings.stages['context_ready'] <= timings.stages['first_token'] <= timings.stages['complete']
+
+    @pytest.mark.asyncio
+    async def test_blocked_input_skips_model_and_cancels_prefetch(self):
+        """Test an unsafe message never opens a stream"""
+        client = FakeAnthropic(["unused"])
+        context_task = asyncio.create_task(asyncio.sleep(1, result=EMPTY_CONTEXT))
+
+        with patch.object(claude_agent, 'get_anthropic_client', return_value=client), \
+             patch.object(claude_agent.Config, 'ENABLE_SAFETY_FILTERS', True):
+            chunks = await collect(interact_with_coach_stream(
+                "Should I use negging?", "user-1", "thread-1", context=context_task
+            ))
+
+        await asyncio.sleep(0)
+        assert len(chunks) == 1
+        assert client.requests == []
+        assert context_task.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_unsafe_response_is_cut_off(self):
+        """Test an unsafe response is replaced once detected mid-stream"""
+        client = FakeAnthropic(["Just call her at ", "555-123-4567 later."])
+
+        with patch.object(claude_agent, 'get_anthropic_client', return_value=client), \
+             patch.object(claude_agent.Config, 'ENABLE_SAFETY_FILTERS', True):
+            chunks = await collect(interact_with_coach_stream(
+                "What next?", "user-1", "thread-1", context=EMPTY_CONTEXT
+            ))
+
+        assert chunks == [RESPONSE_BLOCKED_MESSAGE]
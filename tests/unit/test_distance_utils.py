@@ -10,6 +10,7 @@ from unittest.mock import AsyncMock, Mock
 
 # Mock the database client for tests
 from src.db.distance import find_candidates_within_radius, get_distance_between_users
+from src.db.geo_index import GeoCellIndex, IndexedLocation, CandidateLocationIndex, haversine_miles
 
 class TestDistanceUtils:
     """Basic tests for distance calculation functions"""
@@ -76,6 +77,108 @@ class TestDistanceUtils:
             # Expected - no database connection in unit tests
             pass
 
+class TestGeoCellIndex:
+    """Tests for the in-process candidate location index"""
+    
+    @pytest.fixture
+    def bay_area_index(self):
+        index = GeoCellIndex()
+        index.upsert(IndexedLocation("sf", 37.7749, -122.4194, "San Francisco", "beginner", "Naturalist"))
+        index.upsert(IndexedLocation("oakland", 37.8044, -122.2712, "Oakland", "intermediate", "Analyzer"))
+        index.upsert(IndexedLocation("san-jose", 37.3382, -121.8863, "San Jose", "advanced", "Sprinter"))
+        index.upsert(IndexedLocation("nyc", 40.7128, -74.0060, "New York", "beginner", "Scholar"))
+        return index
+    
+    def test_haversine_known_distances(self):
+        """Test haversine against known city distances"""
+        assert 8 <= haversine_miles(37.7749, -122.4194, 37.8044, -122.2712) <= 9
+        assert 2550 <= haversine_miles(37.7749, -122.4194, 40.7128, -74.0060) <= 2590
+        assert haversine_miles(37.7749, -122.4194, 37.7749, -122.4194) == 0.0
+    
+    def test_query_radius_sorted_and_excludes_self(self, bay_area_index):
+        """Test radius query returns nearest first without the searcher"""
+        results = bay_area_index.query_radius(37.7749, -122.4194, 20, exclude_user_id="sf")
+        
+        assert [location.user_id for location, _ in results] == ["oakland"]
+        
+        results = bay_area_index.query_radius(37.7749, -122.4194, 60, exclude_user_id="sf")
+        assert [location.user_id for location, _ in results] == ["oakland", "san-jose"]
+        assert results[0][1] < results[1][1]
+    
+    def test_query_nearest(self, bay_area_index):
+        """Test k-nearest expands until enough points are found"""
+        results = bay_area_index.query_nearest(37.7749, -122.4194, 3, exclude_user_id="sf")
+        
+        assert [location.user_id for location, _ in results] == ["oakland", "san-jose", "nyc"]
+    
+    def test_upsert_moves_and_remove_drops(self, bay_area_index):
+        """Test location updates move users between cells"""
+        bay_area_index.upsert(IndexedLocation("oakland", 40.73, -74.0, "Hoboken", "intermediate", "Analyzer"))
+        
+        assert bay_area_index.query_radius(37.7749, -122.4194, 20, exclude_user_id="sf") == []
+        
+        bay_area_index.remove("nyc")
+        near_nyc = bay_area_index.query_radius(40.7128, -74.0060, 20)
+        assert [location.user_id for location, _ in near_nyc] == ["oakland"]
+        assert len(bay_area_index) == 3
+    
+    def test_query_across_antimeridian(self):
+        """Test cells wrap around at +/-180 longitude"""
+        index = GeoCellIndex()
+        index.upsert(IndexedLocation("east", 0.0, 179.95))
+        
+        results = index.query_radius(0.0, -179.95, 20)
+        assert [location.user_id for location, _ in results] == ["east"]
+    
+    def test_city_only_location_removed(self):
+        """Test placeholder (0,0) coordinates drop the user from the index"""
+        index = CandidateLocationIndex()
+        index.update_location("user-1", 37.7749, -122.4194, "San Francisco", "beginner", "Naturalist")
+        assert "user-1" in index
+        
+        index.update_location("user-1", 0.0, 0.0, "San Francisco")
+        assert "user-1" not in index
+    
+    def test_update_location_keeps_profile_fields(self):
+        """Test a location-only update keeps previously known profile fields"""
+        index = CandidateLocationIndex()
+        index.update_location("user-1", 37.7749, -122.4194, "San Francisco", "beginner", "Naturalist")
+        index.update_location("user-1", 37.8044, -122.2712, "Oakland")
+        
+        location = index.get("user-1")
+        assert location.city == "Oakland"
+        assert location.experience_level == "beginner"
+        assert location.is_matchable
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_reloads_share_one_nonblocking_query(self):
+        """Test stale-index reloads run once, off the event loop, for concurrent callers"""
+        import time
+        
+        rows = [{'user_id': 'sf', 'lat': 37.7749, 'lng': -122.4194, 'city': 'San Francisco',
+                 'user_profiles': {'experience_level': 'beginner', 'confidence_archetype': 'Naturalist'}}]
+        
+        def slow_execute():
+            time.sleep(0.05)
+            return Mock(data=rows)
+        
+        client = Mock()
+        client.table.return_value.select.return_value.execute.side_effect = slow_execute
+        index = CandidateLocationIndex()
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            for _ in range(3):
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        await asyncio.gather(index.ensure_loaded(client), index.ensure_loaded(client), ticker())
+        
+        assert client.table.return_value.select.return_value.execute.call_count == 1
+        assert ticks == 3
+        assert "sf" in index and not index.is_stale
+
 if __name__ == "__main__":
     # Simple test runner for development
     print("Testing distance calculation approximation...")
@@ -0,0 +1,165 @@
+"""
+Tests for the durable email outbox and its dispatcher
+"""
+
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.email_outbox import DEAD_LETTER_STREAM, OUTBOX_STREAM, EmailOutbox
+from src.email_templates import EmailService as TemplateEmailService
+from src.retry_policies import CircuitBreakerError
+
+def stream_entry(entry_id, payload, attempts=0, not_before=None):
+    fields = {b"payload": json.dumps(payload).encode(), b"attempts": str(attempts).encode()}
+    if not_before is not None:
+        fields[b"not_before"] = str(not_before).encode()
+    return (entry_id.encode(), fields)
+
+def outbox_client(entries):
+    """Redis client mock whose consumer group read returns the given entries"""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[])
+
+    client = MagicMock()
+    client.xadd = AsyncMock()
+    client.xgroup_create = AsyncMock()
+    client.xautoclaim = AsyncMock(return_value=[b"0-0", [], []])
+    client.xreadgroup = AsyncMock(return_value=[[OUTBOX_STREAM.encode(), entries]])
+    client.pipeline.return_value = pipe
+    return client, pipe
+
+class TestEnqueue:
+    """Tests for EmailOutbox.enqueue"""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_appends_to_stream_without_sending(self):
+        """Test enqueueing is one XADD and never calls Resend"""
+        outbox = EmailOutbox()
+        client, _ = outbox_client([])
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=client), \
+             patch('src.email_outbox.resend.Emails.send') as send:
+            assert await outbox.enqueue({"to": ["a@example.com"], "subject": "Hi"}) is True
+
+        send.assert_not_called()
+        stream, message = client.xadd.await_args.args
+        assert stream == OUTBOX_STREAM
+        assert json.loads(message["payload"]) == {"to": ["a@example.com"], "subject": "Hi"}
+
+    @pytest.mark.asyncio
+    async def test_local_queue_used_and_drained_without_redis(self):
+        """Test emails queued while Redis is down are sent by the dispatcher"""
+        outbox = EmailOutbox()
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=None), \
+             patch('src.email_outbox.resend.Emails.send', return_value={"id": "e1"}) as send:
+            await outbox.enqueue({"to": ["a@example.com"]})
+            assert await outbox.dispatch_once() == 1
+
+        send.assert_called_once_with({"to": ["a@example.com"]})
+        assert outbox.stats["sent"] == 1
+        assert len(outbox._local) == 0
+
+    @pytest.mark.asyncio
+    async def test_refused_local_sends_are_deferred_and_not_counted(self):
+        """Test open-circuit refusals count as no work and wait before the next attempt"""
+        outbox = EmailOutbox()
+        deliver = AsyncMock(side_effect=CircuitBreakerError("open"))
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=None), \
+             patch.object(outbox, '_deliver', deliver):
+            await outbox.enqueue({"to": ["a@example.com"]})
+            assert await outbox.dispatch_once() == 0
+            assert await outbox.dispatch_once() == 0
+
+        deliver.assert_awaited_once()
+        assert len(outbox._local) == 1
+        assert float(outbox._local[0]["not_before"]) > time.time()
+
+    @pytest.mark.asyncio
+    async def test_failed_local_send_is_retried_with_backoff(self):
+        """Test a failed local send is requeued with a not_before time"""
+        outbox = EmailOutbox()
+        deliver = AsyncMock(side_effect=RuntimeError("rejected"))
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=None), \
+             patch.object(outbox, '_deliver', deliver):
+            await outbox.enqueue({"to": ["a@example.com"]})
+            assert await outbox.dispatch_once() == 1
+            assert await outbox.dispatch_once() == 0
+
+        message = outbox._local[0]
+        assert message["attempts"] == "1"
+        assert float(message["not_before"]) >= time.time() + outbox.retry_backoff_seconds - 1
+
+class TestDispatch:
+    """Tests for batch dispatch from the stream"""
+
+    @pytest.mark.asyncio
+    async def test_batch_is_acked_requeued_and_dead_lettered_in_one_pipeline(self):
+        """Test successes are acked, failures requeued or dead-lettered, open-circuit sends left pending"""
+        outbox = EmailOutbox()
+        outbox.max_attempts = 3
+        entries = [
+            stream_entry("1-0", {"to": ["ok@example.com"]}),
+            stream_entry("2-0", {"to": ["retry@example.com"]}),
+            stream_entry("3-0", {"to": ["dead@example.com"]}, attempts=2),
+            stream_entry("4-0", {"to": ["later@example.com"]})
+        ]
+        client, pipe = outbox_client(entries)
+
+        async def deliver(payload):
+            recipient = payload["to"][0]
+            if recipient == "later@example.com":
+                raise CircuitBreakerError("open")
+            if recipient != "ok@example.com":
+                raise RuntimeError("rejected")
+            return {"id": "e1"}
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=client), \
+             patch.object(outbox, '_deliver', side_effect=deliver):
+            assert await outbox.dispatch_once() == 3
+
+        pipe.execute.assert_awaited_once()
+        assert pipe.xack.call_args.args[2:] == ("1-0", "2-0", "3-0")
+        requeued = {call.args[0]: call.args[1] for call in pipe.xadd.call_args_list}
+        assert requeued[OUTBOX_STREAM]["attempts"] == "1"
+        assert float(requeued[OUTBOX_STREAM]["not_before"]) > time.time()
+        assert json.loads(requeued[DEAD_LETTER_STREAM]["payload"]) == {"to": ["dead@example.com"]}
+        assert outbox.stats == {"enqueued": 0, "sent": 1, "retried": 1, "dead_lettered": 1}
+
+    @pytest.mark.asyncio
+    async def test_entries_not_yet_due_are_left_pending(self):
+        """Test requeued entries are not sent or acknowledged before their not_before time"""
+        outbox = EmailOutbox()
+        client, pipe = outbox_client([stream_entry("1-0", {"to": ["a@example.com"]}, 1, time.time() + 60)])
+        deliver = AsyncMock()
+
+        with patch('src.email_outbox.redis_service.get_client', return_value=client), \
+             patch.object(outbox, '_deliver', deliver):
+            assert await outbox.dispatch_once() == 0
+
+        deliver.assert_not_awaited()
+        pipe.execute.assert_not_awaited()
+
+class TestTemplateServiceEnqueues:
+    """Tests that request-path email helpers only enqueue"""
+
+    @pytest.mark.asyncio
+    async def test_session_scheduled_is_queued(self):
+        """Test send_session_scheduled queues the email instead of calling Resend inline"""
+        service = TemplateEmailService()
+        service.enabled = True
+        enqueue = AsyncMock(return_value=True)
+
+        with patch('src.email_templates.email_outbox.enqueue', enqueue), \
+             patch('src.email_templates.resend.Emails.send') as send:
+            assert await service.send_session_scheduled("a@example.com", "Alex", "Cafe", "Friday 7pm")
+
+        send.assert_not_called()
+        payload = enqueue.await_args.args[0]
+        assert payload["to"] == ["a@example.com"]
+        assert "Cafe" in payload["html"]
@@ -0,0 +1,95 @@
+"""
+Tests for precompiled email template rendering
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.email_rendering import CompiledTemplate, compile_templates
+from src.email_service import (
+    EMAIL_TEMPLATE_SOURCES, EmailService, EmailServiceError, EmailTemplate
+)
+
+class TestCompiledTemplate:
+    """Tests for CompiledTemplate"""
+
+    def test_render_matches_str_format(self):
+        """Test compiled rendering produces the same text as str.format"""
+        source = EMAIL_TEMPLATE_SOURCES["match_invitation"]["template"]
+        context = {
+            "recipient_name": "Alex", "wingman_name": "Jordan",
+            "challenge_title": "Say hi", "challenge_type": "social",
+            "duration_days": 7, "match_url": "https://example.com/m",
+            "preferences_url": "https://example.com/p"
+        }
+
+        assert CompiledTemplate(source).render(context) == source.format(**context)
+
+    def test_repeated_fields_and_format_specs(self):
+        """Test repeated fields, conversions, format specs and literal braces"""
+        template = CompiledTemplate("{name} {{literal}} {score:.1f} {name!r}")
+
+        assert template.fields == frozenset({"name", "score"})
+        assert template.render({"name": "Alex", "score": 4.25}) == "Alex {literal} 4.2 'Alex'"
+
+    def test_missing_field_raises_key_error(self):
+        """Test a missing field raises KeyError"""
+        with pytest.raises(KeyError):
+            CompiledTemplate("Hi {name}").render({})
+
+    def test_html_values_are_escaped(self):
+        """Test substituted values are escaped in HTML templates but static markup is not"""
+        template = CompiledTemplate("<p>{name}</p>", escape_html=True)
+
+        assert template.render({"name": "<b>Tom & Jerry</b>"}) == "<p>&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;</p>"
+
+    def test_render_many_binds_shared_fields_once(self):
+        """Test render_many with shared fields matches rendering each full context"""
+        template = CompiledTemplate("{greeting}, {name}! {{ok}} {days:d} days", escape_html=True)
+        shared = {"greeting": "Hello & welcome", "days": 30}
+        contexts = [{"name": "Alex"}, {"name": "<Sam>"}]
+
+        assert template.render_many(contexts, shared=shared) == [
+            template.render({**shared, **context}) for context in contexts
+        ]
+        assert template.partial(shared).fields == frozenset({"name"})
+
+    def test_compile_templates_escapes_html_keys_only(self):
+        """Test compile_templates marks only the listed parts as HTML"""
+        compiled = compile_templates({"t": {"subject": "{x}", "html": "{x}"}}, html_keys=("html",))
+
+        assert compiled["t"]["subject"].render({"x": "<"}) == "<"
+        assert compiled["t"]["html"].render({"x": "<"}) == "&lt;"
+
+class TestEmailServiceRendering:
+    """Tests for EmailService template rendering and bulk sends"""
+
+    def test_missing_variable_raises_email_service_error(self):
+        """Test a missing template variable surfaces as EmailServiceError"""
+        with pytest.raises(EmailServiceError):
+            EmailService()._format_email_content(EmailTemplate.MATCH_ACCEPTED, {"recipient_name": "Alex"})
+
+    @pytest.mark.asyncio
+    async def test_send_bulk_template_queues_one_email_per_recipient(self):
+        """Test send_bulk_template renders per recipient and enqueues each email"""
+        service = EmailService()
+        service._fallback_mode = False
+        shared = {
+            "partner_name": "Jordan", "challenge_title": "Say hi", "duration_days": 30,
+            "start_date": "2026-10-20", "challenge_dashboard_url": "https://example.com/d"
+        }
+        recipients = [
+            {"to_email": "a@example.com", "variables": {"recipient_name": "Alex"}},
+            {"to_email": "b@example.com", "variables": {"recipient_name": "Sam"}}
+        ]
+        enqueue = AsyncMock(return_value=True)
+
+        with patch('src.email_service.email_outbox.enqueue', enqueue):
+            results = await service.send_bulk_template(EmailTemplate.MATCH_ACCEPTED, recipients, shared)
+
+        assert results["successful"] == 2
+        payloads = [call.args[0] for call in enqueue.await_args_list]
+        assert [payload["to"] for payload in payloads] == [["a@example.com"], ["b@example.com"]]
+        assert "Hello Sam" in payloads[1]["text"]
+        assert "Jordan" in payloads[1]["text"]
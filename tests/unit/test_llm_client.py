@@ -0,0 +1,152 @@
+"""
+Tests for the shared Anthropic client and non-blocking agent Claude calls
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import anthropic
+import httpx
+import pytest
+
+import src.llm_client as llm_client
+from src.agents.base_agent import BaseAgent, CLAUDE_FALLBACK_RESPONSE
+
+class StubAgent(BaseAgent):
+    async def process_message(self, thread_id, user_message):
+        return ""
+
+    async def get_progress(self):
+        return {}
+
+    async def save_progress(self, progress_data):
+        pass
+
+    async def is_flow_complete(self):
+        return False
+
+class FakeAnthropic:
+    """Async client stand-in that answers after a delay, optionally failing first"""
+
+    def __init__(self, failures=0, delay=0.05):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com"))
+        if kwargs.get('stream'):
+            return self._stream()
+        return SimpleNamespace(content=[SimpleNamespace(text="Sounds like progress.")])
+
+    async def _stream(self):
+        for text in ["Sounds ", "like ", "progress."]:
+            yield SimpleNamespace(delta=SimpleNamespace(text=text))
+
+@pytest.fixture
+def agent():
+    return StubAgent(None, "user-1", "test")
+
+class TestSharedAnthropicClient:
+    """Tests for src.llm_client"""
+
+    def test_client_is_shared(self):
+        """Test every caller gets the same pooled client"""
+        with patch.object(llm_client, '_anthropic_client', None):
+            first = llm_client.get_anthropic_client()
+            assert llm_client.get_anthropic_client() is first
+            assert first.max_retries == 0
+
+class TestBaseAgentClaudeCalls:
+    """Tests for BaseAgent.call_claude_with_router"""
+
+    @pytest.mark.asyncio
+    async def test_call_does_not_block_event_loop(self, agent):
+        """Test other coroutines run while the model responds"""
+        client = FakeAnthropic(delay=0.1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client):
+            response, _ = await asyncio.gather(
+                agent.call_claude_with_router([{"role": "user", "content": "hi"}], "Be kind"),
+                ticker()
+            )
+
+        assert response == "Sounds like progress."
+        assert ticks == 5
+        assert client.calls[0]['system'] == "Be kind"
+
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self, agent):
+        """Test connection errors go through the anthropic retry policy"""
+        client = FakeAnthropic(failures=1, delay=0)
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client), \
+             patch('src.retry_policies.asyncio.sleep'):
+            response = await agent.call_claude_with_router([{"role": "user", "content": "hi"}])
+
+        assert response == "Sounds like progress."
+        assert len(client.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_streaming_yields_chunks(self, agent):
+        """Test agent responses can be streamed"""
+        client = FakeAnthropic(delay=0)
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client):
+            chunks = [c async for c in agent.stream_claude_with_router([{"role": "user", "content": "hi"}])]
+
+        assert chunks == ["Sounds ", "like ", "progress."]
+        assert client.calls[0]['stream'] is True
+
+    @pytest.mark.asyncio
+    async def test_failure_returns_fallback(self, agent):
+        """Test a non-retryable failure returns the apology message"""
+        client = FakeAnthropic(delay=0)
+        client.create = None
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client):
+            response = await agent.call_claude_with_router([{"role": "user", "content": "hi"}])
+
+        assert response == CLAUDE_FALLBACK_RESPONSE
+
+    @pytest.mark.asyncio
+    async def test_default_model(self, agent):
+        """Test agents keep their default model when none is passed"""
+        client = FakeAnthropic(delay=0)
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client):
+            await agent.call_claude_with_router([{"role": "user", "content": "hi"}])
+
+        assert client.calls[0]['model'] == "claude-3-5-sonnet-20241022"
+
+class TestCoachClaudeCalls:
+    """Tests for the non-streaming coach call"""
+
+    @pytest.mark.asyncio
+    async def test_coach_retries_transient_errors(self):
+        """Test /coach/chat retries a connection error instead of returning the apology"""
+        from src import claude_agent
+
+        client = FakeAnthropic(failures=1, delay=0)
+        context = {'conversation_history': []}
+
+        with patch.object(llm_client, 'get_anthropic_client', return_value=client), \
+             patch.object(claude_agent, 'record_prompt_cache_metric'), \
+             patch('src.retry_policies.asyncio.sleep'):
+            response = await claude_agent.interact_with_coach("Hi", "user-1", "thread-1", context=context)
+
+        assert response == "Sounds like progress."
+        assert len(client.calls) == 2
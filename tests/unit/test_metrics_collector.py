@@ -0,0 +1,233 @@
+"""
+Tests for in-process metric aggregation, batched Redis flushes and quantile sketches
+"""
+
+import random
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.observability.metrics_collector import (
+    OVERFLOW_LABEL, UNMATCHED_ROUTE_LABEL, MetricsCollector, get_route_label
+)
+from src.observability.quantile_sketch import QuantileSketch
+
+def redis_with_pipeline(results=None):
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=results or [])
+    client = MagicMock()
+    client.pipeline.return_value = pipe
+    return client, pipe
+
+@pytest.fixture
+def collector():
+    return MetricsCollector()
+
+class TestMetricAggregation:
+    """Tests for MetricsCollector.record_metric and flush"""
+
+    @pytest.mark.asyncio
+    async def test_recording_does_not_touch_redis(self, collector):
+        """Test samples are aggregated in memory on the request path"""
+        get_client = AsyncMock()
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', get_client):
+            for value in (5, 15, 30):
+                await collector.record_metric("request", "GET /health", value, tags={"status_code": "200"})
+
+        get_client.assert_not_awaited()
+        (aggregate,) = collector._pending.values()
+        assert (aggregate.count, aggregate.total, aggregate.min, aggregate.max) == (3, 50, 5, 30)
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_are_bounded_by_series(self, collector):
+        """Test a flush is one pipeline whose size does not grow with sample count"""
+        client, pipe = redis_with_pipeline()
+
+        for _ in range(1000):
+            await collector.record_metric("request", "GET /health", 42, tags={"status_code": "200"})
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=client)):
+            written = await collector.flush()
+
+        assert written == 1
+        pipe.execute.assert_awaited_once()
+        assert pipe.hincrby.call_args_list[0].args[1:] == ("GET /health|status_code=200|count", 1000)
+        assert pipe.hincrby.call_count == 2  # count + one histogram bucket
+        assert collector._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_pending_aggregates(self, collector):
+        """Test aggregates survive a failed flush and merge with samples recorded meanwhile"""
+        client, pipe = redis_with_pipeline()
+        pipe.execute.side_effect = ConnectionError("down")
+        await collector.record_metric("request", "GET /health", 10)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=client)):
+            assert await collector.flush() == 0
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=None)):
+            assert await collector.flush() == 0
+        await collector.record_metric("request", "GET /health", 20)
+
+        (aggregate,) = collector._pending.values()
+        assert (aggregate.count, aggregate.total) == (2, 30)
+
+    @pytest.mark.asyncio
+    async def test_tag_separators_round_trip(self, collector):
+        """Test names and tag values containing separators are stored and read back intact"""
+        client, pipe = redis_with_pipeline()
+        tags = {"query": "a=1,b|c", "pct": "100%"}
+        await collector.record_metric("database", "select|x", 5, tags=tags)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=client)):
+            await collector.flush()
+
+        bucket = {call.args[1]: str(call.args[2]) for call in pipe.hset.call_args_list + pipe.hincrby.call_args_list}
+        bucket.update({call.args[1]: str(call.args[2]) for call in pipe.hincrbyfloat.call_args_list})
+        read_client, read_pipe = redis_with_pipeline()
+        read_pipe.execute.side_effect = lambda: [bucket] + [{}] * (len(read_pipe.hgetall.call_args_list) - 1)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=read_client)):
+            (metric,) = await collector.get_metrics(metric_type="database", hours=1, source="redis")
+
+        assert (metric.name, metric.tags, metric.metadata["count"]) == ("select|x", tags, 1)
+
+    @pytest.mark.asyncio
+    async def test_redis_read_returns_aggregated_series(self, collector):
+        """Test aggregated buckets read back with counts and tags"""
+        sketch = QuantileSketch()
+        bucket = {
+            "get|hit=True|unit": "ms", "get|hit=True|count": "3", "get|hit=True|sum": "6", "get|hit=True|z": "3",
+            "get|hit=False|unit": "ms", "get|hit=False|count": "1", "get|hit=False|sum": "9",
+            f"get|hit=False|k{sketch.key(9)}": "1",
+        }
+        client, pipe = redis_with_pipeline()
+        pipe.execute.side_effect = lambda: [bucket] + [{}] * (len(pipe.hgetall.call_args_list) - 1)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=client)):
+            metrics = await collector.get_metrics(metric_type="cache", hours=1, source="redis")
+
+        by_hit = {m.tags["hit"]: m for m in metrics}
+        assert by_hit["True"].metadata["count"] == 3
+        assert by_hit["True"].value == pytest.approx(2.0)
+        assert by_hit["False"].metadata["percentiles"]["p95"] == pytest.approx(9, rel=0.01)
+
+    @pytest.mark.asyncio
+    async def test_memory_samples_are_bounded(self, collector):
+        """Test the raw sample window keeps only the newest samples"""
+        collector.metrics = type(collector.metrics)(maxlen=3)
+
+        for value in range(5):
+            await collector.record_metric("database", "select", value)
+
+        assert [m.value for m in collector.metrics] == [2, 3, 4]
+
+class TestQuantileSketch:
+    """Tests for QuantileSketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test sketch percentiles stay within 1% of the exact values"""
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(4, 1) for _ in range(20000))
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.01)
+
+    def test_merged_sketches_match_single_sketch(self):
+        """Test per-worker sketches merge into the same cluster-wide answer"""
+        rng = random.Random(11)
+        values = [rng.expovariate(1 / 80) for _ in range(6000)]
+        combined, workers = QuantileSketch(), [QuantileSketch() for _ in range(3)]
+        for index, value in enumerate(values):
+            combined.add(value)
+            workers[index % 3].add(value)
+
+        merged = QuantileSketch()
+        for sketch in workers:
+            merged.merge(sketch)
+
+        assert merged.bins == combined.bins
+        assert merged.quantiles([0.5, 0.99]) == combined.quantiles([0.5, 0.99])
+
+class TestPerformanceSummary:
+    """Tests for MetricsCollector.get_performance_summary"""
+
+    @pytest.mark.asyncio
+    async def test_summary_merges_redis_buckets_with_unflushed_samples(self, collector):
+        """Test summaries combine other workers' flushed data with local pending samples"""
+        other_worker = MetricsCollector()
+        for value in (100, 200, 300):
+            await other_worker.record_metric("request", "GET /health", value)
+        (stored,) = other_worker._pending.values()
+        bucket = {"GET /health||unit": "ms", **{k: str(v) for k, v in stored.to_fields("GET /health|").items()}}
+
+        client, pipe = redis_with_pipeline()
+        client.smembers = AsyncMock(return_value={"request"})
+        pipe.execute.side_effect = lambda: [bucket] + [{}] * (len(pipe.hgetall.call_args_list) - 1)
+        await collector.record_metric("request", "GET /health", 400)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=client)):
+            summary = await collector.get_performance_summary(hours=1)
+
+        stats = summary["metric_types"]["request"]["metrics"]["GET /health"]
+        assert summary["scope"] == "cluster"
+        assert stats["count"] == 4
+        assert stats["avg"] == pytest.approx(250)
+        assert stats["percentiles"]["p50"] == pytest.approx(200, rel=0.01)
+        assert stats["max"] == 400
+
+    @pytest.mark.asyncio
+    async def test_summary_uses_local_history_without_redis(self, collector):
+        """Test summaries fall back to this worker's aggregates when Redis is down"""
+        for value in (10, 20, 30):
+            await collector.record_metric("database", "select", value)
+
+        with patch('src.observability.metrics_collector.RedisSession.get_client', AsyncMock(return_value=None)):
+            summary = await collector.get_performance_summary(hours=1)
+
+        stats = summary["metric_types"]["database"]["metrics"]["select"]
+        assert summary["scope"] == "local"
+        assert (stats["count"], stats["min"], stats["max"]) == (3, 10, 30)
+
+class TestMetricLabels:
+    """Tests for bounded request metric labels"""
+
+    def test_requests_are_labelled_by_route_template(self):
+        """Test different IDs on one route share a label and unknown paths share another"""
+        app = FastAPI()
+        labels = []
+
+        @app.get("/api/session/{session_id}")
+        async def get_session(session_id: str):
+            return {}
+
+        @app.middleware("http")
+        async def capture_label(request: Request, call_next):
+            response = await call_next(request)
+            labels.append(get_route_label(request.scope))
+            return response
+
+        client = TestClient(app)
+        for path in ("/api/session/a1", "/api/session/b2", "/missing/c3"):
+            client.get(path)
+
+        assert labels == ["/api/session/{session_id}", "/api/session/{session_id}", UNMATCHED_ROUTE_LABEL]
+
+    @pytest.mark.asyncio
+    async def test_names_past_cap_go_to_overflow(self, collector):
+        """Test the number of series per metric type stays flat"""
+        collector.max_names_per_type = 2
+
+        for index in range(10):
+            await collector.record_metric("request", f"GET /user/{index}", 10)
+
+        names = {name for (_, name, _, _) in collector._pending}
+        assert names == {"GET /user/0", "GET /user/1", OVERFLOW_LABEL}
@@ -0,0 +1,71 @@
+"""
+Tests for cacheable coaching system prompt blocks
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import src.claude_agent as claude_agent
+from src.prompts import ARCHETYPE_PROMPTS, get_personalized_prompt, get_system_prompt_blocks, main_prompt
+
+class FakeAnthropic:
+    def __init__(self):
+        self.requests = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        usage = SimpleNamespace(input_tokens=40, output_tokens=12,
+                                cache_read_input_tokens=3000, cache_creation_input_tokens=0)
+        return SimpleNamespace(content=[SimpleNamespace(text="Keep going.")], usage=usage)
+
+class TestSystemPromptBlocks:
+    """Tests for get_system_prompt_blocks"""
+
+    def test_static_blocks_carry_breakpoints(self):
+        """Test persona and archetype blocks are cacheable and context is not"""
+        blocks = get_system_prompt_blocks(main_prompt, 2, "Name: Sam")
+
+        assert [block['text'] for block in blocks[:2]] == [main_prompt, ARCHETYPE_PROMPTS[2]]
+        assert all(block['cache_control'] == {'type': 'ephemeral'} for block in blocks[:2])
+        assert 'cache_control' not in blocks[-1]
+        assert 'Name: Sam' in blocks[-1]['text']
+
+    def test_blocks_hold_same_content_as_monolithic_prompt(self):
+        """Test splitting the prompt does not change what the model sees"""
+        blocks = get_system_prompt_blocks(main_prompt, 4, "Name: Sam")
+        personalized = get_personalized_prompt(main_prompt, 4, "Name: Sam")
+
+        positions = [personalized.index(block['text'].strip()) for block in blocks]
+        assert positions == sorted(positions)
+
+    def test_caching_can_be_disabled(self):
+        """Test no breakpoints are emitted when prompt caching is off"""
+        blocks = get_system_prompt_blocks(main_prompt, None, "", enable_caching=False)
+
+        assert len(blocks) == 2
+        assert all('cache_control' not in block for block in blocks)
+
+class TestCoachPromptCaching:
+    """Tests for prompt caching in interact_with_coach"""
+
+    @pytest.mark.asyncio
+    async def test_coach_sends_blocks_and_records_cache_usage(self):
+        """Test the coach sends cacheable blocks and exports cache token counts"""
+        client = FakeAnthropic()
+        record = AsyncMock()
+        context = {'conversation_history': [], 'assessment_results': {'archetype': 1}}
+
+        with patch('src.llm_client.get_anthropic_client', return_value=client), \
+             patch.object(claude_agent, 'record_prompt_cache_metric', record), \
+             patch.object(claude_agent.Config, 'ENABLE_PROMPT_CACHING', True):
+            response = await claude_agent.interact_with_coach("Hi", "user-1", "thread-1", context=context)
+
+        system = client.requests[0]['system']
+        assert response == "Keep going."
+        assert system[0]['text'] == main_prompt
+        assert system[1]['text'] == ARCHETYPE_PROMPTS[1]
+        record.assert_awaited_once()
+        assert record.await_args.args[1].cache_read_input_tokens == 3000
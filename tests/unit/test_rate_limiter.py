@@ -0,0 +1,152 @@
+"""
+Tests for the single round trip multi-tier rate limit check
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.rate_limiter import LEASE_SCRIPT, MULTI_TIER_SCRIPT, RateLimiter
+from src.redis_client import redis_service
+
+def make_request(path="/auth/login", ip="10.0.0.1"):
+    request = MagicMock()
+    request.headers = {}
+    request.client.host = ip
+    request.url.path = path
+    return request
+
+def tier_reply(*tiers):
+    """Flatten (allowed, remaining, retry_after, reset_after) tuples like the script does"""
+    return [value for tier in tiers for value in tier]
+
+@pytest.fixture
+def limiter():
+    with patch('src.rate_limiter.Config.RATE_LIMIT_GLOBAL_LEASE_FRACTION', 0):
+        limiter = RateLimiter()
+    limiter.algorithm = "gcra"
+    return limiter
+
+@pytest.fixture
+def leased_limiter():
+    limiter = RateLimiter()
+    limiter.algorithm = "gcra"
+    limiter.global_lease.lease_size = 10
+    limiter.global_lease.low_watermark = 0
+    return limiter
+
+def script_router(lease_reply, tier_allowed=1):
+    """Answer lease and tier scripts like Redis would"""
+    async def run_script(script, keys, args):
+        if script == LEASE_SCRIPT:
+            return lease_reply
+        return tier_reply(*[[tier_allowed, 5, "0" if tier_allowed else "3", "60"] for _ in keys])
+    return AsyncMock(side_effect=run_script)
+
+class TestMultiTierCheck:
+    """Tests for RateLimiter.check_rate_limit"""
+
+    @pytest.mark.asyncio
+    async def test_all_tiers_checked_in_one_script_call(self, limiter):
+        """Test endpoint, user, IP and global limits cost a single Redis call"""
+        reply = tier_reply([1, 6, "0", "60"], [1, 1199, "0", "3"], [1, 149, "0", "36"], [1, 11999, "0", "0.3"])
+        run_script = AsyncMock(return_value=reply)
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()):
+            allowed, info = await limiter.check_rate_limit(make_request(), user_id="user-1")
+
+        assert allowed is True
+        assert info["limit_type"] == "none"
+        run_script.assert_awaited_once()
+        assert run_script.await_args.args[0] == MULTI_TIER_SCRIPT
+        assert run_script.await_args.kwargs["keys"] == [
+            "ratelimit:endpoint:/auth/login:10.0.0.1",
+            "ratelimit:user:user-1",
+            "ratelimit:ip:10.0.0.1",
+            "ratelimit:global",
+        ]
+        assert run_script.await_args.kwargs["args"] == [
+            "gcra", 1, 5, 300, 7, 1000, 3600, 1200, 100, 3600, 150, 10000, 3600, 12000
+        ]
+
+    @pytest.mark.asyncio
+    async def test_rejection_reports_first_failing_tier(self, limiter):
+        """Test a denied request reports the tier that rejected it"""
+        reply = tier_reply([0, 0, "12.5", "3600"], [1, 99, "0", "36"], [1, 11999, "0", "0.3"])
+        run_script = AsyncMock(return_value=reply)
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()), \
+             patch('src.rate_limiter.time.time', return_value=1000.0):
+            allowed, info = await limiter.check_rate_limit(make_request("/matches"), user_id="user-1")
+
+        assert allowed is False
+        assert info["limit_type"] == "user"
+        assert info["user_id"] == "user-1"
+        assert info["retry_after"] == pytest.approx(12.5)
+        assert info["reset_time"] == 1013
+
+    @pytest.mark.asyncio
+    async def test_redis_unavailable_uses_memory_buckets(self, limiter):
+        """Test the in-memory fallback still enforces endpoint limits"""
+        run_script = AsyncMock(return_value=None)
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()):
+            results = [await limiter.check_rate_limit(make_request("/auth/register")) for _ in range(6)]
+
+        assert [allowed for allowed, _ in results] == [True] * 5 + [False]
+        assert results[-1][1]["limit_type"] == "endpoint"
+
+    def test_unknown_algorithm_defaults_to_gcra(self):
+        """Test a misconfigured algorithm falls back to GCRA"""
+        with patch('src.rate_limiter.Config.RATE_LIMIT_ALGORITHM', 'fixed_window'):
+            assert RateLimiter().algorithm == "gcra"
+
+class TestGlobalQuotaLease:
+    """Tests for the worker-local global rate limit lease"""
+
+    @pytest.mark.asyncio
+    async def test_global_tokens_are_spent_locally(self, leased_limiter):
+        """Test one lease covers many requests and global leaves the tier script"""
+        run_script = script_router([10, "0"])
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()):
+            results = [await leased_limiter.check_rate_limit(make_request("/matches")) for _ in range(5)]
+
+        lease_calls = [call for call in run_script.await_args_list if call.args[0] == LEASE_SCRIPT]
+        tier_keys = [call.kwargs["keys"] for call in run_script.await_args_list if call.args[0] == MULTI_TIER_SCRIPT]
+        assert all(allowed for allowed, _ in results)
+        assert len(lease_calls) == 1
+        assert leased_limiter.global_lease.tokens == 5
+        assert all("ratelimit:global" not in keys for keys in tier_keys)
+
+    @pytest.mark.asyncio
+    async def test_rejected_request_returns_global_token(self, leased_limiter):
+        """Test a request denied by another tier does not spend global quota"""
+        run_script = script_router([10, "0"], tier_allowed=0)
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()):
+            allowed, info = await leased_limiter.check_rate_limit(make_request("/matches"))
+
+        assert allowed is False
+        assert info["limit_type"] == "ip"
+        assert leased_limiter.global_lease.tokens == 10
+
+    @pytest.mark.asyncio
+    async def test_exhausted_budget_rejects_without_redis_call(self, leased_limiter):
+        """Test requests are rejected locally until the shared budget refills"""
+        run_script = script_router([0, "2.5"])
+
+        with patch.object(redis_service, 'run_script', run_script), \
+             patch.object(redis_service, '_client', MagicMock()):
+            first = await leased_limiter.check_rate_limit(make_request("/matches"))
+            second = await leased_limiter.check_rate_limit(make_request("/matches"))
+
+        assert first[0] is False and second[0] is False
+        assert first[1]["limit_type"] == "global"
+        assert first[1]["retry_after"] == pytest.approx(2.5, abs=0.1)
+        assert run_script.await_count == 1
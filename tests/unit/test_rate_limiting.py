@@ -0,0 +1,78 @@
+"""
+Tests for the script-based token bucket
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.rate_limiting import TOKEN_BUCKET_SCRIPT, TokenBucket
+
+@pytest.fixture(autouse=True)
+def reset_script():
+    TokenBucket._script = None
+    yield
+    TokenBucket._script = None
+
+def redis_with_script(reply):
+    script = AsyncMock(return_value=reply)
+    client = MagicMock()
+    client.register_script.return_value = script
+    return client, script
+
+class TestTokenBucket:
+    """Tests for TokenBucket.consume"""
+
+    @pytest.mark.asyncio
+    async def test_consume_is_one_script_call(self):
+        """Test the check is a single atomic script round trip"""
+        client, script = redis_with_script([1, "4.5", "0"])
+        bucket = TokenBucket(capacity=5, refill_rate=0.5, key_prefix="rate_limit:test")
+
+        with patch('src.rate_limiting.RedisSession.get_client', AsyncMock(return_value=client)):
+            result = await bucket.consume("user:1")
+
+        client.register_script.assert_called_once_with(TOKEN_BUCKET_SCRIPT)
+        script.assert_awaited_once_with(
+            keys=["rate_limit:test:user:1"], args=[5, 0.5, 1, 70], client=client
+        )
+        client.hgetall.assert_not_called()
+        assert result == {"allowed": True, "tokens_remaining": 4, "retry_after": None, "redis_fallback": False}
+
+    @pytest.mark.asyncio
+    async def test_rejection_reports_retry_after(self):
+        """Test a denied request carries the script's retry delay"""
+        client, _ = redis_with_script([0, "0.2", "0.4"])
+        bucket = TokenBucket(capacity=1, refill_rate=2.0)
+
+        with patch('src.rate_limiting.RedisSession.get_client', AsyncMock(return_value=client)):
+            result = await bucket.consume("user:1")
+
+        assert result["allowed"] is False
+        assert result["retry_after"] == pytest.approx(0.4)
+
+    @pytest.mark.asyncio
+    async def test_script_is_registered_once(self):
+        """Test later calls reuse the registered script (EVALSHA)"""
+        client, script = redis_with_script([1, "0", "0"])
+        bucket = TokenBucket(capacity=1, refill_rate=2.0)
+
+        with patch('src.rate_limiting.RedisSession.get_client', AsyncMock(return_value=client)):
+            await bucket.consume("a")
+            await bucket.consume("b")
+
+        assert client.register_script.call_count == 1
+        assert script.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_script_error_fails_open(self):
+        """Test Redis errors allow the request"""
+        client, script = redis_with_script(None)
+        script.side_effect = ConnectionError("down")
+        bucket = TokenBucket(capacity=1, refill_rate=2.0)
+
+        with patch('src.rate_limiting.RedisSession.get_client', AsyncMock(return_value=client)):
+            result = await bucket.consume("user:1")
+
+        assert result["allowed"] is True
+        assert "down" in result["error"]
@@ -0,0 +1,91 @@
+"""
+Tests for the Redis circuit breaker in RedisService
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from redis.exceptions import ConnectionError, ResponseError
+
+from src.redis_client import RedisService
+
+def failing_service(threshold=3):
+    """RedisService whose Redis client refuses every connection"""
+    service = RedisService()
+    service._breaker.failure_threshold = threshold
+    service._client = MagicMock()
+    service._client.get = AsyncMock(side_effect=ConnectionError("refused"))
+    service._client.setex = AsyncMock(side_effect=ConnectionError("refused"))
+    service._client.ping = AsyncMock(side_effect=ConnectionError("refused"))
+    return service
+
+class TestRedisCircuitBreaker:
+    """Tests for failover to the in-memory fallback"""
+
+    @pytest.mark.asyncio
+    async def test_failed_call_falls_back_in_the_same_call(self):
+        """Test a write that hits a connection error still succeeds in memory"""
+        service = failing_service()
+
+        assert await service.set_cache("catalog", {"v": 1}, 600) is True
+        assert await service.get_cache("catalog") == {"v": 1}
+        assert service._breaker.state == "CLOSED"
+
+    @pytest.mark.asyncio
+    async def test_opens_after_threshold_and_fails_fast(self):
+        """Test consecutive failures open the circuit and later calls skip Redis"""
+        service = failing_service(threshold=2)
+
+        with patch.object(service, '_start_probe') as start_probe:
+            await service.get_cache("a")
+            await service.get_cache("b")
+            assert service._breaker.state == "OPEN"
+            start_probe.assert_called_once()
+
+            await service.get_cache("c")
+            await service.set_cache("c", 1)
+
+        assert service._client.get.await_count == 2
+        service._client.setex.assert_not_awaited()
+        assert service.is_available() is False
+        assert await service.health_check() is False
+        service._client.ping.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_hot_path_does_not_ping(self):
+        """Test cache reads go straight to Redis without a health check round trip"""
+        service = RedisService()
+        service._client = MagicMock()
+        service._client.get = AsyncMock(return_value='{"v": 1}')
+        service._client.ping = AsyncMock()
+
+        assert await service.get_cache("catalog") == {"v": 1}
+        service._client.ping.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_command_errors_do_not_open_circuit(self):
+        """Test errors from a healthy Redis are not counted as outages"""
+        service = RedisService()
+        service._breaker.failure_threshold = 1
+        service._client = MagicMock()
+        service._client.get = AsyncMock(side_effect=ResponseError("WRONGTYPE"))
+
+        assert await service.get_cache("catalog") is None
+        assert service._breaker.state == "CLOSED"
+
+    @pytest.mark.asyncio
+    async def test_background_probe_closes_circuit(self):
+        """Test the probe backs off while Redis is down and closes the circuit once it answers"""
+        service = failing_service(threshold=1)
+        service._client.ping = AsyncMock(side_effect=[ConnectionError("refused"), True])
+
+        with patch('src.redis_client.Config.REDIS_BREAKER_PROBE_INTERVAL_SECONDS', 0.001):
+            await service.get_cache("catalog")
+            assert service._breaker.state == "OPEN"
+            await asyncio.wait_for(service._probe_task, timeout=1)
+
+        assert service._breaker.state == "CLOSED"
+        assert service._client.ping.await_count == 2
+        assert service.is_available() is True
@@ -0,0 +1,112 @@
+"""
+Tests for the in-process L1 cache in front of Redis
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.cache_tags import INVALIDATION_CHANNEL, invalidation_message
+from src.redis_client import LocalCache, RedisService
+
+def l1_service(stored):
+    """RedisService with a live L1 whose Redis GET/PTTL returns the stored value"""
+    service = RedisService()
+    service._l1_active = True
+
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[json.dumps(stored) if stored is not None else None, 60000])
+    service._client = MagicMock()
+    service._client.pipeline.return_value = pipe
+    return service, pipe
+
+class TestLocalCache:
+    """Tests for LocalCache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted when full"""
+        cache = LocalCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
+    def test_read_started_before_invalidation_is_not_stored(self):
+        """Test a value read before an invalidation cannot repopulate the cache"""
+        cache = LocalCache(max_entries=10, ttl_seconds=60)
+        version = cache.version
+        cache.invalidate(["a"])
+        cache.set("a", "stale", version=version)
+
+        assert cache.get("a") is None
+
+class TestTwoTierGetCache:
+    """Tests for RedisService.get_cache with the L1 enabled"""
+
+    @pytest.mark.asyncio
+    async def test_second_read_is_served_from_l1(self):
+        """Test a repeated read skips Redis and is counted as an L1 hit"""
+        service, pipe = l1_service({"flag": True})
+
+        assert await service.get_cache("flags") == {"flag": True}
+        assert await service.get_cache("flags") == {"flag": True}
+        assert await service.get_cache("archetypes") == {"flag": True}
+
+        assert pipe.execute.await_count == 2
+        stats = service.get_cache_stats()
+        assert (stats["l1_hits"], stats["l2_hits"], stats["misses"]) == (1, 2, 0)
+        assert stats["l1_hit_ratio"] == round(1 / 3, 4)
+        assert stats["l2_hit_ratio"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_l1_bypassed_while_listener_is_down(self):
+        """Test reads go to Redis every time when invalidations are not being received"""
+        service, _ = l1_service(None)
+        service._l1_active = False
+        service._client.get = AsyncMock(return_value=json.dumps([1, 2]))
+
+        await service.get_cache("catalog")
+        await service.get_cache("catalog")
+
+        assert service._client.get.await_count == 2
+        assert service.get_cache_stats()["l1_hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_write_publishes_invalidation_in_same_pipeline(self):
+        """Test set_cache announces the key to other workers in its write round trip"""
+        service, pipe = l1_service(None)
+        pipe.execute = AsyncMock(return_value=[True, 1])
+
+        await service.set_cache("catalog", {"v": 2}, 600)
+        assert await service.get_cache("catalog") == {"v": 2}
+
+        pipe.execute.assert_awaited_once()
+        channel, message = pipe.publish.call_args.args
+        assert channel == INVALIDATION_CHANNEL
+        assert json.loads(message) == {"origin": service._instance_id, "keys": ["catalog"]}
+
+class TestInvalidationMessages:
+    """Tests for applying INVALIDATION_CHANNEL messages"""
+
+    def test_other_worker_write_drops_key(self):
+        """Test a message from another worker removes the key from the L1"""
+        service = RedisService()
+        service._l1.set("catalog", {"v": 1})
+
+        service._apply_invalidation(invalidation_message([b"catalog"], "other-worker"))
+
+        assert service._l1.get("catalog") is None
+
+    def test_own_write_is_ignored(self):
+        """Test a worker keeps its own freshly written value"""
+        service = RedisService()
+        service._l1.set("catalog", {"v": 2})
+
+        service._apply_invalidation(invalidation_message(["catalog"], service._instance_id))
+
+        assert service._l1.get("catalog") == {"v": 2}
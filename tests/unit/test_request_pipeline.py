@@ -0,0 +1,305 @@
+"""
+Tests for the single-pass request pipeline middleware and response cache
+"""
+
+import asyncio
+import random
+import time
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.cache_middleware import ResponseCache, invalidate_cache_type
+from src.middleware.request_pipeline import RequestPipelineMiddleware
+from src.redis_client import redis_service
+
+def make_limiter(allowed=True, info=None):
+    limiter = MagicMock()
+    limiter.check_rate_limit = AsyncMock(return_value=(allowed, info or {"limit_type": "none"}))
+    return limiter
+
+def make_client(limiter=None, response_cache=None):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/api/challenges")
+    async def list_challenges():
+        app.state.calls += 1
+        return {"challenges": ["approach", "conversation"]}
+
+    @app.get("/api/user/location")
+    async def user_location():
+        app.state.calls += 1
+        return {"lat": 1.0, "lng": 2.0}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield f"data: {index}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        response_cache=response_cache,
+        limiter=limiter or make_limiter()
+    )
+    return app, TestClient(app)
+
+class TestRequestPipeline:
+    """Tests for RequestPipelineMiddleware"""
+
+    def test_rate_limited_request_gets_429(self):
+        """Test a rejected request is answered without reaching the app"""
+        info = {"limit_type": "ip", "limit": 100, "remaining": 0, "reset_time": 0}
+        app, client = make_client(limiter=make_limiter(allowed=False, info=info))
+
+        response = client.get("/api/challenges", headers={"X-User-ID": "user-1"})
+
+        assert response.status_code == 429
+        assert response.json()["error"] == "Rate limit exceeded"
+        assert response.headers["X-RateLimit-Limit"] == "100"
+        assert app.state.calls == 0
+
+    def test_responses_carry_timing_headers_and_metric(self):
+        """Test timing headers are added and the metric uses the route template"""
+        record = AsyncMock()
+        app, client = make_client()
+
+        with patch('src.middleware.request_pipeline.record_request_metric', record):
+            response = client.get("/api/challenges")
+
+        assert response.status_code == 200
+        assert response.headers["X-Response-Time"].endswith("ms")
+        assert response.headers["X-Cache-Status"] == "miss"
+        assert record.await_args.kwargs["endpoint"] == "GET /api/challenges"
+        assert record.await_args.kwargs["status_code"] == 200
+
+    def test_streaming_response_passes_through(self):
+        """Test streamed bodies are forwarded intact"""
+        app, client = make_client(response_cache=ResponseCache())
+
+        response = client.get("/stream")
+
+        assert response.status_code == 200
+        assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+        assert "X-Response-Time" in response.headers
+
+class TestResponseCache:
+    """Tests for ResponseCache served through the pipeline"""
+
+    def test_cache_miss_stores_response(self):
+        """Test a successful JSON response is stored with its TTL"""
+        set_cache = AsyncMock(return_value=True)
+        app, client = make_client(response_cache=ResponseCache())
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=None)), \
+             patch.object(redis_service, 'set_cache', set_cache):
+            response = client.get("/api/challenges")
+
+        assert response.json() == {"challenges": ["approach", "conversation"]}
+        assert response.headers["X-Cache"] == "MISS"
+        cache_key, cache_data, ttl = set_cache.await_args.args
+        assert cache_key.startswith("wingman:api:challenges:")
+        assert cache_data["body"] == response.text
+        assert cache_data["expires_at"] == pytest.approx(time.time() + 3600, abs=5)
+        assert ttl == 7200  # fresh for an hour, then servable stale for another
+
+    def test_cache_hit_skips_app(self):
+        """Test a cached response is served without running the endpoint"""
+        cached = {"body": '{"challenges": ["cached"]}', "headers": {}}
+        app, client = make_client(response_cache=ResponseCache())
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=cached)):
+            response = client.get("/api/challenges")
+
+        assert response.json() == {"challenges": ["cached"]}
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.headers["X-Cache-Status"] == "hit"
+        assert app.state.calls == 0
+
+    @pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer token"}])
+    def test_user_scoped_request_without_user_is_not_cached(self, headers):
+        """Test a user-scoped endpoint bypasses the cache when no user id can be found"""
+        get_cache = AsyncMock(return_value={"body": '{"lat": 0}', "headers": {}})
+        set_cache = AsyncMock(return_value=True)
+        app, client = make_client(response_cache=ResponseCache())
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', get_cache), \
+             patch.object(redis_service, 'set_cache', set_cache):
+            response = client.get("/api/user/location", headers=headers)
+
+        assert response.json() == {"lat": 1.0, "lng": 2.0}
+        assert app.state.calls == 1
+        get_cache.assert_not_awaited()
+        set_cache.assert_not_awaited()
+
+class TestCachedResponsesWithCors:
+    """Tests for cached responses behind main.app's CORS and pipeline middleware"""
+
+    def test_cached_response_gets_cors_headers_for_each_origin(self):
+        """Test a response cached for one Origin is served to another with that Origin's CORS headers"""
+        from src import main
+        from src.middleware import request_pipeline
+
+        app = FastAPI()
+        app.user_middleware = list(main.app.user_middleware)
+        app.state.calls = 0
+
+        @app.get("/api/challenges")
+        async def list_challenges():
+            app.state.calls += 1
+            return {"challenges": ["approach"]}
+
+        store = {}
+
+        async def set_cache(key, value, *args, **kwargs):
+            store[key] = value
+            return True
+
+        with patch.object(request_pipeline.rate_limiter, 'check_rate_limit',
+                          AsyncMock(return_value=(True, {"limit_type": "none"}))), \
+             patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(side_effect=lambda key: store.get(key))), \
+             patch.object(redis_service, 'set_cache', AsyncMock(side_effect=set_cache)), \
+             patch.object(redis_service, 'get_counter', AsyncMock(return_value=0)):
+            client = TestClient(app)
+            first = client.get("/api/challenges", headers={"Origin": "http://localhost:3000"})
+            second = client.get("/api/challenges", headers={"Origin": "http://localhost:3002"})
+
+        assert app.state.calls == 1
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert first.headers["access-control-allow-origin"] == "http://localhost:3000"
+        assert second.headers["access-control-allow-origin"] == "http://localhost:3002"
+        (entry,) = store.values()
+        assert not any(name.startswith("access-control-") for name in entry["headers"])
+        assert "origin" not in entry["headers"].get("vary", "").lower()
+
+def http_scope(path="/api/challenges"):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+
+async def call_cache(cache, app):
+    """Run one GET through the cache and return (status header value, body)"""
+    scope = http_scope()
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await cache.run(app, scope, receive, send)
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return scope.get("state", {}).get("cache_status", "miss"), body
+
+def slow_app(delay=0.05):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/api/challenges")
+    async def list_challenges():
+        app.state.calls += 1
+        await asyncio.sleep(delay)
+        return {"version": app.state.calls}
+
+    return app
+
+class TestCacheStampedeProtection:
+    """Tests for single-flight fills, stale-while-revalidate and early expiration"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_run_app_once(self):
+        """Test one request fills a cold key while the rest wait for its response"""
+        cache, app = ResponseCache(), slow_app()
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=None)), \
+             patch.object(redis_service, 'set_cache', AsyncMock(return_value=True)):
+            results = await asyncio.gather(*[call_cache(cache, app) for _ in range(20)])
+
+        assert app.state.calls == 1
+        assert {body for _, body in results} == {b'{"version":1}'}
+        assert [status for status, _ in results].count("coalesced") == 19
+        assert cache._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_served_stale_and_refreshed_once(self):
+        """Test expired entries are answered immediately while one refresh runs"""
+        cache, app = ResponseCache(), slow_app()
+        stale = {"body": '{"version":0}', "headers": {}, "expires_at": time.time() - 1, "compute_time": 0.05}
+        set_cache = AsyncMock(return_value=True)
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=stale)), \
+             patch.object(redis_service, 'set_cache', set_cache):
+            results = await asyncio.gather(*[call_cache(cache, app) for _ in range(10)])
+            assert app.state.calls <= 1  # nobody waited on the refresh
+            await asyncio.gather(*cache._refresh_tasks)
+
+        assert results == [("stale", b'{"version":0}')] * 10
+        assert app.state.calls == 1
+        assert set_cache.await_args.args[1]["body"] == '{"version":1}'
+
+    @pytest.mark.asyncio
+    async def test_refresh_invalidated_in_flight_is_not_stored(self):
+        """Test a background refresh does not write back data computed before an invalidation"""
+        cache, app = ResponseCache(), slow_app()
+        stale = {"body": '{"version":0}', "headers": {}, "expires_at": time.time() - 1, "compute_time": 0.05}
+        set_cache = AsyncMock(return_value=True)
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=stale)), \
+             patch.object(redis_service, 'set_cache', set_cache):
+            await call_cache(cache, app)
+            await asyncio.sleep(0.01)  # refresh is now running the app
+            await invalidate_cache_type("challenges")
+            await asyncio.gather(*cache._refresh_tasks)
+
+        assert app.state.calls == 1
+        set_cache.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_without_stale_mode_expired_entry_is_refilled_inline(self):
+        """Test disabling stale-while-revalidate makes expired entries a coalesced miss"""
+        cache, app = ResponseCache(), slow_app()
+        cache.stale_while_revalidate = False
+        expired = {"body": '{"version":0}', "headers": {}, "expires_at": time.time() - 1}
+
+        with patch.object(redis_service, 'is_available', MagicMock(return_value=True)), \
+             patch.object(redis_service, 'get_cache', AsyncMock(return_value=expired)), \
+             patch.object(redis_service, 'set_cache', AsyncMock(return_value=True)):
+            results = await asyncio.gather(*[call_cache(cache, app) for _ in range(5)])
+
+        assert app.state.calls == 1
+        assert {body for _, body in results} == {b'{"version":1}'}
+
+    def test_early_expiration_spreads_refreshes(self):
+        """Test refresh probability rises toward expiry and with compute time"""
+        cache = ResponseCache()
+        now = time.time()
+        rng = random.Random(3)
+
+        def refresh_rate(seconds_left, compute_time):
+            entry = {"expires_at": now + seconds_left, "compute_time": compute_time}
+            with patch('src.cache_middleware.time.time', return_value=now), \
+                 patch('src.cache_middleware.random.random', rng.random):
+                return sum(cache._needs_refresh(entry) for _ in range(2000)) / 2000
+
+        assert refresh_rate(3600, 0.5) == 0
+        assert 0 < refresh_rate(1.0, 0.5) < refresh_rate(0.25, 0.5) < 1
+        assert refresh_rate(1.0, 0.5) < refresh_rate(1.0, 2.0)
+        assert refresh_rate(-1, 0.5) == 1